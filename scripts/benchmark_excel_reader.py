@@ -0,0 +1,70 @@
+"""
+benchmark_excel_reader.py
+Benchmark pembacaan file realisasi: pd.read_excel (openpyxl, semua kolom)
+dibandingkan excel_reader.read_excel_fast (calamine dan/atau proyeksi kolom).
+
+Pemakaian:
+    python scripts/benchmark_excel_reader.py [jumlah_baris] [path_xlsx]
+
+Tanpa path_xlsx, file realisasi sintetis (default 200.000 baris) dibuat di
+folder temporary. Setiap hasil dicek sama persis dengan pd.read_excel.
+
+Lokasi: verval-pupuk2/scripts/benchmark_excel_reader.py
+"""
+
+import os
+import sys
+import time
+import tempfile
+import pandas as pd
+
+from excel_reader import read_excel_fast, calamine_available, keyword_usecols
+from synthetic_data import write_realisasi_file
+
+# Kolom yang dipakai sisa_kuota.process_realisasi_file
+REALISASI_USECOLS = ['NIK', 'NAMA', 'KODE KIOS', 'KECAMATAN', 'UREA', 'NPK', 'SP36', 'ZA', 'ORGANIK']
+
+def build_sample_file(path, rows):
+    """Buat file realisasi sintetis (dengan NIK / tanggal / angka campuran seperti data asli)"""
+    write_realisasi_file(path, month=1, rows=rows, seed=42)
+
+def timed(label, func):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"   ⏱️  {label:<38} {elapsed:8.2f} detik  ({result.shape[0]:,} x {result.shape[1]})")
+    return result, elapsed
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    path = sys.argv[2] if len(sys.argv) > 2 else None
+
+    if path is None:
+        path = os.path.join(tempfile.gettempdir(), f"benchmark_realisasi_{rows}.xlsx")
+        if not os.path.exists(path):
+            print(f"🛠️  Membuat file sintetis {rows:,} baris: {path}")
+            build_sample_file(path, rows)
+
+    print(f"📖 File: {path} ({os.path.getsize(path) / (1024 * 1024):.1f} MB)")
+    print(f"   calamine tersedia: {'ya' if calamine_available() else 'tidak'}")
+
+    baseline, base_time = timed("pd.read_excel (openpyxl, semua kolom)",
+                                lambda: pd.read_excel(path, dtype=str))
+    projected_cols = [col for col in baseline.columns if keyword_usecols(REALISASI_USECOLS)(col)]
+    expected = baseline[projected_cols]
+
+    cases = [("openpyxl + proyeksi kolom",
+              lambda: read_excel_fast(path, dtype=str, engine='openpyxl', usecols_keywords=REALISASI_USECOLS))]
+    if calamine_available():
+        cases.append(("calamine, semua kolom", lambda: read_excel_fast(path, dtype=str)))
+        cases.append(("calamine + proyeksi kolom",
+                      lambda: read_excel_fast(path, dtype=str, usecols_keywords=REALISASI_USECOLS)))
+
+    for label, func in cases:
+        result, elapsed = timed(label, func)
+        reference = expected if result.shape[1] == expected.shape[1] else baseline
+        pd.testing.assert_frame_equal(result, reference)
+        print(f"      ✅ hasil identik, {base_time / elapsed:.1f}x lebih cepat")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+benchmark_startup.py
+Benchmark waktu startup (import) setiap script job dengan `python -X importtime`.
+
+Setiap script diimpor di proses baru TANPA secret di environment, beberapa
+kali (median dipakai), lalu dicatat:
+- total waktu import modul job (kumulatif, ms);
+- import top-level terberat di bawah modul job;
+- modul yang seharusnya baru diimpor saat dipakai (LAZY_MODULES: gspread,
+  googleapiclient, google.oauth2, httplib2, gspread_dataframe) tetapi ikut
+  terimpor saat startup.
+Script gagal (exit 1) jika ada job yang gagal diimpor tanpa secret, melebihi
+anggaran STARTUP_BUDGET_MS, atau mengimpor modul LAZY_MODULES.
+
+Pemakaian:
+    python scripts/benchmark_startup.py [--repeat N] [--baseline FILE] [--update-baseline]
+
+Dengan --baseline, hasil dibandingkan dengan file JSON hasil run sebelumnya;
+--update-baseline menulis hasil run ini ke file tersebut.
+
+Lokasi: verval-pupuk2/scripts/benchmark_startup.py
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+from statistics import median
+
+from run_job import JOBS, SCRIPTS_DIR, GOOGLE_SECRETS, EMAIL_SECRETS
+
+# ============================
+# KONFIGURASI
+# ============================
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "900"))
+LAZY_MODULES = ("gspread", "googleapiclient", "google.oauth2", "httplib2", "gspread_dataframe")
+TOP_IMPORTS = 3
+
+# ============================
+# FUNGSI UTILITY
+# ============================
+def parse_importtime(stderr):
+    """Baris `import time: self | cumulative | name` -> list (kedalaman, nama, kumulatif_us)"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        raw_name = parts[2].rstrip()
+        name = raw_name.lstrip()
+        depth = (len(raw_name) - len(name) - 1) // 2
+        entries.append((depth, name, int(parts[1])))
+    return entries
+
+def clean_environment():
+    """Environment tanpa secret: import script harus tetap berhasil"""
+    env = {key: value for key, value in os.environ.items() if key not in GOOGLE_SECRETS + EMAIL_SECRETS}
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    return env
+
+def measure_job(job, env):
+    """Satu kali import job di proses baru. Return dict hasil atau raise RuntimeError"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {job}"],
+        cwd=SCRIPTS_DIR, env=env, capture_output=True, text=True
+    )
+    entries = parse_importtime(result.stderr)
+    if result.returncode != 0:
+        last_line = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "unknown error"
+        raise RuntimeError(last_line)
+
+    # Urutan importtime: anak dicetak sebelum induknya, ambil anak langsung modul job
+    job_index = max(i for i, (depth, name, _) in enumerate(entries) if depth == 0 and name == job)
+    total_us = entries[job_index][2]
+    start = job_index
+    while start > 0 and entries[start - 1][0] >= 1:
+        start -= 1
+    children = [(name, cumulative) for depth, name, cumulative in entries[start:job_index] if depth == 1]
+    eager = sorted({name for _, name, _ in entries
+                    if any(name == lazy or name.startswith(lazy + ".") for lazy in LAZY_MODULES)})
+    return {
+        "total_ms": total_us / 1000.0,
+        "top": sorted(children, key=lambda item: item[1], reverse=True)[:TOP_IMPORTS],
+        "eager": [name for name in eager if "." not in name or name in LAZY_MODULES],
+    }
+
+# ============================
+# FUNGSI UTAMA
+# ============================
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark waktu import script job")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    env = clean_environment()
+    results, failures = {}, []
+    print(f"⏱️  Startup budget: {STARTUP_BUDGET_MS:.0f} ms per job, {args.repeat}x per job (median)")
+    print(f"{'JOB':24s} {'IMPORT (ms)':>12s} {'BASELINE':>10s}  IMPORT TERBERAT")
+    for job in sorted(JOBS):
+        try:
+            runs = [measure_job(job, env) for _ in range(max(1, args.repeat))]
+        except (RuntimeError, ValueError) as e:
+            failures.append(f"{job}: gagal diimpor tanpa secret ({e})")
+            print(f"{job:24s} {'GAGAL':>12s}")
+            continue
+
+        total_ms = median(run["total_ms"] for run in runs)
+        results[job] = round(total_ms, 1)
+        top = ", ".join(f"{name} {cumulative / 1000:.0f}" for name, cumulative in runs[-1]["top"])
+        base = f"{baseline[job]:.0f}" if job in baseline else "-"
+        print(f"{job:24s} {total_ms:12.0f} {base:>10s}  {top}")
+
+        if total_ms > STARTUP_BUDGET_MS:
+            failures.append(f"{job}: {total_ms:.0f} ms melebihi budget {STARTUP_BUDGET_MS:.0f} ms")
+        if runs[-1]["eager"]:
+            failures.append(f"{job}: modul berikut seharusnya diimpor saat dipakai: {', '.join(runs[-1]['eager'])}")
+
+    if args.baseline and args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"💾 Baseline ditulis ke {args.baseline}")
+
+    if failures:
+        print("\n❌ Startup budget tidak terpenuhi:")
+        for failure in failures:
+            print(f"   • {failure}")
+        return 1
+    print("\n✅ Semua job dalam startup budget")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
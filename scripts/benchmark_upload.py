@@ -0,0 +1,136 @@
+"""
+benchmark_upload.py
+Benchmark strategi upload data besar ke Google Sheets secara offline dengan
+backend palsu (fake_google), sehingga hasilnya bisa diulang di laptop.
+
+Setiap kombinasi ukuran chunk x jumlah request bersamaan (ChunkUploader +
+RateLimiter) meng-upload data sintetis yang sama ke spreadsheet palsu dengan
+latency dan kuota write yang diemulasikan. Dicatat: durasi, jumlah request,
+MB dikirim, jumlah 429, dan isi sheet dicek sama persis dengan data sumber.
+
+Pemakaian:
+    python scripts/benchmark_upload.py [jumlah_baris] [--latency DETIK] [--quota N] [--time-scale X]
+
+Default: 100.000 baris, latency 0,3 detik + 0,5 detik/MB, kuota 60 write per
+menit. --time-scale 10 mempercepat semua waktu 10x (latency, menit kuota,
+konstanta rate limiter); kolom MENIT menampilkan durasi setara tanpa skala.
+
+Lokasi: verval-pupuk2/scripts/benchmark_upload.py
+"""
+
+import io
+import sys
+import time
+import random
+import argparse
+from contextlib import redirect_stdout
+
+import rate_limiter
+from rate_limiter import RateLimiter
+from chunk_uploader import ChunkUploader
+from google_clients import get_gspread_client
+from fake_google import FakeGoogleBackend, install_fake_backend
+
+# ============================
+# KONFIGURASI
+# ============================
+CHUNK_SIZES = (1000, 5000)
+IN_FLIGHT = (1, 2, 4, 8)
+SPREADSHEET_ID = "benchmark-upload"
+HEADER = ['NIK', 'NAMA PETANI', 'KECAMATAN', 'DESA', 'KODE KIOS', 'UREA', 'NPK',
+          'SP36', 'ZA', 'ORGANIK', 'TGL TEBUS', 'STATUS']
+
+# ============================
+# FUNGSI UTILITY
+# ============================
+def build_rows(rows):
+    """Data sintetis (string, seperti hasil dataframe yang sudah dibersihkan)"""
+    rng = random.Random(42)
+    return [[
+        f"3509{rng.randint(10**11, 10**12 - 1)}",
+        f"Petani {i}",
+        f"KEC {rng.randint(1, 24):02d}",
+        f"Desa {rng.randint(1, 250)}",
+        f"KIOS{rng.randint(1, 400):04d}",
+        str(rng.choice([0, 25, 50, 100])),
+        str(rng.choice([0, 25, 50])),
+        str(rng.choice([0, 25])),
+        str(rng.choice([0, 25])),
+        str(rng.choice([0, 100, 200])),
+        f"{rng.randint(1, 28):02d}-{rng.randint(1, 12):02d}-2025",
+        "Disetujui Pusat",
+    ] for i in range(rows)]
+
+def scaled_limiter(quota, time_scale):
+    """RateLimiter dengan laju ~92% kuota; konstanta waktu dibagi time_scale"""
+    rate_limiter.BURST_SECONDS = 10 / time_scale
+    rate_limiter.BACKOFF_BASE = 2 / time_scale
+    rate_limiter.BACKOFF_MAX = 64 / time_scale
+    rate = quota * 0.92 * time_scale
+    return RateLimiter("benchmark", read_per_minute=rate, write_per_minute=rate)
+
+def run_case(rows, chunk_rows, in_flight, args):
+    """Upload rows sekali. Return dict hasil"""
+    backend = install_fake_backend(FakeGoogleBackend(
+        latency=args.latency / args.time_scale, latency_per_mb=args.latency_per_mb / args.time_scale,
+        sheets_write_per_minute=args.quota, quota_window=60.0 / args.time_scale
+    ))
+    backend.add_spreadsheet(SPREADSHEET_ID, sheets={"Sheet1": []})
+    worksheet = get_gspread_client().open_by_key(SPREADSHEET_ID).sheet1
+    worksheet.resize(rows=len(rows) + 1, cols=len(HEADER))
+    worksheet.update(values=[HEADER], range_name="A1")
+    backend.reset_stats()
+
+    def send_chunk(start_row, values):
+        return worksheet.update(values=values, range_name=f"A{start_row}", value_input_option="RAW")
+
+    limiter = scaled_limiter(args.quota, args.time_scale)
+    uploader = ChunkUploader(send_chunk, limiter=limiter, max_in_flight=in_flight)
+    with redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        report = uploader.upload(rows, chunk_rows, first_row=2)
+        elapsed = time.perf_counter() - start
+
+    totals = backend.totals()
+    return {
+        "elapsed": elapsed,
+        "requests": totals["requests"],
+        "mb_sent": totals["bytes_sent"] / (1024 * 1024),
+        "throttled": totals["errors"].get(429, 0),
+        "failed": len(report["failed"]),
+        "identical": backend.sheet_values(SPREADSHEET_ID, "Sheet1") == [HEADER] + rows,
+    }
+
+# ============================
+# FUNGSI UTAMA
+# ============================
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark strategi upload Sheets dengan backend palsu")
+    parser.add_argument("rows", nargs="?", type=int, default=100_000)
+    parser.add_argument("--latency", type=float, default=0.3, help="detik per request")
+    parser.add_argument("--latency-per-mb", type=float, default=0.5, help="detik per MB payload")
+    parser.add_argument("--quota", type=int, default=60, help="write request per menit")
+    parser.add_argument("--time-scale", type=float, default=10.0, help="percepatan menit kuota")
+    args = parser.parse_args()
+
+    rows = build_rows(args.rows)
+    print(f"🧪 Upload {args.rows:,} baris x {len(HEADER)} kolom, latency {args.latency}s + "
+          f"{args.latency_per_mb}s/MB, kuota {args.quota} write/menit (skala waktu {args.time_scale:g}x)")
+    print(f"{'CHUNK':>7s} {'PARALEL':>8s} {'DETIK':>8s} {'MENIT*':>7s} {'REQUEST':>8s} {'MB':>7s} {'429':>5s}  HASIL")
+
+    all_identical = True
+    for chunk_rows in CHUNK_SIZES:
+        for in_flight in IN_FLIGHT:
+            result = run_case(rows, chunk_rows, in_flight, args)
+            ok = result["identical"] and not result["failed"]
+            all_identical = all_identical and ok
+            print(f"{chunk_rows:7,d} {in_flight:8d} {result['elapsed']:8.2f} "
+                  f"{result['elapsed'] * args.time_scale / 60:7.2f} {result['requests']:8d} "
+                  f"{result['mb_sent']:7.1f} {result['throttled']:5d}  "
+                  f"{'✅ identik' if ok else '❌ tidak identik / ada chunk gagal'}")
+
+    print("* MENIT = durasi setara tanpa skala waktu")
+    return 0 if all_identical else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""
+chunk_uploader.py
+Upload data besar ke Google Sheets per chunk dengan beberapa request
+berjalan bersamaan.
+
+Sebelumnya chunk 3.000-5.000 baris dikirim satu per satu: setiap chunk
+menunggu round trip chunk sebelumnya (ditambah sleep), sehingga waktu upload
+= jumlah chunk x latensi, jauh di bawah kuota write yang tersedia.
+ChunkUploader menjaga sampai UPLOAD_IN_FLIGHT request values.update berjalan
+bersamaan (thread pool), sementara laju total tetap diatur rate limiter
+bersama (rate_limiter.get_rate_limiter), jadi kuota per menit tetap dihormati.
+
+- Setiap chunk punya jatah percobaan sendiri (CHUNK_ATTEMPTS) di atas retry
+  429/5xx milik rate limiter; callback on_error dipanggil di thread utama
+  sebelum chunk dicoba ulang (mis. untuk memperbesar grid sheet).
+- Penyelesaian dilacak berurutan: progress menampilkan sampai baris berapa
+  data sudah lengkap tanpa celah, walaupun chunk selesai tidak berurutan.
+
+Konfigurasi lewat environment variable:
+- SHEETS_UPLOAD_IN_FLIGHT : maksimal request upload bersamaan (default 4)
+
+Lokasi: verval-pupuk2/scripts/chunk_uploader.py
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from rate_limiter import get_rate_limiter
+
+# ============================
+# KONFIGURASI
+# ============================
+UPLOAD_IN_FLIGHT = max(1, int(os.getenv("SHEETS_UPLOAD_IN_FLIGHT", "4")))
+CHUNK_ATTEMPTS = 3  # Percobaan per chunk (di luar retry 429/5xx rate limiter)
+
+# ============================
+# FUNGSI UTILITY
+# ============================
+def split_chunks(total_rows, chunk_rows):
+    """Daftar (start_idx, end_idx) untuk total_rows baris, chunk_rows per chunk"""
+    chunk_rows = max(1, int(chunk_rows))
+    return [(start, min(start + chunk_rows, total_rows)) for start in range(0, total_rows, chunk_rows)]
+
+# ============================
+# KELAS UPLOADER
+# ============================
+class ChunkUploader:
+    """
+    Kirim rows per chunk lewat send_chunk(start_row, values) dengan maksimal
+    max_in_flight request bersamaan. start_row = nomor baris sheet (1-based)
+    untuk baris pertama chunk. send_chunk harus aman dipanggil dari beberapa
+    thread.
+    """
+
+    def __init__(self, send_chunk, limiter=None, max_in_flight=UPLOAD_IN_FLIGHT,
+                 attempts=CHUNK_ATTEMPTS, on_error=None, label="Chunk"):
+        self.send_chunk = send_chunk
+        self.limiter = limiter or get_rate_limiter("sheets")
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.attempts = max(1, int(attempts))
+        self.on_error = on_error  # on_error(chunk_dict, exception) di thread utama
+        self.label = label
+
+    def _send(self, chunk, rows):
+        start_idx, end_idx = chunk['start_idx'], chunk['end_idx']
+        return self.limiter.call(self.send_chunk, chunk['start_row'], rows[start_idx:end_idx])
+
+    def upload(self, rows, chunk_rows, first_row=1):
+        """
+        Upload semua rows mulai baris first_row. Return dict: total, successful,
+        failed (list dict chunk/rows/error), complete_rows (jumlah baris awal yang
+        sudah tertulis tanpa celah), elapsed (detik).
+        """
+        chunks = [
+            {'index': idx, 'start_idx': start, 'end_idx': end,
+             'start_row': first_row + start, 'attempt': 0}
+            for idx, (start, end) in enumerate(split_chunks(len(rows), chunk_rows))
+        ]
+        total = len(chunks)
+        done = [False] * total
+        failed = []
+        contiguous = 0  # Jumlah chunk awal yang sudah selesai berurutan
+        start_time = time.time()
+
+        workers = min(self.max_in_flight, total) or 1
+        print(f"   ⚡ Upload {total} chunk, maksimal {workers} request bersamaan")
+
+        pending = list(reversed(chunks))  # pop() mengambil chunk paling awal
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while pending or in_flight:
+                while pending and len(in_flight) < workers:
+                    chunk = pending.pop()
+                    chunk['attempt'] += 1
+                    in_flight[executor.submit(self._send, chunk, rows)] = chunk
+
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    chunk = in_flight.pop(future)
+                    rows_label = f"baris {chunk['start_row']:,}-{chunk['start_row'] + chunk['end_idx'] - chunk['start_idx'] - 1:,}"
+                    try:
+                        future.result()
+                    except Exception as e:
+                        if chunk['attempt'] < self.attempts:
+                            print(f"   🔄 {self.label} {chunk['index'] + 1}/{total} gagal "
+                                  f"(percobaan {chunk['attempt']}/{self.attempts}): {str(e)[:100]}")
+                            if self.on_error:
+                                self.on_error(chunk, e)
+                            pending.append(chunk)
+                        else:
+                            print(f"   ❌ {self.label} {chunk['index'] + 1}/{total} gagal setelah "
+                                  f"{self.attempts} percobaan: {str(e)[:100]}")
+                            failed.append({'chunk': chunk['index'] + 1, 'rows': rows_label, 'error': str(e)[:200]})
+                        continue
+
+                    done[chunk['index']] = True
+                    while contiguous < total and done[contiguous]:
+                        contiguous += 1
+                    complete_rows = chunks[contiguous - 1]['end_idx'] if contiguous else 0
+                    print(f"   ✅ {self.label} {chunk['index'] + 1}/{total}: {rows_label} "
+                          f"(lengkap s.d. {complete_rows:,}/{len(rows):,} baris)")
+
+        complete_rows = chunks[contiguous - 1]['end_idx'] if contiguous else 0
+        elapsed = time.time() - start_time
+        failed.sort(key=lambda item: item['chunk'])
+        print(f"   ⏱️  Upload selesai dalam {elapsed:.1f} detik: "
+              f"{sum(done)}/{total} chunk berhasil")
+        return {
+            'total': total,
+            'successful': sum(done),
+            'failed': failed,
+            'complete_rows': complete_rows,
+            'elapsed': elapsed,
+        }
+
+def upload_rows(send_chunk, rows, chunk_rows, first_row=1, **kwargs):
+    """Shortcut: ChunkUploader(send_chunk, **kwargs).upload(rows, chunk_rows, first_row)"""
+    return ChunkUploader(send_chunk, **kwargs).upload(rows, chunk_rows, first_row)
@@ -1,14 +1,18 @@
 import os
-import io
 import json
 import pandas as pd
-import gspread
-import re
+import numpy as np
 import time
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
-from datetime import datetime, timedelta
+from drive_cache import get_drive_cache, DRIVE_FILE_FIELDS
+from excel_snapshot import read_excel_cached
+from incremental_state import IncrementalState
+from nik_utils import clean_nik_series, print_nik_summary
+from date_utils import parse_date_series, format_date_series
+from sheet_sync import sync_dataframe_to_worksheet
+from rate_limiter import get_rate_limiter
+from chunk_uploader import ChunkUploader, UPLOAD_IN_FLIGHT
+from google_clients import get_drive_service, get_gspread_client
+from datetime import datetime
 import traceback
 import smtplib
 from email.mime.text import MIMEText
@@ -24,167 +28,137 @@ SHEET_NAME = "Rekap_Gabungan"
 
 # Optimasi untuk data besar
 BATCH_SIZE = 3000  # Ukuran batch untuk API requests
-MAX_RETRIES = 3  # Maks percobaan retry
-RETRY_DELAY = 2  # Delay antar retry (detik)
+SHEETS_LIMITER = get_rate_limiter("sheets")  # Laju request sesuai kuota, retry saat 429
+MAX_RETRIES = SHEETS_LIMITER.max_retries  # Maks percobaan retry
 BUFFER_ROWS = 1000  # Buffer untuk resize worksheet
 
-# ============================
-# LOAD CREDENTIALS DAN KONFIGURASI EMAIL DARI SECRETS
-# ============================
-# Load Google credentials dari secret
-creds_json = os.getenv("GOOGLE_APPLICATION_CREDENTIALS_JSON")
-if not creds_json:
-    raise ValueError("❌ SECRET GOOGLE_APPLICATION_CREDENTIALS_JSON TIDAK TERBACA")
-
-# Load email configuration dari secrets
-SENDER_EMAIL = os.getenv("SENDER_EMAIL")
-SENDER_EMAIL_PASSWORD = os.getenv("SENDER_EMAIL_PASSWORD")
-RECIPIENT_EMAILS = os.getenv("RECIPIENT_EMAILS")
-
-# Validasi email configuration
-if not SENDER_EMAIL:
-    raise ValueError("❌ SECRET SENDER_EMAIL TIDAK TERBACA")
-if not SENDER_EMAIL_PASSWORD:
-    raise ValueError("❌ SECRET SENDER_EMAIL_PASSWORD TIDAK TERBACA")
-if not RECIPIENT_EMAILS:
-    raise ValueError("❌ SECRET RECIPIENT_EMAILS TIDAK TERBACA")
-
-# Parse recipient emails
-try:
-    recipient_list = json.loads(RECIPIENT_EMAILS)
-except json.JSONDecodeError:
-    recipient_list = [email.strip() for email in RECIPIENT_EMAILS.split(",")]
-
-# KONFIGURASI EMAIL
-EMAIL_CONFIG = {
-    "smtp_server": "smtp.gmail.com",
-    "smtp_port": 587,
-    "sender_email": SENDER_EMAIL,
-    "sender_password": SENDER_EMAIL_PASSWORD,
-    "recipient_emails": recipient_list
-}
-
-credentials = Credentials.from_service_account_info(
-    json.loads(creds_json),
-    scopes=[
-        "https://www.googleapis.com/auth/spreadsheets",
-        "https://www.googleapis.com/auth/drive",
-    ],
-)
-
-gc = gspread.authorize(credentials)
-drive_service = build("drive", "v3", credentials=credentials)
-
-# ============================
-# FUNGSI BERSIHKAN NIK
-# ============================
-def clean_nik(nik_value):
-    """
-    Membersihkan NIK dari karakter non-angka seperti ', `, spasi, dll.
-    Hanya mengambil angka saja.
-    """
-    if pd.isna(nik_value) or nik_value is None:
-        return None
-
-    nik_str = str(nik_value)
-    cleaned_nik = re.sub(r'\D', '', nik_str)
-
-    if len(cleaned_nik) != 16:
-        print(f"⚠️  NIK tidak standar: {nik_value} -> {cleaned_nik} (panjang: {len(cleaned_nik)})")
-
-    return cleaned_nik if cleaned_nik else None
+# Naikkan jika cara memproses satu file berubah (state inkremental lama dibuang)
+INCREMENTAL_LOGIC_VERSION = 3
 
 # ============================
-# FUNGSI KONVERSI TANGGAL (DIPERBAIKI - hanya dd-mm-yyyy)
+# LOAD EMAIL CONFIGURATION FROM SECRETS
 # ============================
-def parse_tanggal_tebus(tanggal_str):
+def load_email_config():
     """
-    Mengonversi string tanggal menjadi format dd-mm-yyyy
-    Menghapus bagian waktu jika ada
+    Memuat konfigurasi email dari environment variables/secrets
     """
-    if pd.isna(tanggal_str) or tanggal_str is None or tanggal_str == "":
-        return None
+    # Load dari environment variables
+    SENDER_EMAIL = os.getenv("SENDER_EMAIL")
+    SENDER_EMAIL_PASSWORD = os.getenv("SENDER_EMAIL_PASSWORD")
+    RECIPIENT_EMAILS = os.getenv("RECIPIENT_EMAILS")
     
+    # Validasi
+    if not SENDER_EMAIL:
+        raise ValueError("❌ SECRET SENDER_EMAIL TIDAK TERBACA")
+    if not SENDER_EMAIL_PASSWORD:
+        raise ValueError("❌ SECRET SENDER_EMAIL_PASSWORD TIDAK TERBACA")
+    if not RECIPIENT_EMAILS:
+        raise ValueError("❌ SECRET RECIPIENT_EMAILS TIDAK TERBACA")
+    
+    # Parse recipient emails
     try:
-        tanggal_str = str(tanggal_str).strip()
-        
-        # Jika sudah datetime object
-        if isinstance(tanggal_str, datetime):
-            return tanggal_str.strftime('%d-%m-%Y')
-        
-        # Coba berbagai format dan konversi ke dd-mm-yyyy
-        # Format yyyy-mm-dd HH:MM:SS
-        if re.match(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$', tanggal_str):
-            dt = datetime.strptime(tanggal_str, '%Y-%m-%d %H:%M:%S')
-            return dt.strftime('%d-%m-%Y')
-        
-        # Format yyyy-mm-dd
-        elif re.match(r'^\d{4}-\d{2}-\d{2}$', tanggal_str):
-            dt = datetime.strptime(tanggal_str, '%Y-%m-%d')
-            return dt.strftime('%d-%m-%Y')
-        
-        # Format dd-mm-yyyy HH:MM:SS
-        elif re.match(r'^\d{2}-\d{2}-\d{4} \d{2}:\d{2}:\d{2}$', tanggal_str):
-            dt = datetime.strptime(tanggal_str, '%d-%m-%Y %H:%M:%S')
-            return dt.strftime('%d-%m-%Y')
-        
-        # Format dd-mm-yyyy (sudah benar)
-        elif re.match(r'^\d{2}-\d{2}-\d{4}$', tanggal_str):
-            return tanggal_str
-        
-        # Format dd/mm/yyyy
-        elif re.match(r'^\d{2}/\d{2}/\d{4}$', tanggal_str):
-            dt = datetime.strptime(tanggal_str, '%d/%m/%Y')
-            return dt.strftime('%d-%m-%Y')
-        
-        # Format Excel serial number (angka)
-        elif tanggal_str.replace('.', '').isdigit():
-            try:
-                # Konversi dari Excel serial number
-                excel_date = float(tanggal_str)
-                dt = datetime(1899, 12, 30) + timedelta(days=excel_date)
-                return dt.strftime('%d-%m-%Y')
-            except:
-                return None
-        else:
-            print(f"⚠️  Format tanggal tidak dikenali: {tanggal_str}")
-            return None
-            
-    except Exception as e:
-        print(f"⚠️  Error parsing tanggal '{tanggal_str}': {str(e)}")
-        return None
-
-def format_tanggal_display(tanggal_str):
-    """
-    Format tanggal untuk ditampilkan (selalu dd-mm-yyyy)
-    """
-    formatted = parse_tanggal_tebus(tanggal_str)
-    return formatted if formatted else ""
+        # Coba parse sebagai JSON array
+        recipient_list = json.loads(RECIPIENT_EMAILS)
+    except json.JSONDecodeError:
+        # Jika bukan JSON, split berdasarkan koma
+        recipient_list = [email.strip() for email in RECIPIENT_EMAILS.split(",")]
+    
+    return {
+        "smtp_server": "smtp.gmail.com",
+        "smtp_port": 587,
+        "sender_email": SENDER_EMAIL,
+        "sender_password": SENDER_EMAIL_PASSWORD,
+        "recipient_emails": recipient_list
+    }
 
 # ============================
-# FUNGSI URUTKAN DATA BERDASARKAN BULAN DAN TANGGAL
+# FUNGSI REKAP PER NIK (URUT BERDASARKAN TANGGAL)
 # ============================
-def urutkan_data_per_nik(group):
+# Grup dengan baris lebih banyak dari ini diurutkan ulang per grup dengan
+# quicksort, sama seperti sort_values per grup sebelumnya (urutan baris
+# bertanggal sama tetap identik dengan Rekap_Gabungan lama). Grup kecil:
+# quicksort numpy untuk <= 16 elemen = insertion sort yang stabil, jadi cukup
+# diurutkan sekali untuk seluruh data. Ini detail implementasi numpy: diperiksa
+# saat runtime di quicksort_kecil_stabil() dan numpy di-pin di workflow.
+STABLE_QUICKSORT_SIZE = 16
+
+# Kolom dan label untuk satu baris teks rekap
+REKAP_TEXT_PARTS = [
+    ("", "NAMA PETANI"),
+    (" Tgl Tebus ", "TGL TEBUS"),
+    (" No Transaksi ", "NO TRANSAKSI"),
+    (" Kios ", "NAMA KIOS"),
+    (", Kecamatan ", "KECAMATAN"),
+    (", Urea ", "UREA"),
+    (" kg, NPK ", "NPK"),
+    (" kg, SP36 ", "SP36"),
+    (" kg, ZA ", "ZA"),
+    (" kg, NPK Formula ", "NPK FORMULA"),
+    (" kg, Organik ", "ORGANIK"),
+    (" kg, Organik Cair ", "ORGANIK CAIR"),
+    (" kg, Status ", "STATUS"),
+]
+
+def quicksort_kecil_stabil(dtype):
+    """Cek apakah argsort quicksort numpy stabil untuk grup <= STABLE_QUICKSORT_SIZE baris"""
+    rng = np.random.default_rng(0)
+    for size in range(2, STABLE_QUICKSORT_SIZE + 1):
+        for _ in range(20):
+            sample = rng.integers(0, 3, size).astype(dtype)
+            if not np.array_equal(np.argsort(sample, kind='quicksort'), np.argsort(sample, kind='stable')):
+                return False
+    return True
+
+def urutkan_data_per_nik(combined):
     """
-    Mengurutkan data dalam group NIK berdasarkan tanggal (dd-mm-yyyy)
+    Urutkan seluruh data sekali berdasarkan (NIK, TGL_TEBUS_DATETIME) dengan
+    urutan baris bertanggal sama yang identik dengan sort_values per grup NIK
+    sebelumnya. Baris tanpa tanggal dibuang. Kolom TGL_TEBUS_DATETIME sudah
+    di-parse sekali untuk seluruh data di main().
     """
-    group = group.copy()
-    
-    # Parse dan format tanggal
-    group['TGL_TEBS_FORMATTED'] = group['TGL TEBUS'].apply(parse_tanggal_tebus)
-    group['TGL_TEBS_DATETIME'] = group['TGL TEBUS'].apply(lambda x: 
-        datetime.strptime(parse_tanggal_tebus(x), '%d-%m-%Y') 
-        if parse_tanggal_tebus(x) else None
-    )
-    
-    group = group[group['TGL_TEBS_DATETIME'].notna()]
-    
-    if len(group) == 0:
-        return group
-    
-    group = group.sort_values('TGL_TEBS_DATETIME')
-    
-    return group
+    data = combined[combined['TGL_TEBUS_DATETIME'].notna()]
+    nik_codes, _ = pd.factorize(data['NIK'], sort=True)
+    dates = data['TGL_TEBUS_DATETIME'].to_numpy()
+    order = np.lexsort((dates, nik_codes))
+
+    batas_grup = STABLE_QUICKSORT_SIZE
+    if not quicksort_kecil_stabil(dates.dtype):
+        print(f"⚠️  numpy {np.__version__}: quicksort grup kecil tidak stabil, semua grup NIK diurutkan per grup")
+        batas_grup = 1
+
+    # Grup besar: ulangi urutan quicksort per grup seperti sebelumnya
+    group_sizes = np.bincount(nik_codes)
+    starts = np.concatenate(([0], np.cumsum(group_sizes)[:-1]))
+    for code in np.flatnonzero(group_sizes > batas_grup):
+        start, end = starts[code], starts[code] + group_sizes[code]
+        # Posisi baris grup ini dalam urutan asli (seperti hasil groupby)
+        positions = np.sort(order[start:end])
+        order[start:end] = positions[np.argsort(dates[positions], kind='quicksort')]
+
+    return data.iloc[order], nik_codes[order]
+
+def buat_rekap_per_nik(combined):
+    """
+    Rekap per NIK: satu baris teks per transaksi (nomor urut per NIK),
+    digabung dengan newline. Return DataFrame kolom NIK, Nama, Data.
+    """
+    data, nik_codes = urutkan_data_per_nik(combined)
+    if data.empty:
+        return pd.DataFrame(columns=["NIK", "Nama", "Data"])
+
+    # Nomor urut per NIK lalu semua baris teks dibentuk sekaligus
+    nomor = pd.Series(nik_codes).groupby(nik_codes).cumcount() + 1
+    lines = nomor.astype(str).to_numpy(dtype=object) + ") "
+    for label, col in REKAP_TEXT_PARTS:
+        lines = lines + label + data[col].astype(str).to_numpy(dtype=object)
+
+    data_text = pd.Series(lines).groupby(nik_codes, sort=False).agg("\n".join)
+    first_rows = data[(nomor == 1).to_numpy()]
+    return pd.DataFrame({
+        "NIK": first_rows['NIK'].to_numpy(),
+        "Nama": first_rows['NAMA PETANI'].to_numpy(),
+        "Data": data_text.to_numpy()
+    })
 
 # ============================
 # FUNGSI KIRIM EMAIL
@@ -194,6 +168,9 @@ def send_email_notification(subject, message, is_success=True):
     Mengirim notifikasi email tentang status proses
     """
     try:
+        # Load config email
+        EMAIL_CONFIG = load_email_config()
+        
         msg = MIMEMultipart()
         msg['From'] = EMAIL_CONFIG["sender_email"]
         msg['To'] = ", ".join(EMAIL_CONFIG["recipient_emails"])
@@ -243,23 +220,58 @@ def send_email_notification(subject, message, is_success=True):
 # ============================
 def download_excel_files(folder_id, save_folder=SAVE_FOLDER):
     os.makedirs(save_folder, exist_ok=True)
+    drive_service = get_drive_service()
     query = f"'{folder_id}' in parents and (mimeType='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet' or mimeType='application/vnd.ms-excel')"
-    results = drive_service.files().list(q=query, fields="files(id, name)").execute()
+    results = drive_service.files().list(q=query, fields=DRIVE_FILE_FIELDS).execute()
     files = results.get("files", [])
 
     if not files:
         raise ValueError("Tidak ada file Excel di folder Google Drive.")
 
-    paths = []
+    drive_cache = get_drive_cache()
+    downloaded = []
     for f in files:
-        request = drive_service.files().get_media(fileId=f["id"])
-        fh = io.FileIO(os.path.join(save_folder, f["name"]), "wb")
-        downloader = MediaIoBaseDownload(fh, request)
-        done = False
-        while not done:
-            _, done = downloader.next_chunk()
-        paths.append(os.path.join(save_folder, f["name"]))
-    return paths
+        file_path, _ = drive_cache.fetch(drive_service, f, os.path.join(save_folder, f["name"]))
+        downloaded.append({"path": file_path, "file": f})
+    drive_cache.print_summary()
+    return downloaded
+
+# ============================
+# PROSES SATU FILE
+# ============================
+def process_file(fpath):
+    """
+    Baca satu file, bersihkan NIK dan format TGL TEBUS.
+    Hasilnya disimpan per file oleh IncrementalState, jadi file yang tidak
+    berubah tidak dibaca ulang pada run berikutnya.
+    """
+    # Load dengan dtype string untuk menghemat memory
+    df = read_excel_cached(fpath, dtype=str)
+
+    # Cek kolom NIK
+    if 'NIK' not in df.columns:
+        return {"df": None, "original_count": len(df), "nik_cleaning_log": []}
+
+    # Simpan original dan bersihkan NIK
+    original_nik_count = len(df)
+    df['NIK_ORIGINAL'] = df['NIK']
+    df['NIK'], nik_summary = clean_nik_series(df['NIK'])
+    print_nik_summary(nik_summary)
+
+    # Contoh NIK yang dibersihkan (maks 20 per file)
+    nik_cleaning_log = []
+    cleaned_niks = df[df['NIK_ORIGINAL'] != df['NIK']][['NIK_ORIGINAL', 'NIK']]
+    for _, row in cleaned_niks.head(20).iterrows():
+        nik_cleaning_log.append(f"'{row['NIK_ORIGINAL']}' -> {row['NIK']}")
+
+    # Hapus baris dengan NIK kosong
+    df = df[df['NIK'].notna()]
+
+    # Format tanggal ke dd-mm-yyyy (sekali per kolom, termasuk serial Excel)
+    if 'TGL TEBUS' in df.columns:
+        df['TGL TEBUS'] = format_date_series(df['TGL TEBUS'], excel_serial=True, warn_label="TGL TEBUS")
+
+    return {"df": df, "original_count": original_nik_count, "nik_cleaning_log": nik_cleaning_log}
 
 # ============================
 # FUNGSI OPTIMASI UNTUK DATA BESAR (200K+ BARIS)
@@ -282,9 +294,8 @@ def optimize_worksheet_for_large_data(worksheet, required_rows, required_cols):
         # Jika perlu resize
         if new_rows > current_rows or new_cols > current_cols:
             print(f"🔄 Resizing worksheet ke {new_rows:,} baris x {new_cols} kolom...")
-            worksheet.resize(rows=new_rows, cols=new_cols)
+            SHEETS_LIMITER.call(worksheet.resize, rows=new_rows, cols=new_cols)
             print(f"✅ Worksheet berhasil di-resize")
-            time.sleep(1)  # Tunggu API
             
         return True
         
@@ -307,8 +318,7 @@ def write_large_dataset_to_sheet(worksheet, dataframe, batch_size=BATCH_SIZE):
         # 2. Clear existing data
         print("🧹 Membersihkan data lama...")
         try:
-            worksheet.clear()
-            time.sleep(1)
+            SHEETS_LIMITER.call(worksheet.clear)
         except Exception as e:
             print(f"⚠️  Warning saat clear worksheet: {str(e)}")
         
@@ -323,48 +333,21 @@ def write_large_dataset_to_sheet(worksheet, dataframe, batch_size=BATCH_SIZE):
         num_chunks = (total_rows + batch_size - 1) // batch_size
         print(f"🔀 Data akan dibagi menjadi {num_chunks} chunk ({batch_size:,} baris per chunk)")
         
-        # 5. Proses setiap chunk dengan retry mechanism
-        for chunk_idx in range(num_chunks):
-            start_row = chunk_idx * batch_size
-            end_row = min(start_row + batch_size, total_rows)
-            current_chunk = data_to_update[start_row:end_row]
-            
-            chunk_success = False
-            retry_count = 0
-            
-            while not chunk_success and retry_count < MAX_RETRIES:
-                try:
-                    start_cell = f"A{start_row + 1}"
-                    
-                    if retry_count > 0:
-                        print(f"   🔄 Retry {retry_count} untuk chunk {chunk_idx + 1}")
-                        time.sleep(RETRY_DELAY * (retry_count + 1))
-                    
-                    worksheet.update(
-                        range_name=start_cell,
-                        values=current_chunk,
-                        value_input_option='USER_ENTERED'
-                    )
-                    
-                    chunk_success = True
-                    print(f"   ✅ Chunk {chunk_idx + 1}/{num_chunks}: baris {start_row + 1:,}-{end_row:,}")
-                    
-                    # Jeda antar chunk (kecuali chunk terakhir)
-                    if chunk_idx < num_chunks - 1:
-                        time.sleep(0.5)
-                        
-                except Exception as chunk_error:
-                    retry_count += 1
-                    error_msg = str(chunk_error)
-                    print(f"   ❌ Error pada chunk {chunk_idx + 1} (attempt {retry_count}): {error_msg[:100]}...")
-                    
-                    if "rate limit" in error_msg.lower():
-                        print(f"   ⏳ Rate limit terdeteksi, menunggu {RETRY_DELAY * 3} detik...")
-                        time.sleep(RETRY_DELAY * 3)
-                    
-                    if retry_count >= MAX_RETRIES:
-                        print(f"   ⚠️  Gagal menulis chunk {chunk_idx + 1} setelah {MAX_RETRIES} percobaan")
-                        raise
+        # 5. Kirim chunk bersamaan (maks UPLOAD_IN_FLIGHT), laju & retry 429 diatur SHEETS_LIMITER
+        def kirim_chunk(start_row, values):
+            return worksheet.update(
+                range_name=f"A{start_row}",
+                values=values,
+                value_input_option='USER_ENTERED'
+            )
+        
+        result = ChunkUploader(kirim_chunk, limiter=SHEETS_LIMITER).upload(data_to_update, batch_size)
+        if result['failed']:
+            first_failed = result['failed'][0]
+            raise RuntimeError(
+                f"{len(result['failed'])} chunk gagal ditulis, pertama chunk {first_failed['chunk']} "
+                f"({first_failed['rows']}): {first_failed['error'][:100]}"
+            )
         
         print(f"🎉 Berhasil menulis semua data! Total {total_rows:,} baris")
         return True
@@ -377,6 +360,8 @@ def write_large_dataset_to_sheet(worksheet, dataframe, batch_size=BATCH_SIZE):
 # FUNGSI UTAMA YANG DIPERBAIKI
 # ============================
 def main():
+    import gspread
+
     try:
         log = []
         all_data = []
@@ -387,10 +372,13 @@ def main():
         print("=" * 70)
         print("🚀 MEMULAI PROSES REKAP DATA (Optimized for Large Data)")
         print("=" * 70)
-        print(f"📧 Email pengirim: {SENDER_EMAIL}")
+        email_config = load_email_config()
+        recipient_list = email_config["recipient_emails"]
+        print(f"📧 Email pengirim: {email_config['sender_email']}")
         print(f"📧 Email penerima: {', '.join(recipient_list[:3])}{'...' if len(recipient_list) > 3 else ''}")
         print(f"⚙️  Batch Size: {BATCH_SIZE:,} baris")
         print(f"⚙️  Max Retries: {MAX_RETRIES}")
+        print(f"⚙️  Upload Bersamaan: {UPLOAD_IN_FLIGHT} request")
         print(f"📅 Format Tanggal: dd-mm-yyyy")
         print()
 
@@ -399,45 +387,37 @@ def main():
         print(f"📁 Berhasil download {len(excel_files)} file Excel")
         print()
 
-        # 2. Proses setiap file dengan optimasi memory
-        for fpath in excel_files:
+        # 2. Proses setiap file (file yang tidak berubah memakai hasil run sebelumnya)
+        state = IncrementalState("data_tebus_pubers", INCREMENTAL_LOGIC_VERSION)
+        state.prune(item["file"]["id"] for item in excel_files)
+
+        for item in excel_files:
+            fpath = item["path"]
             file_count += 1
             filename = os.path.basename(fpath)
             print(f"🔄 Memproses file {file_count}/{len(excel_files)}: {filename}")
             
             try:
-                # Load dengan dtype string untuk menghemat memory
-                df = pd.read_excel(fpath, dtype=str)
+                partial, _ = state.get_or_compute(item["file"], lambda: process_file(fpath))
             except Exception as e:
                 print(f"   ❌ Gagal membaca file: {str(e)}")
                 log.append(f"- {filename}: GAGAL DIBACA - {str(e)}")
                 continue
 
-            # Cek kolom NIK
-            if 'NIK' not in df.columns:
+            df = partial["df"]
+            if df is None:
                 print(f"   ⚠️  Kolom NIK tidak ditemukan")
                 log.append(f"- {filename}: KOLOM NIK TIDAK DITEMUKAN")
                 continue
-                
-            # Simpan original dan bersihkan NIK
-            original_nik_count = len(df)
-            df['NIK_ORIGINAL'] = df['NIK']
-            df['NIK'] = df['NIK'].apply(clean_nik)
 
             # Log NIK yang dibersihkan
-            cleaned_niks = df[df['NIK_ORIGINAL'] != df['NIK']][['NIK_ORIGINAL', 'NIK']]
-            for _, row in cleaned_niks.iterrows():
+            for entry in partial["nik_cleaning_log"]:
                 if len(nik_cleaning_log) < 20:  # Simpan hanya 20 contoh
-                    nik_cleaning_log.append(f"'{row['NIK_ORIGINAL']}' -> {row['NIK']}")
+                    nik_cleaning_log.append(entry)
 
-            # Hapus baris dengan NIK kosong
-            df = df[df['NIK'].notna()]
+            original_nik_count = partial["original_count"]
             cleaned_nik_count = len(df)
 
-            # Format tanggal ke dd-mm-yyyy
-            if 'TGL TEBUS' in df.columns:
-                df['TGL TEBUS'] = df['TGL TEBUS'].apply(format_tanggal_display)
-
             total_rows += cleaned_nik_count
             log.append(f"- {filename}: {original_nik_count:,} → {cleaned_nik_count:,} baris")
             all_data.append(df)
@@ -447,6 +427,7 @@ def main():
             # Free memory
             del df
 
+        state.print_summary()
         print()
         
         if not all_data:
@@ -473,49 +454,14 @@ def main():
 
         combined = combined[cols]
 
+        # Parse TGL TEBUS sekali untuk seluruh kolom (dipakai untuk urutan per NIK)
+        combined['TGL_TEBUS_DATETIME'] = parse_date_series(combined['TGL TEBUS'])
+
         # 5. Rekap per NIK dengan urutan bulan dan tanggal
         print("🔄 Membuat rekap per NIK...")
         print(f"📊 Jumlah NIK unik yang akan diproses: {combined['NIK'].nunique():,}")
         
-        output_rows = []
-        
-        # Progress tracking
-        total_unique_niks = combined['NIK'].nunique()
-        processed_niks = 0
-        progress_interval = max(1, total_unique_niks // 20)  # Update progress setiap 5%
-        
-        for nik, group in combined.groupby("NIK"):
-            processed_niks += 1
-            
-            # Show progress
-            if processed_niks % progress_interval == 0:
-                progress = (processed_niks / total_unique_niks) * 100
-                print(f"   📈 Progress: {processed_niks:,}/{total_unique_niks:,} NIK ({progress:.1f}%)")
-            
-            # Urutkan data dalam group
-            group_sorted = urutkan_data_per_nik(group)
-            
-            if len(group_sorted) == 0:
-                continue
-                
-            list_info = []
-            for i, (_, row) in enumerate(group_sorted.iterrows(), start=1):
-                tgl_tebus = row['TGL TEBUS']
-                
-                text = (
-                    f"{i}) {row['NAMA PETANI']} Tgl Tebus {tgl_tebus} "
-                    f"No Transaksi {row['NO TRANSAKSI']} Kios {row['NAMA KIOS']}, Kecamatan {row['KECAMATAN']}, "
-                    f"Urea {row['UREA']} kg, NPK {row['NPK']} kg, SP36 {row['SP36']} kg, "
-                    f"ZA {row['ZA']} kg, NPK Formula {row['NPK FORMULA']} kg, "
-                    f"Organik {row['ORGANIK']} kg, Organik Cair {row['ORGANIK CAIR']} kg, "
-                    f"Status {row['STATUS']}"
-                )
-                list_info.append(text)
-            
-            nama_petani = group_sorted['NAMA PETANI'].iloc[0] if len(group_sorted) > 0 else ""
-            output_rows.append([nik, nama_petani, "\n".join(list_info)])
-
-        out_df = pd.DataFrame(output_rows, columns=["NIK", "Nama", "Data"])
+        out_df = buat_rekap_per_nik(combined)
         print(f"✅ Rekap selesai: {len(out_df):,} NIK unik ditemukan")
         
         # Free memory
@@ -527,7 +473,7 @@ def main():
         print("📤 MENULIS DATA KE GOOGLE SHEETS")
         print("=" * 70)
         
-        sh = gc.open_by_key(SPREADSHEET_ID)
+        sh = get_gspread_client().open_by_key(SPREADSHEET_ID)
         
         # Cek atau buat worksheet
         try:
@@ -545,8 +491,12 @@ def main():
             )
             print(f"✅ Sheet '{SHEET_NAME}' berhasil dibuat ({initial_rows:,} baris)")
         
-        # Tulis data dengan fungsi yang dioptimasi
-        write_large_dataset_to_sheet(ws, out_df)
+        # Tulis hanya baris yang berubah (fallback: tulis ulang penuh)
+        sync_dataframe_to_worksheet(
+            ws, out_df, "data_tebus_pubers", key_columns=['NIK'],
+            full_write=lambda: write_large_dataset_to_sheet(ws, out_df),
+            value_input_option='USER_ENTERED'  # sama dengan write_large_dataset_to_sheet
+        )
 
         # 7. Buat laporan sukses
         print()
@@ -581,7 +531,7 @@ REKAP DATA BERHASIL DENGAN OPTIMASI DATA BESAR ✓
 📏 Ukuran Worksheet: {ws.row_count:,} baris x {ws.col_count} kolom
 
 🔧 OPTIMASI YANG DITERAPKAN:
-1. Batch processing ({BATCH_SIZE:,} baris per batch)
+1. Batch processing ({BATCH_SIZE:,} baris per batch, maks {UPLOAD_IN_FLIGHT} request bersamaan)
 2. Automatic worksheet resizing
 3. Retry mechanism ({MAX_RETRIES}x retry)
 4. Rate limit handling
@@ -649,6 +599,7 @@ if __name__ == "__main__":
     print("⏱️  Memulai proses...")
     
     success = main()
+    SHEETS_LIMITER.print_summary()
     
     end_time = time.time()
     duration = end_time - start_time
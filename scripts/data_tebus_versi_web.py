@@ -9,19 +9,18 @@ Lokasi: verval-pupuk2/scripts/data_tebus_versi_web.py
 import os
 import sys
 import pandas as pd
-import gspread
-import re
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
-from gspread_dataframe import set_with_dataframe
+from drive_cache import get_drive_cache, DRIVE_FILE_FIELDS
+from excel_snapshot import read_excel_cached
+from google_clients import get_drive_service, get_gspread_client
+from nik_utils import clean_nik_series, print_nik_summary
+from date_utils import format_date_series, WEB_DATE_FORMATS
+from sheet_sync import sync_dataframe_to_worksheet
 from datetime import datetime
 import traceback
 import json
-import io
 
 # ============================
 # KONFIGURASI
@@ -69,65 +68,6 @@ def load_email_config():
         "recipient_emails": recipient_list
     }
 
-# ============================
-# FUNGSI BERSIHKAN NIK
-# ============================
-def clean_nik(nik_value):
-    """
-    Membersihkan NIK dari karakter non-angka seperti ', `, spasi, dll.
-    Hanya mengambil angka saja.
-    """
-    if pd.isna(nik_value) or nik_value is None:
-        return None
-    
-    # Convert ke string dan hilangkan semua karakter non-digit
-    nik_str = str(nik_value)
-    cleaned_nik = re.sub(r'\D', '', nik_str)  # \D = non-digit
-    
-    # Validasi panjang NIK (biasanya 16 digit)
-    if len(cleaned_nik) != 16:
-        print(f"⚠️  NIK tidak standar: {nik_value} -> {cleaned_nik} (panjang: {len(cleaned_nik)})")
-    
-    return cleaned_nik if cleaned_nik else None
-
-# ============================
-# FUNGSI FORMAT TANGGAL
-# ============================
-def format_tanggal(tanggal_value):
-    """
-    Format tanggal menjadi dd-mm-yyyy
-    Menangani berbagai format input
-    """
-    if pd.isna(tanggal_value) or tanggal_value is None:
-        return ""
-    
-    try:
-        # Coba parse sebagai datetime pandas
-        if isinstance(tanggal_value, pd.Timestamp):
-            return tanggal_value.strftime('%d-%m-%Y')
-        
-        # Convert ke string
-        tanggal_str = str(tanggal_value).strip()
-        
-        # Jika kosong, return string kosong
-        if not tanggal_str:
-            return ""
-        
-        # Coba parse dengan berbagai format
-        for fmt in ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d', '%d-%m-%Y', '%d/%m/%Y', '%m/%d/%Y', '%d-%m-%y', '%d/%m/%y']:
-            try:
-                dt = datetime.strptime(tanggal_str, fmt)
-                return dt.strftime('%d-%m-%Y')
-            except ValueError:
-                continue
-        
-        # Jika tidak bisa di-parse, return as-is (tapi bersihkan whitespace)
-        return tanggal_str
-        
-    except Exception as e:
-        print(f"⚠️  Gagal format tanggal '{tanggal_value}': {e}")
-        return str(tanggal_value).strip()
-
 # ============================
 # FUNGSI KIRIM EMAIL
 # ============================
@@ -197,37 +137,25 @@ def download_excel_files(folder_id, save_folder="data_web"):
     """
     os.makedirs(save_folder, exist_ok=True)
     
-    # Load credentials
-    creds_json = os.getenv("GOOGLE_APPLICATION_CREDENTIALS_JSON")
-    if not creds_json:
-        raise ValueError("❌ GOOGLE_APPLICATION_CREDENTIALS_JSON tidak ditemukan")
-    
-    credentials = Credentials.from_service_account_info(
-        json.loads(creds_json),
-        scopes=["https://www.googleapis.com/auth/drive"]
-    )
-    
-    drive_service = build('drive', 'v3', credentials=credentials)
+    drive_service = get_drive_service()
     
     # Query untuk mencari file Excel
     query = f"'{folder_id}' in parents and (mimeType='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet' or mimeType='application/vnd.ms-excel')"
-    results = drive_service.files().list(q=query, fields="files(id, name)").execute()
+    results = drive_service.files().list(q=query, fields=DRIVE_FILE_FIELDS).execute()
     files = results.get("files", [])
 
     if not files:
         raise ValueError("❌ Tidak ada file Excel di folder Google Drive.")
 
+    drive_cache = get_drive_cache()
     paths = []
     for f in files:
         print(f"📥 Downloading: {f['name']}")
-        request = drive_service.files().get_media(fileId=f["id"])
         file_path = os.path.join(save_folder, f["name"])
         
-        with io.FileIO(file_path, 'wb') as fh:
-            downloader = MediaIoBaseDownload(fh, request)
-            done = False
-            while not done:
-                _, done = downloader.next_chunk()
+        _, from_cache = drive_cache.fetch(drive_service, f, file_path)
+        if from_cache:
+            print(f"   ♻️  Dari cache (file tidak berubah)")
         
         paths.append({
             'path': file_path,
@@ -235,6 +163,7 @@ def download_excel_files(folder_id, save_folder="data_web"):
         })
     
     print(f"✅ Berhasil download {len(paths)} file Excel")
+    drive_cache.print_summary()
     return paths
 
 # ============================
@@ -639,6 +568,9 @@ def process_data_for_web():
     """
     Fungsi utama untuk processing data versi web
     """
+    import gspread
+    from gspread_dataframe import set_with_dataframe
+
     print("=" * 60)
     print("🚀 PROSES CLEANING & REORDERING DATA UNTUK WEB")
     print("=" * 60)
@@ -660,19 +592,7 @@ def process_data_for_web():
         print("🔍 Memulai proses cleaning dan reordering data...")
         
         # ========== LOAD CREDENTIALS ==========
-        creds_json = os.getenv("GOOGLE_APPLICATION_CREDENTIALS_JSON")
-        if not creds_json:
-            raise ValueError("❌ SECRET GOOGLE_APPLICATION_CREDENTIALS_JSON TIDAK TERBACA")
-
-        credentials = Credentials.from_service_account_info(
-            json.loads(creds_json),
-            scopes=[
-                "https://www.googleapis.com/auth/spreadsheets",
-                "https://www.googleapis.com/auth/drive",
-            ],
-        )
-
-        gc = gspread.authorize(credentials)
+        gc = get_gspread_client()
         
         # Download semua Excel
         excel_files = download_excel_files(FOLDER_ID, save_folder="data_web")
@@ -687,12 +607,13 @@ def process_data_for_web():
             print(f"\n📖 Memproses: {filename}")
             
             try:
-                df = pd.read_excel(fpath, dtype=str)  # pastikan NIK terbaca full string
+                df = read_excel_cached(fpath, dtype=str)  # pastikan NIK terbaca full string
                 
                 # PROSES BERSIHKAN NIK
                 original_nik_count = len(df)
                 df['NIK_ORIGINAL'] = df['NIK']  # Simpan nilai asli untuk logging
-                df['NIK'] = df['NIK'].apply(clean_nik)
+                df['NIK'], nik_summary = clean_nik_series(df['NIK'])
+                print_nik_summary(nik_summary)
                 
                 # Log NIK yang dibersihkan
                 cleaned_niks = df[df['NIK_ORIGINAL'] != df['NIK']][['NIK_ORIGINAL', 'NIK']]
@@ -704,13 +625,14 @@ def process_data_for_web():
                     # Simpan nilai asli untuk logging
                     df['TGL_TEBUS_ORIGINAL'] = df['TGL TEBUS']
                     
-                    # Apply formatting function
-                    df['TGL TEBUS'] = df['TGL TEBUS'].apply(format_tanggal)
+                    # Format dd-mm-yyyy sekali per kolom (yang tidak dikenali dibiarkan apa adanya)
+                    df['TGL TEBUS'] = format_date_series(df['TGL TEBUS'], keep_unparsed=True, formats=WEB_DATE_FORMATS)
                     
                     # Log perubahan format tanggal
-                    for _, row in df[['TGL_TEBUS_ORIGINAL', 'TGL TEBUS']].iterrows():
-                        if str(row['TGL_TEBUS_ORIGINAL']).strip() != str(row['TGL TEBUS']).strip():
-                            tanggal_format_log.append(f"'{row['TGL_TEBUS_ORIGINAL']}' -> {row['TGL TEBUS']}")
+                    changed = (df['TGL_TEBUS_ORIGINAL'].astype(str).str.strip()
+                               != df['TGL TEBUS'].astype(str).str.strip())
+                    for original, formatted in zip(df.loc[changed, 'TGL_TEBUS_ORIGINAL'], df.loc[changed, 'TGL TEBUS']):
+                        tanggal_format_log.append(f"'{original}' -> {formatted}")
                 
                 # Hapus kolom sementara
                 df = df.drop(columns=['NIK_ORIGINAL', 'TGL_TEBUS_ORIGINAL'], errors='ignore')
@@ -822,13 +744,6 @@ def process_data_for_web():
                 print(f"   📄 Sheet '{DATA_SHEET_NAME}' tidak ditemukan, membuat baru...")
                 ws_data = sh.add_worksheet(DATA_SHEET_NAME, rows=1000, cols=len(new_column_order))
             
-            # BERSIHKAN SHEET SEBELUM MENULIS
-            print(f"   🧹 Membersihkan {DATA_SHEET_NAME} sebelum upload data...")
-            clear_sheet_contents(ws_data)
-            
-            # Upload data ke Data_Gabungan
-            print(f"   📤 Mengupload data ke {DATA_SHEET_NAME}...")
-            
             # PERBAIKAN: Tambahkan header sebagai baris pertama
             # Buat DataFrame dengan header di baris pertama
             print(f"   📝 Menyiapkan data: {len(combined_df):,} baris + 1 baris header")
@@ -842,13 +757,26 @@ def process_data_for_web():
             # Convert semua nilai ke string untuk menghindari format yang tidak konsisten
             data_with_header = data_with_header.astype(str)
             
-            # Upload data dengan set_with_dataframe - TANPA MENAMBAH HEADER LAGI
-            # Karena set_with_dataframe akan menulis header otomatis
-            print(f"   ⬆️  Uploading {len(data_with_header):,} baris ke Google Sheets...")
-            set_with_dataframe(ws_data, data_with_header, include_index=False, include_column_header=True)
+            def tulis_ulang_penuh():
+                # BERSIHKAN SHEET SEBELUM MENULIS
+                print(f"   🧹 Membersihkan {DATA_SHEET_NAME} sebelum upload data...")
+                clear_sheet_contents(ws_data)
+                
+                # Upload data dengan set_with_dataframe - TANPA MENAMBAH HEADER LAGI
+                # Karena set_with_dataframe akan menulis header otomatis
+                print(f"   ⬆️  Uploading {len(data_with_header):,} baris ke Google Sheets...")
+                set_with_dataframe(ws_data, data_with_header, include_index=False, include_column_header=True)
+                
+                # Format data sheet
+                format_data_sheet(ws_data)
             
-            # Format data sheet
-            format_data_sheet(ws_data)
+            # Upload data ke Data_Gabungan (hanya baris yang berubah)
+            print(f"   📤 Mengupload data ke {DATA_SHEET_NAME}...")
+            sync_dataframe_to_worksheet(
+                ws_data, data_with_header, "data_tebus_versi_web",
+                key_columns=['NIK', 'NO TRANSAKSI'], full_write=tulis_ulang_penuh,
+                value_input_option='USER_ENTERED'  # sama dengan set_with_dataframe
+            )
             
             print(f"   ✅ Data berhasil diupload: {len(combined_df):,} baris × {len(combined_df.columns)} kolom")
             
@@ -0,0 +1,178 @@
+"""
+date_utils.py
+Parsing tanggal (TGL TEBUS / TGL INPUT) untuk satu kolom sekaligus.
+
+Sebelumnya setiap nilai tanggal di-parse sendiri lewat .apply (kadang
+beberapa kali per baris, di dalam loop groupby) dengan serangkaian
+re.match + strptime. Di sini:
+- parsing dilakukan per nilai unik lalu disebar ke semua baris (satu kolom
+  berisi ratusan ribu baris biasanya hanya punya beberapa ratus tanggal unik);
+- nilai unik dikelompokkan per format dengan mask regex, lalu setiap
+  kelompok dikonversi sekaligus dengan pd.to_datetime(format=...).
+  Urutan format menentukan prioritas, sama seperti mencoba strptime satu
+  per satu;
+- opsional: angka serial Excel dan fallback pd.to_datetime tanpa format.
+
+Lokasi: verval-pupuk2/scripts/date_utils.py
+"""
+
+import re
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+
+# ============================
+# DAFTAR FORMAT
+# ============================
+# Format TGL TEBUS realisasi (urutan = prioritas)
+TGL_TEBUS_FORMATS = [
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%d',
+    '%d-%m-%Y %H:%M:%S',
+    '%d-%m-%Y',
+    '%d/%m/%Y',
+]
+
+# Format yang dicoba data_tebus_versi_web (termasuk mm/dd/yyyy dan tahun 2 digit)
+WEB_DATE_FORMATS = [
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%d',
+    '%d-%m-%Y',
+    '%d/%m/%Y',
+    '%m/%d/%Y',
+    '%d-%m-%y',
+    '%d/%m/%y',
+]
+
+# Format yang dicoba proses_excel sebelum fallback pd.to_datetime
+ARCHIVE_DATE_FORMATS = [
+    '%d-%m-%Y',
+    '%d/%m/%Y',
+    '%Y-%m-%d',
+    '%Y/%m/%d',
+    '%d %b %Y',
+    '%d %B %Y',
+]
+
+EXCEL_EPOCH = pd.Timestamp(1899, 12, 30)
+# Batas serial Excel yang masih muat di pd.Timestamp (s/d tahun 2161)
+MAX_EXCEL_SERIAL = 95000
+MAX_WARNING_EXAMPLES = 5
+
+_DIRECTIVE_PATTERNS = {
+    'Y': r'\d{4}',
+    'y': r'\d{2}',
+    'm': r'\s?\d{1,2}',
+    'd': r'\s?\d{1,2}',
+    'H': r'\d{1,2}',
+    'M': r'\d{1,2}',
+    'S': r'\d{1,2}',
+    'b': r'[A-Za-z]+',
+    'B': r'[A-Za-z]+',
+}
+EXCEL_SERIAL_PATTERN = r'[\d.]+'
+
+# ============================
+# FUNGSI UTILITY
+# ============================
+def _format_regex(fmt):
+    """Regex (lebih longgar dari strptime) untuk memilih kandidat satu format"""
+    parts = re.split(r'(%[A-Za-z])', fmt)
+    pattern = ''
+    for part in parts:
+        if part.startswith('%') and len(part) == 2:
+            pattern += _DIRECTIVE_PATTERNS[part[1]]
+        else:
+            pattern += re.escape(part).replace(r'\ ', r'\s+')
+    return pattern
+
+def _as_text(value):
+    return value.strip() if isinstance(value, str) else str(value).strip()
+
+def _parse_uniques(uniques, formats, excel_serial, fallback):
+    """Parse daftar nilai unik. Return (Series datetime64 per posisi, Series teks yang tidak dikenali)"""
+    parsed = pd.Series(pd.NaT, index=range(len(uniques)), dtype='datetime64[ns]')
+
+    # Nilai yang sudah bertipe tanggal tidak perlu di-parse
+    text_positions = []
+    for i, value in enumerate(uniques):
+        if isinstance(value, (pd.Timestamp, datetime, date, np.datetime64)):
+            parsed.iat[i] = pd.Timestamp(value)
+        else:
+            text_positions.append(i)
+
+    texts = pd.Series([_as_text(uniques[i]) for i in text_positions], index=text_positions, dtype=object)
+    pending = texts[texts != '']
+
+    for fmt in formats:
+        if pending.empty:
+            break
+        candidates = pending[pending.str.fullmatch(_format_regex(fmt))]
+        if candidates.empty:
+            continue
+        converted = pd.to_datetime(candidates, format=fmt, errors='coerce').dropna()
+        parsed.loc[converted.index] = converted
+        pending = pending.drop(converted.index)
+
+    if excel_serial and not pending.empty:
+        candidates = pending[pending.str.fullmatch(EXCEL_SERIAL_PATTERN)]
+        days = pd.to_numeric(candidates, errors='coerce')
+        days = days[(days >= 0) & (days < MAX_EXCEL_SERIAL)]
+        if not days.empty:
+            parsed.loc[days.index] = EXCEL_EPOCH + pd.to_timedelta(days, unit='D')
+            pending = pending.drop(days.index)
+
+    if fallback and not pending.empty:
+        for i, value in pending.items():
+            result = pd.to_datetime(value, errors='coerce')
+            if pd.notna(result):
+                parsed.iat[i] = result
+        pending = pending[parsed.loc[pending.index].isna()]
+
+    return parsed, pending
+
+def _warn_unparsed(warn_label, codes, pending):
+    if not warn_label or pending.empty:
+        return
+    unknown_rows = int(np.isin(codes, pending.index.to_numpy()).sum())
+    examples = ", ".join(f"'{value}'" for value in pending.head(MAX_WARNING_EXAMPLES))
+    print(f"   ⚠️  {warn_label}: {unknown_rows:,} baris dengan format tanggal tidak dikenali ({examples})")
+
+# ============================
+# FUNGSI UTAMA
+# ============================
+def parse_date_series(series, formats=TGL_TEBUS_FORMATS, excel_serial=False, fallback=False, warn_label=None):
+    """
+    Parse satu kolom tanggal menjadi Series datetime64 (NaT jika kosong/tidak dikenali).
+
+    formats      : daftar format strptime, dicoba berurutan
+    excel_serial : angka (mis. "45678") dianggap serial tanggal Excel
+    fallback     : nilai yang belum cocok dicoba pd.to_datetime tanpa format
+    warn_label   : jika diisi, cetak ringkasan nilai yang tidak dikenali
+    """
+    codes, uniques = pd.factorize(series)
+    parsed, pending = _parse_uniques(list(uniques), formats, excel_serial, fallback)
+    _warn_unparsed(warn_label, codes, pending)
+
+    # Slot terakhir untuk nilai kosong (kode -1 dari factorize)
+    values = np.append(parsed.to_numpy(), np.datetime64('NaT', 'ns'))
+    return pd.Series(values[codes], index=series.index, name=series.name)
+
+def format_date_series(series, output_format='%d-%m-%Y', keep_unparsed=False,
+                       formats=TGL_TEBUS_FORMATS, excel_serial=False, fallback=False, warn_label=None):
+    """
+    Parse lalu format ulang satu kolom tanggal (default dd-mm-yyyy).
+    Nilai kosong/tidak dikenali -> "" atau, jika keep_unparsed=True,
+    nilai aslinya (sudah di-strip).
+    """
+    codes, uniques = pd.factorize(series)
+    uniques = list(uniques)
+    parsed, pending = _parse_uniques(uniques, formats, excel_serial, fallback)
+    _warn_unparsed(warn_label, codes, pending)
+
+    formatted = parsed.dt.strftime(output_format)
+    if keep_unparsed:
+        formatted = formatted.fillna(pd.Series([_as_text(value) for value in uniques], dtype=object))
+
+    values = np.append(formatted.fillna("").to_numpy(dtype=object), "")
+    return pd.Series(values[codes], index=series.index, name=series.name)
@@ -0,0 +1,357 @@
+"""
+drive_cache.py
+Cache bersama (content-addressed) untuk file yang diunduh dari Google Drive.
+
+Semua script membaca folder realisasi dan ERDKK yang sama. Dengan cache ini
+setiap file cukup diunduh sekali: kunci cache adalah fileId + md5Checksum
+(atau modifiedTime untuk Google Sheets), sehingga file yang tidak berubah
+langsung dibaca dari disk. Ukuran cache dibatasi dan file yang paling lama
+tidak dipakai dihapus lebih dulu (LRU). File dari cache selalu disalin ke
+lokasi tujuan, blob cache tidak pernah dibagikan langsung ke script.
+
+Di GitHub Actions folder cache dipulihkan lewat actions/cache (kunci
+drive-cache-*) di setiap workflow yang mengunduh dari Drive, sehingga file
+yang sama tidak diunduh ulang antar job dan antar run.
+
+Konfigurasi lewat environment variable:
+- DRIVE_CACHE_DIR     : lokasi cache (default ~/.cache/verval-pupuk2/drive)
+- DRIVE_CACHE_MAX_MB  : batas ukuran cache dalam MB (default 2048)
+- DRIVE_CACHE_ENABLED : "0" untuk mematikan cache
+- DRIVE_DOWNLOAD_WORKERS : jumlah download paralel (default 8)
+
+Lokasi: verval-pupuk2/scripts/drive_cache.py
+"""
+
+import os
+import io
+import json
+import time
+import shutil
+import hashlib
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from google_clients import get_drive_service
+
+try:
+    import fcntl
+except ImportError:  # Windows: cukup lock antar thread
+    fcntl = None
+
+# ============================
+# KONFIGURASI
+# ============================
+DRIVE_CACHE_DIR = os.getenv(
+    "DRIVE_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "verval-pupuk2", "drive")
+)
+DRIVE_CACHE_MAX_BYTES = int(float(os.getenv("DRIVE_CACHE_MAX_MB", "2048")) * 1024 * 1024)
+DRIVE_CACHE_ENABLED = os.getenv("DRIVE_CACHE_ENABLED", "1").strip().lower() not in ("0", "false", "no")
+DRIVE_DOWNLOAD_WORKERS = max(1, int(os.getenv("DRIVE_DOWNLOAD_WORKERS", "8")))
+
+# Field yang wajib diminta di files().list agar file bisa di-cache
+DRIVE_FILE_FIELDS = "files(id, name, mimeType, modifiedTime, md5Checksum, size)"
+
+XLSX_MIME_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+GOOGLE_SHEET_MIME_TYPE = "application/vnd.google-apps.spreadsheet"
+
+INDEX_FILENAME = "index.json"
+LOCK_FILENAME = ".lock"
+
+# ============================
+# FUNGSI UTILITY
+# ============================
+def cache_key(file_meta, export_mime=None):
+    """Buat kunci cache dari fileId + versi file (md5Checksum / modifiedTime)"""
+    file_id = file_meta.get("id")
+    version = file_meta.get("md5Checksum") or file_meta.get("modifiedTime")
+    if not file_id or not version:
+        return None
+
+    raw = f"{file_id}:{version}:{export_mime or ''}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def download_drive_media(drive_service, file_meta, target, export_mime=None, progress_callback=None):
+    """Download satu file Drive ke path atau file object (tanpa cache)"""
+    from googleapiclient.http import MediaIoBaseDownload
+
+    if export_mime:
+        request = drive_service.files().export_media(fileId=file_meta["id"], mimeType=export_mime)
+    else:
+        request = drive_service.files().get_media(fileId=file_meta["id"])
+
+    if isinstance(target, str):
+        fh = io.FileIO(target, "wb")
+    else:
+        fh = target
+
+    try:
+        downloader = MediaIoBaseDownload(fh, request)
+        done = False
+        while not done:
+            status, done = downloader.next_chunk()
+            if status and progress_callback:
+                progress_callback(status.progress())
+    finally:
+        if isinstance(target, str):
+            fh.close()
+
+def _materialize(src_path, dest_path):
+    """
+    Salin file cache ke lokasi tujuan. Selalu copy (bukan hardlink), supaya
+    script yang mengubah file unduhannya tidak ikut mengubah isi cache.
+    """
+    dest_dir = os.path.dirname(dest_path)
+    if dest_dir:
+        os.makedirs(dest_dir, exist_ok=True)
+    if os.path.exists(dest_path):
+        os.remove(dest_path)
+    shutil.copyfile(src_path, dest_path)
+    return dest_path
+
+# ============================
+# KELAS CACHE
+# ============================
+class DriveCache:
+    """Cache file Drive di disk dengan index JSON dan eviction LRU"""
+
+    def __init__(self, cache_dir=DRIVE_CACHE_DIR, max_bytes=DRIVE_CACHE_MAX_BYTES, enabled=DRIVE_CACHE_ENABLED):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.blob_dir = os.path.join(cache_dir, "blobs")
+        self.index_path = os.path.join(cache_dir, INDEX_FILENAME)
+        self._thread_lock = threading.RLock()
+        self.stats = {"hit": 0, "miss": 0, "evicted": 0, "bytes_downloaded": 0}
+
+        if self.enabled:
+            try:
+                os.makedirs(self.blob_dir, exist_ok=True)
+            except OSError as e:
+                print(f"⚠️  Cache Drive dimatikan, folder {cache_dir} tidak bisa dibuat: {e}")
+                self.enabled = False
+
+    @contextmanager
+    def _locked(self):
+        """Lock antar thread dan antar proses (fcntl) saat mengubah index"""
+        with self._thread_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.cache_dir, LOCK_FILENAME), "a") as lock_fh:
+                fcntl.flock(lock_fh, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_fh, fcntl.LOCK_UN)
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self, index):
+        tmp_path = f"{self.index_path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=1)
+        os.replace(tmp_path, self.index_path)
+
+    def _count(self, name, value=1):
+        with self._thread_lock:
+            self.stats[name] += value
+
+    def _blob_path(self, key):
+        return os.path.join(self.blob_dir, key)
+
+    def lookup(self, file_meta, export_mime=None):
+        """Kembalikan path file di cache jika ada, sekaligus update waktu akses"""
+        key = cache_key(file_meta, export_mime)
+        if not self.enabled or not key:
+            return None
+
+        with self._locked():
+            index = self._load_index()
+            blob_path = self._blob_path(key)
+            if key not in index or not os.path.exists(blob_path):
+                if index.pop(key, None) is not None:
+                    self._save_index(index)
+                return None
+            index[key]["last_access"] = time.time()
+            self._save_index(index)
+        return blob_path
+
+    def store(self, file_meta, src_path, export_mime=None):
+        """Pindahkan file hasil download ke cache lalu jalankan eviction"""
+        key = cache_key(file_meta, export_mime)
+        if not self.enabled or not key:
+            return None
+
+        blob_path = self._blob_path(key)
+        os.replace(src_path, blob_path)
+
+        with self._locked():
+            index = self._load_index()
+            index[key] = {
+                "file_id": file_meta.get("id"),
+                "name": file_meta.get("name"),
+                "version": file_meta.get("md5Checksum") or file_meta.get("modifiedTime"),
+                "size": os.path.getsize(blob_path),
+                "last_access": time.time()
+            }
+            self._evict(index, keep_key=key)
+            self._save_index(index)
+        return blob_path
+
+    def _evict(self, index, keep_key=None):
+        """Hapus entri yang paling lama tidak dipakai sampai ukuran di bawah batas"""
+        for key in [k for k in index if not os.path.exists(self._blob_path(k))]:
+            index.pop(key, None)
+
+        total_size = sum(entry.get("size", 0) for entry in index.values())
+        if total_size <= self.max_bytes:
+            return
+
+        for key, entry in sorted(index.items(), key=lambda item: item[1].get("last_access", 0)):
+            if total_size <= self.max_bytes:
+                break
+            if key == keep_key:
+                continue
+            try:
+                os.remove(self._blob_path(key))
+            except OSError:
+                pass
+            total_size -= entry.get("size", 0)
+            index.pop(key, None)
+            self._count("evicted")
+            print(f"   🧹 Cache Drive: hapus {entry.get('name')} (LRU)")
+
+    def fetch(self, drive_service, file_meta, dest_path, export_mime=None, progress_callback=None):
+        """
+        Ambil file ke dest_path: dari cache jika versi sama, jika tidak download
+        dari Drive lalu simpan ke cache. Return (dest_path, from_cache).
+        """
+        cached_path = self.lookup(file_meta, export_mime)
+        if cached_path:
+            try:
+                _materialize(cached_path, dest_path)
+                self._count("hit")
+                return dest_path, True
+            except FileNotFoundError:
+                # Blob baru saja dihapus oleh eviction di thread/proses lain
+                pass
+
+        self._count("miss")
+        key = cache_key(file_meta, export_mime)
+        if not self.enabled or not key:
+            download_drive_media(drive_service, file_meta, dest_path, export_mime, progress_callback)
+            self._count("bytes_downloaded", os.path.getsize(dest_path))
+            return dest_path, False
+
+        tmp_path = os.path.join(self.blob_dir, f"{key}.part-{os.getpid()}-{threading.get_ident()}")
+        try:
+            download_drive_media(drive_service, file_meta, tmp_path, export_mime, progress_callback)
+            self._count("bytes_downloaded", os.path.getsize(tmp_path))
+            blob_path = self.store(file_meta, tmp_path, export_mime)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return _materialize(blob_path, dest_path), False
+
+    def fetch_bytes(self, drive_service, file_meta, export_mime=None):
+        """Ambil file sebagai BytesIO (untuk script yang membaca langsung dari memori)"""
+        return self.fetch_bytes_with_source(drive_service, file_meta, export_mime)[0]
+
+    def fetch_bytes_with_source(self, drive_service, file_meta, export_mime=None):
+        """Seperti fetch_bytes, return (BytesIO, from_cache)"""
+        if not self.enabled or not cache_key(file_meta, export_mime):
+            self._count("miss")
+            fh = io.BytesIO()
+            download_drive_media(drive_service, file_meta, fh, export_mime)
+            self._count("bytes_downloaded", fh.getbuffer().nbytes)
+            fh.seek(0)
+            return fh, False
+
+        tmp_path = os.path.join(self.blob_dir, f"read-{os.getpid()}-{threading.get_ident()}")
+        try:
+            _, from_cache = self.fetch(drive_service, file_meta, tmp_path, export_mime)
+            with open(tmp_path, "rb") as f:
+                return io.BytesIO(f.read()), from_cache
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def print_summary(self):
+        """Tampilkan ringkasan pemakaian cache"""
+        if not self.enabled:
+            print("ℹ️  Cache Drive tidak aktif")
+            return
+        print(f"📦 Cache Drive: {self.stats['hit']} hit, {self.stats['miss']} download, "
+              f"{self.stats['evicted']} dihapus, "
+              f"{self.stats['bytes_downloaded'] / (1024 * 1024):.1f} MB diunduh")
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_drive_cache():
+    """Instance cache bersama untuk satu proses"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = DriveCache()
+        return _default_cache
+
+# ============================
+# DOWNLOAD PARALEL
+# ============================
+def get_thread_drive_service(credentials):
+    """Drive service milik thread ini (lihat google_clients.ClientFactory.service)"""
+    return get_drive_service(credentials)
+
+def download_files_parallel(credentials, jobs, max_workers=DRIVE_DOWNLOAD_WORKERS):
+    """
+    Download banyak file sekaligus dengan thread pool terbatas.
+
+    jobs: list dict {'file': metadata Drive, 'path': lokasi tujuan,
+    'export_mime': opsional}. Tanpa 'path', isi file disimpan di memori
+    sebagai 'content' (BytesIO). Setiap job dikembalikan (urutan sama)
+    dengan tambahan 'from_cache' dan 'error' (None jika berhasil).
+    """
+    if not jobs:
+        return []
+
+    drive_cache = get_drive_cache()
+    total = len(jobs)
+    workers = min(max_workers, total)
+    print(f"   ⚡ Download paralel: {total} file, {workers} thread")
+
+    def run(numbered_job):
+        idx, job = numbered_job
+        name = job['file'].get('name')
+        result = dict(job, from_cache=False, error=None)
+        try:
+            service = get_thread_drive_service(credentials)
+            if job.get('path'):
+                _, from_cache = drive_cache.fetch(
+                    service, job['file'], job['path'],
+                    export_mime=job.get('export_mime'),
+                    progress_callback=lambda p: print(f"      [{idx}/{total}] {name}: {int(p * 100)}%")
+                )
+                result['from_cache'] = from_cache
+            else:
+                result['content'], result['from_cache'] = drive_cache.fetch_bytes_with_source(
+                    service, job['file'], export_mime=job.get('export_mime')
+                )
+            source = "cache" if result['from_cache'] else "Drive"
+            print(f"      ✅ [{idx}/{total}] {name} ({source})")
+        except Exception as e:
+            result['error'] = e
+            print(f"      ❌ [{idx}/{total}] Gagal download {name}: {str(e)}")
+        return result
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(run, enumerate(jobs, 1)))
+
+    drive_cache.print_summary()
+    return results
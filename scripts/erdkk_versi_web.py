@@ -1,13 +1,11 @@
 import os
-import io
 import json
 import pandas as pd
-import gspread
-import re
-import time
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
+import numpy as np
+from drive_cache import get_drive_cache, DRIVE_FILE_FIELDS
+from nik_utils import clean_nik_series, print_nik_summary
+from rate_limiter import get_rate_limiter
+from google_clients import get_drive_service, get_gspread_client
 from datetime import datetime
 import traceback
 import smtplib
@@ -22,72 +20,43 @@ FOLDER_ID = "13N5dLdHzAKff6g8RDRiHa7LFyZbdJUCJ"  # Folder Google Drive ERDKK
 SAVE_FOLDER = "data_erdkk"  # Folder lokal di runner
 SPREADSHEET_ID = "1aEx7cgw1KIdpXo20dD3LnCHF6PWer1wWgT7H5YKSqlY"
 SHEET_NAME = "Hasil_Rekap"
+SHEETS_LIMITER = get_rate_limiter("sheets")  # Laju request Sheets API + retry 429
 
 # ============================
-# LOAD CREDENTIALS DAN KONFIGURASI EMAIL DARI SECRETS
+# LOAD EMAIL CONFIGURATION FROM SECRETS
 # ============================
-# Load Google credentials dari secret
-creds_json = os.getenv("GOOGLE_APPLICATION_CREDENTIALS_JSON")
-if not creds_json:
-    raise ValueError("❌ SECRET GOOGLE_APPLICATION_CREDENTIALS_JSON TIDAK TERBACA")
-
-# Load email configuration dari secrets
-SENDER_EMAIL = os.getenv("SENDER_EMAIL")
-SENDER_EMAIL_PASSWORD = os.getenv("SENDER_EMAIL_PASSWORD")
-RECIPIENT_EMAILS = os.getenv("RECIPIENT_EMAILS")
-
-# Validasi email configuration
-if not SENDER_EMAIL:
-    raise ValueError("❌ SECRET SENDER_EMAIL TIDAK TERBACA")
-if not SENDER_EMAIL_PASSWORD:
-    raise ValueError("❌ SECRET SENDER_EMAIL_PASSWORD TIDAK TERBACA")
-if not RECIPIENT_EMAILS:
-    raise ValueError("❌ SECRET RECIPIENT_EMAILS TIDAK TERBACA")
-
-# Parse recipient emails
-try:
-    recipient_list = json.loads(RECIPIENT_EMAILS)
-except json.JSONDecodeError:
-    recipient_list = [email.strip() for email in RECIPIENT_EMAILS.split(",")]
-
-# KONFIGURASI EMAIL
-EMAIL_CONFIG = {
-    "smtp_server": "smtp.gmail.com",
-    "smtp_port": 587,
-    "sender_email": SENDER_EMAIL,
-    "sender_password": SENDER_EMAIL_PASSWORD,
-    "recipient_emails": recipient_list
-}
-
-credentials = Credentials.from_service_account_info(
-    json.loads(creds_json),
-    scopes=[
-        "https://www.googleapis.com/auth/spreadsheets",
-        "https://www.googleapis.com/auth/drive",
-    ],
-)
-
-gc = gspread.authorize(credentials)
-drive_service = build("drive", "v3", credentials=credentials)
-
-# ============================
-# FUNGSI BERSIHKAN NIK
-# ============================
-def clean_nik(nik_value):
+def load_email_config():
     """
-    Membersihkan NIK dari karakter non-angka seperti ', `, spasi, dll.
-    Hanya mengambil angka saja.
+    Memuat konfigurasi email dari environment variables/secrets
     """
-    if pd.isna(nik_value) or nik_value is None:
-        return None
-
-    nik_str = str(nik_value)
-    cleaned_nik = re.sub(r'\D', '', nik_str)
-
-    if len(cleaned_nik) != 16:
-        print(f"⚠️  NIK tidak standar: {nik_value} -> {cleaned_nik} (panjang: {len(cleaned_nik)})")
-
-    return cleaned_nik if cleaned_nik else None
+    # Load dari environment variables
+    SENDER_EMAIL = os.getenv("SENDER_EMAIL")
+    SENDER_EMAIL_PASSWORD = os.getenv("SENDER_EMAIL_PASSWORD")
+    RECIPIENT_EMAILS = os.getenv("RECIPIENT_EMAILS")
+    
+    # Validasi
+    if not SENDER_EMAIL:
+        raise ValueError("❌ SECRET SENDER_EMAIL TIDAK TERBACA")
+    if not SENDER_EMAIL_PASSWORD:
+        raise ValueError("❌ SECRET SENDER_EMAIL_PASSWORD TIDAK TERBACA")
+    if not RECIPIENT_EMAILS:
+        raise ValueError("❌ SECRET RECIPIENT_EMAILS TIDAK TERBACA")
+    
+    # Parse recipient emails
+    try:
+        # Coba parse sebagai JSON array
+        recipient_list = json.loads(RECIPIENT_EMAILS)
+    except json.JSONDecodeError:
+        # Jika bukan JSON, split berdasarkan koma
+        recipient_list = [email.strip() for email in RECIPIENT_EMAILS.split(",")]
+    
+    return {
+        "smtp_server": "smtp.gmail.com",
+        "smtp_port": 587,
+        "sender_email": SENDER_EMAIL,
+        "sender_password": SENDER_EMAIL_PASSWORD,
+        "recipient_emails": recipient_list
+    }
 
 # ============================
 # FUNGSI STANDARDISASI KOLOM
@@ -233,16 +202,82 @@ def convert_to_numeric(value):
 # ============================
 # FUNGSI PROSES DATA PIVOT
 # ============================
+def numeric_columns(df, cols):
+    """
+    convert_to_numeric untuk beberapa kolom sekaligus: setiap nilai unik
+    dikonversi sekali lalu disebar ke semua baris (kolom tidak ada -> 0).
+    Return dict kolom -> array float.
+    """
+    present = [col for col in cols if col in df.columns]
+    result = {col: np.zeros(len(df)) for col in cols if col not in df.columns}
+    if present:
+        block = df[present].to_numpy(dtype=object)
+        codes, uniques = pd.factorize(block.ravel(order='F'))
+        numbers = np.array([convert_to_numeric(value) for value in uniques] + [0.0], dtype=float)
+        values = numbers[codes].reshape(block.shape, order='F')
+        for pos, col in enumerate(present):
+            result[col] = values[:, pos]
+    return result
+
+def round_values(values, digits=2):
+    """round() bawaan Python per nilai unik (hasil sama persis dengan pembulatan per baris)"""
+    codes, uniques = pd.factorize(values)
+    rounded = np.array([round(value, digits) for value in uniques.tolist()] + [0.0], dtype=object)
+    return rounded[codes]
+
+def text_values(df, col):
+    """Nilai teks satu kolom (kolom tidak ada / nilai kosong -> '')"""
+    if col not in df.columns:
+        return np.full(len(df), '', dtype=object)
+    return df[col].where(df[col].notna(), '').to_numpy(dtype=object)
+
+def gabung_komoditas_per_grup(df, group_codes, n_groups):
+    """
+    Gabungkan Komoditas MT1-MT3 per grup: nilai unik, diurutkan, dipisah ", ".
+    Semua sel komoditas diproses sebagai satu tabel panjang (grup, komoditas).
+    """
+    komoditas = np.full(n_groups, '', dtype=object)
+    parts = []
+    for mt_col in ['Komoditas MT1', 'Komoditas MT2', 'Komoditas MT3']:
+        if mt_col not in df.columns:
+            continue
+        values = df[mt_col]
+        filled = (values.notna() & (values != '')).to_numpy()
+        parts.append(pd.DataFrame({
+            'grup': group_codes[filled],
+            'komoditas': values[filled].astype(str).str.strip().to_numpy(dtype=object)
+        }))
+    if not parts:
+        return komoditas
+
+    long_df = pd.concat(parts, ignore_index=True).drop_duplicates()
+    if long_df.empty:
+        return komoditas
+
+    # Urutkan per grup lalu per komoditas (urutan string sama dengan sorted())
+    kom_codes, kom_uniques = pd.factorize(long_df['komoditas'])
+    kom_rank = np.empty(len(kom_uniques), dtype=np.int64)
+    kom_rank[np.argsort(np.array(kom_uniques, dtype=object), kind='stable')] = np.arange(len(kom_uniques))
+    grup = long_df['grup'].to_numpy()
+    order = np.lexsort((kom_rank[kom_codes], grup))
+    grup_sorted = grup[order]
+    kom_sorted = np.array(kom_uniques, dtype=object)[kom_codes[order]].tolist()
+
+    starts = np.flatnonzero(np.r_[True, grup_sorted[1:] != grup_sorted[:-1]])
+    ends = np.r_[starts[1:], len(grup_sorted)]
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        komoditas[grup_sorted[start]] = ", ".join(kom_sorted[start:end])
+    return komoditas
+
 def proses_data_pivot(dataframes_list):
     """
-    Membuat pivot data ERDKK sesuai dengan format yang diminta
+    Membuat pivot data ERDKK sesuai dengan format yang diminta.
+    Semua file digabung lalu dikelompokkan per (KTP, Nama Poktan) sekaligus;
+    urutan baris = urutan kemunculan pertama setiap kombinasi.
     """
     if not dataframes_list:
         return []
     
-    # Dictionary untuk menyimpan data pivot per key (KTP + Poktan)
-    pivot_dict = {}
-    
     # Header output sesuai permintaan - TANPA kolom luas lahan per MT
     output_header = [
         'KTP',
@@ -273,139 +308,59 @@ def proses_data_pivot(dataframes_list):
         'Pupuk ZA (Kg) MT3'
     ]
     
-    hasil_rows = [output_header]
-    
-    total_rows_processed = 0
-    
+    frames = []
     for df_idx, df in enumerate(dataframes_list):
         if df.empty:
             print(f"   ⚠️  Dataframe {df_idx} kosong, dilewati")
             continue
-        
         print(f"   📊 Processing dataframe {df_idx + 1}: {len(df)} rows")
-        
-        for i in range(len(df)):
-            row = df.iloc[i]
-            
-            # Buat key unik berdasarkan KTP dan Nama Poktan
-            ktp_value = row.get('KTP', '') if not pd.isna(row.get('KTP')) else ''
-            poktan_value = row.get('Nama Poktan', '') if not pd.isna(row.get('Nama Poktan')) else ''
-            
-            key = f"{ktp_value}|{poktan_value}"
-            
-            if key not in pivot_dict:
-                # Data baru
-                pivot_dict[key] = {
-                    'KTP': ktp_value,
-                    'Nama Petani': row.get('Nama Petani', '') if not pd.isna(row.get('Nama Petani')) else '',
-                    'Nama Poktan': poktan_value,
-                    'Desa': row.get('Nama Desa', '') if not pd.isna(row.get('Nama Desa')) else '',
-                    'Kecamatan': row.get('Gapoktan', '') if not pd.isna(row.get('Gapoktan')) else '',  # Gunakan Gapoktan untuk Kecamatan
-                    'Nama Kios Pengecer': row.get('Nama Kios Pengecer', '') if not pd.isna(row.get('Nama Kios Pengecer')) else '',
-                    
-                    # Komoditas
-                    'komoditas_set': set(),
-                    
-                    # Luas lahan total (MT1 + MT2 + MT3)
-                    'luas_total': 0,
-                    
-                    # MT1 - Pupuk
-                    'urea_mt1': 0,
-                    'npk_mt1': 0,
-                    'npk_formula_mt1': 0,
-                    'organik_mt1': 0,
-                    'za_mt1': 0,
-                    
-                    # MT2 - Pupuk
-                    'urea_mt2': 0,
-                    'npk_mt2': 0,
-                    'npk_formula_mt2': 0,
-                    'organik_mt2': 0,
-                    'za_mt2': 0,
-                    
-                    # MT3 - Pupuk
-                    'urea_mt3': 0,
-                    'npk_mt3': 0,
-                    'npk_formula_mt3': 0,
-                    'organik_mt3': 0,
-                    'za_mt3': 0,
-                }
-            
-            # Tambahkan komoditas ke set
-            for mt_col in ['Komoditas MT1', 'Komoditas MT2', 'Komoditas MT3']:
-                komoditas_value = row.get(mt_col, '')
-                if not pd.isna(komoditas_value) and komoditas_value:
-                    pivot_dict[key]['komoditas_set'].add(str(komoditas_value).strip())
-            
-            # Konversi dan jumlahkan luas lahan TOTAL (MT1 + MT2 + MT3)
-            luas_mt1 = convert_to_numeric(row.get('Luas Lahan (Ha) MT1', 0))
-            luas_mt2 = convert_to_numeric(row.get('Luas Lahan (Ha) MT2', 0))
-            luas_mt3 = convert_to_numeric(row.get('Luas Lahan (Ha) MT3', 0))
-            
-            pivot_dict[key]['luas_total'] += (luas_mt1 + luas_mt2 + luas_mt3)
-            
-            # Jumlahkan pupuk MT1
-            pivot_dict[key]['urea_mt1'] += convert_to_numeric(row.get('Pupuk Urea (Kg) MT1', 0))
-            pivot_dict[key]['npk_mt1'] += convert_to_numeric(row.get('Pupuk NPK (Kg) MT1', 0))
-            pivot_dict[key]['npk_formula_mt1'] += convert_to_numeric(row.get('Pupuk NPK Formula (Kg) MT1', 0))
-            pivot_dict[key]['organik_mt1'] += convert_to_numeric(row.get('Pupuk Organik (Kg) MT1', 0))
-            pivot_dict[key]['za_mt1'] += convert_to_numeric(row.get('Pupuk ZA (Kg) MT1', 0))
-            
-            # Jumlahkan pupuk MT2
-            pivot_dict[key]['urea_mt2'] += convert_to_numeric(row.get('Pupuk Urea (Kg) MT2', 0))
-            pivot_dict[key]['npk_mt2'] += convert_to_numeric(row.get('Pupuk NPK (Kg) MT2', 0))
-            pivot_dict[key]['npk_formula_mt2'] += convert_to_numeric(row.get('Pupuk NPK Formula (Kg) MT2', 0))
-            pivot_dict[key]['organik_mt2'] += convert_to_numeric(row.get('Pupuk Organik (Kg) MT2', 0))
-            pivot_dict[key]['za_mt2'] += convert_to_numeric(row.get('Pupuk ZA (Kg) MT2', 0))
-            
-            # Jumlahkan pupuk MT3
-            pivot_dict[key]['urea_mt3'] += convert_to_numeric(row.get('Pupuk Urea (Kg) MT3', 0))
-            pivot_dict[key]['npk_mt3'] += convert_to_numeric(row.get('Pupuk NPK (Kg) MT3', 0))
-            pivot_dict[key]['npk_formula_mt3'] += convert_to_numeric(row.get('Pupuk NPK Formula (Kg) MT3', 0))
-            pivot_dict[key]['organik_mt3'] += convert_to_numeric(row.get('Pupuk Organik (Kg) MT3', 0))
-            pivot_dict[key]['za_mt3'] += convert_to_numeric(row.get('Pupuk ZA (Kg) MT3', 0))
-            
-            total_rows_processed += 1
+        frames.append(df)
+    
+    if not frames:
+        print(f"   📊 Data diproses: 0 baris")
+        print(f"   🎯 Unique keys: 0")
+        return [output_header]
+    
+    df = pd.concat(frames, ignore_index=True)
+    
+    # Key unik berdasarkan KTP dan Nama Poktan (urutan = kemunculan pertama)
+    ktp_values = text_values(df, 'KTP')
+    poktan_values = text_values(df, 'Nama Poktan')
+    key_values = pd.Series(ktp_values).astype(str) + "|" + pd.Series(poktan_values).astype(str)
+    group_codes, group_keys = pd.factorize(key_values)
+    n_groups = len(group_keys)
     
-    print(f"   📊 Data diproses: {total_rows_processed} baris")
-    print(f"   🎯 Unique keys: {len(pivot_dict)}")
+    print(f"   📊 Data diproses: {len(df)} baris")
+    print(f"   🎯 Unique keys: {n_groups}")
     
-    # Konversi dictionary ke list untuk output
-    for key, data in pivot_dict.items():
-        # Format komoditas
-        komoditas_str = ", ".join(sorted(data['komoditas_set'])) if data['komoditas_set'] else ""
-        
-        # Buat row output
-        output_row = [
-            data['KTP'],
-            data['Nama Petani'],
-            data['Nama Poktan'],
-            data['Desa'],
-            data['Kecamatan'],
-            data['Nama Kios Pengecer'],
-            komoditas_str,  # Kolom 7: Komoditas
-            round(data['luas_total'], 2),  # Kolom 8: Rencana Tanam 1 Tahun
-            # MT1 - Pupuk saja
-            round(data['urea_mt1'], 2),
-            round(data['npk_mt1'], 2),
-            round(data['npk_formula_mt1'], 2),
-            round(data['organik_mt1'], 2),
-            round(data['za_mt1'], 2),
-            # MT2 - Pupuk saja (TANPA luas lahan)
-            round(data['urea_mt2'], 2),
-            round(data['npk_mt2'], 2),
-            round(data['npk_formula_mt2'], 2),
-            round(data['organik_mt2'], 2),
-            round(data['za_mt2'], 2),
-            # MT3 - Pupuk saja (TANPA luas lahan)
-            round(data['urea_mt3'], 2),
-            round(data['npk_mt3'], 2),
-            round(data['npk_formula_mt3'], 2),
-            round(data['organik_mt3'], 2),
-            round(data['za_mt3'], 2),
-        ]
-        
-        hasil_rows.append(output_row)
+    # Kolom identitas: nilai dari baris pertama setiap key
+    first_pos = np.unique(group_codes, return_index=True)[1]
+    pivot_df = pd.DataFrame({
+        'KTP': ktp_values[first_pos],
+        'Nama Petani': text_values(df, 'Nama Petani')[first_pos],
+        'Nama Poktan': poktan_values[first_pos],
+        'Desa': text_values(df, 'Nama Desa')[first_pos],
+        'Kecamatan': text_values(df, 'Gapoktan')[first_pos],  # Gunakan Gapoktan untuk Kecamatan
+        'Nama Kios Pengecer': text_values(df, 'Nama Kios Pengecer')[first_pos],
+        'Komoditas': gabung_komoditas_per_grup(df, group_codes, n_groups)
+    })
+    
+    # Konversi semua kolom angka sekaligus (aturan pemisah ribuan/desimal sama)
+    luas_cols = ['Luas Lahan (Ha) MT1', 'Luas Lahan (Ha) MT2', 'Luas Lahan (Ha) MT3']
+    pupuk_cols = output_header[8:]
+    numbers = numeric_columns(df, luas_cols + pupuk_cols)
+    
+    # Jumlahkan per key. np.bincount menjumlahkan berurutan sesuai urutan baris,
+    # sama dengan penjumlahan per baris sebelumnya (hasil round() tidak bergeser)
+    luas_per_row = numbers[luas_cols[0]] + numbers[luas_cols[1]] + numbers[luas_cols[2]]
+    sum_cols = {'Rencana Tanam 1 Tahun (Ha)': luas_per_row}
+    sum_cols.update({col: numbers[col] for col in pupuk_cols})
+    for col, values in sum_cols.items():
+        totals = np.bincount(group_codes, weights=values, minlength=n_groups)
+        pivot_df[col] = round_values(totals)
+    
+    hasil_rows = [output_header]
+    hasil_rows.extend(pivot_df[output_header].to_numpy(dtype=object).tolist())
     
     return hasil_rows
 
@@ -415,21 +370,19 @@ def proses_data_pivot(dataframes_list):
 def download_excel_files(folder_id, save_folder=SAVE_FOLDER):
     os.makedirs(save_folder, exist_ok=True)
     query = f"'{folder_id}' in parents and (mimeType='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet' or mimeType='application/vnd.ms-excel')"
-    results = drive_service.files().list(q=query, fields="files(id, name)").execute()
+    drive_service = get_drive_service()
+    results = drive_service.files().list(q=query, fields=DRIVE_FILE_FIELDS).execute()
     files = results.get("files", [])
 
     if not files:
         raise ValueError("Tidak ada file Excel di folder Google Drive.")
 
+    drive_cache = get_drive_cache()
     paths = []
     for f in files:
-        request = drive_service.files().get_media(fileId=f["id"])
-        fh = io.FileIO(os.path.join(save_folder, f["name"]), "wb")
-        downloader = MediaIoBaseDownload(fh, request)
-        done = False
-        while not done:
-            _, done = downloader.next_chunk()
-        paths.append(os.path.join(save_folder, f["name"]))
+        file_path, _ = drive_cache.fetch(drive_service, f, os.path.join(save_folder, f["name"]))
+        paths.append(file_path)
+    drive_cache.print_summary()
     return paths
 
 # ============================
@@ -463,7 +416,7 @@ def write_to_google_sheet(worksheet, data_rows):
         if needed_rows > current_rows or needed_cols > current_cols:
             print(f"🔄 Meresize worksheet menjadi {needed_rows} baris x {needed_cols} kolom...")
             try:
-                worksheet.resize(rows=needed_rows, cols=needed_cols)
+                SHEETS_LIMITER.call(worksheet.resize, rows=needed_rows, cols=needed_cols)
                 print(f"✅ Resize berhasil")
                 
                 # Verifikasi resize
@@ -486,7 +439,7 @@ def write_to_google_sheet(worksheet, data_rows):
         # 1. CLEAR SEMUA DATA DI WORKSHEET TERLEBIH DAHULU
         print("🧹 Membersihkan SEMUA data lama di worksheet...")
         try:
-            worksheet.clear()
+            SHEETS_LIMITER.call(worksheet.clear)
             print("✅ Worksheet berhasil dibersihkan")
         except Exception as clear_error:
             print(f"⚠️  Gagal clear worksheet: {str(clear_error)}")
@@ -511,50 +464,37 @@ def write_to_google_sheet(worksheet, data_rows):
             print(f"   📄 Menulis chunk {chunk_index + 1}/{chunk_count}: baris {start_row + 1}-{end_row}...")
             
             try:
-                worksheet.update(start_cell, current_chunk, value_input_option='USER_ENTERED')
-                
-                # Jeda antar chunk untuk menghindari rate limit
-                if chunk_index < chunk_count - 1:
-                    time.sleep(2)
+                # Laju & retry (429/5xx) diatur SHEETS_LIMITER, tanpa jeda tetap
+                SHEETS_LIMITER.call(worksheet.update, range_name=start_cell, values=current_chunk,
+                                    value_input_option='USER_ENTERED')
                     
             except Exception as chunk_error:
-                error_msg = str(chunk_error)
-                print(f"❌ Error pada chunk {chunk_index + 1}: {error_msg}")
+                print(f"❌ Error pada chunk {chunk_index + 1}: {str(chunk_error)}")
                 
-                # Coba lagi dengan jeda lebih lama
-                print("🔄 Mencoba lagi dengan jeda 5 detik...")
-                time.sleep(5)
+                # Coba dengan chunk yang lebih kecil
+                print("🔄 Mencoba dengan chunk lebih kecil (5,000 baris)...")
+                smaller_chunk_size = 5000
                 
-                try:
-                    worksheet.update(start_cell, current_chunk, value_input_option='USER_ENTERED')
-                    print(f"✅ Chunk {chunk_index + 1} berhasil pada percobaan kedua")
-                except Exception as retry_error:
-                    print(f"❌ Gagal lagi: {str(retry_error)}")
-                    
-                    # Coba dengan chunk yang lebih kecil
-                    print("🔄 Mencoba dengan chunk lebih kecil (5,000 baris)...")
-                    smaller_chunk_size = 5000
+                # Bagi chunk saat ini menjadi sub-chunks
+                sub_start_row = start_row
+                sub_chunks = []
+                while sub_start_row < end_row:
+                    sub_end_row = min(sub_start_row + smaller_chunk_size, end_row)
+                    sub_chunks.append((sub_start_row, sub_end_row))
+                    sub_start_row = sub_end_row
+                
+                for sub_idx, (sub_start, sub_end) in enumerate(sub_chunks):
+                    sub_chunk = data_rows[sub_start:sub_end]
+                    sub_cell = f'A{sub_start + 1}'
                     
-                    # Bagi chunk saat ini menjadi sub-chunks
-                    sub_start_row = start_row
-                    sub_chunks = []
-                    while sub_start_row < end_row:
-                        sub_end_row = min(sub_start_row + smaller_chunk_size, end_row)
-                        sub_chunks.append((sub_start_row, sub_end_row))
-                        sub_start_row = sub_end_row
+                    print(f"     📝 Sub-chunk {sub_idx + 1}/{len(sub_chunks)}: baris {sub_start + 1}-{sub_end}...")
                     
-                    for sub_idx, (sub_start, sub_end) in enumerate(sub_chunks):
-                        sub_chunk = data_rows[sub_start:sub_end]
-                        sub_cell = f'A{sub_start + 1}'
-                        
-                        print(f"     📝 Sub-chunk {sub_idx + 1}/{len(sub_chunks)}: baris {sub_start + 1}-{sub_end}...")
-                        
-                        try:
-                            worksheet.update(sub_cell, sub_chunk, value_input_option='USER_ENTERED')
-                            time.sleep(1)
-                        except Exception as sub_error:
-                            print(f"     ❌ Gagal sub-chunk: {str(sub_error)}")
-                            raise sub_error
+                    try:
+                        SHEETS_LIMITER.call(worksheet.update, range_name=sub_cell, values=sub_chunk,
+                                            value_input_option='USER_ENTERED')
+                    except Exception as sub_error:
+                        print(f"     ❌ Gagal sub-chunk: {str(sub_error)}")
+                        raise sub_error
         
         print(f"✅ Semua data berhasil ditulis! Total {total_rows_to_write} baris.")
         return True
@@ -571,6 +511,9 @@ def send_email_notification(subject, message, is_success=True):
     Mengirim notifikasi email tentang status proses
     """
     try:
+        # Load config email
+        EMAIL_CONFIG = load_email_config()
+        
         msg = MIMEMultipart()
         msg['From'] = EMAIL_CONFIG["sender_email"]
         msg['To'] = ", ".join(EMAIL_CONFIG["recipient_emails"])
@@ -619,6 +562,8 @@ def send_email_notification(subject, message, is_success=True):
 # PROSES UTAMA (DIPERBAIKI)
 # ============================
 def main():
+    import gspread
+
     try:
         log = []
         all_dataframes = []
@@ -632,7 +577,7 @@ def main():
         print("=" * 60)
         print(f"📁 Folder ID: {FOLDER_ID}")
         print(f"📊 Spreadsheet ID: {SPREADSHEET_ID}")
-        print(f"📧 Email penerima: {', '.join(recipient_list)}")
+        print(f"📧 Email penerima: {', '.join(load_email_config()['recipient_emails'])}")
         print()
 
         # 1. Download semua Excel dari folder ERDKK
@@ -673,7 +618,8 @@ def main():
                 df['KTP_ORIGINAL'] = df['KTP'].copy()
                 
                 # Bersihkan NIK/KTP
-                df['KTP'] = df['KTP'].apply(clean_nik)
+                df['KTP'], nik_summary = clean_nik_series(df['KTP'])
+                print_nik_summary(nik_summary, label="KTP")
                 
                 # Log perubahan NIK
                 mask = df['KTP_ORIGINAL'] != df['KTP']
@@ -735,7 +681,7 @@ def main():
         
         # Buka spreadsheet
         try:
-            sh = gc.open_by_key(SPREADSHEET_ID)
+            sh = get_gspread_client().open_by_key(SPREADSHEET_ID)
             print(f"✅ Spreadsheet ditemukan: {SPREADSHEET_ID}")
         except Exception as e:
             raise ValueError(f"❌ Gagal membuka spreadsheet: {str(e)}")
@@ -932,3 +878,4 @@ REKAP DATA ERDKK GAGAL ❌
 # ============================
 if __name__ == "__main__":
     main()
+    SHEETS_LIMITER.print_summary()
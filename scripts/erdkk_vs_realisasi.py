@@ -9,21 +9,24 @@ Lokasi: verval-pupuk2/scripts/erdkk_vs_realisasi_fixed_v6.py
 import os
 import sys
 import pandas as pd
-import gspread
+import numpy as np
 import re
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from google.oauth2.service_account import Credentials
+from google_clients import get_credentials, get_gspread_client, get_drive_service
 from datetime import datetime, date
 import traceback
 import json
 import time
-from googleapiclient.errors import HttpError
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
-import io
 import tempfile
+from drive_cache import download_files_parallel, DRIVE_FILE_FIELDS, XLSX_MIME_TYPE, GOOGLE_SHEET_MIME_TYPE
+from excel_snapshot import read_excel_cached, ingest_excel_file, summarize_latest_input
+from incremental_state import IncrementalState
+from nik_utils import clean_nik_series, print_nik_summary
+from status_utils import StatusClassifier
+from sheet_batch_writer import SheetBatchWriter, dataframe_values
+from rate_limiter import get_rate_limiter
 
 # ============================
 # KONFIGURASI
@@ -32,11 +35,11 @@ ERDKK_FOLDER_ID = "13N5dLdHzAKff6g8RDRiHa7LFyZbdJUCJ"  # Folder ERDKK
 REALISASI_FOLDER_ID = "1AXQdEUW1dXRcdT0m0QkzvT7ZJjN0Vt4E"  # Folder realisasi
 OUTPUT_SHEET_URL = "https://docs.google.com/spreadsheets/d/1xiMkISdgcquqt69dbFek8mEc0UNOZmtAALVgX5jaPJc/edit"
 
-# OPTIMIZED RATE LIMITING
-MAX_RETRIES = 5
-INITIAL_RETRY_DELAY = 30
-WRITE_DELAY = 5
-BATCH_DELAY = 10
+# RATE LIMITING: laju request diatur token bucket bersama (lihat rate_limiter.py)
+SHEETS_LIMITER = get_rate_limiter("sheets")
+
+# Naikkan jika cara memproses satu file ERDKK/realisasi berubah (state inkremental lama dibuang)
+INCREMENTAL_LOGIC_VERSION = 3
 
 # ============================
 # LOAD EMAIL CONFIGURATION FROM SECRETS
@@ -161,6 +164,10 @@ def is_status_disetujui_pusat(status_value):
     # Harus memenuhi semua kriteria
     return contains_disetujui and contains_pusat and not contains_menunggu and not contains_ditolak
 
+# Filter ACC PUSAT per teks STATUS unik (cache antar file dan antar run).
+# Naikkan version jika kriteria is_status_disetujui_pusat diubah.
+ACC_PUSAT_CLASSIFIER = StatusClassifier(is_status_disetujui_pusat, "erdkk_vs_realisasi_acc_pusat", version=1)
+
 def print_status_analysis(df, status_column='STATUS'):
     """Analisis dan print semua status yang ada"""
     if status_column not in df.columns:
@@ -199,94 +206,6 @@ def print_status_analysis(df, status_column='STATUS'):
 # ============================
 # FUNGSI BANTU UNTUK TANGGAL INPUT
 # ============================
-def extract_latest_input_date_from_files(excel_files):
-    """
-    Ekstrak tanggal input terbaru dari semua file realisasi
-    Mirip dengan fungsi di pivot_klaster_status.py
-    """
-    latest_datetime = None
-    found_in_files = 0
-    
-    print("📅 Mencari tanggal input dari semua file...")
-    
-    for file_info in excel_files:
-        file_path = file_info['path']
-        file_name = file_info['name']
-        
-        try:
-            # Coba sheet 'Worksheet' terlebih dahulu (seperti di script lain)
-            try:
-                df = pd.read_excel(file_path, sheet_name='Worksheet')
-            except:
-                # Coba sheet pertama
-                xls = pd.ExcelFile(file_path)
-                sheet_name = xls.sheet_names[0]
-                df = pd.read_excel(file_path, sheet_name=sheet_name)
-            
-            # Bersihkan nama kolom
-            df.columns = [clean_column_name(col) for col in df.columns]
-            
-            # Cari kolom TGL INPUT atau TANGGAL INPUT
-            tgl_input_cols = [col for col in df.columns if 'TGL INPUT' in col.upper() or 'TANGGAL INPUT' in col.upper()]
-            
-            if tgl_input_cols:
-                tgl_col = tgl_input_cols[0]
-                found_in_files += 1
-                
-                print(f"   🔍 File: {file_name} - Kolom tanggal: '{tgl_col}'")
-                
-                # Coba parsing tanggal dengan berbagai format
-                try:
-                    # Coba format dengan dayfirst=True (untuk format DD/MM/YYYY)
-                    df[tgl_col] = pd.to_datetime(df[tgl_col], errors='coerce', dayfirst=True)
-                except:
-                    try:
-                        # Coba format spesifik
-                        df[tgl_col] = pd.to_datetime(df[tgl_col], errors='coerce', format='%d/%m/%Y %H:%M:%S')
-                    except:
-                        try:
-                            df[tgl_col] = pd.to_datetime(df[tgl_col], errors='coerce', format='%d-%m-%Y %H:%M:%S')
-                        except:
-                            try:
-                                df[tgl_col] = pd.to_datetime(df[tgl_col], errors='coerce', format='%d/%m/%Y')
-                            except:
-                                try:
-                                    df[tgl_col] = pd.to_datetime(df[tgl_col], errors='coerce', format='%d-%m-%Y')
-                                except:
-                                    # Fallback ke parsing otomatis
-                                    df[tgl_col] = pd.to_datetime(df[tgl_col], errors='coerce')
-                
-                # Cari tanggal yang valid
-                valid_datetimes = df[tgl_col].dropna()
-                
-                if not valid_datetimes.empty:
-                    file_latest_datetime = valid_datetimes.max()
-                    
-                    if latest_datetime is None or file_latest_datetime > latest_datetime:
-                        latest_datetime = file_latest_datetime
-                    
-                    date_str = file_latest_datetime.strftime('%d %b %Y')
-                    time_str = file_latest_datetime.strftime('%H:%M:%S') if pd.notna(file_latest_datetime) else "00:00:00"
-                    print(f"   ✅ {file_name}: Terbaru: {date_str} {time_str}")
-                else:
-                    print(f"   ⚠️  {file_name}: Tidak ada tanggal valid di kolom '{tgl_col}'")
-                    
-            else:
-                print(f"   ⚠️  {file_name}: Kolom TGL INPUT/TANGGAL INPUT tidak ditemukan")
-                
-        except Exception as e:
-            print(f"   ❌ Error membaca tanggal dari {file_name}: {str(e)}")
-            continue
-    
-    if latest_datetime:
-        date_str = latest_datetime.strftime('%d %b %Y')
-        time_str = latest_datetime.strftime('%H:%M:%S') if pd.notna(latest_datetime) else "00:00:00"
-        print(f"📅 Tanggal dan waktu input terbaru: {date_str} {time_str}")
-    else:
-        print("📅 Tidak ditemukan data TGL INPUT yang valid")
-    
-    return latest_datetime, found_in_files
-
 def format_date_indonesian(date_obj):
     """
     Format tanggal ke format Indonesia (02 Jan 2026)
@@ -317,6 +236,8 @@ def write_update_date_to_sheet(gc, spreadsheet_url, latest_datetime):
     """
     Menulis tanggal dan waktu update ke Sheet1 kolom E1-E3
     """
+    import gspread
+
     try:
         print(f"📝 Menulis tanggal dan waktu update ke Sheet1...")
         
@@ -338,25 +259,22 @@ def write_update_date_to_sheet(gc, spreadsheet_url, latest_datetime):
                 print(f"   ⚠️  Membuat sheet baru 'Sheet1'")
                 worksheet = spreadsheet.add_worksheet(title="Sheet1", rows="100", cols="20")
         
-        # Update kolom E (E1, E2, E3)
-        worksheet.update('E1', [['Update per tanggal input']])
-        time.sleep(WRITE_DELAY)
-        
         if latest_datetime:
             date_formatted = format_date_indonesian(latest_datetime)
         else:
             date_formatted = "Tanggal tidak tersedia"
         
-        worksheet.update('E2', [[date_formatted]])
-        time.sleep(WRITE_DELAY)
-        
         if latest_datetime:
             time_formatted = latest_datetime.strftime('%H:%M:%S')
         else:
             time_formatted = "Waktu tidak tersedia"
         
-        worksheet.update('E3', [[time_formatted]])
-        time.sleep(WRITE_DELAY)
+        # Update kolom E (E1, E2, E3) dalam satu request
+        safe_google_api_operation(
+            worksheet.update,
+            values=[['Update per tanggal input'], [date_formatted], [time_formatted]],
+            range_name='E1:E3'
+        )
         
         # Format kolom E dengan warna kuning muda
         try:
@@ -391,64 +309,9 @@ def write_update_date_to_sheet(gc, spreadsheet_url, latest_datetime):
 # ============================
 # FUNGSI BANTU UNTUK GOOGLE API
 # ============================
-def exponential_backoff(attempt):
-    base_delay = INITIAL_RETRY_DELAY * (2 ** (attempt - 1))
-    jitter = base_delay * 0.1
-    return base_delay + jitter
-
 def safe_google_api_operation(operation, *args, **kwargs):
-    """Safe operation dengan exponential backoff"""
-    last_exception = None
-    
-    for attempt in range(1, MAX_RETRIES + 1):
-        try:
-            result = operation(*args, **kwargs)
-            if attempt > 1:
-                print(f"   ✅ Berhasil pada percobaan ke-{attempt}")
-            return result
-            
-        except HttpError as e:
-            last_exception = e
-            if e.resp.status == 429:
-                if attempt < MAX_RETRIES:
-                    wait_time = exponential_backoff(attempt)
-                    print(f"⏳ Quota exceeded, menunggu {wait_time:.1f} detik... (Percobaan {attempt}/{MAX_RETRIES})")
-                    time.sleep(wait_time)
-                else:
-                    print(f"❌ Gagal setelah {MAX_RETRIES} percobaan")
-                    raise e
-            elif e.resp.status in [500, 502, 503, 504]:
-                if attempt < MAX_RETRIES:
-                    wait_time = exponential_backoff(attempt)
-                    print(f"⏳ Server error {e.resp.status}, menunggu {wait_time:.1f} detik... (Percobaan {attempt}/{MAX_RETRIES})")
-                    time.sleep(wait_time)
-                else:
-                    raise e
-            else:
-                raise e
-        except Exception as e:
-            last_exception = e
-            if attempt < MAX_RETRIES:
-                wait_time = exponential_backoff(attempt)
-                print(f"⏳ Error {type(e).__name__}, menunggu {wait_time:.1f} detik... (Percobaan {attempt}/{MAX_RETRIES})")
-                time.sleep(wait_time)
-            else:
-                raise e
-    
-    raise last_exception
-
-def clean_nik(nik_value):
-    """Membersihkan NIK dari karakter non-angka"""
-    if pd.isna(nik_value) or nik_value is None:
-        return None
-    nik_str = str(nik_value)
-    cleaned_nik = re.sub(r'\D', '', nik_str)
-    if len(cleaned_nik) != 16:
-        # Tidak selalu error, bisa jadi data valid dengan leading zeros hilang
-        if len(cleaned_nik) < 16:
-            # Tambahkan leading zeros
-            cleaned_nik = cleaned_nik.zfill(16)
-    return cleaned_nik if cleaned_nik else None
+    """Panggil Google API sesuai kuota; retry hanya saat throttled (429) atau error sementara"""
+    return SHEETS_LIMITER.call(operation, *args, **kwargs)
 
 def clean_column_name(col_name):
     """Bersihkan nama kolom"""
@@ -473,63 +336,55 @@ def download_excel_files_from_drive(credentials, folder_id, folder_name):
     os.makedirs(save_folder, exist_ok=True)
     
     try:
-        drive_service = build('drive', 'v3', credentials=credentials)
+        drive_service = get_drive_service(credentials)
 
         # Query untuk mencari file Excel
         query = f"'{folder_id}' in parents and (mimeType='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet' or mimeType='application/vnd.ms-excel' or mimeType='application/vnd.google-apps.spreadsheet')"
         
-        results = drive_service.files().list(q=query, fields="files(id, name, mimeType, modifiedTime)").execute()
+        results = drive_service.files().list(q=query, fields=DRIVE_FILE_FIELDS).execute()
         files = results.get("files", [])
 
         if not files:
             print(f"⚠️  Tidak ada file Excel di folder {folder_name}")
             return []
 
-        file_paths = []
+        jobs = []
         for file in files:
-            print(f"   📥 Downloading: {file['name']} ({file['mimeType']})")
+            # Handle Google Sheets vs regular Excel
+            if file['mimeType'] == GOOGLE_SHEET_MIME_TYPE:
+                # Export Google Sheets ke Excel
+                export_mime = XLSX_MIME_TYPE
+                ext = '.xlsx'
+            else:
+                # Regular Excel file
+                export_mime = None
+                ext = '.xlsx' if file['name'].lower().endswith('.xlsx') else '.xls'
             
-            try:
-                # Handle Google Sheets vs regular Excel
-                if file['mimeType'] == 'application/vnd.google-apps.spreadsheet':
-                    # Export Google Sheets ke Excel
-                    request = drive_service.files().export_media(
-                        fileId=file["id"],
-                        mimeType='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-                    )
-                    ext = '.xlsx'
-                else:
-                    # Regular Excel file
-                    request = drive_service.files().get_media(fileId=file["id"])
-                    ext = '.xlsx' if file['name'].lower().endswith('.xlsx') else '.xls'
-                
-                # Gunakan nama file yang aman
-                safe_filename = "".join(c for c in file['name'] if c.isalnum() or c in (' ', '-', '_', '.')).rstrip()
-                if not safe_filename.lower().endswith(('.xlsx', '.xls')):
-                    safe_filename += ext
-                    
-                file_path = os.path.join(save_folder, safe_filename)
-
-                with io.FileIO(file_path, 'wb') as fh:
-                    downloader = MediaIoBaseDownload(fh, request)
-                    done = False
-                    while not done:
-                        status, done = downloader.next_chunk()
-                        if status:
-                            print(f"      Progress: {int(status.progress() * 100)}%")
-
-                file_paths.append({
-                    'path': file_path,
-                    'name': file['name'],
-                    'temp_folder': save_folder,
-                    'mime_type': file['mimeType'],
-                    'modified_time': file.get('modifiedTime')
-                })
-                print(f"      ✅ Berhasil download: {safe_filename}")
+            # Gunakan nama file yang aman
+            safe_filename = "".join(c for c in file['name'] if c.isalnum() or c in (' ', '-', '_', '.')).rstrip()
+            if not safe_filename.lower().endswith(('.xlsx', '.xls')):
+                safe_filename += ext
+
+            jobs.append({
+                'file': file,
+                'path': os.path.join(save_folder, safe_filename),
+                'export_mime': export_mime
+            })
 
-            except Exception as e:
-                print(f"      ❌ Gagal download {file['name']}: {str(e)}")
+        # Download beberapa file sekaligus (satu koneksi per thread)
+        file_paths = []
+        for job in download_files_parallel(credentials, jobs):
+            if job['error'] is not None:
                 continue
+            file = job['file']
+            file_paths.append({
+                'path': job['path'],
+                'name': file['name'],
+                'temp_folder': save_folder,
+                'mime_type': file['mimeType'],
+                'modified_time': file.get('modifiedTime'),
+                'file': file
+            })
 
         print(f"✅ Berhasil download {len(file_paths)} file Excel dari {folder_name}")
         return file_paths
@@ -542,13 +397,55 @@ def download_excel_files_from_drive(credentials, folder_id, folder_name):
 # ============================
 # FUNGSI PROSES DATA ERDKK
 # ============================
+def parse_pupuk_number(value):
+    """Konversi satu nilai sel pupuk ke angka (karakter non-angka dibuang, gagal -> 0)"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, str):
+        return 0.0
+    
+    # Bersihkan string dari karakter non-numeric
+    clean_str = re.sub(r'[^\d.-]', '', value)
+    if not clean_str:
+        return 0.0
+    try:
+        return float(clean_str)
+    except ValueError:
+        # Jika tidak bisa dikonversi, ambil angka pertama dalam string
+        numbers = re.findall(r'\d+\.?\d*', value)
+        return float(numbers[0]) if numbers else 0.0
+
+def pupuk_frame_to_numbers(df, cols):
+    """
+    Konversi beberapa kolom pupuk ke angka sekaligus.
+    Setiap nilai unik (dari semua kolom) dikonversi sekali dengan
+    parse_pupuk_number, nilai kosong -> 0. Return list array float per kolom.
+    """
+    if not cols:
+        return []
+    block = df[cols].to_numpy(dtype=object)
+    codes, uniques = pd.factorize(block.ravel(order='F'))
+    numbers = np.array([parse_pupuk_number(value) for value in uniques] + [0.0])
+    return list(numbers[codes].reshape(block.shape, order='F').T)
+
+def text_column(df, col, upper=False):
+    """Kolom teks yang sudah di-strip (tanpa kolom / nilai kosong -> '')"""
+    if not col:
+        return np.full(len(df), '', dtype=object)
+    values = df[col].where(df[col].notna(), '').astype(str).str.strip()
+    return (values.str.upper() if upper else values).to_numpy(dtype=object)
+
 def process_erdkk_file(file_path, file_name):
-    """Proses satu file ERDKK - DIPERBAIKI DENGAN MENCARI KECAMATAN DARI GAPOKTAN"""
+    """
+    Proses satu file ERDKK - DIPERBAIKI DENGAN MENCARI KECAMATAN DARI GAPOKTAN.
+    Return DataFrame per baris petani (NIK, kios, TOTAL_* per jenis pupuk),
+    atau None jika file gagal diproses / tidak ada baris yang valid.
+    """
     try:
         print(f"\n   📖 Memproses ERDKK: {file_name}")
 
         # Baca file Excel
-        df = pd.read_excel(file_path, dtype=str)
+        df = read_excel_cached(file_path, dtype=str)
         
         # Standardize column names
         df.columns = df.columns.astype(str).str.strip().str.upper()
@@ -740,156 +637,81 @@ def process_erdkk_file(file_path, file_name):
                 print(f"   ⚠️  {pupuk_type}: Tidak ditemukan kolom")
         
         # ============================================
-        # PROSES SETIAP BARIS
+        # PROSES SEMUA BARIS SEKALIGUS
         # ============================================
-        results = []
-        skipped_rows = 0
-        
-        for idx, row in df.iterrows():
-            try:
-                # Clean NIK
-                nik_value = row.get(ktp_col, '')
-                nik = clean_nik(nik_value)
-                if not nik or len(nik) != 16:
-                    skipped_rows += 1
-                    if idx < 3:
-                        print(f"   ⚠️  Baris {idx}: NIK '{nik_value}' tidak valid -> '{nik}'")
-                    continue
-                
-                # Ambil nilai kecamatan dari kolom yang telah ditentukan
-                kecamatan_value = row.get(kec_col, '') if kec_col else ''
-                if pd.isna(kecamatan_value):
-                    kecamatan_value = ''
-                
-                result = {
-                    'NIK': nik,
-                    'NAMA_PETANI': str(row.get(nama_col, '')).strip() if nama_col and pd.notna(row.get(nama_col)) else '',
-                    'KECAMATAN': str(kecamatan_value).strip().upper(),
-                    'KODE_KIOS': str(row.get(kode_kios_col, '')).strip().upper() if kode_kios_col and pd.notna(row.get(kode_kios_col)) else '',
-                    'NAMA_KIOS': str(row.get(nama_kios_col, '')).strip() if nama_kios_col and pd.notna(row.get(nama_kios_col)) else '',
-                    'TOTAL_UREA': 0,
-                    'TOTAL_NPK': 0,
-                    'TOTAL_SP36': 0,
-                    'TOTAL_ZA': 0,
-                    'TOTAL_NPK_FORMULA': 0,
-                    'TOTAL_ORGANIK': 0,
-                    'TOTAL_ORGANIK_CAIR': 0,
-                    'FILE_SOURCE': file_name
-                }
-                
-                # Hitung total per jenis pupuk dari semua kolom yang ditemukan
-                for pupuk_type, cols in pupuk_columns.items():
-                    if not cols:
-                        continue
-                    
-                    total = 0
-                    for col in cols:
-                        value = row.get(col)
-                        if pd.notna(value):
-                            try:
-                                # Coba konversi ke float
-                                if isinstance(value, (int, float)):
-                                    num_value = float(value)
-                                elif isinstance(value, str):
-                                    # Bersihkan string dari karakter non-numeric
-                                    clean_str = re.sub(r'[^\d.-]', '', value)
-                                    if clean_str:
-                                        num_value = float(clean_str)
-                                    else:
-                                        num_value = 0
-                                else:
-                                    num_value = 0
-                                
-                                total += num_value
-                            except (ValueError, TypeError):
-                                # Jika tidak bisa dikonversi, coba parsing string
-                                if isinstance(value, str):
-                                    # Cari angka dalam string
-                                    numbers = re.findall(r'\d+\.?\d*', value)
-                                    if numbers:
-                                        try:
-                                            num_value = float(numbers[0])
-                                            total += num_value
-                                        except:
-                                            pass
-                    
-                    # Simpan total per jenis pupuk
-                    if pupuk_type == 'UREA':
-                        result['TOTAL_UREA'] = total
-                    elif pupuk_type == 'NPK':
-                        result['TOTAL_NPK'] = total
-                    elif pupuk_type == 'SP36':
-                        result['TOTAL_SP36'] = total
-                    elif pupuk_type == 'ZA':
-                        result['TOTAL_ZA'] = total
-                    elif pupuk_type == 'NPK_FORMULA':
-                        result['TOTAL_NPK_FORMULA'] = total
-                    elif pupuk_type == 'ORGANIK':
-                        result['TOTAL_ORGANIK'] = total
-                    elif pupuk_type == 'ORGANIK_CAIR':
-                        result['TOTAL_ORGANIK_CAIR'] = total
-                
-                # Cek apakah ada data pupuk
-                has_pupuk_data = any([
-                    result['TOTAL_UREA'] > 0,
-                    result['TOTAL_NPK'] > 0,
-                    result['TOTAL_SP36'] > 0,
-                    result['TOTAL_ZA'] > 0,
-                    result['TOTAL_NPK_FORMULA'] > 0,
-                    result['TOTAL_ORGANIK'] > 0,
-                    result['TOTAL_ORGANIK_CAIR'] > 0
-                ])
-                
-                if has_pupuk_data:
-                    results.append(result)
-                else:
-                    skipped_rows += 1
-                    if idx < 3:
-                        print(f"   ⚠️  Baris {idx}: Tidak ada data pupuk")
-                
-            except Exception as e:
-                if idx < 3:
-                    print(f"   ⚠️  Error processing row {idx}: {e}")
-                skipped_rows += 1
-                continue
+        # Bersihkan NIK satu kolom sekaligus (NIK yang kehilangan nol di depan dilengkapi)
+        clean_niks, nik_summary = clean_nik_series(df[ktp_col], pad_to_length=True)
+        print_nik_summary(nik_summary)
+        valid_nik = (clean_niks.str.len() == 16).to_numpy()
+        
+        result = pd.DataFrame({
+            'NIK': clean_niks.to_numpy(),
+            'NAMA_PETANI': text_column(df, nama_col),
+            'KECAMATAN': text_column(df, kec_col, upper=True),
+            'KODE_KIOS': text_column(df, kode_kios_col, upper=True),
+            'NAMA_KIOS': text_column(df, nama_kios_col)
+        })
+        
+        # Total per jenis pupuk: semua kolom pupuk dikonversi ke angka sekaligus,
+        # lalu dijumlahkan per jenis (urutan penjumlahan mengikuti urutan kolom)
+        pupuk_source_cols = list(dict.fromkeys(col for cols in pupuk_columns.values() for col in cols))
+        pupuk_numbers = dict(zip(pupuk_source_cols, pupuk_frame_to_numbers(df, pupuk_source_cols)))
+        has_pupuk_data = np.zeros(len(df), dtype=bool)
+        for pupuk_type, cols in pupuk_columns.items():
+            total = np.zeros(len(df))
+            for col in cols:
+                total = total + pupuk_numbers[col]
+            result[f'TOTAL_{pupuk_type}'] = total
+            has_pupuk_data |= total > 0
+        result['FILE_SOURCE'] = file_name
+        
+        # Info untuk 3 baris pertama yang dilewati
+        for pos in range(min(3, len(df))):
+            if not valid_nik[pos]:
+                print(f"   ⚠️  Baris {pos}: NIK '{df[ktp_col].iat[pos]}' tidak valid -> '{clean_niks.iat[pos]}'")
+            elif not has_pupuk_data[pos]:
+                print(f"   ⚠️  Baris {pos}: Tidak ada data pupuk")
+        
+        results = result[valid_nik & has_pupuk_data].reset_index(drop=True)
+        skipped_rows = len(df) - len(results)
         
         print(f"   ✅ Berhasil diproses: {len(results)} baris data")
         if skipped_rows > 0:
             print(f"   ⚠️  Dilewati: {skipped_rows} baris (NIK tidak valid/tidak ada data pupuk)")
         
+        if results.empty:
+            return None
+        
         # Tampilkan sample dengan detail
-        if results:
-            print(f"\n   🔍 Sample data (baris pertama):")
-            sample = results[0]
-            print(f"     NIK: {sample['NIK']}")
-            print(f"     NAMA: {sample['NAMA_PETANI'][:30]}{'...' if len(sample['NAMA_PETANI']) > 30 else ''}")
-            print(f"     KECAMATAN: {sample['KECAMATAN']}")
-            print(f"     KODE_KIOS: {sample['KODE_KIOS']}")
-            print(f"     UREA: {sample['TOTAL_UREA']:.2f} Kg")
-            print(f"     NPK: {sample['TOTAL_NPK']:.2f} Kg")
-            
-            # Hitung total untuk verifikasi
-            total_urea = sum(r['TOTAL_UREA'] for r in results)
-            total_npk = sum(r['TOTAL_NPK'] for r in results)
-            print(f"\n   📊 Total dalam file ini:")
-            print(f"     Total UREA: {total_urea:.2f} Kg")
-            print(f"     Total NPK: {total_npk:.2f} Kg")
+        print(f"\n   🔍 Sample data (baris pertama):")
+        sample = results.iloc[0]
+        print(f"     NIK: {sample['NIK']}")
+        print(f"     NAMA: {sample['NAMA_PETANI'][:30]}{'...' if len(sample['NAMA_PETANI']) > 30 else ''}")
+        print(f"     KECAMATAN: {sample['KECAMATAN']}")
+        print(f"     KODE_KIOS: {sample['KODE_KIOS']}")
+        print(f"     UREA: {sample['TOTAL_UREA']:.2f} Kg")
+        print(f"     NPK: {sample['TOTAL_NPK']:.2f} Kg")
+        
+        # Hitung total untuk verifikasi
+        print(f"\n   📊 Total dalam file ini:")
+        print(f"     Total UREA: {results['TOTAL_UREA'].sum():.2f} Kg")
+        print(f"     Total NPK: {results['TOTAL_NPK'].sum():.2f} Kg")
         
         return results
 
     except Exception as e:
         print(f"   ❌ Error memproses ERDKK {file_name}: {str(e)}")
         traceback.print_exc()
-        return []
+        return None
 
-def aggregate_erdkk_by_kecamatan(all_erdkk_rows):
+def aggregate_erdkk_by_kecamatan(erdkk_df):
     """Agregasi data ERDKK per Kecamatan"""
-    if not all_erdkk_rows:
+    if erdkk_df is None or erdkk_df.empty:
         print("⚠️  Tidak ada data ERDKK untuk diagregasi")
         return pd.DataFrame()
 
     print("\n📊 Mengagregasi data ERDKK per KECAMATAN...")
-    df = pd.DataFrame(all_erdkk_rows)
+    df = erdkk_df.copy()
     
     # Handle kasus KECAMATAN kosong
     if 'KECAMATAN' not in df.columns or df['KECAMATAN'].isna().all():
@@ -945,14 +767,14 @@ def aggregate_erdkk_by_kecamatan(all_erdkk_rows):
     
     return kec_df
 
-def aggregate_erdkk_by_kios(all_erdkk_rows):
+def aggregate_erdkk_by_kios(erdkk_df):
     """Agregasi data ERDKK per Kode Kios"""
-    if not all_erdkk_rows:
+    if erdkk_df is None or erdkk_df.empty:
         print("⚠️  Tidak ada data ERDKK untuk diagregasi")
         return pd.DataFrame()
 
     print("\n📊 Mengagregasi data ERDKK per KIOS...")
-    df = pd.DataFrame(all_erdkk_rows)
+    df = erdkk_df.copy()
     
     # Filter yang punya KECAMATAN dan KODE_KIOS
     mask = df['KECAMATAN'].notna() & (df['KECAMATAN'] != '') & df['KODE_KIOS'].notna() & (df['KODE_KIOS'] != '')
@@ -1000,24 +822,16 @@ def aggregate_erdkk_by_kios(all_erdkk_rows):
 # ============================
 # FUNGSI PROSES DATA REALISASI - VERSI DIPERBAIKI
 # ============================
-def process_realisasi_file(file_path, file_name):
-    """Proses satu file realisasi - VERSI DIPERBAIKI"""
+def process_realisasi_file(file_path, file_name, df=None):
+    """Proses satu file realisasi - VERSI DIPERBAIKI (df: hasil ingest_excel_file jika sudah dibaca)"""
     try:
         print(f"\n   📖 Memproses Realisasi: {file_name}")
 
-        # Coba sheet 'Worksheet' terlebih dahulu (seperti di script lain)
-        try:
-            df = pd.read_excel(file_path, sheet_name='Worksheet', dtype=str)
-            print(f"   ✅ Membaca sheet 'Worksheet'")
-        except:
+        if df is None:
+            # Coba sheet 'Worksheet' terlebih dahulu, lalu sheet pertama
             try:
-                # Coba semua sheet
-                xls = pd.ExcelFile(file_path)
-                print(f"   📋 Sheet yang tersedia: {xls.sheet_names}")
-                # Ambil sheet pertama
-                sheet_name = xls.sheet_names[0]
-                df = pd.read_excel(file_path, sheet_name=sheet_name, dtype=str)
-                print(f"   ✅ Membaca sheet pertama: {sheet_name}")
+                df, meta = ingest_excel_file(file_path, file_name, dtype=str)
+                print(f"   ✅ Membaca sheet {meta['sheet']}")
             except Exception as e:
                 print(f"   ❌ Gagal membaca file: {e}")
                 return []
@@ -1132,10 +946,10 @@ def process_realisasi_file(file_path, file_name):
         
         # Tampilkan sample data untuk verifikasi
         if nik_col and len(df) > 0:
-            sample_niks = df[nik_col].head(3).astype(str).tolist()
+            sample_niks = df[nik_col].head(3).astype(str)
+            sample_cleaned = clean_nik_series(sample_niks, pad_to_length=True)[0].tolist()
             print(f"   🔍 Sample NIK (3 pertama):")
-            for i, nik in enumerate(sample_niks):
-                cleaned = clean_nik(nik)
+            for i, (nik, cleaned) in enumerate(zip(sample_niks.tolist(), sample_cleaned)):
                 print(f"     {i+1}. '{nik}' -> clean: '{cleaned}' (panjang: {len(cleaned) if cleaned else 0})")
         
         # ============================================
@@ -1199,11 +1013,15 @@ def process_realisasi_file(file_path, file_name):
         skipped_rows = 0
         valid_rows = 0
         
-        for idx, row in df.iterrows():
+        # Bersihkan NIK satu kolom sekaligus (NIK yang kehilangan nol di depan dilengkapi)
+        clean_niks, nik_summary = clean_nik_series(df[nik_col], pad_to_length=True)
+        print_nik_summary(nik_summary)
+        clean_niks = clean_niks.tolist()
+        
+        for pos, (idx, row) in enumerate(df.iterrows()):
             try:
-                # Clean NIK
                 nik_value = str(row[nik_col]) if nik_col in row else ''
-                nik = clean_nik(nik_value)
+                nik = clean_niks[pos]
                 
                 # Validasi NIK - harus 16 digit
                 if not nik or len(nik) != 16:
@@ -1306,6 +1124,20 @@ def process_realisasi_file(file_path, file_name):
         traceback.print_exc()
         return []
 
+def ingest_realisasi_file(file_path, file_name, failed_metas=None):
+    """
+    Baca satu file realisasi sekali: metadata TGL INPUT + baris per NIK (disimpan per file di state).
+    File gagal/tanpa baris valid (mis. kolom NIK tidak ada) -> None agar tidak disimpan di state;
+    metadatanya tetap dicatat di failed_metas untuk ringkasan TGL INPUT.
+    """
+    df_file, meta = ingest_excel_file(file_path, file_name, dtype=str)
+    rows = process_realisasi_file(file_path, file_name, df=df_file)
+    if not rows:
+        if failed_metas is not None:
+            failed_metas.append(meta)
+        return None
+    return {'meta': meta, 'rows': rows}
+
 def aggregate_realisasi_by_kecamatan(all_realisasi_rows, filter_acc_pusat=False):
     """Agregasi data realisasi per Kecamatan"""
     if not all_realisasi_rows:
@@ -1320,7 +1152,7 @@ def aggregate_realisasi_by_kecamatan(all_realisasi_rows, filter_acc_pusat=False)
     if filter_acc_pusat:
         if 'STATUS' in df.columns:
             initial_count = len(df)
-            mask = df['STATUS'].apply(is_status_disetujui_pusat)
+            mask = ACC_PUSAT_CLASSIFIER.mask(df['STATUS'])
             df = df[mask]
             print(f"   Filter ACC PUSAT: {len(df)}/{initial_count} baris tersisa")
         else:
@@ -1394,7 +1226,7 @@ def aggregate_realisasi_by_kios(all_realisasi_rows, filter_acc_pusat=False):
     if filter_acc_pusat:
         if 'STATUS' in df.columns:
             initial_count = len(df)
-            mask = df['STATUS'].apply(is_status_disetujui_pusat)
+            mask = ACC_PUSAT_CLASSIFIER.mask(df['STATUS'])
             df = df[mask]
             print(f"   Filter ACC PUSAT: {len(df)}/{initial_count} baris tersisa")
         else:
@@ -1765,8 +1597,10 @@ def create_comparison_kios(erdkk_kios_df, realisasi_kios_df_all, realisasi_kios_
 # ============================
 # FUNGSI UPDATE GOOGLE SHEETS
 # ============================
-def format_worksheet_with_date(worksheet, df, latest_tanggal_input=None):
-    """Format worksheet dengan warna header, border, dan informasi tanggal"""
+def format_worksheet_with_date(writer, sheet_name, df, latest_tanggal_input=None):
+    """Antrikan format header, baris TOTAL dan kolom angka/persen ke SheetBatchWriter"""
+    import gspread
+
     try:
         # Format header (baris 1)
         header_format = {
@@ -1818,89 +1652,62 @@ def format_worksheet_with_date(worksheet, df, latest_tanggal_input=None):
         }
         
         # Format header
-        worksheet.format("1:1", header_format)
+        writer.format(sheet_name, "1:1", header_format)
         
         # Format baris TOTAL (jika ada)
         total_row = len(df) + 1  # +1 karena header di baris 1
         if 'KECAMATAN' in df.columns and 'TOTAL' in df['KECAMATAN'].values:
-            worksheet.format(f"{total_row}:{total_row}", total_format)
+            writer.format(sheet_name, f"{total_row}:{total_row}", total_format)
         
         # Format kolom persentase
         for col_idx, col_name in enumerate(df.columns, start=1):
             if '%' in col_name:
                 col_letter = gspread.utils.rowcol_to_a1(1, col_idx)[0]
-                worksheet.format(f"{col_letter}2:{col_letter}{total_row}", percent_format)
+                writer.format(sheet_name, f"{col_letter}2:{col_letter}{total_row}", percent_format)
             elif any(x in col_name for x in ['ERDKK', 'REALISASI', 'SELISIH']):
                 col_letter = gspread.utils.rowcol_to_a1(1, col_idx)[0]
-                worksheet.format(f"{col_letter}2:{col_letter}{total_row}", number_format)
+                writer.format(sheet_name, f"{col_letter}2:{col_letter}{total_row}", number_format)
         
         # Set lebar kolom otomatis
-        try:
-            worksheet.columns_auto_resize(start_column_index=0, end_column_index=len(df.columns))
-        except:
-            pass
+        writer.auto_resize_columns(sheet_name, 0, len(df.columns))
         
         # Freeze header row
-        try:
-            worksheet.freeze(rows=1)
-        except:
-            pass
-        
-        print(f"      ✅ Formatting diterapkan untuk sheet {worksheet.title}")
+        writer.freeze(sheet_name, 1)
         
     except Exception as e:
         print(f"      ⚠️  Gagal formatting: {e}")
 
 def batch_update_worksheets(spreadsheet, updates):
-    """Batch update untuk multiple worksheets dengan formatting"""
+    """Batch update untuk multiple worksheets dengan formatting (beberapa request API saja)"""
     print(f"🔄 Memproses batch update untuk {len(updates)} worksheet...")
     
+    writer = SheetBatchWriter(spreadsheet, api_call=safe_google_api_operation)
+    for sheet_name, data in updates:
+        print(f"   📝 Menyiapkan {sheet_name} ({len(data)} baris)")
+        writer.write(
+            sheet_name,
+            dataframe_values(data),
+            value_input_option='USER_ENTERED',
+            rows=max(1000, len(data) + 100),
+            cols=min(50, len(data.columns) + 5)
+        )
+        format_worksheet_with_date(writer, sheet_name, data, None)
+    
+    try:
+        written = set(writer.commit())
+    except Exception as e:
+        print(f"      ❌ Gagal batch update: {str(e)}")
+        written = set()
+    
     success_count = 0
-    for i, (sheet_name, data) in enumerate(updates):
-        try:
-            print(f"   📝 Processing {i+1}/{len(updates)}: {sheet_name} ({len(data)} baris)")
-            
-            try:
-                # Coba akses sheet yang sudah ada
-                worksheet = spreadsheet.worksheet(sheet_name)
-                print(f"      📝 Menggunakan sheet existing")
-                
-                # Clear existing data
-                safe_google_api_operation(worksheet.clear)
-                time.sleep(WRITE_DELAY)
-                
-            except gspread.exceptions.WorksheetNotFound:
-                # Buat sheet baru
-                worksheet = safe_google_api_operation(
-                    spreadsheet.add_worksheet, 
-                    title=sheet_name, 
-                    rows=str(max(1000, len(data) + 100)), 
-                    cols=str(min(50, len(data.columns) + 5))
-                )
-                print(f"      ✅ Membuat sheet baru: {sheet_name}")
-                time.sleep(WRITE_DELAY)
-            
-            # Update data
-            safe_google_api_operation(
-                worksheet.update,
-                [data.columns.values.tolist()] + data.values.tolist(),
-                value_input_option='USER_ENTERED'
-            )
-            
-            # Format worksheet
-            format_worksheet_with_date(worksheet, data, None)
-            
-            print(f"      ✅ Berhasil update data ({len(data)} baris, {len(data.columns)} kolom)")
+    for sheet_name, data in updates:
+        if sheet_name in written:
+            print(f"      ✅ {sheet_name}: berhasil update data ({len(data)} baris, {len(data.columns)} kolom)")
             success_count += 1
-            
-            if i < len(updates) - 1:
-                time.sleep(WRITE_DELAY)
-                
-        except Exception as e:
-            print(f"      ❌ Gagal update {sheet_name}: {str(e)}")
-            continue
+        else:
+            print(f"      ❌ Gagal update {sheet_name}")
     
-    print(f"✅ Batch update selesai: {success_count}/{len(updates)} berhasil")
+    print(f"✅ Batch update selesai: {success_count}/{len(updates)} berhasil ({writer.requests_sent} request API)")
     return success_count
 
 # ============================
@@ -1917,19 +1724,8 @@ def process_erdkk_vs_realisasi_with_date():
     try:
         # Load credentials
         print("\n🔐 Memuat credentials...")
-        creds_json = os.getenv("GOOGLE_APPLICATION_CREDENTIALS_JSON")
-        if not creds_json:
-            raise ValueError("❌ GOOGLE_APPLICATION_CREDENTIALS_JSON tidak ditemukan")
-
-        credentials = Credentials.from_service_account_info(
-            json.loads(creds_json),
-            scopes=[
-                "https://www.googleapis.com/auth/spreadsheets",
-                "https://www.googleapis.com/auth/drive",
-            ],
-        )
-
-        gc = gspread.authorize(credentials)
+        credentials = get_credentials()
+        gc = get_gspread_client(credentials)
         print("✅ Berhasil terhubung ke Google API")
         
         # Test koneksi spreadsheet
@@ -1959,34 +1755,43 @@ def process_erdkk_vs_realisasi_with_date():
             print("⚠️  Tidak ada file ERDKK yang ditemukan")
             erdkk_kec_df = pd.DataFrame()
             erdkk_kios_df = pd.DataFrame()
-            all_erdkk_rows = []
+            erdkk_df = pd.DataFrame()
         else:
             print(f"✅ Download selesai: {len(erdkk_files)} file")
             
             # Process setiap file ERDKK
             print("\n🔄 Memproses data ERDKK...")
-            all_erdkk_rows = []
+            erdkk_frames = []
             processed_files = 0
+            erdkk_state = IncrementalState("erdkk_vs_realisasi_erdkk", INCREMENTAL_LOGIC_VERSION)
+            erdkk_state.prune(file_info['file']['id'] for file_info in erdkk_files)
             
             for file_info in erdkk_files:
                 print(f"\n📄 Processing file {processed_files + 1}/{len(erdkk_files)}")
-                file_rows = process_erdkk_file(file_info['path'], file_info['name'])
+                # File kosong/gagal (None) tidak disimpan ke state agar dicoba lagi
+                file_rows, _ = erdkk_state.get_or_compute(
+                    file_info['file'],
+                    lambda: process_erdkk_file(file_info['path'], file_info['name'])
+                )
                 
-                if file_rows:
-                    all_erdkk_rows.extend(file_rows)
+                if file_rows is not None:
+                    erdkk_frames.append(file_rows)
                     processed_files += 1
                     print(f"   ✅ File '{file_info['name']}' berhasil diproses: {len(file_rows)} baris")
                 else:
                     print(f"   ⚠️  File '{file_info['name']}' tidak menghasilkan data")
             
-            if all_erdkk_rows:
+            erdkk_state.print_summary()
+            
+            erdkk_df = pd.concat(erdkk_frames, ignore_index=True) if erdkk_frames else pd.DataFrame()
+            if not erdkk_df.empty:
                 print(f"\n✅ Total file ERDKK diproses: {processed_files}/{len(erdkk_files)}")
-                print(f"✅ Total baris data ERDKK: {len(all_erdkk_rows)}")
+                print(f"✅ Total baris data ERDKK: {len(erdkk_df)}")
                 
                 # Agregasi data ERDKK
                 print("\n📊 Melakukan agregasi data ERDKK...")
-                erdkk_kec_df = aggregate_erdkk_by_kecamatan(all_erdkk_rows)
-                erdkk_kios_df = aggregate_erdkk_by_kios(all_erdkk_rows)
+                erdkk_kec_df = aggregate_erdkk_by_kecamatan(erdkk_df)
+                erdkk_kios_df = aggregate_erdkk_by_kios(erdkk_df)
             else:
                 print("⚠️  Tidak ada data ERDKK yang berhasil diproses")
                 erdkk_kec_df = pd.DataFrame()
@@ -2016,9 +1821,40 @@ def process_erdkk_vs_realisasi_with_date():
         else:
             print(f"✅ Download selesai: {len(realisasi_files)} file")
             
-            # Ekstrak tanggal input terbaru dari semua file
-            print("\n📅 Mengekstrak tanggal input dari file realisasi...")
-            latest_tanggal_input, found_in_files = extract_latest_input_date_from_files(realisasi_files)
+            # Setiap file realisasi dibaca SEKALI: data + metadata (TGL INPUT terbaru)
+            print("\n🔄 Memproses data Realisasi...")
+            all_realisasi_rows = []
+            realisasi_metas = []
+            processed_files = 0
+            realisasi_state = IncrementalState("erdkk_vs_realisasi_realisasi", INCREMENTAL_LOGIC_VERSION)
+            realisasi_state.prune(file_info['file']['id'] for file_info in realisasi_files)
+            
+            for file_info in realisasi_files:
+                print(f"\n📄 Processing file {processed_files + 1}/{len(realisasi_files)}")
+                try:
+                    # File kosong/gagal (None) tidak disimpan ke state agar dicoba lagi
+                    partial, _ = realisasi_state.get_or_compute(
+                        file_info['file'],
+                        lambda: ingest_realisasi_file(file_info['path'], file_info['name'], realisasi_metas)
+                    )
+                except Exception as e:
+                    print(f"   ❌ Gagal membaca file {file_info['name']}: {e}")
+                    continue
+                
+                if partial is not None:
+                    realisasi_metas.append(partial['meta'])
+                    file_rows = partial['rows']
+                    all_realisasi_rows.extend(file_rows)
+                    processed_files += 1
+                    print(f"   ✅ File '{file_info['name']}' berhasil diproses: {len(file_rows)} baris")
+                else:
+                    print(f"   ⚠️  File '{file_info['name']}' tidak menghasilkan data")
+            
+            realisasi_state.print_summary()
+            
+            # Tanggal input terbaru dari metadata hasil baca di atas
+            print("\n📅 Tanggal input dari file realisasi:")
+            latest_tanggal_input, found_in_files = summarize_latest_input(realisasi_metas)
             
             # Tulis tanggal ke Sheet1 - TAMBAHKAN DI SINI
             if latest_tanggal_input:
@@ -2035,22 +1871,6 @@ def process_erdkk_vs_realisasi_with_date():
             else:
                 print(f"⚠️ Tidak ada tanggal input yang valid ditemukan")
             
-            # Process setiap file Realisasi
-            print("\n🔄 Memproses data Realisasi...")
-            all_realisasi_rows = []
-            processed_files = 0
-            
-            for file_info in realisasi_files:
-                print(f"\n📄 Processing file {processed_files + 1}/{len(realisasi_files)}")
-                file_rows = process_realisasi_file(file_info['path'], file_info['name'])
-                
-                if file_rows:
-                    all_realisasi_rows.extend(file_rows)
-                    processed_files += 1
-                    print(f"   ✅ File '{file_info['name']}' berhasil diproses: {len(file_rows)} baris")
-                else:
-                    print(f"   ⚠️  File '{file_info['name']}' tidak menghasilkan data")
-            
             if all_realisasi_rows:
                 print(f"\n✅ Total file realisasi diproses: {processed_files}/{len(realisasi_files)}")
                 print(f"✅ Total baris data realisasi: {len(all_realisasi_rows)}")
@@ -2061,7 +1881,7 @@ def process_erdkk_vs_realisasi_with_date():
                     print_status_analysis(df_status)
                     
                     # Cek berapa banyak yang ACC PUSAT
-                    acc_pusat_count = df_status['STATUS'].apply(is_status_disetujui_pusat).sum()
+                    acc_pusat_count = ACC_PUSAT_CLASSIFIER.mask(df_status['STATUS']).sum()
                     print(f"\n📊 Status ACC PUSAT: {acc_pusat_count} baris ({acc_pusat_count/len(df_status)*100:.1f}%)")
                 else:
                     print(f"⚠️  Kolom STATUS tidak ditemukan dalam data realisasi")
@@ -2256,7 +2076,7 @@ def process_erdkk_vs_realisasi_with_date():
         duration = end_time - start_time
         
         # Buat summary
-        total_erdkk_rows = len(all_erdkk_rows) if 'all_erdkk_rows' in locals() else 0
+        total_erdkk_rows = len(erdkk_df) if 'erdkk_df' in locals() else 0
         total_realisasi_rows = len(all_realisasi_rows) if 'all_realisasi_rows' in locals() else 0
         
         # Hitung ACC PUSAT
@@ -2264,7 +2084,7 @@ def process_erdkk_vs_realisasi_with_date():
         if 'all_realisasi_rows' in locals() and all_realisasi_rows:
             df_status = pd.DataFrame(all_realisasi_rows)
             if 'STATUS' in df_status.columns:
-                acc_pusat_count = df_status['STATUS'].apply(is_status_disetujui_pusat).sum()
+                acc_pusat_count = ACC_PUSAT_CLASSIFIER.mask(df_status['STATUS']).sum()
         
         # Hitung statistik pupuk
         total_erdkk_urea = erdkk_kec_df['TOTAL_UREA'].sum() if not erdkk_kec_df.empty else 0
@@ -2385,6 +2205,7 @@ if __name__ == "__main__":
     # Tambahkan error handling global
     try:
         success = process_erdkk_vs_realisasi_with_date()
+        SHEETS_LIMITER.print_summary()
         sys.exit(0 if success else 1)
     except KeyboardInterrupt:
         print("\n\n⚠️ Script dihentikan oleh pengguna")
@@ -15,12 +15,8 @@ import os
 import sys
 import pandas as pd
 import numpy as np
-from googleapiclient.discovery import build
-from google.oauth2 import service_account
-from googleapiclient.http import MediaIoBaseDownload
 import io
 import warnings
-warnings.filterwarnings('ignore')
 from datetime import datetime
 import json
 import re
@@ -28,15 +24,21 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import traceback
-import time
+from drive_cache import get_drive_cache, download_files_parallel
+from excel_snapshot import read_excel_cached
 import math
 import glob
+from google_clients import get_credentials, get_drive_service, get_sheets_service
+from rate_limiter import get_rate_limiter
+from chunk_uploader import ChunkUploader, UPLOAD_IN_FLIGHT
 
 # ==============================================
 # KONFIGURASI
 # ==============================================
 FOLDER_ID = "13N5dLdHzAKff6g8RDRiHa7LFyZbdJUCJ"
 SPREADSHEET_ID = "1nrZ1YLMijIrmHA3hJUw5AsdElkTH1oIxt3ux2mbdTn8"
+SHEETS_LIMITER = get_rate_limiter("sheets")  # Laju request Sheets API + retry 429
+UPLOAD_BATCH_SIZE = 5000  # Baris per request values.update
 
 # ==============================================
 # FUNGSI EMAIL
@@ -219,19 +221,7 @@ def authenticate_google():
     """Autentikasi ke Google API dengan service account info di env var"""
     try:
         print("🔐 Memulai autentikasi Google...")
-        creds_json = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS_JSON")
-        if not creds_json:
-            print("❌ GOOGLE_APPLICATION_CREDENTIALS_JSON tidak ditemukan")
-            return None
-
-        credentials_dict = json.loads(creds_json)
-        credentials = service_account.Credentials.from_service_account_info(
-            credentials_dict,
-            scopes=[
-                'https://www.googleapis.com/auth/drive',
-                'https://www.googleapis.com/auth/spreadsheets'
-            ]
-        )
+        credentials = get_credentials()
         print("✅ Autentikasi Google berhasil")
         return credentials
     except Exception as e:
@@ -357,14 +347,14 @@ def extract_luas_column(df, keywords, mt_number=None):
 # FUNGSI PEMROSESAN FILE - VERSI FINAL
 # ==============================================
 
-def extract_files_from_folder(folder_id, service):
-    """Ekstrak file dari Google Drive"""
+def extract_files_from_folder(folder_id, service, credentials=None):
+    """Ekstrak file dari Google Drive (dengan credentials: sekaligus download paralel)"""
     try:
         print("🔍 Mencari file Excel di Google Drive...")
 
         results = service.files().list(
             q=f"'{folder_id}' in parents and trashed = false",
-            fields="files(id, name, mimeType)",
+            fields="files(id, name, mimeType, modifiedTime, md5Checksum, size)",
             pageSize=200
         ).execute()
 
@@ -385,32 +375,37 @@ def extract_files_from_folder(folder_id, service):
         for i, file in enumerate(excel_files, 1):
             print(f"   {i:2d}. {file['name']}")
 
+        # Download semua file sekaligus, isi disimpan di file['content']
+        if credentials is not None and excel_files:
+            print("📥 Download file Excel...")
+            results = download_files_parallel(credentials, [{'file': file} for file in excel_files])
+            for file, result in zip(excel_files, results):
+                if result['error'] is None:
+                    file['content'] = result['content']
+
         return excel_files
 
     except Exception as e:
         print(f"❌ Error mengakses Google Drive: {e}")
         return []
 
-def read_and_process_excel(file_id, drive_service, filename):
+def read_and_process_excel(file_id, drive_service, filename, file_meta=None):
     """Baca dan proses file Excel dengan posisi kolom tetap"""
     try:
         print(f"\n📖 Memproses: {filename}")
         
-        # Download file
-        request = drive_service.files().get_media(fileId=file_id)
-        fh = io.BytesIO()
-        downloader = MediaIoBaseDownload(fh, request)
-
-        while True:
-            status, done = downloader.next_chunk()
-            if done:
-                break
+        # Pakai hasil download paralel jika ada, jika tidak download sekarang
+        if file_meta is None:
+            file_meta = {'id': file_id, 'name': filename}
+        fh = file_meta.pop('content', None)
+        if fh is None:
+            fh = get_drive_cache().fetch_bytes(drive_service, file_meta)
 
         file_content = fh.getvalue()
 
         # Baca file Excel
         try:
-            df = pd.read_excel(io.BytesIO(file_content), dtype=str, na_filter=False)
+            df = read_excel_cached(io.BytesIO(file_content), dtype=str, na_filter=False)
         except Exception as e:
             print(f"   ⚠️ Error membaca: {e}")
             return None
@@ -628,84 +623,85 @@ def read_and_process_excel(file_id, drive_service, filename):
         print(f"   🔍 Traceback: {traceback.format_exc()}")
         return None
 
-def choose_nama_from_group(group):
-    """Pilih nama petani yang paling mungkin benar"""
-    names = group['nama_petani'].astype(str).str.strip()
-    candidates = names[(names != '') & (~names.str.lower().str.contains('penyuluh'))]
-    if not candidates.empty:
-        mode = candidates.mode()
-        if not mode.empty:
-            return mode.iloc[0]
-        else:
-            return candidates.iloc[0]
-    non_empty = names[names != '']
-    if not non_empty.empty:
-        return non_empty.iloc[non_empty.str.len().argmax()]
-    return ''
-
-def format_poktan_details_row(row):
-    """Format detail satu baris poktan menjadi teks"""
-    parts = []
-    
-    poktan = str(row.get('poktan', 'Tidak disebutkan')).strip()
-    desa = str(row.get('desa', '')).strip()
-    kec = str(row.get('kecamatan', '')).strip()
-    luas = float(row.get('luas_tanam', 0.0))
-    
-    if poktan and poktan.lower() not in ['nan', 'tidak disebutkan', '']:
-        parts.append(f"Poktan {poktan} Desa {desa} Kec. {kec},")
-    else:
-        parts.append(f"Poktan (tidak disebutkan) Desa {desa} Kec. {kec},")
-    
-    parts.append(f"Luas Tanam setahun {luas:.2f} Ha,")
-    
-    # Pupuk
-    urea_mt1 = float(row.get('urea_mt1', 0))
-    npk_mt1 = float(row.get('npk_mt1', 0))
-    npk_formula_mt1 = float(row.get('npk_formula_mt1', 0))
-    organik_mt1 = float(row.get('organik_mt1', 0))
-    
-    urea_mt2 = float(row.get('urea_mt2', 0))
-    npk_mt2 = float(row.get('npk_mt2', 0))
-    npk_formula_mt2 = float(row.get('npk_formula_mt2', 0))
-    organik_mt2 = float(row.get('organik_mt2', 0))
-    
-    urea_mt3 = float(row.get('urea_mt3', 0))
-    npk_mt3 = float(row.get('npk_mt3', 0))
-    npk_formula_mt3 = float(row.get('npk_formula_mt3', 0))
-    organik_mt3 = float(row.get('organik_mt3', 0))
-    
-    if urea_mt1 > 0 or npk_mt1 > 0 or npk_formula_mt1 > 0 or organik_mt1 > 0:
-        mt1 = f"*. Urea MT1 {urea_mt1:.0f} kg, NPK MT1 {npk_mt1:.0f} kg, NPK Formula MT1 {npk_formula_mt1:.0f} kg, Organik MT1 {organik_mt1:.0f} kg,"
-        parts.append(mt1)
-    
-    if urea_mt2 > 0 or npk_mt2 > 0 or npk_formula_mt2 > 0 or organik_mt2 > 0:
-        mt2 = f"*. Urea MT2 {urea_mt2:.0f} kg, NPK MT2 {npk_mt2:.0f} kg, NPK Formula MT2 {npk_formula_mt2:.0f} kg, Organik MT2 {organik_mt2:.0f} kg,"
-        parts.append(mt2)
-    
-    if urea_mt3 > 0 or npk_mt3 > 0 or npk_formula_mt3 > 0 or organik_mt3 > 0:
-        mt3 = f"*. Urea MT3 {urea_mt3:.0f} kg, NPK MT3 {npk_mt3:.0f} kg, NPK Formula MT3 {npk_formula_mt3:.0f} kg, Organik MT3 {organik_mt3:.0f} kg,"
-        parts.append(mt3)
-    
+def choose_nama_per_nik(all_data, nik_codes, n_niks):
+    """
+    Pilih nama petani yang paling mungkin benar untuk setiap NIK sekaligus:
+    nama terbanyak (bukan kosong / bukan 'penyuluh', seri -> urutan abjad
+    terkecil, sama seperti mode()); jika tidak ada, nama terpanjang.
+    """
+    names = all_data['nama_petani'].astype(str).str.strip()
+    non_empty = (names != '').to_numpy()
+    candidate = non_empty & ~names.str.lower().str.contains('penyuluh').to_numpy()
+    chosen = np.full(n_niks, '', dtype=object)
+
+    # Fallback: nama terpanjang (baris pertama jika sama panjang)
+    fallback = pd.DataFrame({'code': nik_codes[non_empty], 'name': names[non_empty].to_numpy(),
+                             'length': names[non_empty].str.len().to_numpy()})
+    fallback = fallback.sort_values(['code', 'length'], ascending=[True, False]).drop_duplicates('code')
+    chosen[fallback['code'].to_numpy()] = fallback['name'].to_numpy()
+
+    # Nama terbanyak di antara kandidat
+    counts = (pd.DataFrame({'code': nik_codes[candidate], 'name': names[candidate].to_numpy()})
+              .groupby(['code', 'name']).size().reset_index(name='count'))
+    counts = counts.sort_values(['code', 'count'], ascending=[True, False]).drop_duplicates('code')
+    chosen[counts['code'].to_numpy()] = counts['name'].to_numpy()
+    return chosen
+
+def format_unique(values, spec):
+    """Format angka dengan format spec Python, sekali per nilai unik"""
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    formatted = np.array([format(value, spec) for value in uniques.tolist()], dtype=object)
+    return formatted[codes]
+
+def dedup_komoditas(kom_raw):
+    """Teks komoditas unik (tanpa membedakan huruf besar/kecil) dari satu nilai mentah"""
+    kom = str(kom_raw).strip()
+    if not kom or kom.lower() == 'nan':
+        return ''
+    kom_unique = []
+    seen = set()
+    for k in re.split(r'[;,/]+', kom):
+        k_clean = k.strip()
+        if k_clean and k_clean.lower() not in seen:
+            seen.add(k_clean.lower())
+            kom_unique.append(k_clean)
+    return ', '.join(kom_unique)
+
+def is_filled_text(series):
+    """Teks yang terisi (bukan kosong / 'nan' / 'tidak disebutkan')"""
+    return ~series.str.lower().isin(['nan', 'tidak disebutkan', '']).to_numpy()
+
+def format_poktan_details(all_data):
+    """Format detail setiap baris poktan menjadi teks, semua baris sekaligus"""
+    poktan = all_data['poktan'].astype(str).str.strip()
+    desa = all_data['desa'].astype(str).str.strip().to_numpy(dtype=object)
+    kec = all_data['kecamatan'].astype(str).str.strip().to_numpy(dtype=object)
+    kios = all_data['kios'].astype(str).str.strip()
+
+    poktan_label = np.where(is_filled_text(poktan), poktan.to_numpy(dtype=object), "(tidak disebutkan)")
+    text = ("Poktan " + poktan_label + " Desa " + desa + " Kec. " + kec + ",\n"
+            + "Luas Tanam setahun " + format_unique(all_data['luas_tanam'].astype(float).to_numpy(), '.2f') + " Ha,")
+
+    # Pupuk per MT, hanya jika ada pupuk di MT tersebut
+    for mt in ['mt1', 'mt2', 'mt3']:
+        values = {key: all_data[f'{key}_{mt}'].astype(float).to_numpy() for key in ['urea', 'npk', 'npk_formula', 'organik']}
+        has_pupuk = (values['urea'] > 0) | (values['npk'] > 0) | (values['npk_formula'] > 0) | (values['organik'] > 0)
+        label = mt.upper()
+        mt_text = (f"\n*. Urea {label} " + format_unique(values['urea'], '.0f')
+                   + f" kg, NPK {label} " + format_unique(values['npk'], '.0f')
+                   + f" kg, NPK Formula {label} " + format_unique(values['npk_formula'], '.0f')
+                   + f" kg, Organik {label} " + format_unique(values['organik'], '.0f') + " kg,")
+        text = text + np.where(has_pupuk, mt_text, "")
+
     # Kios
-    kios = str(row.get('kios', '')).strip()
-    if kios and kios.lower() not in ['nan', 'tidak disebutkan', '']:
-        parts.append(f'Kios layanan {kios}, Desa {desa}')
-    
-    # Komoditas
-    kom = str(row.get('komoditas_raw', '')).strip()
-    if kom and kom.lower() not in ['nan', '']:
-        kom_list = re.split(r'[;,/]+', kom)
-        kom_unique = []
-        for k in kom_list:
-            k_clean = k.strip()
-            if k_clean and k_clean.lower() not in [x.lower() for x in kom_unique]:
-                kom_unique.append(k_clean)
-        
-        if kom_unique:
-            parts.append(f"Komoditas {', '.join(kom_unique)}")
-    
-    return "\n".join(parts)
+    kios_text = "\nKios layanan " + kios.to_numpy(dtype=object) + ", Desa " + desa
+    text = text + np.where(is_filled_text(kios), kios_text, "")
+
+    # Komoditas (dedup sekali per nilai mentah yang unik)
+    kom_codes, kom_uniques = pd.factorize(all_data['komoditas_raw'].astype(str))
+    kom_values = np.array([dedup_komoditas(kom) for kom in kom_uniques] + [''], dtype=object)[kom_codes]
+    kom_text = np.where(kom_values != '', "\nKomoditas " + kom_values, "")
+    return text + kom_text
 
 def pivot_and_format_data(df_list):
     """Pivot dan format data; hasil hanya 3 kolom: nik, nama_petani, data"""
@@ -723,40 +719,22 @@ def pivot_and_format_data(df_list):
     print(f"🏠 Desa unique: {all_data['desa'].nunique()}")
     print(f"🗺️  Kecamatan unique: {all_data['kecamatan'].nunique()}")
 
-    result_rows = []
-    grouped = all_data.groupby('nik', sort=False)
-    total_groups = len(grouped)
-
-    for i, (nik, group) in enumerate(grouped, 1):
-        if i % 50 == 0 or i == 1 or i == total_groups:
-            print(f"   Memproses NIK ke-{i:,}/{total_groups:,}...")
-
-        nama_petani = choose_nama_from_group(group)
-
-        # buat detail per poktan
-        poktan_details = []
-        for _, row in group.iterrows():
-            rowd = row.to_dict()
-            poktan_details.append(format_poktan_details_row(rowd))
-
-        # gabungkan dengan penomoran
-        formatted_poktans = [f"{j+1}. {d}" for j,d in enumerate(poktan_details)]
+    # NIK diurutkan berdasarkan kemunculan pertama (seperti groupby sort=False)
+    nik_codes, niks = pd.factorize(all_data['nik'])
+    print(f"   Memformat {len(all_data):,} baris untuk {len(niks):,} NIK...")
 
-        if poktan_details:
-            if len(poktan_details) == 1:
-                data_field = f"Nama {nama_petani} terdaftar di:\n    {formatted_poktans[0]}"
-            else:
-                data_field = f"Nama {nama_petani} terdaftar di:\n    " + "\n\n".join(formatted_poktans)
-        else:
-            data_field = f"Nama {nama_petani} terdaftar di: (tidak ada data)"
+    nama_petani = choose_nama_per_nik(all_data, nik_codes, len(niks))
 
-        result_rows.append({
-            'nik': nik,
-            'nama_petani': nama_petani,
-            'data': data_field
-        })
+    # Detail per poktan dengan penomoran per NIK, lalu digabung per NIK
+    nomor = pd.Series(nik_codes).groupby(nik_codes).cumcount() + 1
+    poktan_details = nomor.astype(str).to_numpy(dtype=object) + ". " + format_poktan_details(all_data)
+    joined = pd.Series(poktan_details).groupby(nik_codes, sort=False).agg("\n\n".join)
 
-    result_df = pd.DataFrame(result_rows, columns=['nik','nama_petani','data'])
+    result_df = pd.DataFrame({
+        'nik': np.asarray(niks, dtype=object),
+        'nama_petani': nama_petani,
+        'data': "Nama " + nama_petani + " terdaftar di:\n    " + joined.to_numpy(dtype=object)
+    }, columns=['nik','nama_petani','data'])
 
     print("\n" + "="*60)
     print("✅ PIVOT SELESAI")
@@ -779,9 +757,9 @@ def expand_google_sheet(sheets_service, spreadsheet_id, required_rows, required_
         print(f"   • Required columns: {required_cols}")
         
         # 1. Get current sheet properties
-        spreadsheet = sheets_service.spreadsheets().get(
+        spreadsheet = SHEETS_LIMITER.call(sheets_service.spreadsheets().get(
             spreadsheetId=spreadsheet_id
-        ).execute()
+        ).execute)
         
         sheets = spreadsheet.get('sheets', [])
         if not sheets:
@@ -831,10 +809,10 @@ def expand_google_sheet(sheets_service, spreadsheet_id, required_rows, required_
         # 4. Execute batch update
         if requests:
             body = {"requests": requests}
-            response = sheets_service.spreadsheets().batchUpdate(
+            response = SHEETS_LIMITER.call(sheets_service.spreadsheets().batchUpdate(
                 spreadsheetId=spreadsheet_id,
                 body=body
-            ).execute()
+            ).execute)
             
             print(f"   ✅ Grid expanded successfully")
             print(f"   • New total rows: {current_rows + add_rows:,}")
@@ -847,12 +825,12 @@ def expand_google_sheet(sheets_service, spreadsheet_id, required_rows, required_
         return False
 
 def upload_large_dataset(df, spreadsheet_id, credentials):
-    """Upload dataset besar ke Google Sheets dengan chunking yang optimal"""
+    """Upload dataset besar ke Google Sheets: beberapa chunk dikirim bersamaan, laju diatur rate limiter"""
     try:
         print("\n📤 UPLOADING LARGE DATASET TO GOOGLE SHEETS...")
         print(f"   📊 Data size: {len(df):,} rows, {len(df.columns)} columns")
         
-        sheets_service = build('sheets', 'v4', credentials=credentials)
+        sheets_service = get_sheets_service(credentials)
         
         # 1. Expand sheet jika diperlukan
         required_rows = len(df) + 1  # +1 untuk header
@@ -864,12 +842,11 @@ def upload_large_dataset(df, spreadsheet_id, credentials):
         # 2. Clear existing data
         print("   🧹 Clearing existing data...")
         try:
-            sheets_service.spreadsheets().values().clear(
+            SHEETS_LIMITER.call(sheets_service.spreadsheets().values().clear(
                 spreadsheetId=spreadsheet_id,
                 range="Sheet1!A:Z"
-            ).execute()
+            ).execute)
             print("   ✅ Sheet cleared successfully")
-            time.sleep(1)
         except Exception as e:
             print(f"   ⚠️ Warning while clearing sheet: {e}")
         
@@ -878,7 +855,7 @@ def upload_large_dataset(df, spreadsheet_id, credentials):
         values = df.fillna('').values.tolist()
         
         # 4. Upload dengan batch yang lebih kecil untuk reliability
-        batch_size = 5000  # Ukuran batch optimal
+        batch_size = UPLOAD_BATCH_SIZE
         total_rows = len(values)
         total_batches = math.ceil(total_rows / batch_size)
         
@@ -886,100 +863,41 @@ def upload_large_dataset(df, spreadsheet_id, credentials):
         print(f"   • Total data rows: {total_rows:,}")
         print(f"   • Batch size: {batch_size:,}")
         print(f"   • Number of batches: {total_batches}")
-        print(f"   • Estimated time: {total_batches * 2} seconds")
+        print(f"   • Concurrent requests: {UPLOAD_IN_FLIGHT}")
         
         # 5. Upload header terlebih dahulu
         print("\n📋 Uploading headers...")
         try:
-            sheets_service.spreadsheets().values().update(
+            SHEETS_LIMITER.call(sheets_service.spreadsheets().values().update(
                 spreadsheetId=spreadsheet_id,
                 range="Sheet1!A1",
                 valueInputOption="USER_ENTERED",
                 body={"values": [headers]}
-            ).execute()
+            ).execute)
             print("   ✅ Headers uploaded")
-            time.sleep(1)
         except Exception as e:
             print(f"   ⚠️ Error uploading headers: {e}")
             return False
         
-        # 6. Upload data per batch
-        successful_batches = 0
-        failed_batches = []
+        # 6. Upload data per batch (baris mulai dari 2 karena header di row 1)
+        def send_batch(start_row, batch_data):
+            service = get_sheets_service(credentials)
+            return service.spreadsheets().values().update(
+                spreadsheetId=spreadsheet_id,
+                range=f"Sheet1!A{start_row}",
+                valueInputOption="USER_ENTERED",
+                body={"values": batch_data, "majorDimension": "ROWS"}
+            ).execute()
         
-        for batch_num in range(total_batches):
-            start_idx = batch_num * batch_size
-            end_idx = min(start_idx + batch_size, total_rows)
-            batch_data = values[start_idx:end_idx]
-            batch_size_actual = len(batch_data)
-            
-            # Range untuk batch ini (baris mulai dari 2 karena header di row 1)
-            range_start = start_idx + 2
-            range_name = f"Sheet1!A{range_start}"
-            
-            max_retries = 3
-            batch_success = False
-            
-            for attempt in range(max_retries):
-                try:
-                    if attempt > 0:
-                        print(f"   🔄 Retry {attempt} for batch {batch_num + 1}...")
-                        time.sleep(2 ** attempt)  # Exponential backoff
-                    
-                    print(f"   📤 Batch {batch_num + 1}/{total_batches}: rows {start_idx + 1:,}-{end_idx:,} ({batch_size_actual:,} rows)...")
-                    
-                    body = {
-                        "values": batch_data,
-                        "majorDimension": "ROWS"
-                    }
-                    
-                    request = sheets_service.spreadsheets().values().update(
-                        spreadsheetId=spreadsheet_id,
-                        range=range_name,
-                        valueInputOption="USER_ENTERED",
-                        body=body
-                    )
-                    response = request.execute()
-                    
-                    updated_cells = response.get('updatedCells', 0)
-                    print(f"   ✅ Batch {batch_num + 1} uploaded ({updated_cells:,} cells updated)")
-                    
-                    successful_batches += 1
-                    batch_success = True
-                    
-                    # Delay antar batch untuk menghindari rate limit
-                    if batch_num < total_batches - 1:
-                        delay = 0.5  # 500ms delay
-                        time.sleep(delay)
-                    
-                    break  # Break retry loop jika sukses
-                    
-                except Exception as e:
-                    error_msg = str(e)
-                    if "exceeds grid limits" in error_msg:
-                        print(f"   ❌ GRID LIMIT ERROR: Need to expand sheet more")
-                        # Coba expand sheet lagi
-                        additional_rows_needed = start_idx + batch_size_actual + 1000
-                        expand_google_sheet(sheets_service, spreadsheet_id, additional_rows_needed)
-                        time.sleep(2)
-                        continue  # Coba lagi
-                    
-                    print(f"   ⚠️ Attempt {attempt + 1} failed: {error_msg[:100]}...")
-                    
-                    if attempt < max_retries - 1:
-                        wait_time = 2 * (attempt + 1)
-                        print(f"   ⏳ Waiting {wait_time} seconds before retry...")
-                        time.sleep(wait_time)
-                    else:
-                        print(f"   ❌ Batch {batch_num + 1} failed after all retries")
-                        failed_batches.append({
-                            'batch': batch_num + 1,
-                            'rows': f"{start_idx + 1}-{end_idx}",
-                            'error': error_msg[:200]
-                        })
-            
-            if not batch_success:
-                print(f"   ⚠️ Moving to next batch...")
+        def handle_batch_error(batch, error):
+            if "exceeds grid limits" in str(error):
+                print(f"   ❌ GRID LIMIT ERROR: Need to expand sheet more")
+                expand_google_sheet(sheets_service, spreadsheet_id, batch['start_row'] + batch_size + 1000)
+        
+        uploader = ChunkUploader(send_batch, limiter=SHEETS_LIMITER, on_error=handle_batch_error, label="Batch")
+        result = uploader.upload(values, batch_size, first_row=2)
+        successful_batches = result['successful']
+        failed_batches = result['failed']
         
         # 7. Report upload results
         print(f"\n📊 UPLOAD COMPLETE REPORT:")
@@ -990,18 +908,19 @@ def upload_large_dataset(df, spreadsheet_id, credentials):
         if failed_batches:
             print(f"   ❌ FAILED BATCHES:")
             for fb in failed_batches:
-                print(f"     - Batch {fb['batch']}: rows {fb['rows']}")
+                print(f"     - Batch {fb['chunk']}: {fb['rows']}")
                 print(f"       Error: {fb['error']}")
         
-        success_rate = (successful_batches / total_batches) * 100
+        success_rate = (successful_batches / total_batches) * 100 if total_batches else 100.0
         print(f"   📈 Success rate: {success_rate:.1f}%")
         
         if successful_batches > 0:
-            estimated_uploaded_rows = successful_batches * batch_size
+            estimated_uploaded_rows = min(successful_batches * batch_size, total_rows)
             if successful_batches == total_batches:
                 estimated_uploaded_rows = total_rows
             
             print(f"   ✅ Estimated uploaded rows: {estimated_uploaded_rows:,}/{total_rows:,}")
+            print(f"   ✅ Complete without gaps: {result['complete_rows']:,}/{total_rows:,}")
             return True
         else:
             print(f"   ❌ No batches uploaded successfully")
@@ -1164,6 +1083,7 @@ def cleanup_temp_files():
 
 def main():
     """Fungsi utama dengan posisi kolom tetap"""
+    warnings.filterwarnings('ignore')
     print("\n" + "="*80)
     print("🚀 ERDKK WA CENTER - FINAL VERSION (Posisi Kolom Tetap)")
     print("="*80)
@@ -1196,12 +1116,12 @@ def main():
             send_error_email(error_msg)
             sys.exit(1)
         
-        drive_service = build('drive', 'v3', credentials=credentials)
-        sheets_service = build('sheets', 'v4', credentials=credentials)
+        drive_service = get_drive_service(credentials)
+        sheets_service = get_sheets_service(credentials)
         
         # 3. Ambil file dari Google Drive
         print("\n📂 GETTING FILES FROM GOOGLE DRIVE...")
-        files = extract_files_from_folder(FOLDER_ID, drive_service)
+        files = extract_files_from_folder(FOLDER_ID, drive_service, credentials)
         if not files:
             error_msg = "No Excel files found"
             send_error_email(error_msg)
@@ -1215,7 +1135,7 @@ def main():
         print(f"\n📁 PROCESSING {len(files)} FILES...")
         for i, file in enumerate(files, 1):
             print(f"\n[{i}/{len(files)}] Processing: {file['name']}")
-            df = read_and_process_excel(file['id'], drive_service, file['name'])
+            df = read_and_process_excel(file['id'], drive_service, file['name'], file_meta=file)
             
             if df is not None and not df.empty:
                 all_data.append(df)
@@ -1383,3 +1303,4 @@ def main():
 
 if __name__ == "__main__":
     main()
+    SHEETS_LIMITER.print_summary()
@@ -0,0 +1,184 @@
+"""
+excel_reader.py
+Lapisan pembaca xlsx dengan engine cepat dan proyeksi kolom.
+
+pd.read_excel dengan openpyxl adalah biaya CPU terbesar saat memproses
+file realisasi dan ERDKK. Modul ini:
+- memakai engine calamine (python-calamine, berbasis Rust) jika terpasang.
+  Untuk pandas < 2.2 yang belum punya engine calamine, reader-nya
+  didaftarkan di sini dengan hasil sel yang sama seperti openpyxl.
+  Pendaftaran memakai API internal pandas (ExcelFile._engines,
+  BaseExcelReader), jadi hanya aktif untuk versi pandas yang sudah diuji
+  (TESTED_PANDAS_VERSIONS, sama dengan pin di requirements.txt); di luar
+  itu otomatis kembali ke openpyxl;
+- mendukung proyeksi kolom berdasarkan kata kunci nama kolom, sehingga
+  hanya kolom yang dipakai script (NIK/KTP, pupuk, STATUS, TGL) yang
+  dibangun menjadi DataFrame.
+
+Konfigurasi lewat environment variable:
+- EXCEL_READER_ENGINE : "auto" (default, calamine jika ada), "calamine", atau "openpyxl"
+
+Lokasi: verval-pupuk2/scripts/excel_reader.py
+"""
+
+import os
+import re
+from datetime import date, datetime, time, timedelta
+import pandas as pd
+
+# ============================
+# KONFIGURASI
+# ============================
+EXCEL_READER_ENGINE = os.getenv("EXCEL_READER_ENGINE", "auto").strip().lower()
+
+# Versi pandas (major, minor) yang sudah diuji dengan reader calamine_compat
+TESTED_PANDAS_VERSIONS = {(2, 1)}
+
+_calamine_ready = None
+
+# ============================
+# ENGINE CALAMINE
+# ============================
+def _convert_calamine_cell(value):
+    """Samakan nilai sel calamine dengan hasil reader openpyxl di pandas"""
+    if isinstance(value, float):
+        as_int = int(value)
+        if as_int == value:
+            return as_int
+        return value
+    if isinstance(value, (datetime, date)):
+        return pd.Timestamp(value)
+    if isinstance(value, timedelta):
+        return pd.Timedelta(value)
+    if isinstance(value, time):
+        return value
+    return value
+
+def _build_calamine_reader():
+    """Reader calamine untuk pandas yang belum menyediakannya (pandas < 2.2)"""
+    from pandas.io.excel._base import BaseExcelReader
+    from python_calamine import CalamineWorkbook, load_workbook
+
+    class CalamineReader(BaseExcelReader):
+        @property
+        def _workbook_class(self):
+            return CalamineWorkbook
+
+        def load_workbook(self, filepath_or_buffer, engine_kwargs):
+            return load_workbook(filepath_or_buffer, **engine_kwargs)
+
+        @property
+        def sheet_names(self):
+            return self.book.sheet_names
+
+        def get_sheet_by_name(self, name):
+            self.raise_if_bad_sheet_by_name(name)
+            return self.book.get_sheet_by_name(name)
+
+        def get_sheet_by_index(self, index):
+            self.raise_if_bad_sheet_by_index(index)
+            return self.book.get_sheet_by_index(index)
+
+        def get_sheet_data(self, sheet, file_rows_needed=None):
+            rows = sheet.to_python(skip_empty_area=False, nrows=file_rows_needed)
+
+            # Sama seperti reader openpyxl: buang sel/baris kosong di akhir lalu ratakan lebar
+            data = []
+            last_row_with_data = -1
+            for row_number, row in enumerate(rows):
+                converted_row = [_convert_calamine_cell(cell) for cell in row]
+                while converted_row and converted_row[-1] == "":
+                    converted_row.pop()
+                if converted_row:
+                    last_row_with_data = row_number
+                data.append(converted_row)
+
+            data = data[: last_row_with_data + 1]
+
+            if data:
+                max_width = max(len(data_row) for data_row in data)
+                data = [data_row + [""] * (max_width - len(data_row)) for data_row in data]
+
+            return data
+
+    return CalamineReader
+
+def calamine_available():
+    """Cek (sekali) apakah engine calamine bisa dipakai pandas"""
+    global _calamine_ready
+    if _calamine_ready is not None:
+        return _calamine_ready
+
+    try:
+        import python_calamine  # noqa: F401
+    except ImportError:
+        _calamine_ready = False
+        return False
+
+    pandas_version = tuple(int(part) for part in re.findall(r"\d+", pd.__version__)[:2])
+    if pandas_version not in TESTED_PANDAS_VERSIONS:
+        print(f"⚠️  pandas {pd.__version__} belum diuji dengan engine calamine, memakai openpyxl")
+        _calamine_ready = False
+        return False
+
+    try:
+        pd.ExcelFile._engines["calamine_compat"] = _build_calamine_reader()
+        _calamine_ready = True
+    except Exception as e:
+        print(f"⚠️  Engine calamine tidak bisa didaftarkan: {e}")
+        _calamine_ready = False
+    return _calamine_ready
+
+def resolve_engine(requested=None):
+    """Tentukan engine pandas yang dipakai (None = default pandas/openpyxl)"""
+    choice = (requested or EXCEL_READER_ENGINE or "auto").lower()
+    if choice in ("calamine", "auto") and calamine_available():
+        return "calamine_compat"
+    if choice == "calamine":
+        print("⚠️  python-calamine tidak terpasang, memakai openpyxl")
+    return None
+
+# ============================
+# PROYEKSI KOLOM
+# ============================
+def _normalize_column(col):
+    return re.sub(r'\s+', ' ', str(col)).strip().upper()
+
+def keyword_usecols(keywords):
+    """usecols untuk pd.read_excel: ambil kolom yang namanya memuat salah satu kata kunci"""
+    keywords = [_normalize_column(keyword) for keyword in keywords]
+
+    def use_column(col):
+        name = _normalize_column(col)
+        return any(keyword in name for keyword in keywords)
+
+    return use_column
+
+# ============================
+# FUNGSI UTAMA
+# ============================
+def read_excel_fast(source, usecols_keywords=None, **read_kwargs):
+    """
+    pd.read_excel dengan engine tercepat yang tersedia. usecols_keywords
+    (opsional) membatasi kolom yang dibaca berdasarkan kata kunci nama kolom.
+    Jika calamine gagal membaca file, otomatis diulang dengan openpyxl.
+    """
+    if usecols_keywords:
+        read_kwargs['usecols'] = keyword_usecols(usecols_keywords)
+
+    engine = read_kwargs.pop('engine', None) or resolve_engine()
+    if engine != "calamine_compat":
+        return pd.read_excel(source, engine=engine, **read_kwargs)
+
+    try:
+        return pd.read_excel(source, engine=engine, **read_kwargs)
+    except ValueError as e:
+        if "not found" in str(e) or "invalid" in str(e):
+            raise
+        print(f"⚠️  calamine gagal ({e}), mencoba openpyxl...")
+    except Exception as e:
+        print(f"⚠️  calamine gagal ({e}), mencoba openpyxl...")
+
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return pd.read_excel(source, **read_kwargs)
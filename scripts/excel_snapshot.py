@@ -0,0 +1,345 @@
+"""
+excel_snapshot.py
+Snapshot kolumnar (Parquet) dari file Excel realisasi dan ERDKK.
+
+Parsing xlsx adalah langkah paling lambat di semua script. Modul ini
+menyimpan hasil pd.read_excel sekali per isi file (hash MD5 isi file +
+parameter baca) dalam format Parquet, sehingga pembacaan berikutnya - di
+script mana pun - cukup memuat snapshot.
+
+- read_excel_cached()  : pengganti pd.read_excel, hasilnya identik
+- ingest_excel_file()  : baca workbook sekali, sekaligus metadata per file
+                         (sheet, jumlah baris, TGL INPUT terbaru)
+- enable_memory_cache(): hasil baca juga disimpan di memori proses, sehingga
+                         beberapa job dalam satu proses (orchestrator.py)
+                         memakai DataFrame yang sama tanpa memuat ulang
+
+Jika pyarrow tidak tersedia, snapshot disimpan sebagai pickle (tetap
+tanpa parsing Excel ulang).
+
+Di GitHub Actions folder snapshot dipulihkan antar run lewat actions/cache
+(key excel-snapshot-*), sehingga file yang tidak berubah tidak di-parse ulang.
+
+Konfigurasi lewat environment variable:
+- EXCEL_SNAPSHOT_DIR     : lokasi snapshot (default ~/.cache/verval-pupuk2/snapshot)
+- EXCEL_SNAPSHOT_ENABLED : "0" untuk mematikan snapshot
+- EXCEL_SNAPSHOT_MAX_AGE_DAYS : snapshot yang tidak dipakai selama ini dihapus (default 30)
+
+Lokasi: verval-pupuk2/scripts/excel_snapshot.py
+"""
+
+import os
+import io
+import re
+import json
+import time
+import hashlib
+import threading
+import pandas as pd
+import numpy as np
+from excel_reader import read_excel_fast
+
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except Exception:  # tidak terpasang / tidak cocok dengan versi numpy
+    PARQUET_AVAILABLE = False
+
+# ============================
+# KONFIGURASI
+# ============================
+EXCEL_SNAPSHOT_DIR = os.getenv(
+    "EXCEL_SNAPSHOT_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "verval-pupuk2", "snapshot")
+)
+EXCEL_SNAPSHOT_ENABLED = os.getenv("EXCEL_SNAPSHOT_ENABLED", "1").strip().lower() not in ("0", "false", "no")
+EXCEL_SNAPSHOT_MAX_AGE_DAYS = float(os.getenv("EXCEL_SNAPSHOT_MAX_AGE_DAYS", "30"))
+
+# Naikkan jika format snapshot berubah agar snapshot lama tidak dipakai
+SNAPSHOT_VERSION = 1
+
+TGL_INPUT_KEYWORDS = ['TGL INPUT', 'TANGGAL INPUT']
+
+# Cache DataFrame di memori proses (None = tidak aktif, lihat enable_memory_cache)
+_memory_frames = None
+_memory_locks = {}
+_memory_lock = threading.Lock()
+_memory_stats = {"hit": 0, "miss": 0}
+
+_pruned = False
+
+class SnapshotSheetNotFound(ValueError):
+    """Sheet yang diminta sudah tercatat tidak ada di file ini"""
+
+# ============================
+# FUNGSI UTILITY
+# ============================
+def _source_digest(source):
+    """Hash MD5 isi file (path, bytes, atau file object)"""
+    md5 = hashlib.md5()
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                md5.update(chunk)
+    elif isinstance(source, (bytes, bytearray)):
+        md5.update(source)
+    elif isinstance(source, io.BytesIO):
+        md5.update(source.getbuffer())
+    else:
+        return None
+    return md5.hexdigest()
+
+def _kwargs_digest(read_kwargs):
+    """Hash parameter pd.read_excel (sheet_name, dtype, header, ...)"""
+    normalized = {}
+    for key, value in sorted(read_kwargs.items()):
+        if isinstance(value, type):
+            value = value.__name__
+        normalized[key] = value
+    raw = json.dumps(normalized, sort_keys=True, default=str)
+    return hashlib.md5(f"{SNAPSHOT_VERSION}:{raw}".encode("utf-8")).hexdigest()[:16]
+
+def _snapshot_base(digest, read_kwargs):
+    return os.path.join(EXCEL_SNAPSHOT_DIR, f"{digest}-{_kwargs_digest(read_kwargs)}")
+
+def _prune_old_snapshots():
+    """Hapus snapshot yang sudah lama tidak dipakai (sekali per proses)"""
+    global _pruned
+    if _pruned:
+        return
+    _pruned = True
+
+    cutoff = time.time() - EXCEL_SNAPSHOT_MAX_AGE_DAYS * 86400
+    try:
+        for name in os.listdir(EXCEL_SNAPSHOT_DIR):
+            path = os.path.join(EXCEL_SNAPSHOT_DIR, name)
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+    except OSError:
+        pass
+
+def _restore_missing(df):
+    """Parquet menyimpan NaN di kolom object sebagai None: kembalikan ke NaN"""
+    for col in df.columns:
+        if df[col].dtype == object:
+            mask = df[col].isna()
+            if mask.any():
+                df[col] = df[col].where(~mask, np.nan)
+    return df
+
+def _load_snapshot(base):
+    """Muat snapshot jika ada. Return (df, ditemukan)"""
+    parquet_path = f"{base}.parquet"
+    pickle_path = f"{base}.pkl"
+    missing_path = f"{base}.missing"
+
+    if os.path.exists(missing_path):
+        with open(missing_path, "r", encoding="utf-8") as f:
+            raise SnapshotSheetNotFound(f.read())
+
+    if PARQUET_AVAILABLE and os.path.exists(parquet_path):
+        df = pd.read_parquet(parquet_path)
+        os.utime(parquet_path)
+        return _restore_missing(df), True
+
+    if os.path.exists(pickle_path):
+        df = pd.read_pickle(pickle_path)
+        os.utime(pickle_path)
+        return df, True
+
+    return None, False
+
+def _save_snapshot(base, df):
+    """Simpan snapshot: Parquet jika bisa, pickle jika tidak (mis. nama kolom bukan string)"""
+    os.makedirs(EXCEL_SNAPSHOT_DIR, exist_ok=True)
+    _prune_old_snapshots()
+
+    columns_ok = all(isinstance(col, str) for col in df.columns) and df.columns.is_unique
+    if PARQUET_AVAILABLE and columns_ok:
+        tmp_path = f"{base}.parquet.tmp-{os.getpid()}"
+        try:
+            df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, f"{base}.parquet")
+            return
+        except Exception:
+            # Kolom dengan tipe campuran tidak bisa ditulis ke Parquet
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    tmp_path = f"{base}.pkl.tmp-{os.getpid()}"
+    df.to_pickle(tmp_path)
+    os.replace(tmp_path, f"{base}.pkl")
+
+# ============================
+# CACHE MEMORI PROSES
+# ============================
+def enable_memory_cache():
+    """Simpan hasil read_excel_cached di memori proses (dipakai bersama antar job/thread)"""
+    global _memory_frames
+    with _memory_lock:
+        if _memory_frames is None:
+            _memory_frames = {}
+
+def clear_memory_cache():
+    """Matikan dan kosongkan cache memori"""
+    global _memory_frames
+    with _memory_lock:
+        _memory_frames = None
+        _memory_locks.clear()
+
+def print_memory_cache_summary():
+    if _memory_frames is None:
+        return
+    print(f"🧠 Cache memori Excel: {_memory_stats['hit']} dipakai ulang, "
+          f"{_memory_stats['miss']} dibaca, {len(_memory_frames)} DataFrame tersimpan")
+
+def _memory_key_lock(base):
+    """Satu lock per snapshot: thread lain menunggu pembacaan yang sedang berjalan"""
+    with _memory_lock:
+        return _memory_locks.setdefault(base, threading.Lock())
+
+# ============================
+# FUNGSI UTAMA
+# ============================
+def read_excel_cached(source, usecols_keywords=None, **read_kwargs):
+    """
+    Pengganti pd.read_excel dengan snapshot per isi file.
+    Hasil identik dengan pd.read_excel(source, **read_kwargs); `usecols_keywords`
+    membatasi kolom yang di-parse dari Excel (lihat excel_reader).
+    """
+    digest = _source_digest(source) if EXCEL_SNAPSHOT_ENABLED else None
+    if digest is None:
+        return read_excel_fast(source, usecols_keywords=usecols_keywords, **read_kwargs)
+
+    key_kwargs = dict(read_kwargs)
+    if usecols_keywords:
+        key_kwargs['usecols_keywords'] = sorted(usecols_keywords)
+    base = _snapshot_base(digest, key_kwargs)
+    frames = _memory_frames
+    if frames is None:
+        return _read_snapshot_or_excel(source, base, usecols_keywords, read_kwargs)
+
+    # Cache memori: DataFrame lengkap disimpan, setiap pemanggil mendapat salinan
+    with _memory_key_lock(base):
+        df = frames.get(base)
+        outcome = "hit"
+        if df is None:
+            df = _read_snapshot_or_excel(source, base, usecols_keywords, read_kwargs)
+            if not isinstance(df, pd.DataFrame):
+                return df
+            frames[base] = df
+            outcome = "miss"
+    with _memory_lock:
+        _memory_stats[outcome] += 1
+    return df.copy()
+
+def _read_snapshot_or_excel(source, base, usecols_keywords, read_kwargs):
+    """Muat snapshot `base` jika ada, jika tidak parse Excel lalu simpan snapshot"""
+    try:
+        df, found = _load_snapshot(base)
+        if found:
+            return df
+    except SnapshotSheetNotFound:
+        raise
+    except Exception as e:
+        print(f"⚠️  Snapshot rusak, baca ulang Excel: {e}")
+
+    if isinstance(source, io.BytesIO):
+        source.seek(0)
+
+    try:
+        df = read_excel_fast(source, usecols_keywords=usecols_keywords, **read_kwargs)
+    except ValueError as e:
+        # Sheet tidak ditemukan: simpan agar percobaan berikutnya tidak membuka workbook lagi
+        if "not found" in str(e):
+            try:
+                os.makedirs(EXCEL_SNAPSHOT_DIR, exist_ok=True)
+                with open(f"{base}.missing", "w", encoding="utf-8") as f:
+                    f.write(str(e))
+            except OSError:
+                pass
+        raise
+
+    if not isinstance(df, pd.DataFrame):
+        # sheet_name=None / list -> dict of DataFrame, tidak di-snapshot
+        return df
+
+    try:
+        _save_snapshot(base, df)
+    except Exception as e:
+        print(f"⚠️  Gagal menyimpan snapshot: {e}")
+
+    return df
+
+# ============================
+# INGEST SEKALI BACA
+# ============================
+def parse_input_datetimes(series):
+    """Parse kolom TGL INPUT: ISO dulu (cepat), sisanya per nilai dengan dayfirst"""
+    parsed = pd.to_datetime(series, errors='coerce', format='ISO8601')
+    rest = parsed.isna() & series.notna() & (series.astype(str).str.strip() != '')
+    if rest.any():
+        parsed[rest] = pd.to_datetime(series[rest], errors='coerce', dayfirst=True, format='mixed')
+    return parsed
+
+def ingest_excel_file(file_path, file_name=None, preferred_sheet='Worksheet', fallback_first_sheet=True, **read_kwargs):
+    """
+    Baca satu workbook SEKALI dan kembalikan (df, meta).
+    meta: name, sheet, rows, tgl_input_col, latest_input (Timestamp/None).
+    Sheet `preferred_sheet` dicoba dulu, lalu sheet pertama jika diizinkan.
+    """
+    file_name = file_name or os.path.basename(str(file_path))
+    try:
+        df = read_excel_cached(file_path, sheet_name=preferred_sheet, **read_kwargs)
+        sheet_used = preferred_sheet
+    except Exception:
+        if not fallback_first_sheet:
+            raise
+        df = read_excel_cached(file_path, sheet_name=0, **read_kwargs)
+        sheet_used = "sheet pertama (index 0)"
+
+    meta = {
+        'name': file_name,
+        'sheet': sheet_used,
+        'rows': len(df),
+        'tgl_input_col': None,
+        'latest_input': None
+    }
+
+    for col in df.columns:
+        name = re.sub(r'\s+', ' ', str(col)).strip().upper()
+        if any(keyword in name for keyword in TGL_INPUT_KEYWORDS):
+            meta['tgl_input_col'] = col
+            latest = parse_input_datetimes(df[col]).max()
+            meta['latest_input'] = latest if pd.notna(latest) else None
+            break
+
+    return df, meta
+
+def summarize_latest_input(metas):
+    """Cetak TGL INPUT terbaru per file, return (tanggal terbaru, jumlah file yang punya kolom)"""
+    latest_datetime = None
+    found_in_files = 0
+
+    for meta in metas:
+        if meta['tgl_input_col'] is None:
+            print(f"   ⚠️  {meta['name']}: Kolom TGL INPUT/TANGGAL INPUT tidak ditemukan")
+            continue
+
+        found_in_files += 1
+        file_latest = meta['latest_input']
+        if file_latest is None:
+            print(f"   ⚠️  {meta['name']}: Tidak ada tanggal valid di kolom '{meta['tgl_input_col']}'")
+            continue
+
+        if latest_datetime is None or file_latest > latest_datetime:
+            latest_datetime = file_latest
+        print(f"   ✅ {meta['name']}: Terbaru: {file_latest.strftime('%d %b %Y %H:%M:%S')} "
+              f"({meta['rows']:,} baris, sheet {meta['sheet']})")
+
+    if latest_datetime is not None:
+        print(f"📅 Tanggal dan waktu input terbaru: {latest_datetime.strftime('%d %b %Y %H:%M:%S')}")
+    else:
+        print("📅 Tidak ditemukan data TGL INPUT yang valid")
+
+    return latest_datetime, found_in_files
@@ -0,0 +1,1062 @@
+"""
+fake_google.py
+Backend Google Drive v3 dan Sheets v4 palsu (di memori) untuk benchmark
+dan uji regresi tanpa koneksi ke Google.
+
+Semua script butuh layanan Google asli, sehingga performa strategi upload /
+download tidak bisa diukur secara offline. FakeGoogleBackend menggantikan
+Google di level HTTP: googleapiclient tetap memakai dokumen discovery asli
+(lewat FakeHttp, pengganti httplib2.Http) dan gspread tetap memakai requests
+(lewat FakeRequestsAdapter), jadi kode client (MediaIoBaseDownload, upload
+multipart/resumable, APIError/HttpError, rate limiter) berjalan persis seperti
+di produksi. Backend dipasang lewat ClientFactory:
+
+    backend = install_fake_backend(FakeGoogleBackend(latency=0.2, sheets_write_per_minute=60))
+
+Endpoint yang didukung:
+- Drive v3  : files.list (q, pageSize/pageToken, orderBy), files.get (metadata
+              dan alt=media dengan Range), files.export, files.create,
+              files.update (metadata, addParents/removeParents, upload media /
+              multipart / resumable)
+- Sheets v4 : spreadsheets.get/create/batchUpdate (addSheet, deleteSheet,
+              duplicateSheet, updateSheetProperties, appendDimension,
+              insertDimension, deleteDimension, updateCells; request format
+              lain diterima tanpa efek), values.get/batchGet/update/
+              batchUpdate/append/clear/batchClear
+
+Perilaku yang diemulasikan: batas grid ("exceeds grid limits"), konversi
+USER_ENTERED untuk angka, FORMATTED_VALUE saat membaca, 404 untuk file /
+spreadsheet yang tidak ada. spreadsheets.batchUpdate tidak atomik.
+
+Emulasi kondisi jaringan (deterministik):
+- latency / latency_per_mb : jeda per request (detik) + per MB payload
+- sheets_read_per_minute / sheets_write_per_minute : kuota per quota_window
+  detik (default 60), request di atas kuota mendapat 429
+- error_rate + seed : sebagian request gagal dengan error_status (default 429)
+- inject_error()    : N request berikutnya (per operasi) gagal dengan status tertentu
+Setiap request dicatat per operasi (jumlah request, byte dikirim/diterima,
+error per status), lihat stats() dan print_summary().
+
+Lokasi: verval-pupuk2/scripts/fake_google.py
+"""
+
+import re
+import json
+import time
+import random
+import hashlib
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from email.parser import BytesParser
+from urllib.parse import urlsplit, parse_qs, unquote
+
+import httplib2
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from google.auth.credentials import AnonymousCredentials
+
+# ============================
+# KONFIGURASI
+# ============================
+XLSX_MIME_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+GOOGLE_SHEET_MIME_TYPE = "application/vnd.google-apps.spreadsheet"
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+
+DEFAULT_ROW_COUNT = 1000
+DEFAULT_COLUMN_COUNT = 26
+DRIVE_PAGE_SIZE = 100  # Default pageSize files.list di Drive v3
+
+SHEETS_READ_OPERATIONS = ("sheets.spreadsheets.get", "sheets.values.get", "sheets.values.batchGet")
+STATUS_NAMES = {400: "INVALID_ARGUMENT", 404: "NOT_FOUND", 429: "RESOURCE_EXHAUSTED",
+                500: "INTERNAL", 503: "UNAVAILABLE"}
+
+# ============================
+# FUNGSI UTILITY
+# ============================
+class FakeApiError(Exception):
+    """Error yang dikembalikan ke client sebagai respons JSON Google"""
+
+    def __init__(self, status, message, reason=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.reason = reason or STATUS_NAMES.get(status, "UNKNOWN").lower()
+
+def _now_rfc3339():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+def column_letter(index):
+    """0 -> A, 25 -> Z, 26 -> AA"""
+    letters = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+def column_index(letters):
+    """A -> 0, AA -> 26"""
+    index = 0
+    for char in letters.upper():
+        index = index * 26 + (ord(char) - 64)
+    return index - 1
+
+CELL_RANGE_PATTERN = re.compile(r"^([A-Za-z]*)(\d*)(?::([A-Za-z]*)(\d*))?$")
+QUOTED_SHEET_PATTERN = re.compile(r"^'((?:[^']|'')*)'(?:!(.*))?$")
+
+def parse_cells(cells):
+    """'A1:C10' -> (r1, c1, r2, c2) 0-based inklusif, None = terbuka"""
+    match = CELL_RANGE_PATTERN.match(cells.strip())
+    if not match or not cells.strip():
+        return None
+    col1, row1, col2, row2 = match.groups()
+    r1 = int(row1) - 1 if row1 else None
+    c1 = column_index(col1) if col1 else None
+    if match.group(3) is None and match.group(4) is None:
+        # Satu sel (A1), satu kolom (A) atau satu baris (1)
+        return r1, c1, r1, c1
+    r2 = int(row2) - 1 if row2 else None
+    c2 = column_index(col2) if col2 else None
+    return r1, c1, r2, c2
+
+def format_value(value, render_option="FORMATTED_VALUE"):
+    """Nilai sel seperti yang dikembalikan values.get"""
+    if render_option != "FORMATTED_VALUE":
+        return value
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (int, float)):
+        if float(value).is_integer() and abs(value) < 1e15:
+            return str(int(value))
+        if abs(value) >= 1e15:
+            mantissa, exponent = f"{value:.5E}".split("E")
+            return f"{mantissa.rstrip('0').rstrip('.')}E+{int(exponent)}"
+        return str(value)
+    return str(value)
+
+NUMBER_PATTERN = re.compile(r"^-?\d+(\.\d+)?$")
+
+def parse_input_value(value, input_option):
+    """Konversi nilai input: USER_ENTERED mengubah teks angka menjadi angka"""
+    if input_option != "USER_ENTERED" or not isinstance(value, str):
+        return value
+    if value.startswith("'"):
+        return value[1:]
+    if NUMBER_PATTERN.match(value.strip()):
+        number = float(value)
+        # Sheets hanya menyimpan 15 digit presisi
+        return int(number) if "." not in value and abs(number) < 1e15 else number
+    return value
+
+def _body_bytes(body):
+    if body is None:
+        return b""
+    if isinstance(body, str):
+        return body.encode("utf-8")
+    if hasattr(body, "read"):
+        return body.read()
+    return bytes(body)
+
+def _json_body(body):
+    raw = _body_bytes(body)
+    return json.loads(raw.decode("utf-8")) if raw.strip() else {}
+
+# ============================
+# QUERY DRIVE (files.list q=...)
+# ============================
+QUERY_TOKEN = re.compile(r"\s*(?:(\()|(\))|'((?:[^'\\]|\\.)*)'|(!=|<=|>=|=|<|>)|([A-Za-z_][A-Za-z0-9_.]*))")
+
+def _tokenize_query(query):
+    tokens, pos = [], 0
+    query = query.strip()
+    while pos < len(query):
+        match = QUERY_TOKEN.match(query, pos)
+        if not match or match.end() == pos:
+            raise FakeApiError(400, f"Invalid Value: q ({query})", "invalid")
+        lparen, rparen, string, op, ident = match.groups()
+        if lparen:
+            tokens.append(("(", None))
+        elif rparen:
+            tokens.append((")", None))
+        elif string is not None:
+            tokens.append(("str", re.sub(r"\\(.)", r"\1", string)))
+        elif op:
+            tokens.append(("op", op))
+        else:
+            tokens.append(("id", ident))
+        pos = match.end()
+    return tokens
+
+def compile_drive_query(query):
+    """String q Drive -> fungsi predicate(file)"""
+    tokens = _tokenize_query(query or "")
+    if not tokens:
+        return lambda file: True
+    pos = 0
+
+    def peek(kind=None, value=None):
+        if pos >= len(tokens):
+            return False
+        token = tokens[pos]
+        return (kind is None or token[0] == kind) and (value is None or str(token[1]).lower() == value)
+
+    def take():
+        nonlocal pos
+        if pos >= len(tokens):
+            raise FakeApiError(400, f"Invalid Value: q ({query})", "invalid")
+        pos += 1
+        return tokens[pos - 1]
+
+    def expr():
+        left = term()
+        while peek("id", "or"):
+            take()
+            right = term()
+            left = (lambda a, b: lambda file: a(file) or b(file))(left, right)
+        return left
+
+    def term():
+        left = factor()
+        while peek("id", "and"):
+            take()
+            right = factor()
+            left = (lambda a, b: lambda file: a(file) and b(file))(left, right)
+        return left
+
+    def factor():
+        if peek("id", "not"):
+            take()
+            inner = factor()
+            return lambda file: not inner(file)
+        if peek("("):
+            take()
+            inner = expr()
+            take()
+            return inner
+        return comparison()
+
+    def comparison():
+        kind, value = take()
+        if kind == "str":
+            take()  # in
+            field = take()[1]
+            return lambda file: value in file.get(field, [])
+
+        field = value
+        _, op = take()
+        kind, literal = take()
+        if kind == "id":
+            literal = literal.lower() == "true"
+        op = op.lower()
+
+        def compare(file):
+            actual = file.get(field, False if field == "trashed" else "")
+            if field == "fullText":
+                actual = file.get("name", "")
+            if op == "contains":
+                return str(literal).lower() in str(actual).lower()
+            return {"=": actual == literal, "!=": actual != literal, "<": actual < literal,
+                    ">": actual > literal, "<=": actual <= literal, ">=": actual >= literal}[op]
+        return compare
+
+    predicate = expr()
+    if pos != len(tokens):
+        raise FakeApiError(400, f"Invalid Value: q ({query})", "invalid")
+    return predicate
+
+# ============================
+# BACKEND
+# ============================
+class FakeGoogleBackend:
+    """State Drive + Sheets di memori, statistik request, emulasi latency dan 429"""
+
+    def __init__(self, latency=0.0, latency_per_mb=0.0, sheets_read_per_minute=None,
+                 sheets_write_per_minute=None, quota_window=60.0, error_rate=0.0,
+                 error_status=429, retry_after=None, seed=0, auto_create_spreadsheets=True):
+        self.latency = latency
+        self.latency_per_mb = latency_per_mb
+        self.quota = {"read": sheets_read_per_minute, "write": sheets_write_per_minute}
+        self.quota_window = quota_window
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after  # Nilai header Retry-After untuk 429 (None = tanpa header)
+        self.auto_create_spreadsheets = auto_create_spreadsheets
+
+        self._lock = threading.RLock()
+        self._random = random.Random(seed)
+        self._quota_calls = {"read": deque(), "write": deque()}
+        self._injected = []  # [operasi prefix, status, sisa]
+        self._counter = 0
+        self._uploads = {}
+        self.files = {}  # id -> metadata + 'content'
+        self.spreadsheets = {}  # id -> {'properties', 'sheets': [{'properties', 'rows'}]}
+        self.reset_stats()
+
+    # ---------- seed data & inspeksi ----------
+    def _new_id(self, prefix):
+        with self._lock:
+            self._counter += 1
+            return f"fake-{prefix}-{self._counter:06d}"
+
+    def add_folder(self, name, folder_id=None, parents=()):
+        """Tambah folder Drive, return id"""
+        folder_id = folder_id or self._new_id("folder")
+        with self._lock:
+            self.files[folder_id] = {"id": folder_id, "name": name, "mimeType": FOLDER_MIME_TYPE,
+                                     "parents": list(parents), "modifiedTime": _now_rfc3339(),
+                                     "trashed": False, "content": b""}
+        return folder_id
+
+    def add_file(self, name, content, parents=(), mime_type=XLSX_MIME_TYPE, file_id=None):
+        """Tambah file Drive (content: bytes), return id"""
+        file_id = file_id or self._new_id("file")
+        with self._lock:
+            self.files[file_id] = {"id": file_id, "name": name, "mimeType": mime_type,
+                                   "parents": list(parents), "trashed": False}
+            self._set_content(self.files[file_id], _body_bytes(content))
+        return file_id
+
+    def add_spreadsheet(self, spreadsheet_id=None, title="Spreadsheet", sheets=None, parents=()):
+        """Tambah spreadsheet. sheets: {judul: rows (list of list)} atau None (satu Sheet1 kosong)"""
+        spreadsheet_id = spreadsheet_id or self._new_id("spreadsheet")
+        with self._lock:
+            spreadsheet = {"properties": {"title": title, "locale": "en_US", "timeZone": "Asia/Jakarta",
+                                          "autoRecalc": "ON_CHANGE"},
+                           "sheets": [], "next_sheet_id": 0}
+            self.spreadsheets[spreadsheet_id] = spreadsheet
+            for sheet_title, rows in (sheets or {"Sheet1": []}).items():
+                rows = [list(row) for row in rows]
+                self._add_sheet(spreadsheet, {"title": sheet_title, "gridProperties": {
+                    "rowCount": max(DEFAULT_ROW_COUNT, len(rows)),
+                    "columnCount": max([DEFAULT_COLUMN_COUNT] + [len(row) for row in rows])}})
+                spreadsheet["sheets"][-1]["rows"] = rows
+            self.files[spreadsheet_id] = {"id": spreadsheet_id, "name": title, "mimeType": GOOGLE_SHEET_MIME_TYPE,
+                                          "parents": list(parents), "modifiedTime": _now_rfc3339(),
+                                          "trashed": False, "content": b""}
+        return spreadsheet_id
+
+    def sheet_values(self, spreadsheet_id, title):
+        """Isi sheet (list of list, nilai apa adanya) untuk verifikasi"""
+        with self._lock:
+            sheet = self._sheet_by_title(self._spreadsheet(spreadsheet_id), title)
+            return [list(row) for row in self._trimmed(sheet["rows"])]
+
+    def inject_error(self, operation="", status=429, count=1):
+        """`count` request berikutnya yang operasinya diawali `operation` gagal dengan `status`"""
+        with self._lock:
+            self._injected.append([operation, status, count])
+
+    # ---------- statistik ----------
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {}
+            self.simulated_latency = 0.0
+
+    def _record(self, operation, sent, received, status):
+        with self._lock:
+            entry = self._stats.setdefault(operation, {"requests": 0, "bytes_sent": 0,
+                                                       "bytes_received": 0, "errors": {}})
+            entry["requests"] += 1
+            entry["bytes_sent"] += sent
+            entry["bytes_received"] += received
+            if status >= 400:
+                entry["errors"][status] = entry["errors"].get(status, 0) + 1
+
+    def stats(self):
+        """Salinan statistik per operasi"""
+        with self._lock:
+            return {op: dict(entry, errors=dict(entry["errors"])) for op, entry in self._stats.items()}
+
+    def totals(self):
+        stats = self.stats()
+        errors = {}
+        for entry in stats.values():
+            for status, count in entry["errors"].items():
+                errors[status] = errors.get(status, 0) + count
+        return {"requests": sum(e["requests"] for e in stats.values()),
+                "bytes_sent": sum(e["bytes_sent"] for e in stats.values()),
+                "bytes_received": sum(e["bytes_received"] for e in stats.values()),
+                "errors": errors}
+
+    def print_summary(self):
+        """Tampilkan ringkasan request per operasi"""
+        totals = self.totals()
+        errors = ", ".join(f"{count}x {status}" for status, count in sorted(totals["errors"].items())) or "tanpa error"
+        print(f"📡 Fake Google: {totals['requests']} request, "
+              f"{totals['bytes_sent'] / (1024 * 1024):.2f} MB dikirim, "
+              f"{totals['bytes_received'] / (1024 * 1024):.2f} MB diterima, {errors}")
+        for operation, entry in sorted(self.stats().items()):
+            errors = " ".join(f"{status}:{count}" for status, count in sorted(entry["errors"].items()))
+            print(f"   {operation:34s} {entry['requests']:6d} req "
+                  f"{entry['bytes_sent'] / (1024 * 1024):9.2f} MB ↑ "
+                  f"{entry['bytes_received'] / (1024 * 1024):9.2f} MB ↓  {errors}")
+
+    # ---------- client ----------
+    def credentials(self, scopes=()):
+        return FakeCredentials(scopes)
+
+    def http(self):
+        return FakeHttp(self)
+
+    def requests_adapter(self):
+        return FakeRequestsAdapter(self)
+
+    # ---------- pintu masuk HTTP ----------
+    def handle(self, method, url, headers=None, body=None):
+        """Proses satu request HTTP. Return (status, headers, content bytes)"""
+        headers = {str(k).lower(): str(v) for k, v in (headers or {}).items()}
+        body = _body_bytes(body)
+        parts = urlsplit(url)
+        params = {key: values if len(values) > 1 else values[0]
+                  for key, values in parse_qs(parts.query, keep_blank_values=True).items()}
+
+        try:
+            operation, handler = self._route(method.upper(), parts.netloc, parts.path, params)
+        except FakeApiError as e:
+            operation, handler = "unknown", None
+            route_error = e
+        else:
+            route_error = None
+
+        status, response_headers, content = 200, {"content-type": "application/json; charset=UTF-8"}, b""
+        try:
+            if route_error:
+                raise route_error
+            self._apply_faults(operation, len(body))
+            with self._lock:
+                result = handler(params=params, headers=headers, body=body)
+            if isinstance(result, tuple):
+                status, extra_headers, content = result
+                response_headers.update(extra_headers)
+            else:
+                content = json.dumps(result).encode("utf-8")
+        except FakeApiError as e:
+            status = e.status
+            content = json.dumps({"error": {"code": e.status, "message": e.message,
+                                            "status": STATUS_NAMES.get(e.status, "UNKNOWN"),
+                                            "errors": [{"message": e.message, "domain": "global",
+                                                        "reason": e.reason}]}}).encode("utf-8")
+            if e.status == 429 and self.retry_after is not None:
+                response_headers["retry-after"] = str(self.retry_after)
+
+        delay = self.latency + self.latency_per_mb * (len(body) + len(content)) / (1024 * 1024)
+        if delay > 0:
+            time.sleep(delay)
+            with self._lock:
+                self.simulated_latency += delay
+        self._record(operation, len(body), len(content), status)
+        response_headers["content-length"] = str(len(content))
+        return status, response_headers, content
+
+    def _apply_faults(self, operation, body_size):
+        """Error yang disuntikkan, error acak (seed) dan kuota per menit Sheets"""
+        with self._lock:
+            for injected in self._injected:
+                if injected[2] > 0 and operation.startswith(injected[0]):
+                    injected[2] -= 1
+                    raise FakeApiError(injected[1], f"Injected error {injected[1]} untuk {operation}",
+                                       "rateLimitExceeded" if injected[1] == 429 else None)
+            if self.error_rate and self._random.random() < self.error_rate:
+                raise FakeApiError(self.error_status, f"Simulated error {self.error_status} untuk {operation}",
+                                   "rateLimitExceeded" if self.error_status == 429 else None)
+
+            if not operation.startswith("sheets."):
+                return
+            kind = "read" if operation in SHEETS_READ_OPERATIONS else "write"
+            limit = self.quota[kind]
+            if not limit:
+                return
+            now = time.monotonic()
+            calls = self._quota_calls[kind]
+            while calls and now - calls[0] >= self.quota_window:
+                calls.popleft()
+            if len(calls) >= limit:
+                label = "Read requests" if kind == "read" else "Write requests"
+                raise FakeApiError(429, f"Quota exceeded for quota metric '{label}' and limit "
+                                        f"'{label} per minute per user'", "rateLimitExceeded")
+            calls.append(now)
+
+    def _route(self, method, host, path, params):
+        """(nama operasi, handler) untuk method + URL"""
+        if host == "sheets.googleapis.com" and path.startswith("/v4/spreadsheets"):
+            return self._route_sheets(method, path[len("/v4/spreadsheets"):])
+        if host == "www.googleapis.com":
+            if path.startswith("/upload/drive/v3/files"):
+                file_id = path[len("/upload/drive/v3/files"):].strip("/") or None
+                return self._route_upload(method, file_id, params)
+            if path.startswith("/drive/v3/files"):
+                return self._route_drive(method, path[len("/drive/v3/files"):].strip("/"), params)
+        raise FakeApiError(404, f"URL tidak didukung fake backend: {method} {host}{path}")
+
+    # ---------- Drive ----------
+    def _route_drive(self, method, rest, params):
+        if not rest:
+            if method == "GET":
+                return "drive.files.list", self._drive_list
+            if method == "POST":
+                return "drive.files.create", lambda **kw: self._drive_write(None, media=None, **kw)
+        file_id, _, suffix = rest.partition("/")
+        file_id = unquote(file_id)
+        if suffix == "export" and method == "GET":
+            return "drive.files.export", lambda **kw: self._drive_media(file_id, **kw)
+        if not suffix and method == "GET":
+            if params.get("alt") == "media":
+                return "drive.files.get_media", lambda **kw: self._drive_media(file_id, **kw)
+            return "drive.files.get", lambda **kw: self._file_metadata(self._file(file_id))
+        if not suffix and method == "PATCH":
+            return "drive.files.update", lambda **kw: self._drive_write(file_id, media=None, **kw)
+        raise FakeApiError(404, f"Operasi Drive tidak didukung: {method} files/{rest}")
+
+    def _route_upload(self, method, file_id, params):
+        upload_type = params.get("uploadType", "media")
+        operation = "drive.files.update" if file_id or method == "PATCH" else "drive.files.create"
+        if params.get("upload_id"):
+            # Chunk resumable dicatat sebagai operasi yang memulai sesi upload
+            operation = self._uploads.get(params["upload_id"], {}).get("operation", operation)
+            return operation, lambda **kw: self._resumable_chunk(params["upload_id"], **kw)
+        if upload_type == "resumable":
+            return operation, lambda **kw: self._resumable_start(file_id, operation, **kw)
+        if upload_type == "multipart":
+            return operation, lambda **kw: self._drive_multipart(file_id, **kw)
+        return operation, lambda **kw: self._drive_write(file_id, media=kw["body"], params=kw["params"],
+                                                         headers=kw["headers"], body=b"")
+
+    def _file(self, file_id):
+        file = self.files.get(file_id)
+        if file is None:
+            raise FakeApiError(404, f"File not found: {file_id}.", "notFound")
+        return file
+
+    def _set_content(self, file, content):
+        file["content"] = content
+        file["md5Checksum"] = hashlib.md5(content).hexdigest()
+        file["size"] = str(len(content))
+        file["modifiedTime"] = _now_rfc3339()
+
+    @staticmethod
+    def _file_metadata(file):
+        return {key: value for key, value in file.items() if key != "content"}
+
+    def _drive_list(self, params, **kwargs):
+        predicate = compile_drive_query(params.get("q", ""))
+        files = [file for file in self.files.values() if predicate(file)]
+        order_by = params.get("orderBy")
+        if order_by:
+            for clause in reversed(order_by.split(",")):
+                field, _, direction = clause.strip().partition(" ")
+                files.sort(key=lambda file: str(file.get(field, "")), reverse=direction.lower() == "desc")
+
+        page_size = int(params.get("pageSize", DRIVE_PAGE_SIZE))
+        start = int(params.get("pageToken") or 0)
+        page = files[start:start + page_size]
+        result = {"kind": "drive#fileList", "files": [self._file_metadata(file) for file in page]}
+        if start + page_size < len(files):
+            result["nextPageToken"] = str(start + page_size)
+        return result
+
+    def _drive_media(self, file_id, headers, **kwargs):
+        content = self._file(file_id)["content"]
+        match = re.match(r"bytes=(\d+)-(\d*)", headers.get("range", ""))
+        if not match:
+            return 200, {"content-type": "application/octet-stream"}, content
+        start = int(match.group(1))
+        end = min(int(match.group(2)) if match.group(2) else len(content) - 1, len(content) - 1)
+        if start >= len(content):
+            return 416, {"content-range": f"bytes */{len(content)}"}, b""
+        return 206, {"content-type": "application/octet-stream",
+                     "content-range": f"bytes {start}-{end}/{len(content)}"}, content[start:end + 1]
+
+    def _drive_write(self, file_id, media, params, headers, body):
+        """files.create / files.update: metadata JSON (body) dan isi file (media, opsional)"""
+        metadata = _json_body(body) if body else {}
+        if file_id is None:
+            file_id = self._new_id("file")
+            self.files[file_id] = {"id": file_id, "name": metadata.get("name", "Untitled"),
+                                   "mimeType": metadata.get("mimeType", headers.get("content-type", XLSX_MIME_TYPE)),
+                                   "parents": list(metadata.get("parents", [])), "trashed": False}
+            self._set_content(self.files[file_id], b"")
+        file = self._file(file_id)
+        for key in ("name", "mimeType", "trashed"):
+            if key in metadata:
+                file[key] = metadata[key]
+        if params.get("addParents"):
+            file["parents"] = file["parents"] + [p for p in params["addParents"].split(",") if p not in file["parents"]]
+        if params.get("removeParents"):
+            removed = params["removeParents"].split(",")
+            file["parents"] = [p for p in file["parents"] if p not in removed]
+        if media is not None:
+            self._set_content(file, media)
+        else:
+            file["modifiedTime"] = _now_rfc3339()
+        return self._file_metadata(file)
+
+    def _drive_multipart(self, file_id, params, headers, body):
+        message = BytesParser().parsebytes(
+            f"Content-Type: {headers.get('content-type', '')}\r\n\r\n".encode("utf-8") + body)
+        parts = message.get_payload() if message.is_multipart() else []
+        if len(parts) != 2:
+            raise FakeApiError(400, "Multipart upload harus berisi metadata dan media")
+        metadata = parts[0].get_payload(decode=True) or b""
+        media = parts[1].get_payload(decode=True) or b""
+        return self._drive_write(file_id, media=media, params=params, headers=headers, body=metadata)
+
+    def _resumable_start(self, file_id, operation, params, headers, body):
+        upload_id = self._new_id("upload")
+        self._uploads[upload_id] = {"file_id": file_id, "operation": operation, "params": params, "headers": headers,
+                                    "metadata": body, "content": bytearray()}
+        location = f"https://www.googleapis.com/upload/drive/v3/files?uploadType=resumable&upload_id={upload_id}"
+        return 200, {"location": location}, b""
+
+    def _resumable_chunk(self, upload_id, headers, body, **kwargs):
+        upload = self._uploads.get(upload_id)
+        if upload is None:
+            raise FakeApiError(404, f"Upload session not found: {upload_id}")
+        upload["content"].extend(body)
+        match = re.match(r"bytes (?:\d+-\d+|\*)/(\d+|\*)", headers.get("content-range", ""))
+        total = match.group(1) if match else str(len(upload["content"]))
+        if total != "*" and len(upload["content"]) >= int(total):
+            self._uploads.pop(upload_id)
+            result = self._drive_write(upload["file_id"], media=bytes(upload["content"]),
+                                       params=upload["params"], headers=upload["headers"], body=upload["metadata"])
+            return 200, {}, json.dumps(result).encode("utf-8")
+        return 308, {"range": f"bytes=0-{len(upload['content']) - 1}"}, b""
+
+    # ---------- Sheets: routing ----------
+    def _route_sheets(self, method, rest):
+        rest = rest.lstrip("/")
+        if not rest and method == "POST":
+            return "sheets.spreadsheets.create", self._sheets_create
+        head, _, tail = rest.partition("/")
+        spreadsheet_id, _, verb = head.partition(":")
+        spreadsheet_id = unquote(spreadsheet_id)
+
+        if not tail:
+            if verb == "batchUpdate" and method == "POST":
+                return "sheets.spreadsheets.batchUpdate", lambda **kw: self._sheets_batch_update(spreadsheet_id, **kw)
+            if not verb and method == "GET":
+                return "sheets.spreadsheets.get", lambda **kw: self._sheets_metadata(self._spreadsheet(spreadsheet_id), spreadsheet_id)
+        elif tail.startswith("values:"):
+            verb = tail[len("values:"):]
+            handlers = {("batchUpdate", "POST"): self._values_batch_update,
+                        ("batchGet", "GET"): self._values_batch_get,
+                        ("batchClear", "POST"): self._values_batch_clear}
+            if (verb, method) in handlers:
+                handler = handlers[(verb, method)]
+                return f"sheets.values.{verb}", lambda **kw: handler(spreadsheet_id, **kw)
+        elif tail.startswith("values/"):
+            range_part = tail[len("values/"):]
+            verb = ""
+            if ":" in range_part and range_part.rsplit(":", 1)[1] in ("clear", "append"):
+                range_part, verb = range_part.rsplit(":", 1)
+            a1 = unquote(range_part)
+            if method == "GET" and not verb:
+                return "sheets.values.get", lambda **kw: self._values_get(spreadsheet_id, a1, **kw)
+            if method == "PUT" and not verb:
+                return "sheets.values.update", lambda **kw: self._values_update(spreadsheet_id, a1, **kw)
+            if method == "POST" and verb == "clear":
+                return "sheets.values.clear", lambda **kw: self._values_clear(spreadsheet_id, a1, **kw)
+            if method == "POST" and verb == "append":
+                return "sheets.values.append", lambda **kw: self._values_append(spreadsheet_id, a1, **kw)
+        raise FakeApiError(404, f"Operasi Sheets tidak didukung: {method} spreadsheets/{rest}")
+
+    # ---------- Sheets: model ----------
+    def _spreadsheet(self, spreadsheet_id):
+        spreadsheet = self.spreadsheets.get(spreadsheet_id)
+        if spreadsheet is None:
+            if not self.auto_create_spreadsheets:
+                raise FakeApiError(404, "Requested entity was not found.", "notFound")
+            self.add_spreadsheet(spreadsheet_id, title=spreadsheet_id)
+            spreadsheet = self.spreadsheets[spreadsheet_id]
+        return spreadsheet
+
+    @staticmethod
+    def _sheets_metadata(spreadsheet, spreadsheet_id):
+        return {"spreadsheetId": spreadsheet_id,
+                "properties": json.loads(json.dumps(spreadsheet["properties"])),
+                "sheets": [{"properties": json.loads(json.dumps(sheet["properties"]))}
+                           for sheet in spreadsheet["sheets"]],
+                "spreadsheetUrl": f"https://docs.google.com/spreadsheets/d/{spreadsheet_id}/edit"}
+
+    def _add_sheet(self, spreadsheet, properties):
+        titles = {sheet["properties"]["title"] for sheet in spreadsheet["sheets"]}
+        title = properties.get("title") or f"Sheet{len(spreadsheet['sheets']) + 1}"
+        if title in titles:
+            raise FakeApiError(400, f'Invalid requests[0].addSheet: A sheet with the name "{title}" already exists. '
+                                    f"Please enter another name.")
+        sheet_id = properties.get("sheetId")
+        if sheet_id is None:
+            sheet_id = spreadsheet["next_sheet_id"]
+        spreadsheet["next_sheet_id"] = max(spreadsheet["next_sheet_id"], sheet_id + 1)
+        grid = properties.get("gridProperties", {})
+        sheet = {"properties": {
+            "sheetId": sheet_id, "title": title, "index": len(spreadsheet["sheets"]), "sheetType": "GRID",
+            "gridProperties": dict(grid, rowCount=grid.get("rowCount", DEFAULT_ROW_COUNT),
+                                   columnCount=grid.get("columnCount", DEFAULT_COLUMN_COUNT))},
+            "rows": []}
+        index = properties.get("index")
+        if index is not None and index < len(spreadsheet["sheets"]):
+            spreadsheet["sheets"].insert(index, sheet)
+        else:
+            spreadsheet["sheets"].append(sheet)
+        for position, item in enumerate(spreadsheet["sheets"]):
+            item["properties"]["index"] = position
+        return sheet
+
+    def _sheet_by_id(self, spreadsheet, sheet_id):
+        for sheet in spreadsheet["sheets"]:
+            if sheet["properties"]["sheetId"] == sheet_id:
+                return sheet
+        raise FakeApiError(400, f"No grid with id: {sheet_id}")
+
+    def _sheet_by_title(self, spreadsheet, title):
+        for sheet in spreadsheet["sheets"]:
+            if sheet["properties"]["title"] == title:
+                return sheet
+        raise FakeApiError(400, f"Unable to parse range: {title}")
+
+    def _resolve_range(self, spreadsheet, a1):
+        """'Sheet!A1:B2' -> (sheet, r1, c1, r2, c2)"""
+        a1 = a1.strip()
+        match = QUOTED_SHEET_PATTERN.match(a1)
+        if match:
+            title, cells = match.group(1).replace("''", "'"), match.group(2)
+        elif "!" in a1:
+            title, cells = a1.split("!", 1)
+        else:
+            titles = {sheet["properties"]["title"] for sheet in spreadsheet["sheets"]}
+            if a1 in titles or parse_cells(a1) is None:
+                title, cells = a1, None
+            else:
+                title, cells = spreadsheet["sheets"][0]["properties"]["title"], a1
+        sheet = self._sheet_by_title(spreadsheet, title)
+        bounds = parse_cells(cells) if cells else (None, None, None, None)
+        if bounds is None:
+            raise FakeApiError(400, f"Unable to parse range: {a1}")
+        return (sheet,) + bounds
+
+    @staticmethod
+    def _trimmed(rows):
+        """Buang sel kosong di ujung baris dan baris kosong di akhir"""
+        result = []
+        for row in rows:
+            end = len(row)
+            while end and row[end - 1] in (None, ""):
+                end -= 1
+            result.append(row[:end])
+        while result and not result[-1]:
+            result.pop()
+        return result
+
+    @staticmethod
+    def _a1(sheet, r1, c1, r2, c2):
+        title = sheet["properties"]["title"]
+        quoted = f"'{title}'" if re.search(r"[^A-Za-z0-9_]", title) else title
+        return f"{quoted}!{column_letter(c1)}{r1 + 1}:{column_letter(c2)}{r2 + 1}"
+
+    def _write(self, sheet, r1, c1, values, input_option, limit=None, major="ROWS"):
+        """Tulis values mulai (r1, c1); cek batas grid seperti Sheets API"""
+        if major == "COLUMNS":
+            width = max((len(col) for col in values), default=0)
+            values = [[col[i] if i < len(col) else None for col in values] for i in range(width)]
+        grid = sheet["properties"]["gridProperties"]
+        width = max((len(row) for row in values), default=0)
+        if limit is not None:
+            r2, c2 = limit
+            if (r2 is not None and r1 + len(values) - 1 > r2) or (c2 is not None and c1 + width - 1 > c2):
+                raise FakeApiError(400, f"Requested writing within range [{self._a1(sheet, r1, c1, r2 or r1, c2 or c1)}], "
+                                        f"but tried writing to row [{r1 + len(values)}]")
+        if values and (r1 + len(values) > grid["rowCount"] or c1 + width > grid["columnCount"]):
+            raise FakeApiError(400, f"Range ({self._a1(sheet, r1, c1, r1 + len(values) - 1, c1 + max(width, 1) - 1)}) "
+                                    f"exceeds grid limits. Max rows: {grid['rowCount']}, "
+                                    f"max columns: {grid['columnCount']}")
+
+        rows = sheet["rows"]
+        while len(rows) < r1 + len(values):
+            rows.append([])
+        for offset, row_values in enumerate(values):
+            row = rows[r1 + offset]
+            if len(row) < c1 + len(row_values):
+                row.extend([""] * (c1 + len(row_values) - len(row)))
+            for col_offset, value in enumerate(row_values):
+                if value is not None:
+                    row[c1 + col_offset] = parse_input_value(value, input_option)
+        return {"updatedRange": self._a1(sheet, r1, c1, r1 + max(len(values), 1) - 1, c1 + max(width, 1) - 1),
+                "updatedRows": len(values), "updatedColumns": width,
+                "updatedCells": sum(len(row) for row in values)}
+
+    def _clear(self, sheet, r1, c1, r2, c2):
+        r1, c1 = r1 or 0, c1 or 0
+        for row in sheet["rows"][r1:(r2 + 1) if r2 is not None else None]:
+            end = min(len(row), c2 + 1) if c2 is not None else len(row)
+            for col in range(c1, end):
+                row[col] = ""
+        sheet["rows"] = self._trimmed(sheet["rows"])
+
+    def _read(self, sheet, r1, c1, r2, c2, params):
+        r1, c1 = r1 or 0, c1 or 0
+        rows = sheet["rows"][r1:(r2 + 1) if r2 is not None else None]
+        render = params.get("valueRenderOption", "FORMATTED_VALUE")
+        values = self._trimmed([[format_value(v, render) for v in row[c1:(c2 + 1) if c2 is not None else None]]
+                                for row in rows])
+        grid = sheet["properties"]["gridProperties"]
+        last_row = r2 if r2 is not None else grid["rowCount"] - 1
+        last_col = c2 if c2 is not None else grid["columnCount"] - 1
+        result = {"range": self._a1(sheet, r1, c1, last_row, last_col), "majorDimension": "ROWS"}
+        if params.get("majorDimension") == "COLUMNS":
+            width = max((len(row) for row in values), default=0)
+            values = self._trimmed([[row[i] if i < len(row) else "" for row in values] for i in range(width)])
+            result["majorDimension"] = "COLUMNS"
+        if values:
+            result["values"] = values
+        return result
+
+    # ---------- Sheets: handler ----------
+    def _sheets_create(self, body, **kwargs):
+        request = _json_body(body)
+        sheets = {s["properties"].get("title", f"Sheet{i + 1}"): [] for i, s in enumerate(request.get("sheets", []))}
+        spreadsheet_id = self.add_spreadsheet(title=request.get("properties", {}).get("title", "Untitled spreadsheet"),
+                                              sheets=sheets or None)
+        return self._sheets_metadata(self.spreadsheets[spreadsheet_id], spreadsheet_id)
+
+    def _sheets_batch_update(self, spreadsheet_id, body, **kwargs):
+        spreadsheet = self._spreadsheet(spreadsheet_id)
+        replies = []
+        for request in _json_body(body).get("requests", []):
+            kind, payload = next(iter(request.items()))
+            replies.append(self._apply_request(spreadsheet, kind, payload))
+        self.files[spreadsheet_id]["modifiedTime"] = _now_rfc3339()
+        return {"spreadsheetId": spreadsheet_id, "replies": replies}
+
+    def _apply_request(self, spreadsheet, kind, payload):
+        """Satu request spreadsheets.batchUpdate, return reply"""
+        if kind == "addSheet":
+            sheet = self._add_sheet(spreadsheet, payload.get("properties", {}))
+            return {"addSheet": {"properties": sheet["properties"]}}
+
+        if kind == "deleteSheet":
+            sheet = self._sheet_by_id(spreadsheet, payload["sheetId"])
+            if len(spreadsheet["sheets"]) == 1:
+                raise FakeApiError(400, "You can't remove all the sheets in a document.")
+            spreadsheet["sheets"].remove(sheet)
+            for position, item in enumerate(spreadsheet["sheets"]):
+                item["properties"]["index"] = position
+            return {}
+
+        if kind == "duplicateSheet":
+            source = self._sheet_by_id(spreadsheet, payload["sourceSheetId"])
+            properties = json.loads(json.dumps(source["properties"]))
+            properties.update(title=payload.get("newSheetName") or f"Copy of {properties['title']}",
+                              sheetId=payload.get("newSheetId"), index=payload.get("insertSheetIndex"))
+            sheet = self._add_sheet(spreadsheet, properties)
+            sheet["rows"] = [list(row) for row in source["rows"]]
+            return {"duplicateSheet": {"properties": sheet["properties"]}}
+
+        if kind == "updateSheetProperties":
+            properties = payload.get("properties", {})
+            sheet = self._sheet_by_id(spreadsheet, properties.get("sheetId", 0))
+            fields = payload.get("fields", "*")
+            paths = [key for key in properties if key != "sheetId"] if fields == "*" else fields.split(",")
+            for path in paths:
+                source, target = properties, sheet["properties"]
+                keys = path.strip().replace("/", ".").split(".")
+                for key in keys[:-1]:
+                    source = source.get(key, {})
+                    target = target.setdefault(key, {})
+                if keys[-1] == "*":
+                    target.update(source)
+                elif keys[-1] in source:
+                    target[keys[-1]] = source[keys[-1]]
+            self._fit_to_grid(sheet)
+            return {}
+
+        if kind == "appendDimension":
+            sheet = self._sheet_by_id(spreadsheet, payload["sheetId"])
+            key = "rowCount" if payload.get("dimension") == "ROWS" else "columnCount"
+            sheet["properties"]["gridProperties"][key] += int(payload.get("length", 0))
+            return {}
+
+        if kind in ("insertDimension", "deleteDimension"):
+            grid_range = payload["range"]
+            sheet = self._sheet_by_id(spreadsheet, grid_range.get("sheetId", 0))
+            start, end = int(grid_range.get("startIndex", 0)), int(grid_range["endIndex"])
+            rows_dimension = grid_range.get("dimension") == "ROWS"
+            key = "rowCount" if rows_dimension else "columnCount"
+            count = end - start
+            if kind == "insertDimension":
+                if rows_dimension:
+                    sheet["rows"][start:start] = [[] for _ in range(count)]
+                else:
+                    for row in sheet["rows"]:
+                        if len(row) > start:
+                            row[start:start] = [""] * count
+                sheet["properties"]["gridProperties"][key] += count
+            else:
+                if rows_dimension:
+                    del sheet["rows"][start:end]
+                else:
+                    for row in sheet["rows"]:
+                        del row[start:end]
+                sheet["properties"]["gridProperties"][key] -= count
+            sheet["rows"] = self._trimmed(sheet["rows"])
+            return {}
+
+        if kind == "updateCells":
+            grid_range = payload.get("range") or {}
+            start = payload.get("start") or {}
+            sheet = self._sheet_by_id(spreadsheet, grid_range.get("sheetId", start.get("sheetId", 0)))
+            r1 = grid_range.get("startRowIndex", start.get("rowIndex", 0))
+            c1 = grid_range.get("startColumnIndex", start.get("columnIndex", 0))
+            if "userEnteredValue" not in payload.get("fields", "") and payload.get("fields") != "*":
+                return {}
+            if not payload.get("rows"):
+                r2, c2 = grid_range.get("endRowIndex"), grid_range.get("endColumnIndex")
+                self._clear(sheet, r1, c1, r2 - 1 if r2 else None, c2 - 1 if c2 else None)
+                return {}
+            values = []
+            for row in payload["rows"]:
+                cells = []
+                for cell in row.get("values", []):
+                    entered = cell.get("userEnteredValue", {})
+                    value = next(iter(entered.values()), "") if entered else ""
+                    cells.append(value)
+                values.append(cells)
+            self._write(sheet, r1, c1, values, "RAW")
+            return {}
+
+        # Format, filter, border, dsb. tidak mengubah nilai sel
+        return {}
+
+    def _fit_to_grid(self, sheet):
+        """Data di luar grid terhapus saat grid diperkecil (seperti Sheets)"""
+        grid = sheet["properties"]["gridProperties"]
+        del sheet["rows"][grid["rowCount"]:]
+        for row in sheet["rows"]:
+            del row[grid["columnCount"]:]
+        sheet["rows"] = self._trimmed(sheet["rows"])
+
+    def _values_get(self, spreadsheet_id, a1, params, **kwargs):
+        sheet, r1, c1, r2, c2 = self._resolve_range(self._spreadsheet(spreadsheet_id), a1)
+        return self._read(sheet, r1, c1, r2, c2, params)
+
+    def _values_batch_get(self, spreadsheet_id, params, **kwargs):
+        ranges = params.get("ranges", [])
+        ranges = [ranges] if isinstance(ranges, str) else ranges
+        spreadsheet = self._spreadsheet(spreadsheet_id)
+        return {"spreadsheetId": spreadsheet_id,
+                "valueRanges": [self._read(*self._resolve_range(spreadsheet, a1), params) for a1 in ranges]}
+
+    def _update_one(self, spreadsheet, a1, values, input_option, major="ROWS"):
+        sheet, r1, c1, r2, c2 = self._resolve_range(spreadsheet, a1)
+        # Range satu sel hanya titik awal; range lebih besar membatasi data yang ditulis
+        limit = None if (r1, c1) == (r2, c2) else (r2, c2)
+        return self._write(sheet, r1 or 0, c1 or 0, values or [], input_option, limit=limit, major=major)
+
+    def _values_update(self, spreadsheet_id, a1, params, body, **kwargs):
+        request = _json_body(body)
+        result = self._update_one(self._spreadsheet(spreadsheet_id), a1, request.get("values"),
+                                  params.get("valueInputOption", "RAW"), request.get("majorDimension", "ROWS"))
+        self.files[spreadsheet_id]["modifiedTime"] = _now_rfc3339()
+        return dict(result, spreadsheetId=spreadsheet_id)
+
+    def _values_batch_update(self, spreadsheet_id, body, **kwargs):
+        request = _json_body(body)
+        spreadsheet = self._spreadsheet(spreadsheet_id)
+        input_option = request.get("valueInputOption", "RAW")
+        responses = [dict(self._update_one(spreadsheet, item["range"], item.get("values"), input_option,
+                                           item.get("majorDimension", "ROWS")), spreadsheetId=spreadsheet_id)
+                     for item in request.get("data", [])]
+        self.files[spreadsheet_id]["modifiedTime"] = _now_rfc3339()
+        return {"spreadsheetId": spreadsheet_id,
+                "totalUpdatedRows": sum(r["updatedRows"] for r in responses),
+                "totalUpdatedColumns": max([r["updatedColumns"] for r in responses] or [0]),
+                "totalUpdatedCells": sum(r["updatedCells"] for r in responses),
+                "totalUpdatedSheets": len({r["updatedRange"].rsplit("!", 1)[0] for r in responses}),
+                "responses": responses}
+
+    def _values_append(self, spreadsheet_id, a1, params, body, **kwargs):
+        request = _json_body(body)
+        spreadsheet = self._spreadsheet(spreadsheet_id)
+        sheet, r1, c1, r2, c2 = self._resolve_range(spreadsheet, a1)
+        values = request.get("values") or []
+        start_row = len(self._trimmed(sheet["rows"]))
+        grid = sheet["properties"]["gridProperties"]
+        # append menambah baris grid jika perlu
+        grid["rowCount"] = max(grid["rowCount"], start_row + len(values))
+        grid["columnCount"] = max(grid["columnCount"], (c1 or 0) + max((len(row) for row in values), default=0))
+        updates = self._write(sheet, start_row, c1 or 0, values, params.get("valueInputOption", "RAW"))
+        self.files[spreadsheet_id]["modifiedTime"] = _now_rfc3339()
+        return {"spreadsheetId": spreadsheet_id, "tableRange": a1,
+                "updates": dict(updates, spreadsheetId=spreadsheet_id)}
+
+    def _values_clear(self, spreadsheet_id, a1, **kwargs):
+        sheet, r1, c1, r2, c2 = self._resolve_range(self._spreadsheet(spreadsheet_id), a1)
+        self._clear(sheet, r1, c1, r2, c2)
+        return {"spreadsheetId": spreadsheet_id, "clearedRange": a1}
+
+    def _values_batch_clear(self, spreadsheet_id, body, **kwargs):
+        spreadsheet = self._spreadsheet(spreadsheet_id)
+        ranges = _json_body(body).get("ranges", [])
+        for a1 in ranges:
+            self._clear(*self._resolve_range(spreadsheet, a1))
+        return {"spreadsheetId": spreadsheet_id, "clearedRanges": ranges}
+
+# ============================
+# TRANSPORT
+# ============================
+class FakeCredentials(AnonymousCredentials):
+    """Credentials tanpa token untuk backend palsu"""
+
+    service_account_email = "fake-service-account@verval-pupuk2.local"
+
+    def __init__(self, scopes=()):
+        super().__init__()
+        self.scopes = list(scopes)
+
+class FakeHttp(httplib2.Http):
+    """Pengganti httplib2.Http untuk googleapiclient: request dilayani FakeGoogleBackend"""
+
+    def __init__(self, backend):
+        super().__init__()
+        self.backend = backend
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=5, connection_type=None):
+        status, response_headers, content = self.backend.handle(method, uri, headers, body)
+        return httplib2.Response(dict(response_headers, status=str(status))), content
+
+class FakeRequestsAdapter(BaseAdapter):
+    """Transport adapter requests untuk gspread: request dilayani FakeGoogleBackend"""
+
+    def __init__(self, backend):
+        super().__init__()
+        self.backend = backend
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        status, response_headers, content = self.backend.handle(
+            request.method, request.url, dict(request.headers), request.body)
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(response_headers)
+        response._content = content
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        response.reason = STATUS_NAMES.get(status, "OK")
+        return response
+
+    def close(self):
+        pass
+
+# ============================
+# PEMASANGAN
+# ============================
+def install_fake_backend(backend=None):
+    """Pasang backend palsu sebagai factory bersama google_clients, return backend"""
+    from google_clients import ClientFactory, set_client_factory
+
+    backend = backend or FakeGoogleBackend()
+    set_client_factory(ClientFactory(backend=backend))
+    return backend
@@ -0,0 +1,181 @@
+"""
+google_clients.py
+Factory bersama untuk credentials, client gspread dan service googleapiclient.
+
+Sebelumnya setiap script membuat Credentials, gspread.authorize() dan
+build("drive"/"sheets") sendiri, sebagian langsung saat import (butuh secret
+hanya untuk import), dan ada fungsi yang membangun Drive service baru di
+setiap panggilan. ClientFactory membuat semuanya saat pertama dipakai lalu
+menyimpannya:
+- credentials service account dibaca sekali dari
+  GOOGLE_APPLICATION_CREDENTIALS_JSON (per kombinasi scope);
+- dokumen discovery API diparse sekali per proses, service berikutnya dibangun
+  dari dokumen yang sama (build_from_document);
+- service googleapiclient dibuat satu per thread, masing-masing dengan
+  httplib2.Http sendiri yang menjaga koneksi TLS tetap terbuka (httplib2 tidak
+  aman dipakai bersama antar thread);
+- client gspread memakai satu requests session dengan pool koneksi
+  keep-alive yang cukup besar untuk upload bersamaan.
+
+Konfigurasi lewat environment variable:
+- GOOGLE_HTTP_TIMEOUT   : timeout request googleapiclient (detik, default 120)
+- GOOGLE_HTTP_POOL_SIZE : ukuran pool koneksi gspread (default 16)
+
+Untuk benchmark offline, ClientFactory(backend=...) memakai backend palsu
+(fake_google.FakeGoogleBackend) sebagai pengganti Google: credentials tanpa
+secret, dan semua request gspread / googleapiclient dilayani backend tersebut.
+
+Lokasi: verval-pupuk2/scripts/google_clients.py
+"""
+
+import os
+import json
+import threading
+
+# ============================
+# KONFIGURASI
+# ============================
+GOOGLE_SCOPES = (
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive",
+)
+DRIVE_SCOPES = ("https://www.googleapis.com/auth/drive",)
+HTTP_TIMEOUT = float(os.getenv("GOOGLE_HTTP_TIMEOUT", "120"))
+HTTP_POOL_SIZE = max(1, int(os.getenv("GOOGLE_HTTP_POOL_SIZE", "16")))
+
+# ============================
+# KELAS FACTORY
+# ============================
+class ClientFactory:
+    """Credentials, client gspread dan service Google API yang dibuat sekali lalu dipakai ulang"""
+
+    def __init__(self, credentials_json=None, backend=None):
+        self._credentials_json = credentials_json  # None: baca env saat pertama dibutuhkan
+        self._backend = backend  # None: Google asli; fake_google.FakeGoogleBackend untuk offline
+        self._credentials = {}  # tuple scope -> Credentials
+        self._gspread_clients = {}  # id(credentials) -> (credentials, gspread.Client)
+        self._documents = {}  # (api, version) -> dokumen discovery (dict)
+        self._local = threading.local()
+        self._lock = threading.RLock()
+
+    # ---------- credentials ----------
+    def credentials(self, scopes=GOOGLE_SCOPES):
+        """Credentials service account untuk scopes ini (dibuat sekali)"""
+        key = tuple(scopes)
+        with self._lock:
+            if key not in self._credentials and self._backend is not None:
+                self._credentials[key] = self._backend.credentials(key)
+            if key not in self._credentials:
+                creds_json = self._credentials_json or os.getenv("GOOGLE_APPLICATION_CREDENTIALS_JSON")
+                if not creds_json:
+                    raise ValueError("❌ SECRET GOOGLE_APPLICATION_CREDENTIALS_JSON TIDAK TERBACA")
+                from google.oauth2.service_account import Credentials
+
+                self._credentials[key] = Credentials.from_service_account_info(
+                    json.loads(creds_json), scopes=list(key)
+                )
+            return self._credentials[key]
+
+    # ---------- gspread ----------
+    def gspread_client(self, credentials=None):
+        """Client gspread bersama (session keep-alive dengan pool HTTP_POOL_SIZE koneksi)"""
+        credentials = credentials or self.credentials()
+        with self._lock:
+            cached = self._gspread_clients.get(id(credentials))
+            if cached is None or cached[0] is not credentials:
+                import gspread
+                from requests.adapters import HTTPAdapter
+
+                client = gspread.authorize(credentials)
+                if self._backend is not None:
+                    adapter = self._backend.requests_adapter()
+                else:
+                    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+                # client.http_client hanya ada di gspread 6; versi lain tetap jalan tanpa pool sendiri
+                session = getattr(getattr(client, "http_client", None), "session", None)
+                if session is not None:
+                    session.mount("https://", adapter)
+                else:
+                    print(f"⚠️  gspread {gspread.__version__}: session HTTP tidak bisa diatur, memakai bawaan")
+                cached = (credentials, client)
+                self._gspread_clients[id(credentials)] = cached
+            return cached[1]
+
+    # ---------- googleapiclient ----------
+    def _discovery_document(self, api, version):
+        """Dokumen discovery yang sudah diparse (None jika tidak ada versi statis)"""
+        key = (api, version)
+        with self._lock:
+            if key not in self._documents:
+                from googleapiclient import discovery_cache
+
+                document = discovery_cache.get_static_doc(api, version)
+                self._documents[key] = json.loads(document) if document else None
+            return self._documents[key]
+
+    def service(self, api, version, credentials=None):
+        """Service googleapiclient milik thread ini (satu httplib2.Http keep-alive per thread)"""
+        credentials = credentials or self.credentials()
+        services = getattr(self._local, "services", None)
+        if services is None:
+            services = self._local.services = {}
+        cached = services.get((api, version))
+        if cached is None or cached[0] is not credentials:
+            from googleapiclient.discovery import build, build_from_document
+
+            if self._backend is not None:
+                authorized_http = self._backend.http()
+            else:
+                import httplib2
+                import google_auth_httplib2
+
+                authorized_http = google_auth_httplib2.AuthorizedHttp(
+                    credentials, http=httplib2.Http(timeout=HTTP_TIMEOUT)
+                )
+            document = self._discovery_document(api, version)
+            if document is not None:
+                service = build_from_document(document, http=authorized_http)
+            else:
+                service = build(api, version, http=authorized_http, cache_discovery=False)
+            cached = (credentials, service)
+            services[(api, version)] = cached
+        return cached[1]
+
+    def drive(self, credentials=None):
+        return self.service("drive", "v3", credentials)
+
+    def sheets(self, credentials=None):
+        return self.service("sheets", "v4", credentials)
+
+# ============================
+# FACTORY BERSAMA
+# ============================
+_default_factory = None
+_default_factory_lock = threading.Lock()
+
+def get_client_factory():
+    """Factory bersama (satu per proses)"""
+    global _default_factory
+    with _default_factory_lock:
+        if _default_factory is None:
+            _default_factory = ClientFactory()
+        return _default_factory
+
+def set_client_factory(factory):
+    """Ganti factory bersama (mis. ClientFactory(backend=...) untuk benchmark), return factory lama"""
+    global _default_factory
+    with _default_factory_lock:
+        previous, _default_factory = _default_factory, factory
+        return previous
+
+def get_credentials(scopes=GOOGLE_SCOPES):
+    return get_client_factory().credentials(scopes)
+
+def get_gspread_client(credentials=None):
+    return get_client_factory().gspread_client(credentials)
+
+def get_drive_service(credentials=None):
+    return get_client_factory().drive(credentials)
+
+def get_sheets_service(credentials=None):
+    return get_client_factory().sheets(credentials)
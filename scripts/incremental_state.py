@@ -0,0 +1,178 @@
+"""
+incremental_state.py
+State per file untuk pemrosesan inkremental berdasarkan versi file di Drive.
+
+Data realisasi hanya bertambah, tetapi setiap malam semua file diproses
+ulang dari awal. Modul ini menyimpan hasil olahan per file (baris per NIK,
+ringkasan per file, log) bersama fileId + modifiedTime/md5Checksum. Pada
+run berikutnya file yang versinya sama tidak di-parse lagi: hasil
+tersimpan langsung dipakai, dan hanya file baru/berubah yang diproses lalu
+digabung. File yang sudah tidak ada di folder dibuang dari state.
+
+Setiap script memakai namespace sendiri dan LOGIC_VERSION: naikkan versi
+tersebut jika cara memproses satu file berubah, supaya state lama tidak
+dipakai lagi.
+
+Konfigurasi lewat environment variable:
+- INCREMENTAL_STATE_DIR     : lokasi state (default ~/.cache/verval-pupuk2/state)
+- INCREMENTAL_STATE_ENABLED : "0" untuk memproses ulang semua file
+
+Lokasi: verval-pupuk2/scripts/incremental_state.py
+"""
+
+import os
+import json
+import time
+import pickle
+import hashlib
+
+# ============================
+# KONFIGURASI
+# ============================
+INCREMENTAL_STATE_DIR = os.getenv(
+    "INCREMENTAL_STATE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "verval-pupuk2", "state")
+)
+INCREMENTAL_STATE_ENABLED = os.getenv("INCREMENTAL_STATE_ENABLED", "1").strip().lower() not in ("0", "false", "no")
+
+INDEX_FILENAME = "index.json"
+
+# ============================
+# FUNGSI UTILITY
+# ============================
+def file_version(file_meta):
+    """Versi file Drive: md5Checksum (file biasa) atau modifiedTime (Google Sheets)"""
+    return file_meta.get("md5Checksum") or file_meta.get("modifiedTime")
+
+def _atomic_write(path, write_func, mode="wb"):
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, mode) as f:
+        write_func(f)
+    os.replace(tmp_path, path)
+
+# ============================
+# KELAS STATE
+# ============================
+class IncrementalState:
+    """Hasil olahan per fileId untuk satu script (namespace)"""
+
+    def __init__(self, namespace, logic_version, state_dir=INCREMENTAL_STATE_DIR, enabled=INCREMENTAL_STATE_ENABLED):
+        self.namespace = namespace
+        self.logic_version = str(logic_version)
+        self.enabled = enabled
+        self.state_dir = os.path.join(state_dir, namespace)
+        self.index_path = os.path.join(self.state_dir, INDEX_FILENAME)
+        self.stats = {"reused": 0, "processed": 0, "removed": 0}
+        self.index = {}
+
+        if self.enabled:
+            try:
+                os.makedirs(self.state_dir, exist_ok=True)
+                self.index = self._load_index()
+            except OSError as e:
+                print(f"⚠️  State inkremental dimatikan, folder {self.state_dir} tidak bisa dibuat: {e}")
+                self.enabled = False
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self):
+        _atomic_write(self.index_path, lambda f: json.dump(self.index, f, indent=1), mode="w")
+
+    def _partial_path(self, file_id):
+        return os.path.join(self.state_dir, hashlib.sha256(file_id.encode("utf-8")).hexdigest() + ".pkl")
+
+    def _remove_entry(self, file_id):
+        self.index.pop(file_id, None)
+        try:
+            os.remove(self._partial_path(file_id))
+        except OSError:
+            pass
+
+    def get(self, file_meta):
+        """Hasil tersimpan untuk file ini jika versi file dan LOGIC_VERSION masih sama"""
+        file_id = file_meta.get("id")
+        version = file_version(file_meta)
+        if not self.enabled or not file_id or not version:
+            return None
+
+        entry = self.index.get(file_id)
+        if (not entry or entry.get("version") != version
+                or entry.get("logic_version") != self.logic_version
+                or entry.get("name") != file_meta.get("name")):
+            return None
+
+        try:
+            with open(self._partial_path(file_id), "rb") as f:
+                return pickle.load(f)
+        except Exception as e:
+            print(f"   ⚠️  State {file_meta.get('name')} rusak, file diproses ulang: {e}")
+            self._remove_entry(file_id)
+            return None
+
+    def put(self, file_meta, partial):
+        """Simpan hasil olahan satu file"""
+        file_id = file_meta.get("id")
+        version = file_version(file_meta)
+        if not self.enabled or not file_id or not version:
+            return
+
+        try:
+            _atomic_write(self._partial_path(file_id),
+                          lambda f: pickle.dump(partial, f, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception as e:
+            print(f"   ⚠️  Gagal menyimpan state {file_meta.get('name')}: {e}")
+            return
+
+        self.index[file_id] = {
+            "name": file_meta.get("name"),
+            "version": version,
+            "modified_time": file_meta.get("modifiedTime"),
+            "logic_version": self.logic_version,
+            "updated": time.time()
+        }
+        self._save_index()
+
+    def get_or_compute(self, file_meta, compute):
+        """
+        Pakai hasil tersimpan jika file tidak berubah, jika tidak jalankan
+        compute() lalu simpan hasilnya. Return (partial, from_state).
+        compute() boleh mengembalikan None (file gagal/tidak valid): hasil
+        seperti ini tidak disimpan agar dicoba lagi pada run berikutnya.
+        """
+        partial = self.get(file_meta)
+        if partial is not None:
+            self.stats["reused"] += 1
+            print(f"   ♻️  {file_meta.get('name')}: tidak berubah sejak run sebelumnya, pakai hasil tersimpan")
+            return partial, True
+
+        self.stats["processed"] += 1
+        partial = compute()
+        if partial is not None:
+            self.put(file_meta, partial)
+        return partial, False
+
+    def prune(self, active_file_ids):
+        """Buang state file yang sudah tidak ada di folder Drive"""
+        if not self.enabled:
+            return
+        active_file_ids = set(active_file_ids)
+        stale_ids = [file_id for file_id in self.index if file_id not in active_file_ids]
+        for file_id in stale_ids:
+            print(f"   🧹 State: hapus {self.index[file_id].get('name')} (sudah tidak ada di Drive)")
+            self._remove_entry(file_id)
+            self.stats["removed"] += 1
+        if stale_ids:
+            self._save_index()
+
+    def print_summary(self):
+        """Tampilkan ringkasan pemakaian state"""
+        if not self.enabled:
+            print("ℹ️  State inkremental tidak aktif, semua file diproses ulang")
+            return
+        print(f"📦 State inkremental ({self.namespace}): {self.stats['reused']} file dipakai ulang, "
+              f"{self.stats['processed']} file diproses, {self.stats['removed']} dihapus")
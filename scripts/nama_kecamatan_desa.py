@@ -15,12 +15,9 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload, MediaFileUpload
 import io
 import warnings
-warnings.filterwarnings('ignore')
+from google_clients import get_drive_service
 
 # ============================
 # KONFIGURASI
@@ -81,6 +78,8 @@ def get_service_account_creds():
     
     try:
         # Parse JSON dari environment variable
+        from google.oauth2 import service_account
+
         service_account_info = json.loads(service_account_json)
         return service_account.Credentials.from_service_account_info(
             service_account_info,
@@ -95,7 +94,7 @@ def authenticate_drive():
     """Autentikasi ke Google Drive API"""
     try:
         creds = get_service_account_creds()
-        service = build('drive', 'v3', credentials=creds)
+        service = get_drive_service(creds)
         print(f"✓ Authenticated as: {creds.service_account_email}")
         return service
     except Exception as e:
@@ -104,6 +103,8 @@ def authenticate_drive():
 
 def download_file(service, file_id, file_name):
     """Download file dari Google Drive"""
+    from googleapiclient.http import MediaIoBaseDownload
+
     request = service.files().get_media(fileId=file_id)
     fh = io.BytesIO()
     downloader = MediaIoBaseDownload(fh, request)
@@ -122,6 +123,8 @@ def download_file(service, file_id, file_name):
 
 def update_file(service, file_id, file_path):
     """Update file yang sudah ada di Google Drive (overwrite)"""
+    from googleapiclient.http import MediaFileUpload
+
     media = MediaFileUpload(
         file_path,
         mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
@@ -403,6 +406,38 @@ def send_detailed_email_notification(results):
         print(f"❌ Gagal mengirim email laporan: {str(e)}")
         return False
 
+# ============================
+# FUNGSI LOOKUP KODE DESA
+# ============================
+
+# Kemungkinan nama kolom kode desa di file ERDKK (urutan = prioritas)
+KODE_DESA_COLUMNS = ['Kode Desa', 'Kode_Desa', 'KodeDesa', 'KODE DESA', 'KODES', 'Kode']
+
+def text_series(series):
+    """Nilai teks yang sudah di-strip (nilai kosong -> '')"""
+    return series.astype(str).str.strip().where(series.notna(), '')
+
+def build_kode_mapping(kode_desa_values, value_column):
+    """Series kode desa -> nilai (nilai kosong dilewati, kode berulang pakai baris terakhir)"""
+    if value_column is None:
+        return pd.Series(dtype=object)
+    values = text_series(value_column)
+    mapping = pd.Series(values.to_numpy(dtype=object), index=kode_desa_values.to_numpy(dtype=object))
+    mapping = mapping[(mapping.index != '') & (mapping != '')]
+    return mapping[~mapping.index.duplicated(keep='last')]
+
+def resolve_kode_desa(erdkk_df):
+    """Kode desa per baris dari kolom kandidat pertama yang terisi ('' jika tidak ada)"""
+    kode_desa = pd.Series('', index=erdkk_df.index, dtype=object)
+    found = pd.Series(False, index=erdkk_df.index)
+    for col_name in KODE_DESA_COLUMNS:
+        if col_name not in erdkk_df.columns:
+            continue
+        take = ~found & erdkk_df[col_name].notna()
+        kode_desa[take] = erdkk_df.loc[take, col_name].astype(str).str.strip()
+        found |= take
+    return kode_desa
+
 # ============================
 # PROSES UTAMA
 # ============================
@@ -439,20 +474,11 @@ def process_erdkk_files():
                 kode_df = kode_df.rename(columns={variation: standard_name})
                 break
     
-    # Buat mapping kode desa ke kecamatan dan desa
-    kode_to_kecamatan = {}
-    kode_to_desa = {}
-    
-    for _, row in kode_df.iterrows():
-        kode_desa = str(row['Kode Desa']).strip()
-        kecamatan = str(row['KECAMATAN']).strip() if 'KECAMATAN' in kode_df.columns and pd.notna(row['KECAMATAN']) else ''
-        desa = str(row['Desa']).strip() if 'Desa' in kode_df.columns and pd.notna(row['Desa']) else ''
-        
-        if kode_desa:
-            if kecamatan:
-                kode_to_kecamatan[kode_desa] = kecamatan
-            if desa:
-                kode_to_desa[kode_desa] = desa
+    # Buat mapping kode desa ke kecamatan dan desa (Series ber-index kode desa,
+    # kode yang muncul berulang memakai baris terakhir)
+    kode_desa_values = kode_df['Kode Desa'].astype(str).str.strip()
+    kode_to_kecamatan = build_kode_mapping(kode_desa_values, kode_df.get('KECAMATAN'))
+    kode_to_desa = build_kode_mapping(kode_desa_values, kode_df.get('Desa'))
     
     print(f"✅ Mapping berhasil dibuat:")
     print(f"  📍 Kode desa → kecamatan: {len(kode_to_kecamatan)} entri")
@@ -556,58 +582,37 @@ def process_erdkk_files():
                 print(f"✅ Kolom 'Nama Desa' ditambahkan di akhir file")
             
             # =============== ISI DATA KECAMATAN DAN DESA ===============
-            kecamatan_data = []
-            desa_data = []
-            kecamatan_updated_count = 0
-            desa_updated_count = 0
-            kecamatan_found = None
+            # 1. Kode desa: kolom kandidat pertama yang terisi di setiap baris
+            kode_desa = resolve_kode_desa(erdkk_df)
             
-            for idx, row in erdkk_df.iterrows():
-                # 1. Dapatkan kode desa dari berbagai kemungkinan nama kolom
-                kode_desa = ''
-                kode_col_names = ['Kode Desa', 'Kode_Desa', 'KodeDesa', 'KODE DESA', 'KODES', 'Kode']
-                
-                for col_name in kode_col_names:
-                    if col_name in erdkk_df.columns:
-                        kode_val = row[col_name]
-                        if pd.notna(kode_val):
-                            kode_desa = str(kode_val).strip()
-                            break
-                
-                # 2. Dapatkan data dari mapping
-                kecamatan_from_mapping = kode_to_kecamatan.get(kode_desa, '')
-                desa_from_mapping = kode_to_desa.get(kode_desa, '')
-                
-                # 3. Dapatkan data yang sudah ada di file
-                current_kecamatan = str(row[kecamatan_col_name]).strip() if pd.notna(row[kecamatan_col_name]) else ''
-                current_desa = str(row[desa_col_name]).strip() if pd.notna(row[desa_col_name]) else ''
-                
-                # 4. Tentukan nilai akhir (prioritas: data mapping > data existing)
-                final_kecamatan = kecamatan_from_mapping if kecamatan_from_mapping else current_kecamatan
-                final_desa = desa_from_mapping if desa_from_mapping else current_desa
-                
-                # 5. Hitung berapa data yang diperbarui
-                if kecamatan_from_mapping and (not current_kecamatan or current_kecamatan != kecamatan_from_mapping):
-                    kecamatan_updated_count += 1
-                
-                if desa_from_mapping and (not current_desa or current_desa != desa_from_mapping):
-                    desa_updated_count += 1
-                
-                kecamatan_data.append(final_kecamatan)
-                desa_data.append(final_desa)
-                
-                # 6. Catat kecamatan pertama yang ditemukan untuk rename file
-                if final_kecamatan and kecamatan_found is None:
-                    kecamatan_found = final_kecamatan
+            # 2. Dapatkan data dari mapping
+            kecamatan_from_mapping = kode_desa.map(kode_to_kecamatan).fillna('')
+            desa_from_mapping = kode_desa.map(kode_to_desa).fillna('')
+            
+            # 3. Dapatkan data yang sudah ada di file
+            current_kecamatan = text_series(erdkk_df[kecamatan_col_name])
+            current_desa = text_series(erdkk_df[desa_col_name])
+            
+            # 4. Tentukan nilai akhir (prioritas: data mapping > data existing)
+            kecamatan_data = kecamatan_from_mapping.where(kecamatan_from_mapping != '', current_kecamatan)
+            desa_data = desa_from_mapping.where(desa_from_mapping != '', current_desa)
+            
+            # 5. Hitung berapa data yang diperbarui
+            kecamatan_updated_count = int(((kecamatan_from_mapping != '') & (current_kecamatan != kecamatan_from_mapping)).sum())
+            desa_updated_count = int(((desa_from_mapping != '') & (current_desa != desa_from_mapping)).sum())
+            
+            # 6. Catat kecamatan pertama yang ditemukan untuk rename file
+            kecamatan_terisi = kecamatan_data[kecamatan_data != '']
+            kecamatan_found = kecamatan_terisi.iat[0] if not kecamatan_terisi.empty else None
             
             # Update kolom Kecamatan dan Desa
-            erdkk_df[kecamatan_col_name] = kecamatan_data
-            erdkk_df[desa_col_name] = desa_data
+            erdkk_df[kecamatan_col_name] = kecamatan_data.to_numpy(dtype=object)
+            erdkk_df[desa_col_name] = desa_data.to_numpy(dtype=object)
             
             # Hitung statistik
             total_rows = len(erdkk_df)
-            kecamatan_filled = sum(1 for x in kecamatan_data if x)
-            desa_filled = sum(1 for x in desa_data if x)
+            kecamatan_filled = len(kecamatan_terisi)
+            desa_filled = int((desa_data != '').sum())
             fill_percentage = ((kecamatan_filled + desa_filled) / (total_rows * 2) * 100) if total_rows > 0 else 0
             
             print(f"✅ Data berhasil diproses:")
@@ -703,6 +708,7 @@ def process_erdkk_files():
 
 def main():
     """Fungsi utama"""
+    warnings.filterwarnings('ignore')
     print("\n" + "="*60)
     print("🚀 SCRIPT UPDATE & VERIFIKASI DATA KECAMATAN & DESA ERDKK")
     print("="*60)
@@ -0,0 +1,99 @@
+"""
+nik_utils.py
+Pembersihan NIK/KTP untuk satu kolom sekaligus (vectorized).
+
+Dulu setiap script punya clean_nik sendiri yang dijalankan per sel lewat
+.apply dan mencetak peringatan untuk setiap NIK yang tidak standar.
+Di sini satu kolom dibersihkan sekaligus: setiap NIK unik dibersihkan
+sekali, hasilnya disebar ke semua baris dengan indexing numpy, dan semua
+perbaikan diringkas dalam satu laporan.
+
+Aturan pembersihan:
+- semua karakter non-angka dibuang (', `, spasi, titik, dll.)
+- akhiran ".0" dibuang dulu (NIK dari sel angka yang terbaca sebagai float)
+- nilai kosong / tanpa angka -> None
+- pad_to_length=True: NIK yang lebih pendek dari NIK_LENGTH diberi nol di
+  depan (leading zero yang hilang karena sel dibaca sebagai angka).
+  NIK yang lebih panjang tidak pernah dipotong.
+- NIK yang panjangnya tetap bukan NIK_LENGTH tidak diubah, hanya dihitung
+  di ringkasan ('nonstandard').
+
+Lokasi: verval-pupuk2/scripts/nik_utils.py
+"""
+
+import re
+import numpy as np
+import pandas as pd
+
+# ============================
+# KONFIGURASI
+# ============================
+NIK_LENGTH = 16
+MAX_SUMMARY_EXAMPLES = 5
+
+# Karakter yang sering menempel di tepi NIK hasil export
+EDGE_CHARACTERS = " '`\"\t\r\n"
+
+# ".0" di akhir = sel angka yang terbaca sebagai float, sisanya semua non-angka
+NON_DIGIT_PATTERN = re.compile(r'\.0+$|\D')
+
+# ============================
+# FUNGSI UTAMA
+# ============================
+def clean_nik_series(series, pad_to_length=False, length=NIK_LENGTH):
+    """
+    Bersihkan satu kolom NIK. Return (series_bersih, ringkasan).
+
+    Pembersihan dilakukan per nilai unik (pd.factorize) lalu disebar ke
+    semua baris, sehingga NIK yang muncul berkali-kali hanya diproses sekali.
+
+    Ringkasan berisi jumlah baris ('total'), NIK kosong ('empty'), NIK yang
+    isinya berubah ('changed'), NIK yang diberi nol di depan ('padded'),
+    NIK yang panjangnya bukan `length` ('nonstandard') dan beberapa contoh
+    NIK tidak standar ('examples').
+    """
+    codes, uniques = pd.factorize(series)
+    originals = [value if isinstance(value, str) else str(value) for value in uniques.tolist()]
+
+    # Jalur cepat: kebanyakan NIK hanya diberi tanda ' / ` / spasi di tepi,
+    # regex hanya untuk nilai yang masih berisi karakter lain
+    cleaned = [value.strip(EDGE_CHARACTERS) for value in originals]
+    for i in [i for i, value in enumerate(cleaned) if not value.isdecimal()]:
+        cleaned[i] = NON_DIGIT_PATTERN.sub('', cleaned[i])
+
+    lengths = np.fromiter(map(len, cleaned), dtype=np.int64, count=len(cleaned))
+    short = (lengths > 0) & (lengths < length) if pad_to_length else np.zeros(len(cleaned), dtype=bool)
+    for i in np.flatnonzero(short):
+        cleaned[i] = cleaned[i].zfill(length)
+    lengths[short] = length
+
+    # Slot terakhir dipakai untuk nilai kosong (kode -1 dari factorize)
+    filled = np.append(lengths > 0, False)
+    cleaned_values = np.array(cleaned + [None], dtype=object)
+    cleaned_values[~filled] = None
+    changed = filled & np.append(np.array(originals, dtype=object) != cleaned_values[:-1], False)
+    nonstandard = filled & (np.append(lengths, length) != length)
+
+    summary = {
+        'total': len(series),
+        'empty': int(len(series) - filled[codes].sum()),
+        'changed': int(changed[codes].sum()),
+        'padded': int(np.append(short, False)[codes].sum()),
+        'nonstandard': int(nonstandard[codes].sum()),
+        'examples': [
+            f"{originals[i]} -> {cleaned[i]} (panjang: {len(cleaned[i])})"
+            for i in np.flatnonzero(nonstandard)[:MAX_SUMMARY_EXAMPLES]
+        ]
+    }
+
+    return pd.Series(cleaned_values[codes], index=series.index, name=series.name), summary
+
+def print_nik_summary(summary, label="NIK"):
+    """Cetak ringkasan pembersihan NIK dalam beberapa baris saja"""
+    if not summary['total']:
+        return
+    print(f"   🧹 {label}: {summary['total']:,} baris, {summary['changed']:,} dibersihkan, "
+          f"{summary['padded']:,} ditambah nol, {summary['empty']:,} kosong, "
+          f"{summary['nonstandard']:,} tidak {NIK_LENGTH} digit")
+    for example in summary['examples']:
+        print(f"      ⚠️  NIK tidak standar: {example}")
@@ -0,0 +1,358 @@
+"""
+orchestrator.py
+Menjalankan job malam dalam SATU proses sebagai DAG (task + dependency).
+
+Selama ini setiap job berjalan di workflow sendiri dengan jeda cron
+(data_tebus_versi_web 16:30 "setelah" data_tebus_pubers 16:00, empat job
+sekaligus jam 18:00, sisa_kuota_wa 20:00 setelah sisa_kuota), dan setiap job
+autentikasi ulang, mengunduh ulang dan mem-parse ulang folder yang sama.
+Di orchestrator:
+- task `ingest` mengunduh folder realisasi dan ERDKK sekali, lalu membacanya
+  ke cache memori excel_snapshot (enable_memory_cache) dengan parameter yang
+  sama persis dengan pemanggilan read_excel_cached di setiap job (lihat
+  ingest_reads); job yang membaca file yang sama mendapat salinan DataFrame
+  tanpa membuka Parquet/Excel lagi;
+- credentials, client Google, cache Drive dan rate limiter Sheets dipakai
+  bersama semua job (satu kuota per menit untuk semua job);
+- task yang dependency-nya sudah selesai berjalan bersamaan (thread pool,
+  ORCHESTRATOR_WORKERS); task yang memakai folder lokal yang sama
+  (`resources`) tidak dijalankan bersamaan;
+- task yang gagal membuat task turunannya dilewati, task lain tetap jalan.
+Setiap job tetap dijalankan persis seperti `python scripts/<job>.py`
+(run_job.run_job, tanpa mengubah sys.argv) dan tetap mengirim email
+notifikasinya sendiri. Dijalankan tiap malam oleh workflow
+nightly_orchestrator.yml.
+
+Konfigurasi lewat environment variable:
+- ORCHESTRATOR_WORKERS      : maksimal task bersamaan (default: jumlah CPU, maks 4)
+- ORCHESTRATOR_MEMORY_CACHE : "0" untuk mematikan cache memori hasil ingest
+
+Pemakaian:
+    python scripts/orchestrator.py [task ...] [--check] [--dry-run]
+
+Tanpa nama task semua task malam dijalankan; dengan nama task hanya task
+tersebut beserta dependency-nya.
+
+Lokasi: verval-pupuk2/scripts/orchestrator.py
+"""
+
+import os
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from run_job import JOBS, GOOGLE_SECRETS, check_environment, run_job
+
+# ============================
+# KONFIGURASI
+# ============================
+ORCHESTRATOR_WORKERS = max(1, int(os.getenv("ORCHESTRATOR_WORKERS", str(min(4, os.cpu_count() or 1)))))
+ORCHESTRATOR_MEMORY_CACHE = os.getenv("ORCHESTRATOR_MEMORY_CACHE", "1").strip().lower() not in ("0", "false", "no")
+
+REALISASI_FOLDER_ID = "1AXQdEUW1dXRcdT0m0QkzvT7ZJjN0Vt4E"  # Folder realisasi
+ERDKK_FOLDER_ID = "13N5dLdHzAKff6g8RDRiHa7LFyZbdJUCJ"  # Folder ERDKK
+
+# Task malam -> dependency (`after`) dan folder lokal yang dipakai (`resources`).
+# Tidak termasuk (tetap di workflow sendiri): erdkk_versi_web, erdkk_wa_center
+# dan nama_kecamatan_desa berjalan bulanan (tanggal 1), proses_excel dijalankan
+# cron eksternal (schedule workflow-nya dinonaktifkan).
+NIGHTLY_TASKS = {
+    "ingest": {"after": ()},
+    "data_tebus_pubers": {"after": ("ingest",)},
+    "data_tebus_versi_web": {"after": ("data_tebus_pubers",)},
+    "sisa_kuota": {"after": ("ingest",)},
+    "sisa_kuota_wa": {"after": ("sisa_kuota",)},  # membaca spreadsheet hasil sisa_kuota
+    "erdkk_vs_realisasi": {"after": ("ingest",)},
+    "pivot_pupuk": {"after": ("ingest",), "resources": ("data_excel",)},
+    "pivot_klaster_status": {"after": ("ingest",), "resources": ("data_excel",)},
+    "tebus_petani": {"after": ("ingest",)},
+}
+
+# ============================
+# OUTPUT PER TASK
+# ============================
+_current_task = threading.local()
+
+class TaskOutput:
+    """Pengganti sys.stdout/sys.stderr: setiap baris diberi prefix nama task yang menulis"""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _emit(self, lines):
+        task = getattr(_current_task, "name", None)
+        prefix = f"[{task}] " if task else ""
+        with self._lock:
+            self._stream.write("".join(f"{prefix}{line}\n" for line in lines))
+
+    def write(self, text):
+        buffer = getattr(self._local, "buffer", "") + text
+        *lines, self._local.buffer = buffer.split("\n")
+        if lines:
+            self._emit(lines)
+        return len(text)
+
+    def flush_pending(self):
+        """Tulis sisa baris yang belum diakhiri newline (di akhir task)"""
+        pending = getattr(self._local, "buffer", "")
+        if pending:
+            self._local.buffer = ""
+            self._emit([pending])
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            self._stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+# ============================
+# TASK
+# ============================
+def ingest_reads():
+    """
+    Folder -> pembacaan read_excel_cached job malam: (job, alternatif kwargs).
+    Alternatif dicoba berurutan seperti fallback di job, yang pertama berhasil
+    masuk cache memori. Konstanta diambil dari script job (butuh pandas),
+    jadi fungsi ini hanya dipanggil di dalam task ingest.
+    """
+    from sisa_kuota import REALISASI_USECOLS as SISA_KUOTA_USECOLS, ERDKK_SHEET_OPTIONS
+    from tebus_petani import REALISASI_USECOLS as TEBUS_PETANI_USECOLS
+
+    return {
+        "realisasi": (REALISASI_FOLDER_ID, (
+            (("data_tebus_pubers", "data_tebus_versi_web"), ({"dtype": str},)),
+            # ingest_excel_file: sheet Worksheet, lalu sheet pertama
+            (("erdkk_vs_realisasi",), ({"sheet_name": "Worksheet", "dtype": str},
+                                       {"sheet_name": 0, "dtype": str})),
+            (("pivot_pupuk", "pivot_klaster_status"), ({"sheet_name": "Worksheet"},)),
+            (("sisa_kuota",), ({"dtype": str, "usecols_keywords": SISA_KUOTA_USECOLS},
+                               {"header": 1, "dtype": str, "usecols_keywords": SISA_KUOTA_USECOLS},
+                               {"dtype": str, "engine": "openpyxl", "usecols_keywords": SISA_KUOTA_USECOLS})),
+            (("tebus_petani",), ({"dtype": str, "usecols_keywords": TEBUS_PETANI_USECOLS},)),
+        )),
+        "erdkk": (ERDKK_FOLDER_ID, (
+            (("erdkk_vs_realisasi", "tebus_petani"), ({"dtype": str},)),
+            (("sisa_kuota",), tuple({"sheet_name": sheet, "dtype": str} for sheet in ERDKK_SHEET_OPTIONS)
+                              + ({"sheet_name": 0, "dtype": str},)),
+        )),
+    }
+
+def ingest(selected=None):
+    """Unduh folder realisasi dan ERDKK sekali lalu baca ke cache memori excel_snapshot (hanya untuk job di `selected`)"""
+    from google_clients import get_credentials, get_drive_service
+    from drive_cache import download_files_parallel, get_drive_cache, DRIVE_FILE_FIELDS
+    from excel_snapshot import read_excel_cached
+
+    selected = set(NIGHTLY_TASKS if selected is None else selected)
+    credentials = get_credentials()
+    drive_service = get_drive_service(credentials)
+    for folder_name, (folder_id, reads) in ingest_reads().items():
+        variants = [alternatives for jobs, alternatives in reads if selected.intersection(jobs)]
+        if not variants:
+            continue
+        query = f"'{folder_id}' in parents and (mimeType='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet' or mimeType='application/vnd.ms-excel')"
+        files = drive_service.files().list(q=query, fields=DRIVE_FILE_FIELDS).execute().get("files", [])
+        print(f"📥 Ingest {folder_name}: {len(files)} file")
+
+        for result in download_files_parallel(credentials, [{'file': file} for file in files]):
+            if result['error'] is not None:
+                print(f"   ⚠️  {result['file']['name']}: gagal diunduh ({result['error']}), job akan mengunduh sendiri")
+                continue
+            for alternatives in variants:
+                for read_kwargs in alternatives:
+                    try:
+                        df = read_excel_cached(result['content'], **read_kwargs)
+                        print(f"   ✅ {result['file']['name']} {read_kwargs}: {len(df):,} baris")
+                        break
+                    except Exception as e:
+                        error = e
+                else:
+                    # Tidak fatal: job yang membutuhkan variasi ini membaca sendiri
+                    print(f"   ⚠️  {result['file']['name']} {alternatives[-1]}: {str(error)[:100]}")
+
+    get_drive_cache().print_summary()
+    return 0
+
+def run_task(name, selected=None):
+    """Jalankan satu task, return exit code (`selected`: task yang ikut dijalankan, untuk ingest)"""
+    if name == "ingest":
+        return ingest(selected)
+    return run_job(name)
+
+# ============================
+# PENJADWAL DAG
+# ============================
+def select_tasks(tasks, requested):
+    """Task yang diminta beserta semua dependency-nya (tanpa nama: semua task)"""
+    if not requested:
+        return dict(tasks)
+
+    selected = set()
+    stack = list(requested)
+    while stack:
+        name = stack.pop()
+        if name in selected:
+            continue
+        selected.add(name)
+        stack.extend(tasks[name]["after"])
+    return {name: spec for name, spec in tasks.items() if name in selected}
+
+def execution_order(tasks):
+    """Urutan topologis (validasi siklus dan dependency yang tidak dikenal)"""
+    order, done = [], set()
+    remaining = dict(tasks)
+    while remaining:
+        ready = [name for name, spec in remaining.items() if all(dep in done for dep in spec["after"])]
+        if not ready:
+            unknown = {dep for spec in remaining.values() for dep in spec["after"] if dep not in tasks}
+            raise ValueError(f"❌ Dependency tidak valid: {', '.join(sorted(unknown)) or 'siklus di ' + ', '.join(sorted(remaining))}")
+        for name in ready:
+            order.append(name)
+            done.add(name)
+            remaining.pop(name)
+    return order
+
+def run_dag(tasks, max_workers=ORCHESTRATOR_WORKERS, runner=run_task):
+    """
+    Jalankan tasks sesuai dependency dengan maksimal max_workers task bersamaan.
+    Return dict nama -> {'status': berhasil/gagal/dilewati, 'code', 'elapsed', 'error'}.
+    """
+    execution_order(tasks)  # validasi sebelum mulai
+    results = {}
+    pending = list(tasks)
+    in_flight = {}
+    busy_resources = set()
+    start_time = time.time()
+
+    def execute(name):
+        _current_task.name = name
+        task_start = time.time()
+        try:
+            code = runner(name)
+            error = None
+        except Exception as e:
+            code, error = 1, str(e)
+        finally:
+            for stream in (sys.stdout, sys.stderr):
+                if isinstance(stream, TaskOutput):
+                    stream.flush_pending()
+            _current_task.name = None
+        return code, error, time.time() - task_start
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        while pending or in_flight:
+            # Task dengan dependency gagal/dilewati ikut dilewati
+            for name in list(pending):
+                failed_deps = [dep for dep in tasks[name]["after"]
+                               if dep in results and results[dep]['status'] != "berhasil"]
+                if failed_deps:
+                    pending.remove(name)
+                    results[name] = {'status': "dilewati", 'code': None, 'elapsed': 0.0,
+                                     'error': f"dependency gagal: {', '.join(failed_deps)}"}
+                    print(f"⏭️  {name} dilewati (dependency gagal: {', '.join(failed_deps)})")
+
+            for name in list(pending):
+                if len(in_flight) >= max_workers:
+                    break
+                spec = tasks[name]
+                resources = set(spec.get("resources", ()))
+                if all(results.get(dep, {}).get('status') == "berhasil" for dep in spec["after"]) \
+                        and not (resources & busy_resources):
+                    pending.remove(name)
+                    busy_resources |= resources
+                    print(f"🚀 Mulai {name} (+{time.time() - start_time:.0f} detik)")
+                    in_flight[executor.submit(execute, name)] = name
+
+            if not in_flight:
+                continue
+
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = in_flight.pop(future)
+                busy_resources -= set(tasks[name].get("resources", ()))
+                code, error, elapsed = future.result()
+                status = "berhasil" if code == 0 and error is None else "gagal"
+                results[name] = {'status': status, 'code': code, 'elapsed': elapsed, 'error': error}
+                icon = "✅" if status == "berhasil" else "❌"
+                detail = f", exit code {code}" if code else ""
+                detail += f": {error[:100]}" if error else ""
+                print(f"{icon} {name} {status} dalam {elapsed:.1f} detik{detail}")
+
+    return results
+
+def print_summary(results, total_elapsed):
+    """Ringkasan status dan durasi setiap task"""
+    busy = sum(result['elapsed'] for result in results.values())
+    print("\n" + "=" * 60)
+    print("📊 RINGKASAN ORCHESTRATOR")
+    print("=" * 60)
+    for name, result in results.items():
+        icon = {"berhasil": "✅", "gagal": "❌"}.get(result['status'], "⏭️ ")
+        print(f"{icon} {name:24s} {result['status']:9s} {result['elapsed']:8.1f} detik")
+    print(f"⏱️  Total {total_elapsed:.1f} detik (jumlah durasi task {busy:.1f} detik)")
+
+# ============================
+# FUNGSI UTAMA
+# ============================
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    check_only = "--check" in argv
+    dry_run = "--dry-run" in argv
+    requested = [arg for arg in argv if not arg.startswith("--")]
+
+    unknown = [name for name in requested if name not in NIGHTLY_TASKS]
+    if unknown:
+        print(f"❌ Task tidak dikenal: {', '.join(unknown)}")
+        print(f"   Task tersedia: {', '.join(NIGHTLY_TASKS)}")
+        return 2
+
+    tasks = select_tasks(NIGHTLY_TASKS, requested)
+    print(f"🗂️  Urutan task: {' → '.join(execution_order(tasks))}")
+    print(f"⚙️  Maksimal {ORCHESTRATOR_WORKERS} task bersamaan")
+
+    problems = {}
+    for name in tasks:
+        if name in JOBS:
+            missing = check_environment(name)
+        else:
+            missing = [f"SECRET {secret} TIDAK TERBACA" for secret in GOOGLE_SECRETS if not os.getenv(secret, "").strip()]
+        for problem in missing:
+            problems.setdefault(problem, []).append(name)
+    if problems:
+        print("❌ Environment belum lengkap:")
+        for problem, names in problems.items():
+            print(f"   • {problem} ({', '.join(names)})")
+        return 1
+    print("✅ Environment semua task lengkap")
+    if check_only or dry_run:
+        return 0
+
+    if ORCHESTRATOR_MEMORY_CACHE:
+        from excel_snapshot import enable_memory_cache
+        enable_memory_cache()
+
+    stdout, stderr = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = TaskOutput(stdout), TaskOutput(stderr)
+    start_time = time.time()
+    try:
+        results = run_dag(tasks, runner=lambda name: run_task(name, tasks))
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        sys.stdout, sys.stderr = stdout, stderr
+
+    print_summary(results, time.time() - start_time)
+    if ORCHESTRATOR_MEMORY_CACHE:
+        from excel_snapshot import print_memory_cache_summary, clear_memory_cache
+        print_memory_cache_summary()
+        clear_memory_cache()
+
+    return 0 if all(result['status'] == "berhasil" for result in results.values()) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
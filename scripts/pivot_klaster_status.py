@@ -5,20 +5,19 @@ pivot_klaster_status.py - VERSI DIPERBAIKI DENGAN DEBUGGING MENDALAM
 import os
 import sys
 import pandas as pd
-import gspread
-import re
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from google.oauth2.service_account import Credentials
+from google_clients import get_credentials, get_gspread_client, get_drive_service
 from datetime import datetime, date
 import traceback
 import json
-import time
-from googleapiclient.errors import HttpError
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
-import io
+from drive_cache import get_drive_cache, DRIVE_FILE_FIELDS
+from excel_snapshot import ingest_excel_file, summarize_latest_input
+from nik_utils import clean_nik_series, print_nik_summary
+from status_utils import StatusClassifier
+from sheet_batch_writer import SheetBatchWriter, dataframe_values
+from rate_limiter import get_rate_limiter
 
 # ============================
 # KONFIGURASI
@@ -27,11 +26,8 @@ FOLDER_ID = "1AXQdEUW1dXRcdT0m0QkzvT7ZJjN0Vt4E"
 KECAMATAN_SHEET_URL = "https://docs.google.com/spreadsheets/d/11-fOg3AdSodQeOUwYqkK7GlWSTc1r_1t7pmKGbF9cWI/edit"
 KIOS_SHEET_URL = "https://docs.google.com/spreadsheets/d/1lCPLDLKOtiiUfMCM9cnYv_vXSxaPbbR-TOeLKuBvWxc/edit"
 
-# OPTIMIZED RATE LIMITING
-MAX_RETRIES = 5
-INITIAL_RETRY_DELAY = 30
-WRITE_DELAY = 5
-BATCH_DELAY = 10
+# RATE LIMITING: laju request diatur token bucket bersama (lihat rate_limiter.py)
+SHEETS_LIMITER = get_rate_limiter("sheets")
 
 # Warna untuk header Google Sheets (RGB values 0-1)
 HEADER_FORMAT = {
@@ -221,6 +217,10 @@ def klasifikasikan_status(status_value):
     # 5. Default
     return "LAINNYA"
 
+# Klasifikasi per teks STATUS unik (cache antar file dan antar run).
+# Naikkan version jika aturan klasifikasikan_status diubah.
+STATUS_CLASSIFIER = StatusClassifier(klasifikasikan_status, "pivot_klaster_status", version=1)
+
 def get_klaster_display_name(klaster):
     """
     Konversi nama klaster untuk tampilan sheet
@@ -260,7 +260,7 @@ def debug_status_classification(df, sample_size=10):
     # Analisis untuk setiap status unik
     status_summary = {}
     for status in unique_statuses[:sample_size]:
-        classification = klasifikasikan_status(status)
+        classification = STATUS_CLASSIFIER.classify_value(status)
         
         # Cari apakah ada kurung
         has_brackets = '(' in str(status) or ')' in str(status)
@@ -286,71 +286,6 @@ def debug_status_classification(df, sample_size=10):
 # ============================
 # FUNGSI BANTU UNTUK TANGGAL INPUT
 # ============================
-def extract_latest_input_date_from_files(excel_files):
-    latest_datetime = None
-    found_in_files = 0
-    
-    print("📅 Mencari tanggal input dari semua file...")
-    
-    for file_info in excel_files:
-        file_path = file_info['path']
-        file_name = file_info['name']
-        
-        try:
-            df = pd.read_excel(file_path, sheet_name='Worksheet')
-            
-            tgl_input_cols = [col for col in df.columns if 'TGL INPUT' in col.upper() or 'TANGGAL INPUT' in col.upper()]
-            
-            if tgl_input_cols:
-                tgl_col = tgl_input_cols[0]
-                found_in_files += 1
-                
-                try:
-                    df[tgl_col] = pd.to_datetime(df[tgl_col], errors='coerce', dayfirst=True)
-                except:
-                    try:
-                        df[tgl_col] = pd.to_datetime(df[tgl_col], errors='coerce', format='%d/%m/%Y %H:%M:%S')
-                    except:
-                        try:
-                            df[tgl_col] = pd.to_datetime(df[tgl_col], errors='coerce', format='%d-%m-%Y %H:%M:%S')
-                        except:
-                            try:
-                                df[tgl_col] = pd.to_datetime(df[tgl_col], errors='coerce', format='%d/%m/%Y')
-                            except:
-                                try:
-                                    df[tgl_col] = pd.to_datetime(df[tgl_col], errors='coerce', format='%d-%m-%Y')
-                                except:
-                                    df[tgl_col] = pd.to_datetime(df[tgl_col], errors='coerce')
-                
-                valid_datetimes = df[tgl_col].dropna()
-                
-                if not valid_datetimes.empty:
-                    file_latest_datetime = valid_datetimes.max()
-                    
-                    if latest_datetime is None or file_latest_datetime > latest_datetime:
-                        latest_datetime = file_latest_datetime
-                    
-                    date_str = file_latest_datetime.strftime('%d %b %Y')
-                    time_str = file_latest_datetime.strftime('%H:%M:%S') if pd.notna(file_latest_datetime) else "00:00:00"
-                    print(f"   ✅ {file_name}: Terbaru: {date_str} {time_str}")
-                else:
-                    print(f"   ⚠️  {file_name}: Tidak ada tanggal valid")
-            else:
-                print(f"   ⚠️  {file_name}: Kolom TGL INPUT tidak ditemukan")
-                
-        except Exception as e:
-            print(f"   ❌ Error membaca tanggal dari {file_name}: {str(e)}")
-            continue
-    
-    if latest_datetime:
-        date_str = latest_datetime.strftime('%d %b %Y')
-        time_str = latest_datetime.strftime('%H:%M:%S') if pd.notna(latest_datetime) else "00:00:00"
-        print(f"📅 Tanggal dan waktu input terbaru: {date_str} {time_str}")
-    else:
-        print("📅 Tidak ditemukan data TGL INPUT yang valid")
-    
-    return latest_datetime, found_in_files
-
 def format_date_indonesian(date_obj):
     if not date_obj:
         return "Tidak tersedia"
@@ -378,23 +313,21 @@ def write_update_date_to_sheet(gc, spreadsheet_url, latest_datetime):
         except:
             worksheet = spreadsheet.add_worksheet(title="Sheet1", rows="100", cols="20")
         
-        worksheet.update('E1', [['Update per tanggal input']])
-        time.sleep(WRITE_DELAY)
-        
         if latest_datetime:
             date_formatted = format_date_indonesian(latest_datetime.date())
         else:
             date_formatted = "Tanggal tidak tersedia"
         
-        worksheet.update('E2', [[date_formatted]])
-        time.sleep(WRITE_DELAY)
-        
         if latest_datetime:
             time_formatted = latest_datetime.strftime('%H:%M:%S')
         else:
             time_formatted = "Waktu tidak tersedia"
         
-        worksheet.update('E3', [[time_formatted]])
+        safe_google_api_operation(
+            worksheet.update,
+            values=[['Update per tanggal input'], [date_formatted], [time_formatted]],
+            range_name='E1:E3'
+        )
         
         print(f"   ✅ Tanggal update: {date_formatted} {time_formatted}")
         return True
@@ -406,58 +339,9 @@ def write_update_date_to_sheet(gc, spreadsheet_url, latest_datetime):
 # ============================
 # FUNGSI BANTU LAINNYA
 # ============================
-def clean_nik(nik_value):
-    if pd.isna(nik_value) or nik_value is None:
-        return None
-    nik_str = str(nik_value)
-    cleaned_nik = re.sub(r'\D', '', nik_str)
-    if len(cleaned_nik) != 16:
-        print(f"⚠️  NIK tidak standar: {nik_value} -> {cleaned_nik}")
-    return cleaned_nik if cleaned_nik else None
-
-def exponential_backoff(attempt):
-    base_delay = INITIAL_RETRY_DELAY * (2 ** (attempt - 1))
-    jitter = base_delay * 0.1
-    return base_delay + jitter
-
 def safe_google_api_operation(operation, *args, **kwargs):
-    last_exception = None
-    
-    for attempt in range(1, MAX_RETRIES + 1):
-        try:
-            result = operation(*args, **kwargs)
-            if attempt > 1:
-                print(f"   ✅ Berhasil pada percobaan ke-{attempt}")
-            return result
-            
-        except HttpError as e:
-            last_exception = e
-            if e.resp.status == 429:
-                if attempt < MAX_RETRIES:
-                    wait_time = exponential_backoff(attempt)
-                    print(f"⏳ Quota exceeded, menunggu {wait_time:.1f} detik...")
-                    time.sleep(wait_time)
-                else:
-                    raise e
-            elif e.resp.status in [500, 502, 503, 504]:
-                if attempt < MAX_RETRIES:
-                    wait_time = exponential_backoff(attempt)
-                    print(f"⏳ Server error {e.resp.status}, menunggu {wait_time:.1f} detik...")
-                    time.sleep(wait_time)
-                else:
-                    raise e
-            else:
-                raise e
-        except Exception as e:
-            last_exception = e
-            if attempt < MAX_RETRIES:
-                wait_time = exponential_backoff(attempt)
-                print(f"⏳ Error {type(e).__name__}, menunggu {wait_time:.1f} detik...")
-                time.sleep(wait_time)
-            else:
-                raise e
-    
-    raise last_exception
+    """Panggil Google API sesuai kuota; retry hanya saat throttled (429) atau error sementara"""
+    return SHEETS_LIMITER.call(operation, *args, **kwargs)
 
 def add_total_row(df, pupuk_columns):
     df_with_total = df.copy()
@@ -493,47 +377,36 @@ def add_total_row_with_kios(df, pupuk_columns):
     
     return df_with_total
 
-def apply_header_format(gc, spreadsheet_url, sheet_name):
-    try:
-        spreadsheet = gc.open_by_url(spreadsheet_url)
-        worksheet = spreadsheet.worksheet(sheet_name)
-        
-        worksheet.format('A1:Z1', HEADER_FORMAT)
-        worksheet.columns_auto_resize(0, 20)
-        
-        print(f"   🎨 Format header diterapkan pada {sheet_name}")
-        return True
-    except Exception as e:
-        print(f"   ⚠️  Gagal format header {sheet_name}: {str(e)}")
-        return False
+def apply_header_format(writer, sheet_name):
+    """Antrikan format header dan auto resize kolom ke SheetBatchWriter"""
+    writer.format(sheet_name, 'A1:Z1', HEADER_FORMAT)
+    writer.auto_resize_columns(sheet_name, 0, 20)
 
 # ============================
 # FUNGSI DOWNLOAD FILE
 # ============================
 def download_excel_files_from_drive(credentials, folder_id, save_folder="data_excel"):
     os.makedirs(save_folder, exist_ok=True)
-    drive_service = build('drive', 'v3', credentials=credentials)
+    drive_service = get_drive_service(credentials)
 
     query = f"'{folder_id}' in parents and (mimeType='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet' or mimeType='application/vnd.ms-excel')"
-    results = drive_service.files().list(q=query, fields="files(id, name)").execute()
+    results = drive_service.files().list(q=query, fields=DRIVE_FILE_FIELDS).execute()
     files = results.get("files", [])
 
     if not files:
         raise ValueError("❌ Tidak ada file Excel di folder Google Drive.")
 
+    drive_cache = get_drive_cache()
     paths = []
     for file in files:
         print(f"📥 Downloading: {file['name']}")
-        request = drive_service.files().get_media(fileId=file["id"])
         
         safe_filename = "".join(c for c in file['name'] if c.isalnum() or c in (' ', '-', '_', '.')).rstrip()
         file_path = os.path.join(save_folder, safe_filename)
 
-        with io.FileIO(file_path, 'wb') as fh:
-            downloader = MediaIoBaseDownload(fh, request)
-            done = False
-            while not done:
-                status, done = downloader.next_chunk()
+        _, from_cache = drive_cache.fetch(drive_service, file, file_path)
+        if from_cache:
+            print(f"   ♻️  Dari cache (file tidak berubah)")
 
         paths.append({
             'path': file_path,
@@ -542,6 +415,7 @@ def download_excel_files_from_drive(credentials, folder_id, save_folder="data_ex
         })
 
     print(f"✅ Berhasil download {len(paths)} file Excel")
+    drive_cache.print_summary()
     return paths
 
 # ============================
@@ -553,7 +427,7 @@ def create_pivot_klaster(df, numeric_columns, pivot_type='kecamatan'):
     # PASTIKAN kolom KLASIFIKASI_STATUS sudah ada
     if 'KLASIFIKASI_STATUS' not in df.columns:
         print("   ⚠️  Membuat kolom KLASIFIKASI_STATUS...")
-        df['KLASIFIKASI_STATUS'] = df['STATUS'].apply(klasifikasikan_status)
+        df['KLASIFIKASI_STATUS'] = STATUS_CLASSIFIER.classify_series(df['STATUS'])
     
     # DEBUG: Hitung distribusi per klaster
     print("\n   📊 DISTRIBUSI PER KLASTER:")
@@ -599,46 +473,42 @@ def process_and_upload_pivots(gc, df, numeric_columns, spreadsheet_url, pivot_ty
     if latest_datetime:
         write_update_date_to_sheet(gc, spreadsheet_url, latest_datetime)
     
-    # HAPUS SEMUA SHEET LAMA (kecuali Sheet1)
-    existing_sheets = spreadsheet.worksheets()
-    for sheet in existing_sheets:
-        if sheet.title != "Sheet1":
-            try:
-                spreadsheet.del_worksheet(sheet)
-                print(f"   🗑️  Menghapus sheet lama: {sheet.title}")
-                time.sleep(WRITE_DELAY)
-            except:
-                pass
+    # HAPUS SEMUA SHEET LAMA (kecuali Sheet1), buat & isi sheet klaster sekaligus
+    writer = SheetBatchWriter(spreadsheet, api_call=safe_google_api_operation)
+    existing_sheets = safe_google_api_operation(spreadsheet.worksheets)
+    old_titles = [sheet.title for sheet in existing_sheets if sheet.title != "Sheet1"]
+    writer.delete_sheets(old_titles)
+    for title in old_titles:
+        print(f"   🗑️  Menghapus sheet lama: {title}")
     
-    sheet_count = 0
+    sheet_names = []
     for klaster, pivot_df in pivots.items():
         sheet_name = get_klaster_display_name(klaster)
         row_count = len(pivot_df)
         
         print(f"   📝 Uploading {sheet_name}: {row_count-1} baris data")
-        
-        try:
-            worksheet = spreadsheet.add_worksheet(
-                title=sheet_name, 
-                rows=str(row_count + 10), 
-                cols=str(len(pivot_df.columns) + 5)
-            )
-            
-            worksheet.clear()
-            time.sleep(WRITE_DELAY)
-            
-            worksheet.update(
-                [pivot_df.columns.values.tolist()] + pivot_df.values.tolist()
-            )
-            
-            time.sleep(WRITE_DELAY)
-            apply_header_format(gc, spreadsheet_url, sheet_name)
-            
+        writer.write(
+            sheet_name,
+            dataframe_values(pivot_df),
+            rows=row_count + 10,
+            cols=len(pivot_df.columns) + 5
+        )
+        apply_header_format(writer, sheet_name)
+        sheet_names.append(sheet_name)
+    
+    try:
+        written = set(writer.commit())
+    except Exception as e:
+        print(f"   ❌ Gagal membuat sheet {pivot_type}: {str(e)}")
+        written = set()
+    
+    sheet_count = 0
+    for sheet_name in sheet_names:
+        if sheet_name in written:
+            print(f"   🎨 {sheet_name} ditulis dan diformat")
             sheet_count += 1
-            time.sleep(WRITE_DELAY)
-            
-        except Exception as e:
-            print(f"   ❌ Gagal membuat sheet {sheet_name}: {str(e)}")
+        else:
+            print(f"   ❌ Gagal membuat sheet {sheet_name}")
     
     print(f"📊 Total {pivot_type} sheet dibuat: {sheet_count}")
     return sheet_count
@@ -653,26 +523,13 @@ def process_verval_pupuk_by_klaster():
 
     try:
         # Load credentials
-        creds_json = os.getenv("GOOGLE_APPLICATION_CREDENTIALS_JSON")
-        if not creds_json:
-            raise ValueError("❌ GOOGLE_APPLICATION_CREDENTIALS_JSON tidak ditemukan")
-
-        credentials = Credentials.from_service_account_info(
-            json.loads(creds_json),
-            scopes=[
-                "https://www.googleapis.com/auth/spreadsheets",
-                "https://www.googleapis.com/auth/drive",
-            ],
-        )
-
-        gc = gspread.authorize(credentials)
+        credentials = get_credentials()
+        gc = get_gspread_client(credentials)
 
         # Download files
         excel_files = download_excel_files_from_drive(credentials, FOLDER_ID)
         print(f"📁 Ditemukan {len(excel_files)} file Excel")
 
-        latest_datetime, files_with_date = extract_latest_input_date_from_files(excel_files)
-        
         expected_columns = ['KECAMATAN', 'NO TRANSAKSI', 'KODE KIOS', 'NAMA KIOS', 'NIK', 'NAMA PETANI',
                           'UREA', 'NPK', 'SP36', 'ZA', 'NPK FORMULA', 'ORGANIK', 'ORGANIK CAIR',
                           'TGL TEBUS', 'STATUS']
@@ -680,6 +537,7 @@ def process_verval_pupuk_by_klaster():
         pupuk_columns = ['UREA', 'NPK', 'SP36', 'ZA', 'NPK FORMULA', 'ORGANIK', 'ORGANIK CAIR']
 
         all_data = []
+        file_metas = []
 
         for file_info in excel_files:
             file_path = file_info['path']
@@ -688,7 +546,9 @@ def process_verval_pupuk_by_klaster():
             print(f"\n📖 Memproses: {file_name}")
 
             try:
-                df = pd.read_excel(file_path, sheet_name='Worksheet')
+                # Sekali baca: data + metadata TGL INPUT
+                df, meta = ingest_excel_file(file_path, file_name, fallback_first_sheet=False)
+                file_metas.append(meta)
 
                 missing_columns = [col for col in expected_columns if col not in df.columns]
                 if missing_columns:
@@ -696,7 +556,8 @@ def process_verval_pupuk_by_klaster():
                     continue
 
                 # Clean data
-                df['NIK'] = df['NIK'].apply(clean_nik)
+                df['NIK'], nik_summary = clean_nik_series(df['NIK'])
+                print_nik_summary(nik_summary)
                 df = df[df['NIK'].notna()]
 
                 for col in pupuk_columns:
@@ -707,7 +568,7 @@ def process_verval_pupuk_by_klaster():
                     print(f"   🔍 Analisis status dalam file:")
                     status_counts = df['STATUS'].value_counts()
                     for status, count in status_counts.head(5).items():
-                        classification = klasifikasikan_status(status)
+                        classification = STATUS_CLASSIFIER.classify_value(status)
                         print(f"      • '{status[:50]}...' → {classification}: {count} data")
                 
                 all_data.append(df)
@@ -717,6 +578,9 @@ def process_verval_pupuk_by_klaster():
                 print(f"   ❌ Error: {str(e)}")
                 continue
 
+        print("\n📅 Tanggal input dari semua file:")
+        latest_datetime, files_with_date = summarize_latest_input(file_metas)
+
         if not all_data:
             error_msg = "Tidak ada data yang berhasil diproses!"
             send_email_notification("REKAP KLASTER GAGAL", error_msg, is_success=False)
@@ -741,7 +605,7 @@ def process_verval_pupuk_by_klaster():
         
         # 3. Klasifikasi semua data
         print("\n🎯 MENERAPKAN KLASIFIKASI STATUS...")
-        combined_df['KLASIFIKASI_STATUS'] = combined_df['STATUS'].apply(klasifikasikan_status)
+        combined_df['KLASIFIKASI_STATUS'] = STATUS_CLASSIFIER.classify_series(combined_df['STATUS'])
         
         # 4. Analisis setelah klasifikasi
         print("\n📊 DISTRIBUSI SETELAH KLASIFIKASI:")
@@ -764,22 +628,7 @@ def process_verval_pupuk_by_klaster():
             for i, status in enumerate(sample_statuses):
                 print(f"     {i+1}. '{status}'")
         
-        # Clear old sheets
-        print(f"\n🗑️  MEMBERSIHKAN SHEET LAMA...")
-        
-        for url in [KECAMATAN_SHEET_URL, KIOS_SHEET_URL]:
-            try:
-                spreadsheet = gc.open_by_url(url)
-                sheets = spreadsheet.worksheets()
-                for sheet in sheets:
-                    if sheet.title != "Sheet1":
-                        spreadsheet.del_worksheet(sheet)
-                        print(f"   ✅ Menghapus: {sheet.title}")
-                        time.sleep(WRITE_DELAY)
-            except Exception as e:
-                print(f"   ⚠️  Gagal clear {url}: {str(e)}")
-        
-        # Process pivots
+        # Process pivots (sheet lama dihapus di request yang sama dengan pembuatan sheet baru)
         kecamatan_sheet_count = process_and_upload_pivots(
             gc, combined_df, pupuk_columns, KECAMATAN_SHEET_URL, 'kecamatan', latest_datetime
         )
@@ -840,3 +689,4 @@ Traceback:
 # ============================
 if __name__ == "__main__":
     process_verval_pupuk_by_klaster()
+    SHEETS_LIMITER.print_summary()
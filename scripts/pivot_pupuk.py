@@ -1,16 +1,17 @@
 import os
 import pandas as pd
-import gspread
-import re
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from google.oauth2.service_account import Credentials
+from google_clients import get_credentials, get_gspread_client, get_drive_service
 from datetime import datetime
 import traceback
-import json
-import time
-from googleapiclient.errors import HttpError
+from excel_snapshot import read_excel_cached
+from incremental_state import IncrementalState
+from nik_utils import clean_nik_series, print_nik_summary
+from status_utils import StatusClassifier
+from sheet_batch_writer import SheetBatchWriter, dataframe_values
+from rate_limiter import get_rate_limiter
 
 # ============================
 # KONFIGURASI QUOTA OPTIMIZATION
@@ -19,11 +20,11 @@ FOLDER_ID = "1AXQdEUW1dXRcdT0m0QkzvT7ZJjN0Vt4E"
 MAIN_SHEET_URL = "https://docs.google.com/spreadsheets/d/1qcIGC7Vle9O8dOKJNQjyPW7QIymNX-_I44CUthRDQM0/edit"
 MONTHLY_SHEET_URL = "https://docs.google.com/spreadsheets/d/1LBxLsPSuba7uDJLYnYRBOWyGUbM30dkBo4SOMJD0Xj0/edit"
 
-# OPTIMIZED RATE LIMITING
-MAX_RETRIES = 5
-INITIAL_RETRY_DELAY = 30
-WRITE_DELAY = 5
-BATCH_DELAY = 10
+# RATE LIMITING: laju request diatur token bucket bersama (lihat rate_limiter.py)
+SHEETS_LIMITER = get_rate_limiter("sheets")
+
+# Naikkan jika cara membersihkan satu file realisasi berubah (state lama dibuang)
+INCREMENTAL_LOGIC_VERSION = 2
 
 EMAIL_CONFIG = {
     "smtp_server": os.getenv("SMTP_SERVER", "smtp.gmail.com"),
@@ -132,6 +133,10 @@ def is_status_disetujui_pusat(status_value):
     # Harus memenuhi semua kriteria
     return contains_disetujui and contains_pusat and not contains_menunggu
 
+# Filter ACC PUSAT per teks STATUS unik (cache antar file dan antar run).
+# Naikkan version jika kriteria is_status_disetujui_pusat diubah.
+ACC_PUSAT_CLASSIFIER = StatusClassifier(is_status_disetujui_pusat, "pivot_pupuk_acc_pusat", version=1)
+
 def get_all_status_categories(df):
     """Mendapatkan semua kategori status yang ada dalam data"""
     if 'STATUS' not in df.columns:
@@ -217,16 +222,14 @@ def create_ordered_monthly_sheets(gc, monthly_pivots, monthly_pivots_acc_pusat):
     # Buka spreadsheet bulanan
     monthly_sheet = safe_google_api_operation(gc.open_by_url, MONTHLY_SHEET_URL)
     
+    writer = SheetBatchWriter(monthly_sheet, api_call=safe_google_api_operation)
+    
     # Hapus semua sheet kecuali default pertama
     existing_sheets = safe_google_api_operation(monthly_sheet.worksheets)
     if len(existing_sheets) > 1:
+        writer.delete_sheets([sheet.title for sheet in existing_sheets[1:]])
         for sheet in existing_sheets[1:]:
-            try:
-                safe_google_api_operation(monthly_sheet.del_worksheet, sheet)
-                print(f"   🗑️  Menghapus sheet: {sheet.title}")
-                time.sleep(WRITE_DELAY)
-            except Exception as e:
-                print(f"   ⚠️  Gagal menghapus {sheet.title}: {str(e)}")
+            print(f"   🗑️  Menghapus sheet: {sheet.title}")
     
     # Standardisasi nama bulan untuk kedua dataset
     standardized_acc_pusat = {}
@@ -249,125 +252,40 @@ def create_ordered_monthly_sheets(gc, monthly_pivots, monthly_pivots_acc_pusat):
     print(f"   📅 Data Disetujui Pusat: {list(sorted_acc_pusat.keys())}")
     print(f"   📅 Data All: {list(sorted_all.keys())}")
     
-    # Buat sheet untuk Disetujui Pusat terlebih dahulu (akan muncul di kiri)
-    sheet_count = 0
-    
-    print("\n   🟢 MEMBUAT SHEET DISETUJUI PUSAT:")
+    # Urutan sheet: Disetujui Pusat dulu (kiri), lalu All (kanan), lalu bulan non-standard
+    monthly_sheets = []
     for bulan in BULAN_URUTAN:
         if bulan in sorted_acc_pusat:
-            sheet_name = f"{bulan}_acc_pusat"
-            try:
-                worksheet = safe_google_api_operation(
-                    monthly_sheet.add_worksheet, 
-                    title=sheet_name, 
-                    rows="1000", 
-                    cols="20"
-                )
-                
-                data = sorted_acc_pusat[bulan]
-                safe_google_api_operation(worksheet.clear)
-                time.sleep(WRITE_DELAY)
-                
-                safe_google_api_operation(
-                    worksheet.update,
-                    [data.columns.values.tolist()] + data.values.tolist()
-                )
-                
-                print(f"      ✅ {sheet_name} ({len(data)} baris)")
-                sheet_count += 1
-                time.sleep(WRITE_DELAY)
-                
-            except Exception as e:
-                print(f"      ❌ Gagal membuat {sheet_name}: {str(e)}")
-    
-    # Buat sheet untuk All setelah Disetujui Pusat (akan muncul di kanan)
-    print("\n   🔵 MEMBUAT SHEET ALL:")
+            monthly_sheets.append((f"{bulan}_acc_pusat", sorted_acc_pusat[bulan]))
     for bulan in BULAN_URUTAN:
         if bulan in sorted_all:
-            sheet_name = f"{bulan}_all"
-            try:
-                worksheet = safe_google_api_operation(
-                    monthly_sheet.add_worksheet, 
-                    title=sheet_name, 
-                    rows="1000", 
-                    cols="20"
-                )
-                
-                data = sorted_all[bulan]
-                safe_google_api_operation(worksheet.clear)
-                time.sleep(WRITE_DELAY)
-                
-                safe_google_api_operation(
-                    worksheet.update,
-                    [data.columns.values.tolist()] + data.values.tolist()
-                )
-                
-                print(f"      ✅ {sheet_name} ({len(data)} baris)")
-                sheet_count += 1
-                time.sleep(WRITE_DELAY)
-                
-            except Exception as e:
-                print(f"      ❌ Gagal membuat {sheet_name}: {str(e)}")
+            monthly_sheets.append((f"{bulan}_all", sorted_all[bulan]))
     
     # Handle bulan-bulan yang tidak standar (jika ada)
     non_standard_months = set(list(sorted_acc_pusat.keys()) + list(sorted_all.keys())) - set(BULAN_URUTAN)
+    for bulan in sorted(non_standard_months):
+        if bulan in sorted_acc_pusat:
+            monthly_sheets.append((f"{bulan}_acc_pusat", sorted_acc_pusat[bulan]))
+        if bulan in sorted_all:
+            monthly_sheets.append((f"{bulan}_all", sorted_all[bulan]))
     
-    if non_standard_months:
-        print(f"\n   🟡 MEMBUAT SHEET BULAN NON-STANDARD:")
-        for bulan in sorted(non_standard_months):
-            # Untuk Disetujui Pusat non-standard
-            if bulan in sorted_acc_pusat:
-                sheet_name = f"{bulan}_acc_pusat"
-                try:
-                    worksheet = safe_google_api_operation(
-                        monthly_sheet.add_worksheet, 
-                        title=sheet_name, 
-                        rows="1000", 
-                        cols="20"
-                    )
-                    
-                    data = sorted_acc_pusat[bulan]
-                    safe_google_api_operation(worksheet.clear)
-                    time.sleep(WRITE_DELAY)
-                    
-                    safe_google_api_operation(
-                        worksheet.update,
-                        [data.columns.values.tolist()] + data.values.tolist()
-                    )
-                    
-                    print(f"      ✅ {sheet_name} ({len(data)} baris)")
-                    sheet_count += 1
-                    time.sleep(WRITE_DELAY)
-                    
-                except Exception as e:
-                    print(f"      ❌ Gagal membuat {sheet_name}: {str(e)}")
-            
-            # Untuk All non-standard
-            if bulan in sorted_all:
-                sheet_name = f"{bulan}_all"
-                try:
-                    worksheet = safe_google_api_operation(
-                        monthly_sheet.add_worksheet, 
-                        title=sheet_name, 
-                        rows="1000", 
-                        cols="20"
-                    )
-                    
-                    data = sorted_all[bulan]
-                    safe_google_api_operation(worksheet.clear)
-                    time.sleep(WRITE_DELAY)
-                    
-                    safe_google_api_operation(
-                        worksheet.update,
-                        [data.columns.values.tolist()] + data.values.tolist()
-                    )
-                    
-                    print(f"      ✅ {sheet_name} ({len(data)} baris)")
-                    sheet_count += 1
-                    time.sleep(WRITE_DELAY)
-                    
-                except Exception as e:
-                    print(f"      ❌ Gagal membuat {sheet_name}: {str(e)}")
+    for sheet_name, data in monthly_sheets:
+        writer.write(sheet_name, dataframe_values(data), rows=1000, cols=20)
+    
+    print(f"\n   📤 Mengirim {len(monthly_sheets)} sheet bulanan sekaligus...")
+    try:
+        written = set(writer.commit())
+    except Exception as e:
+        print(f"      ❌ Gagal membuat sheet bulanan: {str(e)}")
+        written = set()
+    
+    sheet_count = 0
+    for sheet_name, data in monthly_sheets:
+        if sheet_name in written:
+            print(f"      ✅ {sheet_name} ({len(data)} baris)")
+            sheet_count += 1
+        else:
+            print(f"      ❌ Gagal membuat {sheet_name}")
     
     print(f"\n📊 Total sheet bulanan dibuat: {sheet_count}")
     
@@ -376,59 +294,9 @@ def create_ordered_monthly_sheets(gc, monthly_pivots, monthly_pivots_acc_pusat):
 # ============================
 # FUNGSI UTAMA YANG DIOPTIMASI
 # ============================
-def clean_nik(nik_value):
-    if pd.isna(nik_value) or nik_value is None:
-        return None
-    nik_str = str(nik_value)
-    cleaned_nik = re.sub(r'\D', '', nik_str)
-    if len(cleaned_nik) != 16:
-        print(f"⚠️  NIK tidak standar: {nik_value} -> {cleaned_nik} (panjang: {len(cleaned_nik)})")
-    return cleaned_nik if cleaned_nik else None
-
-def exponential_backoff(attempt):
-    base_delay = INITIAL_RETRY_DELAY * (2 ** (attempt - 1))
-    jitter = base_delay * 0.1
-    return base_delay + jitter
-
 def safe_google_api_operation(operation, *args, **kwargs):
-    last_exception = None
-    
-    for attempt in range(1, MAX_RETRIES + 1):
-        try:
-            result = operation(*args, **kwargs)
-            if attempt > 1:
-                print(f"   ✅ Berhasil pada percobaan ke-{attempt}")
-            return result
-            
-        except HttpError as e:
-            last_exception = e
-            if e.resp.status == 429:
-                if attempt < MAX_RETRIES:
-                    wait_time = exponential_backoff(attempt)
-                    print(f"⏳ Quota exceeded, menunggu {wait_time:.1f} detik... (Percobaan {attempt}/{MAX_RETRIES})")
-                    time.sleep(wait_time)
-                else:
-                    print(f"❌ Gagal setelah {MAX_RETRIES} percobaan")
-                    raise e
-            elif e.resp.status in [500, 502, 503, 504]:
-                if attempt < MAX_RETRIES:
-                    wait_time = exponential_backoff(attempt)
-                    print(f"⏳ Server error {e.resp.status}, menunggu {wait_time:.1f} detik... (Percobaan {attempt}/{MAX_RETRIES})")
-                    time.sleep(wait_time)
-                else:
-                    raise e
-            else:
-                raise e
-        except Exception as e:
-            last_exception = e
-            if attempt < MAX_RETRIES:
-                wait_time = exponential_backoff(attempt)
-                print(f"⏳ Error {type(e).__name__}, menunggu {wait_time:.1f} detik... (Percobaan {attempt}/{MAX_RETRIES})")
-                time.sleep(wait_time)
-            else:
-                raise e
-    
-    raise last_exception
+    """Panggil Google API sesuai kuota; retry hanya saat throttled (429) atau error sementara"""
+    return SHEETS_LIMITER.call(operation, *args, **kwargs)
 
 def add_total_row(df, pupuk_columns):
     """
@@ -514,85 +382,104 @@ def create_pivot_tables(combined_df, monthly_data, pupuk_columns):
 def batch_update_worksheets(spreadsheet, updates):
     print(f"🔄 Memproses batch update untuk {len(updates)} worksheet...")
     
+    # Semua sheet ditulis sekaligus: buat/kosongkan dalam satu request, data dalam satu request
+    writer = SheetBatchWriter(spreadsheet, api_call=safe_google_api_operation)
+    for sheet_name, data in updates:
+        writer.write(sheet_name, dataframe_values(data), rows=1000, cols=20)
+    
+    try:
+        written = set(writer.commit())
+    except Exception as e:
+        print(f"      ❌ Gagal batch update: {str(e)}")
+        written = set()
+    
     for i, (sheet_name, data) in enumerate(updates):
-        try:
-            print(f"   📝 Processing {i+1}/{len(updates)}: {sheet_name}")
-            
-            try:
-                worksheet = spreadsheet.worksheet(sheet_name)
-                print(f"      📝 Menggunakan sheet existing")
-            except gspread.exceptions.WorksheetNotFound:
-                worksheet = safe_google_api_operation(
-                    spreadsheet.add_worksheet, 
-                    title=sheet_name, 
-                    rows="1000", 
-                    cols="20"
-                )
-                print(f"      ✅ Membuat sheet baru")
-                time.sleep(WRITE_DELAY)
-            
-            safe_google_api_operation(worksheet.clear)
-            time.sleep(WRITE_DELAY)
-            
-            safe_google_api_operation(
-                worksheet.update,
-                [data.columns.values.tolist()] + data.values.tolist()
-            )
-            
-            print(f"      ✅ Berhasil update data ({len(data)} baris)")
-            
-            if i < len(updates) - 1:
-                time.sleep(WRITE_DELAY)
-                
-        except Exception as e:
-            print(f"      ❌ Gagal update {sheet_name}: {str(e)}")
-            continue
+        if sheet_name in written:
+            print(f"   ✅ {i+1}/{len(updates)} {sheet_name}: berhasil update data ({len(data)} baris)")
+        else:
+            print(f"   ❌ {i+1}/{len(updates)} Gagal update {sheet_name}")
     
-    print(f"✅ Batch update selesai")
+    print(f"✅ Batch update selesai ({writer.requests_sent} request API)")
 
 def download_excel_files_from_drive(credentials, folder_id, save_folder="data_excel"):
     """
     Download file Excel dari Google Drive (untuk GitHub Actions)
     """
-    from googleapiclient.discovery import build
-    from googleapiclient.http import MediaIoBaseDownload
-    import io
+    from drive_cache import get_drive_cache, DRIVE_FILE_FIELDS
 
     os.makedirs(save_folder, exist_ok=True)
-    drive_service = build('drive', 'v3', credentials=credentials)
+    drive_service = get_drive_service(credentials)
 
     # Query untuk mencari file Excel
     query = f"'{folder_id}' in parents and (mimeType='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet' or mimeType='application/vnd.ms-excel')"
-    results = drive_service.files().list(q=query, fields="files(id, name)").execute()
+    results = drive_service.files().list(q=query, fields=DRIVE_FILE_FIELDS).execute()
     files = results.get("files", [])
 
     if not files:
         raise ValueError("❌ Tidak ada file Excel di folder Google Drive.")
 
+    drive_cache = get_drive_cache()
     paths = []
     for file in files:
         print(f"📥 Downloading: {file['name']}")
-        request = drive_service.files().get_media(fileId=file["id"])
         
         # Gunakan nama file yang aman
         safe_filename = "".join(c for c in file['name'] if c.isalnum() or c in (' ', '-', '_', '.')).rstrip()
         file_path = os.path.join(save_folder, safe_filename)
 
-        with io.FileIO(file_path, 'wb') as fh:
-            downloader = MediaIoBaseDownload(fh, request)
-            done = False
-            while not done:
-                status, done = downloader.next_chunk()
+        _, from_cache = drive_cache.fetch(drive_service, file, file_path)
+        if from_cache:
+            print(f"   ♻️  Dari cache (file tidak berubah)")
 
         paths.append({
             'path': file_path,
             'name': file['name'],
-            'id': file['id']
+            'id': file['id'],
+            'file': file
         })
 
     print(f"✅ Berhasil download {len(paths)} file Excel")
+    drive_cache.print_summary()
     return paths
 
+def clean_realisasi_file(file_path, bulan, expected_columns, pupuk_columns):
+    """
+    Baca dan bersihkan satu file realisasi (hasil disimpan per file oleh IncrementalState).
+    Return dict {'df', 'status_categories', 'nik_cleaning_log'} atau None jika kolom tidak lengkap.
+    """
+    df = read_excel_cached(file_path, sheet_name='Worksheet')
+
+    missing_columns = [col for col in expected_columns if col not in df.columns]
+    if missing_columns:
+        print(f"   ⚠️  Kolom yang tidak ditemukan: {missing_columns}")
+        return None
+
+    # Track semua status yang ada
+    status_categories = set(df['STATUS'].astype(str).unique())
+
+    # Clean NIK
+    df['NIK_ORIGINAL'] = df['NIK']
+    df['NIK'], nik_summary = clean_nik_series(df['NIK'])
+    print_nik_summary(nik_summary)
+
+    nik_cleaning_log = []
+    cleaned_niks = df[df['NIK_ORIGINAL'] != df['NIK']][['NIK_ORIGINAL', 'NIK']]
+    for _, row in cleaned_niks.iterrows():
+        nik_cleaning_log.append(f"'{row['NIK_ORIGINAL']}' -> {row['NIK']}")
+
+    df = df[df['NIK'].notna()]
+
+    for col in pupuk_columns:
+        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+
+    df['BULAN'] = bulan
+
+    return {
+        'df': df,
+        'status_categories': status_categories,
+        'nik_cleaning_log': nik_cleaning_log
+    }
+
 def is_dataframe_valid(df):
     """Cek apakah dataframe valid dan tidak kosong"""
     return df is not None and isinstance(df, pd.DataFrame) and not df.empty
@@ -600,25 +487,14 @@ def is_dataframe_valid(df):
 def process_verval_pupuk_data_optimized():
     print("🚀 Memulai proses rekap data dengan optimasi quota...")
     print(f"⏰ Konfigurasi:")
-    print(f"   - Max retries: {MAX_RETRIES}")
-    print(f"   - Write delay: {WRITE_DELAY} detik")
+    print(f"   - Max retries: {SHEETS_LIMITER.max_retries}")
+    print(f"   - Rate limit: token bucket adaptif (tanpa jeda tetap)")
     print(f"   - Urutan bulan: {BULAN_URUTAN}")
     print(f"🔍 Kriteria Disetujui Pusat: mengandung 'disetujui' DAN 'pusat' TANPA 'menunggu'")
     print(f"🏪 Struktur baru: KODE KIOS sebelum NAMA KIOS")
 
-    creds_json = os.getenv("GOOGLE_APPLICATION_CREDENTIALS_JSON")
-    if not creds_json:
-        raise ValueError("❌ GOOGLE_APPLICATION_CREDENTIALS_JSON tidak ditemukan")
-
-    credentials = Credentials.from_service_account_info(
-        json.loads(creds_json),
-        scopes=[
-            "https://www.googleapis.com/auth/spreadsheets",
-            "https://www.googleapis.com/auth/drive",
-        ],
-    )
-
-    gc = gspread.authorize(credentials)
+    credentials = get_credentials()
+    gc = get_gspread_client(credentials)
 
     try:
         # Download files dari Google Drive
@@ -640,6 +516,10 @@ def process_verval_pupuk_data_optimized():
 
         pupuk_columns = ['UREA', 'NPK', 'SP36', 'ZA', 'NPK FORMULA', 'ORGANIK', 'ORGANIK CAIR']
 
+        # File yang tidak berubah sejak run sebelumnya tidak dibaca ulang
+        state = IncrementalState("pivot_pupuk", INCREMENTAL_LOGIC_VERSION)
+        state.prune(file_info['id'] for file_info in excel_files)
+
         for file_info in excel_files:
             file_path = file_info['path']
             file_name = file_info['name']
@@ -648,37 +528,22 @@ def process_verval_pupuk_data_optimized():
             print(f"\n📖 Memproses file: {file_name} -> Bulan: {bulan}")
 
             try:
-                df = pd.read_excel(file_path, sheet_name='Worksheet')
-
-                missing_columns = [col for col in expected_columns if col not in df.columns]
-                if missing_columns:
-                    print(f"   ⚠️  Kolom yang tidak ditemukan: {missing_columns}")
+                partial, _ = state.get_or_compute(
+                    file_info['file'],
+                    lambda: clean_realisasi_file(file_path, bulan, expected_columns, pupuk_columns)
+                )
+                if partial is None:
                     continue
 
-                # Track semua status yang ada
-                all_status_categories.update(df['STATUS'].astype(str).unique())
-
-                # Clean NIK
-                original_nik_count = len(df)
-                df['NIK_ORIGINAL'] = df['NIK']
-                df['NIK'] = df['NIK'].apply(clean_nik)
-
-                cleaned_niks = df[df['NIK_ORIGINAL'] != df['NIK']][['NIK_ORIGINAL', 'NIK']]
-                for _, row in cleaned_niks.iterrows():
-                    nik_cleaning_log.append(f"'{row['NIK_ORIGINAL']}' -> {row['NIK']}")
-
-                df = df[df['NIK'].notna()]
+                df = partial['df']
+                all_status_categories.update(partial['status_categories'])
+                nik_cleaning_log.extend(partial['nik_cleaning_log'])
                 cleaned_nik_count = len(df)
 
-                for col in pupuk_columns:
-                    df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-
-                df['BULAN'] = bulan
-
                 all_data.append(df)
 
                 # Filter data Disetujui Pusat dengan kriteria baru
-                df_acc_pusat = df[df['STATUS'].apply(is_status_disetujui_pusat)]
+                df_acc_pusat = df[ACC_PUSAT_CLASSIFIER.mask(df['STATUS'])]
                 
                 if len(df_acc_pusat) > 0:
                     all_data_acc_pusat.append(df_acc_pusat)
@@ -702,6 +567,8 @@ def process_verval_pupuk_data_optimized():
                 print(f"   ❌ Error memproses {file_name}: {str(e)}")
                 continue
 
+        state.print_summary()
+
         if not all_data:
             error_msg = "Tidak ada data yang berhasil diproses!"
             print(f"❌ ERROR: {error_msg}")
@@ -754,7 +621,6 @@ def process_verval_pupuk_data_optimized():
 
         if main_updates:
             batch_update_worksheets(main_sheet, main_updates)
-            time.sleep(BATCH_DELAY)
 
         # Buat sheet bulanan dengan urutan yang ditentukan
         monthly_sheet_count = create_ordered_monthly_sheets(gc, monthly_pivots, monthly_pivots_acc_pusat)
@@ -833,3 +699,4 @@ REKAP DATA BERHASIL DENGAN PENAMBAHAN KODE KIOS ✓
 # ============================
 if __name__ == "__main__":
     process_verval_pupuk_data_optimized()
+    SHEETS_LIMITER.print_summary()
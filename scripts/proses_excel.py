@@ -1,15 +1,13 @@
 import os
 import io
 import pandas as pd
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload, MediaIoBaseUpload
-from google.oauth2 import service_account
 from datetime import datetime
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-import json
 from collections import defaultdict
+from date_utils import parse_date_series, ARCHIVE_DATE_FORMATS
+from google_clients import get_credentials, get_drive_service, DRIVE_SCOPES
 
 # ----------------------------------------------------
 # KONFIGURASI (TETAP)
@@ -25,6 +23,13 @@ SERVICE_ACCOUNT_JSON = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS_JSON")
 
 RECIPIENT_LIST = [e.strip() for e in RECIPIENT_EMAILS.split(",") if e.strip()]
 
+BULAN_MAP = {
+    1: "Januari", 2: "Februari", 3: "Maret",
+    4: "April", 5: "Mei", 6: "Juni",
+    7: "Juli", 8: "Agustus", 9: "September",
+    10: "Oktober", 11: "November", 12: "Desember"
+}
+
 # ----------------------------------------------------
 # LOGGING (TETAP)
 # ----------------------------------------------------
@@ -45,26 +50,29 @@ def add_log(message, is_error=False):
 # AUTENTIKASI GOOGLE DRIVE (TETAP)
 # ----------------------------------------------------
 
+_file_credentials = None
+
 def initialize_drive():
-    SCOPES = ["https://www.googleapis.com/auth/drive"]
+    """Drive service, dibuat saat pertama dipakai lalu dipakai ulang"""
+    global _file_credentials
     if SERVICE_ACCOUNT_JSON:
-        creds = service_account.Credentials.from_service_account_info(
-            json.loads(SERVICE_ACCOUNT_JSON), scopes=SCOPES
-        )
-    else:
-        creds = service_account.Credentials.from_service_account_file(
-            "service_account.json", scopes=SCOPES
-        )
-    return build("drive", "v3", credentials=creds)
+        return get_drive_service(get_credentials(DRIVE_SCOPES))
+    if _file_credentials is None:
+        from google.oauth2 import service_account
 
-drive = initialize_drive()
+        _file_credentials = service_account.Credentials.from_service_account_file(
+            "service_account.json", scopes=list(DRIVE_SCOPES)
+        )
+    return get_drive_service(_file_credentials)
 
 # ----------------------------------------------------
 # DRIVE UTIL (TETAP)
 # ----------------------------------------------------
 
 def download_drive_file(file_id):
-    request = drive.files().get_media(fileId=file_id)
+    from googleapiclient.http import MediaIoBaseDownload
+
+    request = initialize_drive().files().get_media(fileId=file_id)
     fh = io.BytesIO()
     downloader = MediaIoBaseDownload(fh, request)
     done = False
@@ -74,8 +82,8 @@ def download_drive_file(file_id):
     return fh
 
 def move_file_to_folder(file_id, target_folder_id):
-    parents = drive.files().get(fileId=file_id, fields="parents").execute().get("parents", [])
-    drive.files().update(
+    parents = initialize_drive().files().get(fileId=file_id, fields="parents").execute().get("parents", [])
+    initialize_drive().files().update(
         fileId=file_id,
         addParents=target_folder_id,
         removeParents=",".join(parents),
@@ -83,7 +91,7 @@ def move_file_to_folder(file_id, target_folder_id):
     ).execute()
 
 def list_files_in_folder(folder_id):
-    result = drive.files().list(
+    result = initialize_drive().files().list(
         q=f"'{folder_id}' in parents and mimeType='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'",
         fields="files(id, name)"
     ).execute()
@@ -94,44 +102,15 @@ def list_files_in_folder(folder_id):
 # ----------------------------------------------------
 
 def parse_date_safe(date_str):
-    """Parse tanggal dengan format yang lebih fleksibel"""
-    if pd.isna(date_str):
-        return None
-    
-    # Coba berbagai format
-    date_formats = [
-        '%d-%m-%Y',  # 3-1-2026
-        '%d/%m/%Y',  # 3/1/2026
-        '%Y-%m-%d',  # 2026-01-03
-        '%Y/%m/%d',  # 2026/01/03
-        '%d %b %Y',  # 3 Jan 2026
-        '%d %B %Y',  # 3 Januari 2026
-    ]
-    
-    for fmt in date_formats:
-        try:
-            return datetime.strptime(str(date_str).strip(), fmt)
-        except ValueError:
-            continue
-    
-    # Jika tidak ada yang cocok, coba parsing dengan pandas
-    try:
-        return pd.to_datetime(date_str, errors='coerce')
-    except:
-        return None
+    """Parse satu tanggal (format sama dengan parse_date_series di process_excel)"""
+    parsed = parse_date_series(pd.Series([date_str], dtype=object), formats=ARCHIVE_DATE_FORMATS, fallback=True).iloc[0]
+    return None if pd.isna(parsed) else parsed
 
 def extract_month_from_date(date_value):
     """Ekstrak bulan dari tanggal dengan handling error"""
     if pd.isna(date_value):
         return None
     
-    bulan_map = {
-        1: "Januari", 2: "Februari", 3: "Maret",
-        4: "April", 5: "Mei", 6: "Juni",
-        7: "Juli", 8: "Agustus", 9: "September",
-        10: "Oktober", 11: "November", 12: "Desember"
-    }
-    
     try:
         if isinstance(date_value, datetime):
             month_num = date_value.month
@@ -143,7 +122,7 @@ def extract_month_from_date(date_value):
             else:
                 return None
         
-        return bulan_map.get(month_num, None)
+        return BULAN_MAP.get(month_num, None)
     except:
         return None
 
@@ -186,16 +165,12 @@ def process_excel(file_id, file_name):
     # Rename kolom untuk konsistensi
     df.rename(columns={tgl_input_col: "TGL INPUT", tgl_tebus_col: "TGL TEBUS"}, inplace=True)
     
-    # Konversi tanggal dengan cara yang lebih aman
-    df["TGL INPUT"] = df["TGL INPUT"].apply(parse_date_safe)
-    df["TGL TEBUS"] = df["TGL TEBUS"].apply(parse_date_safe)
+    # Konversi tanggal sekali per kolom (per nilai unik, bukan per baris)
+    df["TGL INPUT"] = parse_date_series(df["TGL INPUT"], formats=ARCHIVE_DATE_FORMATS, fallback=True)
+    df["TGL TEBUS"] = parse_date_series(df["TGL TEBUS"], formats=ARCHIVE_DATE_FORMATS, fallback=True)
 
     # Cari bulan untuk TGL TEBUS
-    bulan_tebus_list = []
-    for date_val in df["TGL TEBUS"]:
-        bulan = extract_month_from_date(date_val)
-        if bulan:
-            bulan_tebus_list.append(bulan)
+    bulan_tebus_list = df["TGL TEBUS"].dt.month.dropna().astype(int).map(BULAN_MAP).tolist()
     
     if not bulan_tebus_list:
         add_log("⚠ Tidak ada bulan yang valid di TGL TEBUS", is_error=True)
@@ -275,21 +250,23 @@ def main():
         # Nama file berdasarkan bulan TGL TEBUS
         filename = f"{bulan_tebus}.xlsx"
 
-        existing = drive.files().list(
+        existing = initialize_drive().files().list(
             q=f"'{FOLDER_ID}' in parents and name='{filename}'",
             fields="files(id)"
         ).execute().get("files", [])
 
+        from googleapiclient.http import MediaIoBaseUpload
+
         media = MediaIoBaseUpload(
             output,
             mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
         )
 
         if existing:
-            drive.files().update(fileId=existing[0]["id"], media_body=media).execute()
+            initialize_drive().files().update(fileId=existing[0]["id"], media_body=media).execute()
             add_log(f"  - File {filename} diperbarui")
         else:
-            drive.files().create(
+            initialize_drive().files().create(
                 body={"name": filename, "parents": [FOLDER_ID]},
                 media_body=media
             ).execute()
@@ -0,0 +1,225 @@
+"""
+rate_limiter.py
+Pembatas laju request Google API (token bucket adaptif).
+
+Sebelumnya laju request diatur dengan jeda tetap (WRITE_DELAY=5,
+BATCH_DELAY=10, sleep 0.5-2 detik antar chunk) dan backoff mulai 30 detik,
+sehingga job selalu berjalan selambat jeda terburuk walaupun kuota masih
+longgar. RateLimiter memodelkan kuota per menit Sheets API (read dan write
+terpisah) sebagai token bucket:
+- setiap request mengambil satu token; jika habis, request menunggu hanya
+  selama yang dibutuhkan sampai token terisi lagi (laju default sedikit di
+  bawah kuota 60 request/menit/user);
+- jika tetap kena 429, header Retry-After dipakai (atau backoff eksponensial
+  pendek), bucket dijeda, dan lajunya diturunkan setengah; setiap request
+  sukses menaikkan laju lagi perlahan sampai batas semula;
+- error server (5xx) dan error koneksi di-retry dengan backoff; error lain
+  (mis. WorksheetNotFound) langsung diteruskan ke pemanggil.
+Limiter dipakai bersama per nama (get_rate_limiter) dan aman dipakai dari
+beberapa thread.
+
+Konfigurasi lewat environment variable:
+- SHEETS_READ_PER_MINUTE  : laju read per menit (default 55)
+- SHEETS_WRITE_PER_MINUTE : laju write per menit (default 55)
+- RATE_LIMIT_MAX_RETRIES  : maksimal percobaan per request (default 6)
+
+Lokasi: verval-pupuk2/scripts/rate_limiter.py
+"""
+
+import os
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+
+# ============================
+# KONFIGURASI
+# ============================
+SHEETS_READ_PER_MINUTE = float(os.getenv("SHEETS_READ_PER_MINUTE", "55"))
+SHEETS_WRITE_PER_MINUTE = float(os.getenv("SHEETS_WRITE_PER_MINUTE", "55"))
+RATE_LIMIT_MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "6"))
+
+BURST_SECONDS = 10  # Kapasitas bucket = jumlah request selama 10 detik
+MIN_RATE_FRACTION = 0.1  # Laju terendah setelah berkali-kali kena 429
+RECOVERY_STEP = 0.05  # Kenaikan laju (fraksi laju maksimum) per request sukses
+BACKOFF_BASE = 2
+BACKOFF_MAX = 64
+RETRY_STATUSES = (500, 502, 503, 504)
+
+# Nama method yang dihitung sebagai request read
+READ_PREFIXES = ("get", "fetch", "open", "list", "col_values", "row_values",
+                 "values_get", "values_batch_get", "worksheet", "worksheets")
+
+# ============================
+# FUNGSI UTILITY
+# ============================
+def backoff_delay(attempt):
+    """Backoff eksponensial pendek dengan jitter (attempt mulai dari 1)"""
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** (attempt - 1)))
+    return delay + random.uniform(0, delay * 0.25)
+
+def _parse_retry_after(value):
+    """Nilai header Retry-After (detik atau tanggal HTTP) -> detik"""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        retry_at = parsedate_to_datetime(str(value))
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+def error_status(exc):
+    """(HTTP status, detik Retry-After) dari error googleapiclient / gspread / lainnya"""
+    status, headers = None, {}
+    resp = getattr(exc, "resp", None)  # googleapiclient HttpError (httplib2 Response)
+    if resp is not None:
+        status = getattr(resp, "status", None)
+        headers = resp
+    response = getattr(exc, "response", None)  # gspread APIError (requests Response)
+    if response is not None and hasattr(response, "status_code"):
+        status = response.status_code
+        headers = response.headers
+    try:
+        status = int(status) if status is not None else None
+    except (TypeError, ValueError):
+        status = None
+
+    if status is None:
+        message = str(exc).lower()
+        if "429" in message or "rate limit" in message or "quota exceeded" in message:
+            status = 429
+
+    retry_after = None
+    if headers:
+        retry_after = _parse_retry_after(headers.get("retry-after") or headers.get("Retry-After"))
+    return status, retry_after
+
+def request_kind(operation):
+    """'read' atau 'write' berdasarkan method yang dipanggil"""
+    owner = getattr(operation, "__self__", None)
+    http_method = getattr(owner, "method", None)  # googleapiclient HttpRequest.execute
+    if isinstance(http_method, str):
+        return "read" if http_method.upper() == "GET" else "write"
+    name = getattr(operation, "__name__", "")
+    return "read" if name.startswith(READ_PREFIXES) else "write"
+
+# ============================
+# KELAS TOKEN BUCKET
+# ============================
+class TokenBucket:
+    """Token bucket dengan laju yang bisa turun saat kena 429 dan naik lagi saat sukses"""
+
+    def __init__(self, rate_per_minute):
+        self.max_rate = rate_per_minute / 60.0
+        self.rate = self.max_rate
+        self.capacity = max(1.0, self.max_rate * BURST_SECONDS)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Ambil satu token, tunggu seperlunya jika habis atau bucket sedang dijeda"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self.paused_until - now
+                if wait <= 0:
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+                self.waited += wait
+            time.sleep(wait)
+
+    def throttle(self, pause_seconds):
+        """Kena 429: jeda bucket, kosongkan token, turunkan laju"""
+        with self._lock:
+            self.rate = max(self.max_rate * MIN_RATE_FRACTION, self.rate / 2)
+            self.tokens = 0.0
+            self.paused_until = max(self.paused_until, time.monotonic() + pause_seconds)
+
+    def recover(self):
+        """Request sukses: naikkan laju perlahan sampai batas semula"""
+        if self.rate >= self.max_rate:
+            return
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * RECOVERY_STEP)
+
+# ============================
+# KELAS RATE LIMITER
+# ============================
+class RateLimiter:
+    """Bucket read & write untuk satu API, plus retry untuk error sementara"""
+
+    def __init__(self, name, read_per_minute, write_per_minute, max_retries=RATE_LIMIT_MAX_RETRIES):
+        self.name = name
+        self.buckets = {"read": TokenBucket(read_per_minute), "write": TokenBucket(write_per_minute)}
+        self.max_retries = max_retries
+        self.stats = {"requests": 0, "throttled": 0, "retried": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def call(self, operation, *args, **kwargs):
+        """Jalankan operation(*args, **kwargs) sesuai kuota, retry jika throttled/error sementara"""
+        bucket = self.buckets[request_kind(operation)]
+        for attempt in range(1, self.max_retries + 1):
+            bucket.acquire()
+            self._count("requests")
+            try:
+                result = operation(*args, **kwargs)
+            except Exception as e:
+                status, retry_after = error_status(e)
+                if attempt >= self.max_retries:
+                    raise
+                if status == 429:
+                    wait_time = retry_after if retry_after is not None else backoff_delay(attempt)
+                    bucket.throttle(wait_time)
+                    self._count("throttled")
+                    print(f"⏳ Quota {self.name} habis, lanjut dalam {wait_time:.1f} detik "
+                          f"(percobaan {attempt}/{self.max_retries})")
+                    continue
+                if status in RETRY_STATUSES or (status is None and isinstance(e, (OSError, TimeoutError))):
+                    wait_time = backoff_delay(attempt)
+                    self._count("retried")
+                    print(f"⏳ Error {status or type(e).__name__}, menunggu {wait_time:.1f} detik "
+                          f"(percobaan {attempt}/{self.max_retries})")
+                    time.sleep(wait_time)
+                    continue
+                raise
+            bucket.recover()
+            return result
+
+    def print_summary(self):
+        waited = sum(bucket.waited for bucket in self.buckets.values())
+        print(f"🚦 Rate limiter {self.name}: {self.stats['requests']:,} request, "
+              f"{self.stats['throttled']} kali 429, {self.stats['retried']} retry error, "
+              f"menunggu kuota {waited:.1f} detik")
+
+# ============================
+# LIMITER BERSAMA
+# ============================
+_LIMITERS = {}
+_LIMITERS_LOCK = threading.Lock()
+
+def get_rate_limiter(name="sheets", read_per_minute=SHEETS_READ_PER_MINUTE,
+                     write_per_minute=SHEETS_WRITE_PER_MINUTE):
+    """Limiter bersama per nama API (satu per proses)"""
+    with _LIMITERS_LOCK:
+        if name not in _LIMITERS:
+            _LIMITERS[name] = RateLimiter(name, read_per_minute, write_per_minute)
+        return _LIMITERS[name]
@@ -0,0 +1,120 @@
+"""
+run_job.py
+Entry point ringan untuk menjalankan satu job terjadwal.
+
+Script job mengimpor pandas, gspread, googleapiclient dkk. (0,4-0,8 detik)
+dan secret yang kosong / salah ketik sering baru ketahuan di tengah proses,
+setelah dependency terpasang dan data diunduh. run_job.py hanya memakai
+modul standar Python:
+1. mengecek semua environment variable wajib job sekaligus (termasuk
+   apakah GOOGLE_APPLICATION_CREDENTIALS_JSON berisi JSON service account
+   yang lengkap), sehingga bisa dijalankan dengan --check sebelum
+   pip install;
+2. baru kemudian menjalankan script job persis seperti
+   `python scripts/<job>.py` (kode script dengan __name__ == "__main__").
+   Script job tidak membaca argumen baris perintah, jadi sys.argv dan
+   sys.modules["__main__"] tidak diubah (runpy mengubah keduanya):
+   run_job aman dipanggil bersamaan dari beberapa thread (orchestrator.py).
+Waktu startup (import) setiap script diukur di benchmark_startup.py.
+
+Pemakaian:
+    python scripts/run_job.py <job> [--check]
+
+Lokasi: verval-pupuk2/scripts/run_job.py
+"""
+
+import os
+import sys
+import json
+import builtins
+
+# ============================
+# KONFIGURASI
+# ============================
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+GOOGLE_SECRETS = ("GOOGLE_APPLICATION_CREDENTIALS_JSON",)
+EMAIL_SECRETS = ("SENDER_EMAIL", "SENDER_EMAIL_PASSWORD", "RECIPIENT_EMAILS")
+SERVICE_ACCOUNT_FIELDS = ("client_email", "private_key", "token_uri")
+
+# Job terjadwal -> environment variable wajib
+JOBS = {
+    "data_tebus_pubers": GOOGLE_SECRETS + EMAIL_SECRETS,
+    "data_tebus_versi_web": GOOGLE_SECRETS + EMAIL_SECRETS,
+    "erdkk_versi_web": GOOGLE_SECRETS + EMAIL_SECRETS,
+    "erdkk_vs_realisasi": GOOGLE_SECRETS + EMAIL_SECRETS,
+    "erdkk_wa_center": GOOGLE_SECRETS + EMAIL_SECRETS,
+    "nama_kecamatan_desa": GOOGLE_SECRETS + EMAIL_SECRETS,
+    "pivot_klaster_status": GOOGLE_SECRETS + EMAIL_SECRETS,
+    "pivot_pupuk": GOOGLE_SECRETS + EMAIL_SECRETS,
+    "proses_excel": EMAIL_SECRETS,  # credentials boleh dari service_account.json
+    "sisa_kuota": GOOGLE_SECRETS + EMAIL_SECRETS,
+    "sisa_kuota_wa": GOOGLE_SECRETS + EMAIL_SECRETS,
+    "tebus_petani": GOOGLE_SECRETS + EMAIL_SECRETS,
+}
+
+# ============================
+# FUNGSI CEK ENVIRONMENT
+# ============================
+def check_environment(job):
+    """Daftar masalah environment untuk job (kosong jika semua lengkap)"""
+    problems = []
+    required = JOBS[job]
+    for name in required:
+        if not os.getenv(name, "").strip():
+            problems.append(f"SECRET {name} TIDAK TERBACA")
+
+    creds_json = os.getenv("GOOGLE_APPLICATION_CREDENTIALS_JSON", "").strip()
+    if creds_json:
+        try:
+            info = json.loads(creds_json)
+            missing = [field for field in SERVICE_ACCOUNT_FIELDS if not (isinstance(info, dict) and info.get(field))]
+            if missing:
+                problems.append(f"GOOGLE_APPLICATION_CREDENTIALS_JSON tidak lengkap: {', '.join(missing)}")
+        except json.JSONDecodeError as e:
+            problems.append(f"GOOGLE_APPLICATION_CREDENTIALS_JSON bukan JSON valid: {e}")
+    return problems
+
+# ============================
+# FUNGSI UTAMA
+# ============================
+def run_job(job):
+    """Jalankan scripts/<job>.py sebagai __main__ dengan namespace sendiri (return exit code dari script)"""
+    script_path = os.path.join(SCRIPTS_DIR, f"{job}.py")
+    if SCRIPTS_DIR not in sys.path:
+        sys.path.insert(0, SCRIPTS_DIR)
+
+    with open(script_path, "rb") as f:
+        code = compile(f.read(), script_path, "exec")
+    namespace = {"__name__": "__main__", "__file__": script_path, "__builtins__": builtins}
+    try:
+        exec(code, namespace)
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    return 0
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    check_only = "--check" in argv
+    args = [arg for arg in argv if arg != "--check"]
+
+    if len(args) != 1 or args[0] not in JOBS:
+        print("❌ Pemakaian: python scripts/run_job.py <job> [--check]")
+        print(f"   Job tersedia: {', '.join(sorted(JOBS))}")
+        return 2
+
+    job = args[0]
+    problems = check_environment(job)
+    if problems:
+        print(f"❌ Environment job {job} belum lengkap:")
+        for problem in problems:
+            print(f"   • {problem}")
+        return 1
+    print(f"✅ Environment job {job} lengkap")
+    if check_only:
+        return 0
+
+    return run_job(job)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+"""
+sheet_batch_writer.py
+Menulis banyak worksheet kecil dalam satu spreadsheet dengan sesedikit
+mungkin request API.
+
+Dulu setiap sheet pivot ditulis sendiri-sendiri (add_worksheet / clear /
+update / format) dengan time.sleep(WRITE_DELAY) di antara setiap panggilan,
+sehingga run dengan puluhan sheet bulanan lebih banyak menunggu daripada
+menulis. SheetBatchWriter mengumpulkan semua pekerjaan lalu mengirimnya
+sekaligus saat commit():
+1. satu spreadsheets.batchUpdate untuk struktur: hapus sheet lama, buat
+   sheet baru (sesuai urutan write), perbesar grid, kosongkan nilai lama;
+2. spreadsheets.values.batchUpdate untuk semua data, dipecah hanya jika
+   payload melebihi MAX_PAYLOAD_BYTES;
+3. satu spreadsheets.batchUpdate untuk format, auto resize kolom dan freeze.
+Range format dibatasi ke ukuran grid sheet supaya satu range yang terlalu
+lebar tidak menggagalkan seluruh batch.
+
+Lokasi: verval-pupuk2/scripts/sheet_batch_writer.py
+"""
+
+import json
+import random
+
+# ============================
+# KONFIGURASI
+# ============================
+MAX_PAYLOAD_BYTES = 2_000_000  # Batas aman ukuran body values.batchUpdate
+DEFAULT_ROWS = 1000
+DEFAULT_COLS = 20
+
+# ============================
+# FUNGSI UTILITY
+# ============================
+def _direct_call(operation, *args, **kwargs):
+    return operation(*args, **kwargs)
+
+def dataframe_values(df):
+    """Header + isi DataFrame sebagai list of lists"""
+    return [df.columns.values.tolist()] + df.values.tolist()
+
+# ============================
+# KELAS WRITER
+# ============================
+class SheetBatchWriter:
+    """Kumpulkan penulisan beberapa worksheet lalu kirim dalam beberapa request saja"""
+
+    def __init__(self, spreadsheet, api_call=None):
+        self.spreadsheet = spreadsheet
+        self.api_call = api_call or _direct_call
+        self._delete_titles = []
+        self._writes = []  # (title, values, value_input_option, rows, cols)
+        self._formats = []  # (title, jenis, argumen)
+        self.requests_sent = 0
+
+    # ---------- antrian pekerjaan ----------
+    def delete_sheets(self, titles):
+        """Hapus sheet-sheet ini (yang memang ada) sebelum menulis"""
+        self._delete_titles.extend(titles)
+
+    def write(self, title, values, value_input_option='RAW', rows=DEFAULT_ROWS, cols=DEFAULT_COLS):
+        """
+        Tulis values mulai A1. Sheet dibuat (rows x cols, diperbesar jika
+        data lebih besar) atau, jika sudah ada, nilai lamanya dikosongkan.
+        """
+        self._writes.append((title, values, value_input_option, int(rows), int(cols)))
+
+    def format(self, title, a1_range, cell_format):
+        self._formats.append((title, "format", (a1_range, cell_format)))
+
+    def auto_resize_columns(self, title, start_index, end_index):
+        self._formats.append((title, "auto_resize", (start_index, end_index)))
+
+    def freeze(self, title, rows):
+        self._formats.append((title, "freeze", (rows,)))
+
+    # ---------- commit ----------
+    def _sheet_properties(self):
+        metadata = self.api_call(self.spreadsheet.fetch_sheet_metadata)
+        self.requests_sent += 1
+        return {sheet["properties"]["title"]: sheet["properties"] for sheet in metadata.get("sheets", [])}
+
+    def _structure_requests(self, existing):
+        """Request hapus/buat/resize/kosongkan + grid (id, rows, cols) per sheet tujuan"""
+        requests = []
+        used_ids = {props["sheetId"] for props in existing.values()}
+
+        deleted = set()
+        for title in dict.fromkeys(self._delete_titles):
+            if title in existing:
+                requests.append({"deleteSheet": {"sheetId": existing[title]["sheetId"]}})
+                deleted.add(title)
+
+        grids = {}
+        for title, values, _, rows, cols in self._writes:
+            need_rows = max(rows, len(values))
+            need_cols = max([cols] + [len(row) for row in values])
+            if title in grids:
+                sheet_id, old_rows, old_cols = grids[title]
+                grids[title] = (sheet_id, max(old_rows, need_rows), max(old_cols, need_cols))
+            elif title in existing and title not in deleted:
+                grid = existing[title].get("gridProperties", {})
+                grids[title] = (existing[title]["sheetId"],
+                                max(grid.get("rowCount", 0), len(values)),
+                                max(grid.get("columnCount", 0), max([0] + [len(row) for row in values])))
+            else:
+                sheet_id = random.randint(1, 2**31 - 1)
+                while sheet_id in used_ids:
+                    sheet_id = random.randint(1, 2**31 - 1)
+                used_ids.add(sheet_id)
+                grids[title] = (sheet_id, need_rows, need_cols)
+
+        for title, (sheet_id, rows, cols) in grids.items():
+            if title in existing and title not in deleted:
+                grid = existing[title].get("gridProperties", {})
+                if rows > grid.get("rowCount", 0) or cols > grid.get("columnCount", 0):
+                    requests.append({"updateSheetProperties": {
+                        "properties": {"sheetId": sheet_id, "gridProperties": {"rowCount": rows, "columnCount": cols}},
+                        "fields": "gridProperties(rowCount,columnCount)"
+                    }})
+                requests.append({"updateCells": {"range": {"sheetId": sheet_id}, "fields": "userEnteredValue"}})
+            else:
+                requests.append({"addSheet": {"properties": {
+                    "sheetId": sheet_id, "title": title,
+                    "gridProperties": {"rowCount": rows, "columnCount": cols}
+                }}})
+        return requests, grids
+
+    def _value_batches(self):
+        """(body, judul sheet) per request: dikelompokkan per value_input_option, dipecah menurut ukuran payload"""
+        from gspread.utils import absolute_range_name
+
+        batches = []
+        for option in dict.fromkeys(write[2] for write in self._writes):
+            data, titles, size = [], [], 0
+            for title, values, value_input_option, _, _ in self._writes:
+                if value_input_option != option:
+                    continue
+                item = {"range": absolute_range_name(title, "A1"), "values": values}
+                item_size = len(json.dumps(item, default=str))
+                if data and size + item_size > MAX_PAYLOAD_BYTES:
+                    batches.append(({"valueInputOption": option, "data": data}, titles))
+                    data, titles, size = [], [], 0
+                data.append(item)
+                titles.append(title)
+                size += item_size
+            if data:
+                batches.append(({"valueInputOption": option, "data": data}, titles))
+        return batches
+
+    def _format_requests(self, grids):
+        from gspread.utils import a1_range_to_grid_range
+
+        requests = []
+        for title, kind, args in self._formats:
+            if title not in grids:
+                continue
+            sheet_id, rows, cols = grids[title]
+            if kind == "format":
+                a1_range, cell_format = args
+                grid_range = a1_range_to_grid_range(a1_range, sheet_id)
+                for key, limit in (("endRowIndex", rows), ("endColumnIndex", cols)):
+                    if key in grid_range:
+                        grid_range[key] = min(grid_range[key], limit)
+                requests.append({"repeatCell": {
+                    "range": grid_range,
+                    "cell": {"userEnteredFormat": cell_format},
+                    "fields": "userEnteredFormat(%s)" % ",".join(cell_format.keys())
+                }})
+            elif kind == "auto_resize":
+                start_index, end_index = args
+                requests.append({"autoResizeDimensions": {"dimensions": {
+                    "sheetId": sheet_id, "dimension": "COLUMNS",
+                    "startIndex": start_index, "endIndex": min(end_index, cols)
+                }}})
+            elif kind == "freeze":
+                requests.append({"updateSheetProperties": {
+                    "properties": {"sheetId": sheet_id, "gridProperties": {"frozenRowCount": args[0]}},
+                    "fields": "gridProperties.frozenRowCount"
+                }})
+        return requests
+
+    def commit(self):
+        """Kirim semua pekerjaan. Return daftar judul sheet yang datanya berhasil ditulis"""
+        existing = self._sheet_properties()
+        structure, grids = self._structure_requests(existing)
+        if structure:
+            self.api_call(self.spreadsheet.batch_update, {"requests": structure})
+            self.requests_sent += 1
+            print(f"   🧱 Struktur sheet: {len(structure)} perubahan dalam 1 request")
+
+        written = []
+        for batch, titles in self._value_batches():
+            try:
+                self.api_call(self.spreadsheet.values_batch_update, batch)
+                self.requests_sent += 1
+                written.extend(titles)
+                print(f"   📤 Data {len(batch['data'])} sheet terkirim dalam 1 request")
+            except Exception as e:
+                print(f"   ❌ Gagal menulis data {', '.join(titles)}: {str(e)}")
+
+        format_requests = self._format_requests(grids)
+        if format_requests:
+            try:
+                self.api_call(self.spreadsheet.batch_update, {"requests": format_requests})
+                self.requests_sent += 1
+            except Exception as e:
+                print(f"   ⚠️  Gagal formatting: {e}")
+
+        self._delete_titles, self._writes, self._formats = [], [], []
+        return written
@@ -0,0 +1,301 @@
+"""
+sheet_sync.py
+Sinkronisasi DataFrame ke worksheet dengan hanya mengirim baris yang berubah.
+
+Setiap malam sheet besar (Rekap_Gabungan, Data_Gabungan, Sisa versi Wa)
+di-clear lalu ditulis ulang seluruhnya, padahal sebagian besar barisnya
+sama dengan hari sebelumnya. Modul ini menyimpan manifest per sheet:
+kunci baris (NIK, atau gabungan beberapa kolom) + hash isi baris, sesuai
+posisi baris di sheet. Pada run berikutnya:
+- baris yang kuncinya sama dan isinya sama tidak dikirim;
+- baris yang isinya berubah ditulis di posisinya;
+- baris baru mengisi slot baris yang dihapus, sisanya ditambahkan di bawah;
+- jika lebih banyak baris dihapus, baris paling bawah dipindah ke slot
+  kosong lalu sisa baris di bawah dikosongkan;
+- baris yang perlu ditulis digabung menjadi range berurutan dan dikirim
+  lewat beberapa batch_update saja.
+Akibatnya urutan baris di sheet bisa berbeda dari urutan DataFrame.
+Baris dikirim dengan value_input_option yang sama dengan penulisan penuh
+script (default RAW, seperti worksheet.update).
+
+Manifest disimpan lokal (ikut actions/cache). Supaya manifest yang basi
+(cache lama, run sebelumnya gagal di tengah, sheet dibuat ulang) tidak
+dipakai, token manifest juga dicatat di sheet tersembunyi SYNC_TOKEN_SHEET:
+token dikosongkan sebelum menulis dan diisi lagi setelah sinkronisasi
+selesai. Jika token tidak cocok, header berubah, atau mode "full", fungsi
+penulisan penuh milik script dipakai seperti sebelumnya.
+
+Konfigurasi lewat environment variable:
+- SHEET_SYNC_DIR  : lokasi manifest (default ~/.cache/verval-pupuk2/sheet_sync)
+- SHEET_SYNC_MODE : "diff" (default) atau "full" untuk selalu menulis ulang
+
+Lokasi: verval-pupuk2/scripts/sheet_sync.py
+"""
+
+import os
+import re
+import json
+import uuid
+from datetime import datetime
+import pandas as pd
+from rate_limiter import get_rate_limiter
+
+# ============================
+# KONFIGURASI
+# ============================
+SHEET_SYNC_DIR = os.getenv(
+    "SHEET_SYNC_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "verval-pupuk2", "sheet_sync")
+)
+SHEET_SYNC_MODE = os.getenv("SHEET_SYNC_MODE", "diff").strip().lower()
+
+# Sheet tersembunyi untuk token manifest (satu baris per sheet yang disinkronkan)
+SYNC_TOKEN_SHEET = "_sheet_sync"
+
+MANIFEST_VERSION = 1
+SYNC_BATCH_ROWS = 3000  # Maks baris per panggilan batch_update
+ROW_BUFFER = 1000  # Tambahan baris saat worksheet perlu diperbesar
+
+# ============================
+# FUNGSI UTILITY
+# ============================
+def _with_retry(func, *args, **kwargs):
+    """Panggil API Sheets lewat rate limiter bersama (kuota + retry 429)"""
+    return get_rate_limiter("sheets").call(func, *args, **kwargs)
+
+def row_keys(df, key_columns):
+    """Kunci unik per baris; kunci kembar diberi akhiran #1, #2, ... sesuai urutan"""
+    keys = df[key_columns[0]].astype(str)
+    for col in key_columns[1:]:
+        keys = keys + "|" + df[col].astype(str)
+    occurrence = keys.groupby(keys, sort=False).cumcount()
+    if (occurrence > 0).any():
+        keys = keys.where(occurrence == 0, keys + "#" + occurrence.astype(str))
+    return keys.tolist()
+
+def row_hashes(df):
+    """Hash isi setiap baris (nilai dalam bentuk teks)"""
+    return [int(h) for h in pd.util.hash_pandas_object(df.astype(str), index=False).to_numpy()]
+
+def contiguous_runs(positions):
+    """Posisi terurut -> list (awal, akhir) untuk posisi yang berurutan"""
+    runs = []
+    for pos in positions:
+        if runs and pos == runs[-1][1] + 1:
+            runs[-1][1] = pos
+        else:
+            runs.append([pos, pos])
+    return runs
+
+def plan_sync(old_keys, old_hashes, new_keys, new_hashes):
+    """
+    Rencana sinkronisasi berbasis kunci.
+    Return (layout, writes, counts): layout = indeks baris DataFrame di setiap
+    posisi sheet, writes = posisi yang harus ditulis (terurut), counts =
+    jumlah baris berubah/baru/dihapus/dipindah.
+    """
+    old_pos = {key: pos for pos, key in enumerate(old_keys)}
+    n_new = len(new_keys)
+    layout = [None] * max(len(old_keys), n_new)
+    writes = []
+
+    inserted = []
+    updated = 0
+    for i, key in enumerate(new_keys):
+        pos = old_pos.pop(key, None)
+        if pos is None:
+            inserted.append(i)
+            continue
+        layout[pos] = i
+        if old_hashes[pos] != new_hashes[i]:
+            writes.append(pos)
+            updated += 1
+
+    # Slot baris yang dihapus diisi baris baru, sisanya ditambahkan di bawah
+    free_slots = sorted(old_pos.values())
+    for n_used, i in enumerate(inserted):
+        pos = free_slots[n_used] if n_used < len(free_slots) else len(old_keys) + n_used - len(free_slots)
+        layout[pos] = i
+        writes.append(pos)
+
+    # Lebih banyak baris dihapus: pindahkan baris paling bawah ke slot kosong
+    holes = [pos for pos in free_slots[len(inserted):] if pos < n_new]
+    movers = [pos for pos in range(n_new, len(layout)) if layout[pos] is not None]
+    for hole, mover in zip(holes, movers):
+        layout[hole] = layout[mover]
+        layout[mover] = None
+        writes.append(hole)
+
+    counts = {"updated": updated, "inserted": len(inserted), "deleted": len(old_pos), "moved": len(holes)}
+    # Posisi di bawah baris terakhir tidak ditulis (dikosongkan)
+    return layout[:n_new], sorted(pos for pos in writes if pos < n_new), counts
+
+# ============================
+# KELAS SINKRONISASI
+# ============================
+class SheetSync:
+    """Manifest (kunci + hash per baris) untuk satu worksheet"""
+
+    def __init__(self, worksheet, name, key_columns=('NIK',), value_input_option='RAW',
+                 manifest_dir=SHEET_SYNC_DIR, mode=SHEET_SYNC_MODE):
+        self.worksheet = worksheet
+        self.name = name
+        self.key_columns = list(key_columns)
+        self.value_input_option = value_input_option
+        self.mode = mode
+        self.manifest_path = os.path.join(manifest_dir, f"{re.sub(r'[^A-Za-z0-9_.-]+', '_', name)}.json")
+        self.stats = {"mode": "full", "updated": 0, "inserted": 0, "deleted": 0, "moved": 0,
+                      "rows_written": 0, "requests": 0}
+
+    # ---------- token di sheet tersembunyi ----------
+    def _token_worksheet(self):
+        from gspread.exceptions import WorksheetNotFound
+
+        spreadsheet = self.worksheet.spreadsheet
+        try:
+            return _with_retry(spreadsheet.worksheet, SYNC_TOKEN_SHEET)
+        except WorksheetNotFound:
+            token_ws = _with_retry(spreadsheet.add_worksheet, title=SYNC_TOKEN_SHEET, rows=20, cols=4)
+            try:
+                _with_retry(token_ws.hide)
+            except Exception as e:
+                print(f"   ⚠️  Gagal menyembunyikan sheet {SYNC_TOKEN_SHEET}: {e}")
+            return token_ws
+
+    def _read_token(self, token_ws):
+        """(nomor baris, token) untuk sheet ini di sheet token"""
+        rows = _with_retry(token_ws.get_all_values)
+        for row_idx, row in enumerate(rows, start=1):
+            if row and row[0] == self.name:
+                return row_idx, (row[1] if len(row) > 1 else "")
+        return len(rows) + 1, ""
+
+    def _write_token(self, token_ws, row_idx, token, total_rows):
+        if row_idx > token_ws.row_count:
+            _with_retry(token_ws.add_rows, row_idx - token_ws.row_count)
+        timestamp = datetime.now().strftime("%d-%m-%Y %H:%M:%S")
+        _with_retry(token_ws.update, range_name=f"A{row_idx}:D{row_idx}",
+                    values=[[self.name, token, timestamp, total_rows]])
+
+    # ---------- manifest lokal ----------
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("version") != MANIFEST_VERSION:
+            return None
+        return manifest
+
+    def _save_manifest(self, manifest):
+        try:
+            os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+            tmp_path = f"{self.manifest_path}.tmp-{os.getpid()}"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(manifest, f)
+            os.replace(tmp_path, self.manifest_path)
+        except OSError as e:
+            print(f"⚠️  Gagal menyimpan manifest {self.name}: {e}")
+
+    # ---------- penulisan ----------
+    def _write_rows(self, rows, layout, writes, n_cols):
+        """Tulis posisi `writes` sebagai range berurutan, beberapa range per panggilan"""
+        from gspread.utils import rowcol_to_a1
+
+        batch, batch_rows = [], 0
+        for start, end in contiguous_runs(writes):
+            while start <= end:
+                chunk_end = min(end, start + SYNC_BATCH_ROWS - batch_rows - 1)
+                batch.append({
+                    "range": f"{rowcol_to_a1(start + 2, 1)}:{rowcol_to_a1(chunk_end + 2, n_cols)}",
+                    "values": [rows[layout[pos]] for pos in range(start, chunk_end + 1)]
+                })
+                batch_rows += chunk_end - start + 1
+                start = chunk_end + 1
+                if batch_rows >= SYNC_BATCH_ROWS:
+                    self._send_batch(batch)
+                    batch, batch_rows = [], 0
+        if batch:
+            self._send_batch(batch)
+
+    def _send_batch(self, batch):
+        _with_retry(self.worksheet.batch_update, batch, value_input_option=self.value_input_option)
+        self.stats["requests"] += 1
+        print(f"   ✅ {len(batch)} range ({sum(len(item['values']) for item in batch):,} baris) terkirim")
+
+    def sync(self, df, full_write, rows=None):
+        """
+        Sinkronkan df (header = nama kolom) ke worksheet.
+        full_write : fungsi tanpa argumen yang menulis ulang seluruh sheet
+        rows       : nilai per baris yang dikirim (default df.values.tolist())
+        """
+        from gspread.utils import rowcol_to_a1
+
+        header = [str(col) for col in df.columns]
+        new_keys = row_keys(df, self.key_columns)
+        new_hashes = row_hashes(df)
+
+        token_ws = self._token_worksheet()
+        token_row, sheet_token = self._read_token(token_ws)
+        manifest = self._load_manifest() if self.mode != "full" else None
+
+        reason = None
+        if self.mode == "full":
+            reason = "SHEET_SYNC_MODE=full"
+        elif manifest is None:
+            reason = "manifest belum ada"
+        elif not sheet_token or manifest.get("token") != sheet_token:
+            reason = "token manifest tidak cocok dengan sheet"
+        elif manifest.get("sheet_id") != self.worksheet.id or manifest.get("header") != header:
+            reason = "sheet atau header berubah"
+
+        # Token dikosongkan dulu: jika run gagal di tengah, manifest tidak dipakai lagi
+        self._write_token(token_ws, token_row, "", len(df))
+
+        if reason:
+            print(f"🔁 Sinkronisasi {self.name}: tulis ulang penuh ({reason})")
+            full_write()
+            layout = list(range(len(df)))
+        else:
+            layout, writes, counts = plan_sync(manifest["keys"], manifest["hashes"], new_keys, new_hashes)
+            old_count = len(manifest["keys"])
+            self.stats.update(counts, mode="diff", rows_written=len(writes))
+            print(f"🔁 Sinkronisasi {self.name}: {len(writes):,} dari {len(df):,} baris ditulis "
+                  f"(berubah {counts['updated']:,}, baru {counts['inserted']:,}, "
+                  f"dihapus {counts['deleted']:,}, dipindah {counts['moved']:,})")
+
+            if rows is None:
+                rows = df.values.tolist()
+            required_rows = len(df) + 1
+            if required_rows > self.worksheet.row_count:
+                _with_retry(self.worksheet.add_rows, required_rows - self.worksheet.row_count + ROW_BUFFER)
+            if writes:
+                self._write_rows(rows, layout, writes, len(header))
+            if old_count > len(df):
+                tail_range = f"{rowcol_to_a1(len(df) + 2, 1)}:{rowcol_to_a1(old_count + 1, len(header))}"
+                _with_retry(self.worksheet.batch_clear, [tail_range])
+                self.stats["requests"] += 1
+
+        token = uuid.uuid4().hex
+        self._save_manifest({
+            "version": MANIFEST_VERSION,
+            "token": token,
+            "sheet_id": self.worksheet.id,
+            "header": header,
+            "keys": [new_keys[i] for i in layout],
+            "hashes": [new_hashes[i] for i in layout],
+        })
+        self._write_token(token_ws, token_row, token, len(df))
+        return self.stats
+
+def sync_dataframe_to_worksheet(worksheet, df, name, full_write, key_columns=('NIK',),
+                                value_input_option='RAW', rows=None):
+    """
+    Sinkronkan df ke worksheet (hanya baris berubah); fallback full_write().
+    value_input_option harus sama dengan yang dipakai full_write (default RAW,
+    sama seperti worksheet.update), supaya baris yang ditulis ulang tidak
+    berbeda tipe, mis. NIK 16 digit menjadi angka pada USER_ENTERED.
+    """
+    return SheetSync(worksheet, name, key_columns=key_columns,
+                     value_input_option=value_input_option).sync(df, full_write, rows=rows)
@@ -1,13 +1,11 @@
 import os
 import pandas as pd
 import numpy as np
-import gspread
 import re
-import json
-import io
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
+from google_clients import get_credentials, get_gspread_client, get_drive_service
+from drive_cache import download_files_parallel, DRIVE_FILE_FIELDS
+from excel_snapshot import read_excel_cached
+from nik_utils import clean_nik_series, print_nik_summary
 from datetime import datetime
 import traceback
 import smtplib
@@ -23,6 +21,34 @@ ERDKK_FOLDER_ID = "13N5dLdHzAKff6g8RDRiHa7LFyZbdJUCJ"
 REALISASI_FOLDER_ID = "1AXQdEUW1dXRcdT0m0QkzvT7ZJjN0Vt4E"
 OUTPUT_SHEET_URL = "https://docs.google.com/spreadsheets/d/1-UWjT-N5iRwFwpG-yVLiSxmyONn0VWoLESDPfchmDTk/edit"
 
+# Kolom realisasi yang dipakai (lihat get_manual_mapping_for_realisasi), kolom lain tidak di-parse
+REALISASI_USECOLS = ['NIK', 'NAMA', 'KODE KIOS', 'KECAMATAN', 'UREA', 'NPK', 'SP36', 'ZA', 'ORGANIK']
+
+# Sheet ERDKK yang dicoba berurutan sebelum sheet pertama (index 0)
+ERDKK_SHEET_OPTIONS = ['Sheet1', 'SHEET1', 'sheet1', 'Worksheet', 'WORKSHEET', 'worksheet']
+
+# Jenis pupuk ERDKK -> nama di kolom 'Pupuk <nama> (Kg) MTn'
+ERDKK_PUPUK_LABELS = {
+    'UREA': 'Urea',
+    'NPK': 'NPK',
+    'SP36': 'SP36',
+    'ZA': 'ZA',
+    'NPK_FORMULA': 'NPK Formula',
+    'ORGANIK': 'Organik',
+    'ORGANIK_CAIR': 'Organik Cair'
+}
+
+# Jenis pupuk di column_mapping realisasi -> kolom hasil
+REALISASI_PUPUK_KEYS = {
+    'urea': 'REALISASI_UREA',
+    'npk': 'REALISASI_NPK',
+    'sp36': 'REALISASI_SP36',
+    'za': 'REALISASI_ZA',
+    'npk_formula': 'REALISASI_NPK_FORMULA',
+    'organik': 'REALISASI_ORGANIK',
+    'organik_cair': 'REALISASI_ORGANIK_CAIR'
+}
+
 # ============================
 # EMAIL CONFIG (DARI SECRETS)
 # ============================
@@ -41,19 +67,6 @@ EMAIL_CONFIG = {
 # ============================
 # FUNGSI UTILITY - TIDAK BERUBAH
 # ============================
-def clean_nik(nik_value):
-    """Membersihkan NIK dari karakter non-angka"""
-    if pd.isna(nik_value) or nik_value is None:
-        return None
-
-    nik_str = str(nik_value)
-    cleaned_nik = re.sub(r'\D', '', nik_str)
-
-    if len(cleaned_nik) != 16:
-        print(f"⚠️  NIK tidak standar: {nik_value} -> {cleaned_nik} (panjang: {len(cleaned_nik)})")
-
-    return cleaned_nik if cleaned_nik else None
-
 def clean_kode_kios(kode_value):
     """Membersihkan kode kios dengan konsisten"""
     if pd.isna(kode_value) or kode_value is None:
@@ -75,6 +88,33 @@ def clean_kode_kios(kode_value):
     
     return kode_cleaned
 
+def clean_kode_kios_series(series):
+    """clean_kode_kios untuk satu kolom: setiap kode unik dibersihkan sekali"""
+    codes, uniques = pd.factorize(series)
+    cleaned = np.array([clean_kode_kios(value) for value in uniques] + [''], dtype=object)
+    return cleaned[codes]
+
+def text_column(df, col, upper=False):
+    """Kolom teks yang sudah di-strip (kolom tidak ada / nilai kosong -> '')"""
+    if not col or col not in df.columns:
+        return np.full(len(df), '', dtype=object)
+    values = df[col].where(df[col].notna(), '').astype(str).str.strip()
+    return (values.str.upper() if upper else values).to_numpy(dtype=object)
+
+def numeric_column(df, col):
+    """Konversi satu kolom ke float per nilai unik (kolom tidak ada / bukan angka -> 0)"""
+    if not col or col not in df.columns:
+        return np.zeros(len(df))
+    codes, uniques = pd.factorize(df[col])
+    numbers = pd.to_numeric(pd.Series(uniques, dtype=object), errors='coerce').fillna(0).to_numpy(dtype=float)
+    return np.append(numbers, 0.0)[codes]
+
+def round_values(values, digits=2):
+    """round() bawaan Python per nilai unik (hasil sama persis dengan pembulatan per baris)"""
+    codes, uniques = pd.factorize(values)
+    rounded = np.array([round(value, digits) for value in uniques.tolist()] + [0.0])
+    return rounded[codes]
+
 def send_email_notification(subject, message, is_success=True):
     """Mengirim notifikasi email (menggunakan secrets/env)"""
     try:
@@ -157,32 +197,31 @@ def download_excel_files(credentials, folder_id, folder_name):
     save_folder = os.path.join(temp_dir, f"data_{folder_name}_{int(time.time())}")
     os.makedirs(save_folder, exist_ok=True)
 
-    drive_service = build('drive', 'v3', credentials=credentials)
+    drive_service = get_drive_service(credentials)
 
     query = f"'{folder_id}' in parents and (mimeType='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet' or mimeType='application/vnd.ms-excel')"
-    results = drive_service.files().list(q=query, fields="files(id, name)").execute()
+    results = drive_service.files().list(q=query, fields=DRIVE_FILE_FIELDS).execute()
     files = results.get("files", [])
 
     if not files:
         print(f"⚠️  Tidak ada file Excel di folder {folder_name}")
         return []
 
-    file_paths = []
-    for file in files:
-        print(f"📥 Downloading {folder_name}: {file['name']}")
-        request = drive_service.files().get_media(fileId=file["id"])
-        file_path = os.path.join(save_folder, file["name"])
-
-        with io.FileIO(file_path, 'wb') as fh:
-            downloader = MediaIoBaseDownload(fh, request)
-            done = False
-            while not done:
-                _, done = downloader.next_chunk()
+    jobs = [
+        {'file': file, 'path': os.path.join(save_folder, file["name"])}
+        for file in files
+    ]
 
+    print(f"📥 Downloading {len(jobs)} file {folder_name}...")
+    file_paths = []
+    for job in download_files_parallel(credentials, jobs):
+        if job['error'] is not None:
+            raise job['error']
         file_paths.append({
-            'path': file_path,
-            'name': file['name'],
-            'temp_folder': save_folder
+            'path': job['path'],
+            'name': job['file']['name'],
+            'temp_folder': save_folder,
+            'modified_time': job['file'].get('modifiedTime')
         })
 
     print(f"✅ Berhasil download {len(file_paths)} file dari {folder_name} ke {save_folder}")
@@ -191,109 +230,46 @@ def download_excel_files(credentials, folder_id, folder_name):
 # ============================
 # FUNGSI PROSES DATA ERDKK - DIPERBAIKI (SHEET1)
 # ============================
-def process_single_erdkk_row(row, file_name=""):
-    """Proses satu baris data ERDKK dengan validasi lebih ketat"""
-    result = {
-        'NIK': None,
-        'NAMA_PETANI': '',
-        'KODE_KIOS': '',
-        'NAMA_KIOS': '',
-        'TOTAL_UREA': 0,
-        'TOTAL_NPK': 0,
-        'TOTAL_SP36': 0,
-        'TOTAL_ZA': 0,
-        'TOTAL_NPK_FORMULA': 0,
-        'TOTAL_ORGANIK': 0,
-        'TOTAL_ORGANIK_CAIR': 0,
-        'FILE_SOURCE': file_name
-    }
-
-    try:
-        # Clean NIK
-        nik = clean_nik(row.get('KTP', ''))
-        if not nik:
-            return None
-
-        result['NIK'] = nik
-        result['NAMA_PETANI'] = str(row.get('Nama Petani', '')).strip()
-
-        # Ambil kode kios dari ERDKK
-        kode_kios_raw = row.get('Kode Kios Pengecer', '')
-        nama_kios_raw = row.get('Nama Kios Pengecer', '')
-
-        # Clean kode kios dengan fungsi khusus
-        result['KODE_KIOS'] = clean_kode_kios(kode_kios_raw)
-        result['NAMA_KIOS'] = str(nama_kios_raw).strip() if pd.notna(nama_kios_raw) else ''
-
-        # Hitung total pupuk per jenis (MT1 + MT2 + MT3)
+def build_erdkk_frame(df, file_name=""):
+    """
+    Hitung total pupuk per baris ERDKK (MT1 + MT2 + MT3) untuk semua baris sekaligus.
+    Setiap kolom 'Pupuk X (Kg) MTn' dikonversi ke angka sekali, baris tanpa NIK
+    atau tanpa pupuk dibuang. Return DataFrame dengan kolom TOTAL_*.
+    """
+    # NIK sudah dibersihkan per kolom di process_erdkk_file
+    if 'KTP' in df.columns:
+        niks = df['KTP'].to_numpy(dtype=object)
+    else:
+        niks = np.full(len(df), None, dtype=object)
+
+    result = pd.DataFrame({
+        'NIK': niks,
+        'NAMA_PETANI': (df['Nama Petani'].astype(str).str.strip().to_numpy(dtype=object)
+                        if 'Nama Petani' in df.columns else np.full(len(df), '', dtype=object)),
+        'KODE_KIOS': (clean_kode_kios_series(df['Kode Kios Pengecer'])
+                      if 'Kode Kios Pengecer' in df.columns else np.full(len(df), '', dtype=object)),
+        'NAMA_KIOS': text_column(df, 'Nama Kios Pengecer')
+    })
+
+    # Hitung total pupuk per jenis (MT1 + MT2 + MT3)
+    pupuk_total = np.zeros(len(df))
+    for pupuk_type, label in ERDKK_PUPUK_LABELS.items():
+        total = np.zeros(len(df))
         for mt in ['MT1', 'MT2', 'MT3']:
-            # Urea
-            urea_col = f'Pupuk Urea (Kg) {mt}'
-            if urea_col in row:
-                value = pd.to_numeric(row[urea_col], errors='coerce')
-                if pd.notna(value):
-                    result['TOTAL_UREA'] += float(value)
-
-            # NPK
-            npk_col = f'Pupuk NPK (Kg) {mt}'
-            if npk_col in row:
-                value = pd.to_numeric(row[npk_col], errors='coerce')
-                if pd.notna(value):
-                    result['TOTAL_NPK'] += float(value)
-
-            # SP36
-            sp36_col = f'Pupuk SP36 (Kg) {mt}'
-            if sp36_col in row:
-                value = pd.to_numeric(row[sp36_col], errors='coerce')
-                if pd.notna(value):
-                    result['TOTAL_SP36'] += float(value)
-
-            # ZA
-            za_col = f'Pupuk ZA (Kg) {mt}'
-            if za_col in row:
-                value = pd.to_numeric(row[za_col], errors='coerce')
-                if pd.notna(value):
-                    result['TOTAL_ZA'] += float(value)
-
-            # NPK Formula
-            npk_formula_col = f'Pupuk NPK Formula (Kg) {mt}'
-            if npk_formula_col in row:
-                value = pd.to_numeric(row[npk_formula_col], errors='coerce')
-                if pd.notna(value):
-                    result['TOTAL_NPK_FORMULA'] += float(value)
-
-            # Organik
-            organik_col = f'Pupuk Organik (Kg) {mt}'
-            if organik_col in row:
-                value = pd.to_numeric(row[organik_col], errors='coerce')
-                if pd.notna(value):
-                    result['TOTAL_ORGANIK'] += float(value)
-
-            # Organik Cair (jika ada)
-            organik_cair_col = f'Pupuk Organik Cair (Kg) {mt}'
-            if organik_cair_col in row:
-                value = pd.to_numeric(row[organik_cair_col], errors='coerce')
-                if pd.notna(value):
-                    result['TOTAL_ORGANIK_CAIR'] += float(value)
-
-        # Cek apakah ada data pupuk yang valid
-        pupuk_total = (result['TOTAL_UREA'] + result['TOTAL_NPK'] + result['TOTAL_SP36'] + 
-                      result['TOTAL_ZA'] + result['TOTAL_NPK_FORMULA'] + 
-                      result['TOTAL_ORGANIK'] + result['TOTAL_ORGANIK_CAIR'])
-        
-        if pupuk_total <= 0:
-            return None  # Skip jika tidak ada pupuk
+            total = total + numeric_column(df, f'Pupuk {label} (Kg) {mt}')
+        result[f'TOTAL_{pupuk_type}'] = total
+        pupuk_total = pupuk_total + total
 
-        # Bulatkan nilai
-        for key in ['TOTAL_UREA', 'TOTAL_NPK', 'TOTAL_SP36', 'TOTAL_ZA', 
-                   'TOTAL_NPK_FORMULA', 'TOTAL_ORGANIK', 'TOTAL_ORGANIK_CAIR']:
-            result[key] = round(result[key], 2)
+    # Skip baris tanpa NIK atau tanpa pupuk
+    has_nik = np.array([bool(nik) for nik in niks], dtype=bool)
+    result = result[has_nik & (pupuk_total > 0)].reset_index(drop=True)
 
-        return result
+    # Bulatkan nilai
+    for pupuk_type in ERDKK_PUPUK_LABELS:
+        result[f'TOTAL_{pupuk_type}'] = round_values(result[f'TOTAL_{pupuk_type}'].to_numpy())
 
-    except Exception as e:
-        print(f"   ⚠️  Error processing row: {e}")
-        return None
+    result['FILE_SOURCE'] = file_name
+    return result
 
 def process_erdkk_file(file_path, file_name):
     """Proses satu file ERDKK - SHEET DIPERBAIKI MENJADI Sheet1"""
@@ -301,15 +277,13 @@ def process_erdkk_file(file_path, file_name):
         print(f"\n   📖 Memproses ERDKK: {file_name}")
 
         # Coba beberapa opsi untuk membaca file ERDKK
-        sheet_options = ['Sheet1', 'SHEET1', 'sheet1', 'Worksheet', 'WORKSHEET', 'worksheet']
-        
         df = None
         used_sheet = None
         
-        for sheet_name in sheet_options:
+        for sheet_name in ERDKK_SHEET_OPTIONS:
             try:
                 print(f"   🔍 Mencoba sheet: '{sheet_name}'")
-                df = pd.read_excel(file_path, sheet_name=sheet_name, dtype=str)
+                df = read_excel_cached(file_path, sheet_name=sheet_name, dtype=str)
                 used_sheet = sheet_name
                 print(f"   ✅ Berhasil membaca dengan sheet: '{sheet_name}'")
                 break
@@ -321,12 +295,12 @@ def process_erdkk_file(file_path, file_name):
         if df is None:
             try:
                 print(f"   🔍 Mencoba sheet pertama (index 0)")
-                df = pd.read_excel(file_path, sheet_name=0, dtype=str)
+                df = read_excel_cached(file_path, sheet_name=0, dtype=str)
                 used_sheet = "sheet pertama (index 0)"
                 print(f"   ✅ Berhasil membaca sheet pertama")
             except Exception as e:
                 print(f"   ❌ Gagal membaca sheet pertama: {e}")
-                return []
+                return pd.DataFrame()
         
         print(f"   📊 Sheet yang digunakan: {used_sheet}")
         print(f"   📊 Dimensi data: {df.shape[0]} baris x {df.shape[1]} kolom")
@@ -395,21 +369,20 @@ def process_erdkk_file(file_path, file_name):
                     else:
                         print(f"     {col}: (kosong)")
 
-        results = []
-
-        # Proses setiap baris
-        for idx, row in df.iterrows():
-            row_result = process_single_erdkk_row(row, file_name)
+        # Bersihkan NIK satu kolom sekaligus
+        if 'KTP' in df.columns:
+            df['KTP'], nik_summary = clean_nik_series(df['KTP'])
+            print_nik_summary(nik_summary, label="KTP")
 
-            if row_result:
-                results.append(row_result)
+        # Hitung kuota semua baris sekaligus
+        results = build_erdkk_frame(df, file_name)
 
         print(f"   ✅ Berhasil: {len(results)} baris data")
         
         # DEBUG: Tampilkan sample data
-        if results and len(results) > 0:
+        if not results.empty:
             print(f"   🔍 Sample data ERDKK (baris pertama):")
-            sample = results[0]
+            sample = results.iloc[0]
             print(f"     NIK: {sample['NIK']}")
             print(f"     Nama: {sample['NAMA_PETANI'][:20]}...")
             print(f"     Kode Kios: '{sample['KODE_KIOS']}'")
@@ -421,17 +394,16 @@ def process_erdkk_file(file_path, file_name):
     except Exception as e:
         print(f"   ❌ Error memproses ERDKK {file_name}: {str(e)}")
         traceback.print_exc()
-        return []
+        return pd.DataFrame()
 
-def pivot_erdkk_data(all_erdkk_rows):
+def pivot_erdkk_data(erdkk_rows_df):
     """Pivot data ERDKK berdasarkan NIK dan KODE_KIOS dengan duplikasi handling"""
-    if not all_erdkk_rows:
+    if erdkk_rows_df is None or erdkk_rows_df.empty:
         return pd.DataFrame()
 
     print("\n📊 Membuat pivot data ERDKK...")
 
-    # Convert to DataFrame
-    df = pd.DataFrame(all_erdkk_rows)
+    df = erdkk_rows_df.copy()
     
     # Debug: Tampilkan duplikasi sebelum pivot
     duplicate_check = df.duplicated(subset=['NIK', 'KODE_KIOS'], keep=False)
@@ -518,116 +490,46 @@ def clean_column_name(col_name):
     
     return col_clean
 
-def process_single_realisasi_row(row, column_mapping, file_name=""):
-    """Proses satu baris data realisasi dengan cleaning yang konsisten"""
-    result = {
-        'NIK': None,
-        'NAMA_PETANI': '',
-        'KODE_KIOS': '',
-        'NAMA_KIOS': '',
-        'KECAMATAN': '',
-        'REALISASI_UREA': 0,
-        'REALISASI_NPK': 0,
-        'REALISASI_SP36': 0,
-        'REALISASI_ZA': 0,
-        'REALISASI_NPK_FORMULA': 0,
-        'REALISASI_ORGANIK': 0,
-        'REALISASI_ORGANIK_CAIR': 0,
-        'FILE_SOURCE': file_name
-    }
-
-    try:
-        # 1. AMBIL NIK (wajib)
-        nik_col = column_mapping.get('nik_col')
-        if nik_col and nik_col in row:
-            nik_raw = row[nik_col]
-            nik = clean_nik(nik_raw)
-            if not nik:
-                return None  # Baris tanpa NIK di-skip
-            result['NIK'] = nik
-        
-        if not result['NIK']:
-            return None  # Skip jika tidak ada NIK
-        
-        # 2. AMBIL NAMA PETANI
-        nama_col = column_mapping.get('nama_col')
-        if nama_col and nama_col in row:
-            nama_raw = row[nama_col]
-            if pd.notna(nama_raw):
-                result['NAMA_PETANI'] = str(nama_raw).strip()
-        
-        # 3. AMBIL KODE KIOS dengan cleaning yang sama seperti ERDKK
-        kode_kios_col = column_mapping.get('kode_kios_col')
-        if kode_kios_col and kode_kios_col in row:
-            kode_raw = row[kode_kios_col]
-            result['KODE_KIOS'] = clean_kode_kios(kode_raw)
-        
-        # 4. AMBIL NAMA KIOS
-        nama_kios_col = column_mapping.get('nama_kios_col')
-        if nama_kios_col and nama_kios_col in row:
-            nama_kios_raw = row[nama_kios_col]
-            if pd.notna(nama_kios_raw):
-                result['NAMA_KIOS'] = str(nama_kios_raw).strip()
-        
-        # 5. AMBIL KECAMATAN
-        kecamatan_col = column_mapping.get('kecamatan_col')
-        if kecamatan_col and kecamatan_col in row:
-            kecamatan_raw = row[kecamatan_col]
-            if pd.notna(kecamatan_raw):
-                result['KECAMATAN'] = str(kecamatan_raw).strip().upper()
-        
-        # 6. AMBIL DATA PUPUK
-        pupuk_mapping = {
-            'urea': 'REALISASI_UREA',
-            'npk': 'REALISASI_NPK',
-            'sp36': 'REALISASI_SP36',
-            'za': 'REALISASI_ZA',
-            'npk_formula': 'REALISASI_NPK_FORMULA',
-            'organik': 'REALISASI_ORGANIK',
-            'organik_cair': 'REALISASI_ORGANIK_CAIR'
-        }
-        
-        pupuk_cols_dict = column_mapping.get('pupuk_cols', {})
-        
-        for pupuk_type, result_key in pupuk_mapping.items():
-            if pupuk_type in pupuk_cols_dict:
-                col_name = pupuk_cols_dict[pupuk_type]
-                if col_name in row:
-                    raw_value = row[col_name]
-                    
-                    if pd.notna(raw_value):
-                        try:
-                            # Convert ke numeric dengan handling yang kuat
-                            value = pd.to_numeric(raw_value, errors='coerce')
-                            if pd.notna(value):
-                                result[result_key] = float(value)
-                        except:
-                            pass
-        
-        # 7. Cek apakah ada data pupuk yang valid
-        has_pupuk_data = any([
-            result['REALISASI_UREA'] > 0,
-            result['REALISASI_NPK'] > 0,
-            result['REALISASI_SP36'] > 0,
-            result['REALISASI_ZA'] > 0,
-            result['REALISASI_NPK_FORMULA'] > 0,
-            result['REALISASI_ORGANIK'] > 0,
-            result['REALISASI_ORGANIK_CAIR'] > 0
-        ])
-        
-        if not has_pupuk_data:
-            return None
-
-        # Bulatkan nilai
-        for key in ['REALISASI_UREA', 'REALISASI_NPK', 'REALISASI_SP36', 'REALISASI_ZA',
-                   'REALISASI_NPK_FORMULA', 'REALISASI_ORGANIK', 'REALISASI_ORGANIK_CAIR']:
-            result[key] = round(result[key], 2)
-
-        return result
-
-    except Exception as e:
-        print(f"   ⚠️  Error processing realisasi row: {e}")
-        return None
+def build_realisasi_frame(df, column_mapping, file_name=""):
+    """
+    Ambil data realisasi per baris untuk semua baris sekaligus sesuai column_mapping.
+    Kode kios dibersihkan sama seperti ERDKK, baris tanpa NIK atau tanpa pupuk
+    dibuang. Return DataFrame dengan kolom REALISASI_*.
+    """
+    # NIK sudah dibersihkan per kolom di process_realisasi_file
+    nik_col = column_mapping.get('nik_col')
+    if nik_col and nik_col in df.columns:
+        niks = df[nik_col].to_numpy(dtype=object)
+    else:
+        niks = np.full(len(df), None, dtype=object)
+
+    kode_kios_col = column_mapping.get('kode_kios_col')
+    result = pd.DataFrame({
+        'NIK': niks,
+        'NAMA_PETANI': text_column(df, column_mapping.get('nama_col')),
+        'KODE_KIOS': (clean_kode_kios_series(df[kode_kios_col])
+                      if kode_kios_col and kode_kios_col in df.columns else np.full(len(df), '', dtype=object)),
+        'NAMA_KIOS': text_column(df, column_mapping.get('nama_kios_col')),
+        'KECAMATAN': text_column(df, column_mapping.get('kecamatan_col'), upper=True)
+    })
+
+    pupuk_cols_dict = column_mapping.get('pupuk_cols', {})
+    has_pupuk_data = np.zeros(len(df), dtype=bool)
+    for pupuk_type, result_key in REALISASI_PUPUK_KEYS.items():
+        values = numeric_column(df, pupuk_cols_dict.get(pupuk_type))
+        result[result_key] = values
+        has_pupuk_data |= values > 0
+
+    # Skip baris tanpa NIK atau tanpa pupuk
+    has_nik = np.array([bool(nik) for nik in niks], dtype=bool)
+    result = result[has_nik & has_pupuk_data].reset_index(drop=True)
+
+    # Bulatkan nilai
+    for result_key in REALISASI_PUPUK_KEYS.values():
+        result[result_key] = round_values(result[result_key].to_numpy())
+
+    result['FILE_SOURCE'] = file_name
+    return result
 
 def process_realisasi_file(file_path, file_name):
     """Proses satu file realisasi dengan mapping manual"""
@@ -636,16 +538,16 @@ def process_realisasi_file(file_path, file_name):
 
         # Baca file Excel
         try:
-            df = pd.read_excel(file_path, dtype=str)
+            df = read_excel_cached(file_path, dtype=str, usecols_keywords=REALISASI_USECOLS)
         except Exception as e1:
             try:
-                df = pd.read_excel(file_path, header=1, dtype=str)
+                df = read_excel_cached(file_path, header=1, dtype=str, usecols_keywords=REALISASI_USECOLS)
             except Exception as e2:
                 try:
-                    df = pd.read_excel(file_path, dtype=str, engine='openpyxl')
+                    df = read_excel_cached(file_path, dtype=str, engine='openpyxl', usecols_keywords=REALISASI_USECOLS)
                 except Exception as e3:
                     print(f"   ❌ Gagal membaca file: {e3}")
-                    return []
+                    return pd.DataFrame()
 
         # Clean column names
         df.columns = [clean_column_name(col) for col in df.columns]
@@ -653,19 +555,16 @@ def process_realisasi_file(file_path, file_name):
         # Gunakan mapping manual
         column_mapping = get_manual_mapping_for_realisasi(file_name)
         
-        results = []
-        processed_count = 0
-        skipped_count = 0
+        # Bersihkan NIK satu kolom sekaligus
+        nik_col = column_mapping.get('nik_col')
+        if nik_col and nik_col in df.columns:
+            df[nik_col], nik_summary = clean_nik_series(df[nik_col])
+            print_nik_summary(nik_summary)
         
-        # Proses setiap baris
-        for idx, row in df.iterrows():
-            row_result = process_single_realisasi_row(row, column_mapping, file_name)
-
-            if row_result:
-                results.append(row_result)
-                processed_count += 1
-            else:
-                skipped_count += 1
+        # Ambil realisasi semua baris sekaligus
+        results = build_realisasi_frame(df, column_mapping, file_name)
+        processed_count = len(results)
+        skipped_count = len(df) - processed_count
 
         print(f"\n   📊 Statistik pemrosesan:")
         print(f"      • Total baris dalam file: {len(df)}")
@@ -673,9 +572,9 @@ def process_realisasi_file(file_path, file_name):
         print(f"      • Dilewati: {skipped_count}")
         
         # DEBUG: Tampilkan sample data
-        if results and len(results) > 0:
+        if not results.empty:
             print(f"   🔍 Sample data Realisasi (baris pertama):")
-            sample = results[0]
+            sample = results.iloc[0]
             print(f"     NIK: {sample['NIK']}")
             print(f"     Nama: {sample['NAMA_PETANI'][:20]}...")
             print(f"     Kode Kios: '{sample['KODE_KIOS']}'")
@@ -687,17 +586,16 @@ def process_realisasi_file(file_path, file_name):
     except Exception as e:
         print(f"   ❌ Error memproses realisasi {file_name}: {str(e)}")
         traceback.print_exc()
-        return []
+        return pd.DataFrame()
 
-def pivot_realisasi_data(all_realisasi_rows):
+def pivot_realisasi_data(realisasi_rows_df):
     """Pivot data realisasi berdasarkan NIK dan KODE_KIOS dengan duplikasi handling"""
-    if not all_realisasi_rows:
+    if realisasi_rows_df is None or realisasi_rows_df.empty:
         return pd.DataFrame()
 
     print("\n📊 Membuat pivot data realisasi...")
 
-    # Convert to DataFrame
-    df = pd.DataFrame(all_realisasi_rows)
+    df = realisasi_rows_df.copy()
     
     # Debug: Tampilkan duplikasi sebelum pivot
     duplicate_check = df.duplicated(subset=['NIK', 'KODE_KIOS'], keep=False)
@@ -990,19 +888,8 @@ def process_step_by_step():
     
     try:
         # Load credentials
-        creds_json = os.getenv("GOOGLE_APPLICATION_CREDENTIALS_JSON")
-        if not creds_json:
-            raise ValueError("❌ GOOGLE_APPLICATION_CREDENTIALS_JSON tidak ditemukan")
-        
-        credentials = Credentials.from_service_account_info(
-            json.loads(creds_json),
-            scopes=[
-                "https://www.googleapis.com/auth/spreadsheets",
-                "https://www.googleapis.com/auth/drive",
-            ],
-        )
-        
-        gc = gspread.authorize(credentials)
+        credentials = get_credentials()
+        gc = get_gspread_client(credentials)
         
         all_temp_files = []
         
@@ -1024,17 +911,18 @@ def process_step_by_step():
         else:
             print(f"✅ Download selesai: {len(erdkk_files)} file")
             
-            all_erdkk_rows = []
+            erdkk_frames = []
             processed_files = 0
             
             for file_info in erdkk_files:
                 file_rows = process_erdkk_file(file_info['path'], file_info['name'])
                 
-                if file_rows:
-                    all_erdkk_rows.extend(file_rows)
+                if not file_rows.empty:
+                    erdkk_frames.append(file_rows)
                     processed_files += 1
             
-            if all_erdkk_rows:
+            all_erdkk_rows = pd.concat(erdkk_frames, ignore_index=True) if erdkk_frames else pd.DataFrame()
+            if not all_erdkk_rows.empty:
                 print(f"\n✅ Total file ERDKK diproses: {processed_files}/{len(erdkk_files)}")
                 print(f"✅ Total baris data ERDKK: {len(all_erdkk_rows)}")
                 
@@ -1087,17 +975,18 @@ def process_step_by_step():
         else:
             print(f"✅ Download selesai: {len(realisasi_files)} file")
             
-            all_realisasi_rows = []
+            realisasi_frames = []
             processed_files = 0
             
             for file_info in realisasi_files:
                 file_rows = process_realisasi_file(file_info['path'], file_info['name'])
                 
-                if file_rows:
-                    all_realisasi_rows.extend(file_rows)
+                if not file_rows.empty:
+                    realisasi_frames.append(file_rows)
                     processed_files += 1
             
-            if all_realisasi_rows:
+            all_realisasi_rows = pd.concat(realisasi_frames, ignore_index=True) if realisasi_frames else pd.DataFrame()
+            if not all_realisasi_rows.empty:
                 print(f"\n✅ Total file realisasi diproses: {processed_files}/{len(realisasi_files)}")
                 print(f"✅ Total baris data realisasi: {len(all_realisasi_rows)}")
                 
@@ -1,18 +1,15 @@
 import os
-import json
 import pandas as pd
-import gspread
-import re
-from gspread_dataframe import set_with_dataframe
-from google.oauth2.service_account import Credentials
+from google_clients import get_credentials, get_gspread_client
 from datetime import datetime
 import traceback
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-import time
-import random
-from gspread.exceptions import WorksheetNotFound  # Tambahkan import ini
+import numpy as np
+from nik_utils import clean_nik_series, print_nik_summary
+from sheet_sync import sync_dataframe_to_worksheet
+from rate_limiter import get_rate_limiter
 
 # ============================
 # KONFIGURASI
@@ -25,6 +22,20 @@ SOURCE_SHEET_NAME = "Sisa"
 TARGET_SPREADSHEET_ID = "1ThYTH9QLZb5nXY1TCFN62h7zXqUfCdZQw5C4bxRAVjU"
 TARGET_SHEET_NAME = "Sisa versi Wa"
 
+# Laju request Sheets API (token bucket bersama, retry otomatis saat 429)
+SHEETS_LIMITER = get_rate_limiter("sheets")
+
+# Kolom sisa pupuk dan label di teks WA (urutan = urutan di teks)
+PUPUK_TYPES = {
+    'SISA_UREA': 'Urea',
+    'SISA_NPK': 'NPK',
+    'SISA_SP36': 'SP36',
+    'SISA_ZA': 'ZA',
+    'SISA_NPK_FORMULA': 'NPK Formula',
+    'SISA_ORGANIK': 'Organik',
+    'SISA_ORGANIK_CAIR': 'Organik Cair'
+}
+
 # ============================
 # KONFIGURASI EMAIL (SECRETS)
 # ============================
@@ -40,22 +51,6 @@ EMAIL_CONFIG = {
     "recipient_emails": [email.strip() for email in RECIPIENT_EMAILS.split(",")] if RECIPIENT_EMAILS else []
 }
 
-# ============================
-# FUNGSI BERSIHKAN NIK
-# ============================
-def clean_nik(nik_value):
-    """Membersihkan NIK dari karakter non-angka"""
-    if pd.isna(nik_value) or nik_value is None:
-        return None
-
-    nik_str = str(nik_value)
-    cleaned_nik = re.sub(r'\D', '', nik_str)
-
-    if len(cleaned_nik) != 16:
-        print(f"⚠️  NIK tidak standar: {nik_value} -> {cleaned_nik} (panjang: {len(cleaned_nik)})")
-
-    return cleaned_nik if cleaned_nik else None
-
 # ============================
 # FUNGSI FORMAT PUPUK
 # ============================
@@ -74,56 +69,44 @@ def format_pupuk_value(value):
     except:
         return "0"
 
-# ============================
-# FUNGSI BUAT TEKS WA PER BARIS - TAMPILKAN SEMUA PUPUK
-# ============================
-def create_wa_text(row, index):
-    """Membuat teks WA untuk satu baris data pupuk - TAMPILKAN SEMUA JENIS PUPUK"""
-    try:
-        # Format nama kios
-        nama_kios = str(row.get('NAMA_KIOS', '')).strip()
-        if not nama_kios:
-            nama_kios = "Kios Tanpa Nama"
-        
-        # Daftar semua jenis pupuk dengan nilai default 0
-        pupuk_types = {
-            'SISA_UREA': 'Urea',
-            'SISA_NPK': 'NPK', 
-            'SISA_SP36': 'SP36',
-            'SISA_ZA': 'ZA',
-            'SISA_NPK_FORMULA': 'NPK Formula',
-            'SISA_ORGANIK': 'Organik',
-            'SISA_ORGANIK_CAIR': 'Organik Cair'
-        }
-        
-        # Ambil semua nilai pupuk, format semua
-        pupuk_data = []
-        for col_key, pupuk_name in pupuk_types.items():
-            value = row.get(col_key, 0)
-            formatted_value = format_pupuk_value(value)
-            pupuk_data.append(f"{pupuk_name} {formatted_value} kg")
-        
-        # Gabungkan semua pupuk
-        pupuk_text = ", ".join(pupuk_data)
-        
-        return f"{index}) {nama_kios} - {pupuk_text}"
-    
-    except Exception as e:
-        print(f"❌ Error creating WA text for row {index}: {e}")
-        return f"{index}) Error processing data"
+def format_pupuk_series(series):
+    """Format satu kolom pupuk (format_pupuk_value sekali per nilai unik)"""
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    formatted = np.array([format_pupuk_value(value) for value in uniques], dtype=object)
+    return formatted[codes]
 
 # ============================
-# FUNGSI BUAT TEKS WA UTAMA
+# FUNGSI BUAT TEKS WA - TAMPILKAN SEMUA PUPUK
 # ============================
-def create_complete_wa_text(wa_items):
-    """Membuat teks WA lengkap dengan header"""
-    if not wa_items:
-        return "Sisa kuota anda :\nTidak ada data sisa kuota"
-    
-    header = "Sisa kuota anda :"
-    items_text = "\n".join(wa_items)
-    
-    return f"{header}\n{items_text}"
+def create_wa_rekap(df_sorted):
+    """
+    Rekap teks WA per NIK dari data yang sudah diurutkan per NIK & kios.
+    Semua baris diformat sekaligus per kolom lalu digabung per NIK.
+    """
+    nik_codes, niks = pd.factorize(df_sorted['NIK'], sort=True)
+
+    # Nama petani diambil dari baris pertama setiap NIK
+    first_rows = df_sorted.loc[~df_sorted['NIK'].duplicated(), 'NAMA_PETANI']
+    nama_petani = first_rows.fillna("").astype(str).str.strip().to_numpy(dtype=object)
+
+    nama_kios = df_sorted['NAMA_KIOS'].astype(str).str.strip().to_numpy(dtype=object)
+    nama_kios = np.where(nama_kios == '', "Kios Tanpa Nama", nama_kios)
+
+    # Semua jenis pupuk ditampilkan (nilai 0 juga)
+    pupuk_text = None
+    for col_key, pupuk_name in PUPUK_TYPES.items():
+        part = f"{pupuk_name} " + format_pupuk_series(df_sorted[col_key]) + " kg"
+        pupuk_text = part if pupuk_text is None else pupuk_text + ", " + part
+
+    nomor = pd.Series(nik_codes).groupby(nik_codes).cumcount() + 1
+    wa_items = nomor.astype(str).to_numpy(dtype=object) + ") " + nama_kios + " - " + pupuk_text
+    items_text = pd.Series(wa_items).groupby(nik_codes).agg("\n".join)
+
+    return pd.DataFrame({
+        'NIK': np.asarray(niks, dtype=object),
+        'NAMA_PETANI': nama_petani,
+        'DATA': "Sisa kuota anda :\n" + items_text.to_numpy(dtype=object)
+    }, columns=['NIK', 'NAMA_PETANI', 'DATA'])
 
 # ============================
 # FUNGSI KIRIM EMAIL
@@ -191,27 +174,19 @@ def send_email_notification(subject, message, is_success=True):
         return False
 
 # ============================
-# FUNGSI DENGAN EXPONENTIAL BACKOFF
+# FUNGSI DENGAN RATE LIMITER
 # ============================
-def execute_with_backoff(func, *args, max_retries=5, **kwargs):
-    """Menjalankan fungsi dengan exponential backoff untuk menghindari rate limit"""
-    for retry in range(max_retries):
-        try:
-            return func(*args, **kwargs)
-        except Exception as e:
-            if "429" in str(e) and retry < max_retries - 1:
-                wait_time = (2 ** retry) + random.random()
-                print(f"⚠️  Rate limit terdeteksi, retry {retry+1}/{max_retries} dalam {wait_time:.2f} detik...")
-                time.sleep(wait_time)
-            else:
-                raise e
-    return None
+def execute_with_backoff(func, *args, **kwargs):
+    """Menjalankan fungsi lewat rate limiter bersama (kuota per menit + retry 429)"""
+    return SHEETS_LIMITER.call(func, *args, **kwargs)
 
 # ============================
 # FUNGSI PROSES DATA DENGAN ERROR HANDLING
 # ============================
 def process_sisa_kuota_wa():
     """Proses utama: Baca data dari sheet Sisa, rekap per NIK untuk WA"""
+    from gspread.exceptions import WorksheetNotFound
+
     print("=" * 60)
     print("🚀 MEMULAI PROSES SISA KUOTA WA")
     print("=" * 60)
@@ -224,19 +199,8 @@ def process_sisa_kuota_wa():
         # ============================================
         print("\n🔑 Loading credentials...")
         
-        creds_json = os.getenv("GOOGLE_APPLICATION_CREDENTIALS_JSON")
-        if not creds_json:
-            raise ValueError("❌ GOOGLE_APPLICATION_CREDENTIALS_JSON tidak ditemukan")
-
-        credentials = Credentials.from_service_account_info(
-            json.loads(creds_json),
-            scopes=[
-                "https://www.googleapis.com/auth/spreadsheets",
-                "https://www.googleapis.com/auth/drive",
-            ],
-        )
-
-        gc = gspread.authorize(credentials)
+        credentials = get_credentials()
+        gc = get_gspread_client(credentials)
         print("✅ Credentials berhasil di-load")
         
         # ============================================
@@ -291,8 +255,7 @@ def process_sisa_kuota_wa():
                 raise ValueError(f"Kolom yang diperlukan tidak ditemukan: {missing_columns}")
         
         # Pastikan kolom pupuk ada, jika tidak buat dengan nilai 0
-        pupuk_columns = ['SISA_UREA', 'SISA_NPK', 'SISA_SP36', 'SISA_ZA', 
-                        'SISA_NPK_FORMULA', 'SISA_ORGANIK', 'SISA_ORGANIK_CAIR']
+        pupuk_columns = list(PUPUK_TYPES)
         
         for col in pupuk_columns:
             if col not in df.columns:
@@ -302,7 +265,8 @@ def process_sisa_kuota_wa():
         # Bersihkan NIK
         print("\n🧹 Membersihkan NIK...")
         df['NIK_ORIGINAL'] = df['NIK'].copy()
-        df['NIK'] = df['NIK'].apply(clean_nik)
+        df['NIK'], nik_summary = clean_nik_series(df['NIK'])
+        print_nik_summary(nik_summary)
         
         # Hapus baris dengan NIK kosong
         initial_count = len(df)
@@ -314,49 +278,10 @@ def process_sisa_kuota_wa():
         # ============================================
         print("\n📊 Membuat rekap data per NIK...")
         
-        output_rows = []
-        
         df_sorted = df.sort_values(['NIK', 'NAMA_KIOS']).reset_index(drop=True)
-        nik_groups = df_sorted.groupby('NIK')
-        total_nik = len(nik_groups)
+        print(f"   • Total NIK unik: {df_sorted['NIK'].nunique()}")
         
-        print(f"   • Total NIK unik: {total_nik}")
-        
-        for nik_idx, (nik, group) in enumerate(nik_groups, start=1):
-            try:
-                nama_petani = ""
-                if len(group) > 0:
-                    nama_petani = group['NAMA_PETANI'].iloc[0]
-                    if pd.isna(nama_petani):
-                        nama_petani = ""
-                
-                nama_petani = str(nama_petani).strip()
-                
-                wa_items = []
-                for idx, (_, row) in enumerate(group.iterrows(), start=1):
-                    wa_text = create_wa_text(row, idx)
-                    wa_items.append(wa_text)
-                
-                complete_wa_text = create_complete_wa_text(wa_items)
-                
-                output_rows.append({
-                    'NIK': nik,
-                    'NAMA_PETANI': nama_petani,
-                    'DATA': complete_wa_text
-                })
-                
-                if nik_idx % 10 == 0 or nik_idx == total_nik:
-                    print(f"   • Diproses: {nik_idx}/{total_nik} NIK")
-                    
-            except Exception as e:
-                print(f"❌ Error processing NIK {nik}: {e}")
-                output_rows.append({
-                    'NIK': nik,
-                    'NAMA_PETANI': 'ERROR',
-                    'DATA': f'Error processing data for NIK {nik}'
-                })
-        
-        output_df = pd.DataFrame(output_rows, columns=['NIK', 'NAMA_PETANI', 'DATA'])
+        output_df = create_wa_rekap(df_sorted)
         print(f"✅ Rekap selesai: {len(output_df)} NIK unik")
         
         # ============================================
@@ -368,8 +293,7 @@ def process_sisa_kuota_wa():
         
         try:
             target_worksheet = execute_with_backoff(target_spreadsheet.worksheet, TARGET_SHEET_NAME)
-            print(f"   • Sheet '{TARGET_SHEET_NAME}' sudah ada, menghapus isi...")
-            execute_with_backoff(target_worksheet.clear)
+            print(f"   • Sheet '{TARGET_SHEET_NAME}' sudah ada")
         except WorksheetNotFound:
             print(f"   • Sheet '{TARGET_SHEET_NAME}' tidak ditemukan, membuat baru...")
             target_worksheet = execute_with_backoff(
@@ -382,62 +306,60 @@ def process_sisa_kuota_wa():
             print(f"❌ Error saat mengakses sheet target: {e}")
             raise
         
-        print("   • Menulis data ke Google Sheets...")
+        def tulis_ulang_penuh():
+            print("   • Menghapus isi sheet...")
+            execute_with_backoff(target_worksheet.clear)
+            
+            print("   • Menulis data ke Google Sheets...")
         
-        # Gunakan metode batch update untuk menghindari rate limit
-        # Konversi DataFrame menjadi list of lists
-        data_to_write = [output_df.columns.values.tolist()] + output_df.values.tolist()
+            # Gunakan metode batch update untuk menghindari rate limit
+            # Konversi DataFrame menjadi list of lists
+            data_to_write = [output_df.columns.values.tolist()] + output_df.values.tolist()
         
-        # Tentukan range target
-        end_column = chr(64 + len(output_df.columns))  # A=65, B=66, etc.
-        end_row = len(data_to_write)
-        target_range = f'A1:{end_column}{end_row}'
+            # Tentukan range target
+            end_column = chr(64 + len(output_df.columns))  # A=65, B=66, etc.
+            end_row = len(data_to_write)
+            target_range = f'A1:{end_column}{end_row}'
         
-        print(f"   • Menulis {len(data_to_write)-1} baris data ke range {target_range}...")
+            print(f"   • Menulis {len(data_to_write)-1} baris data ke range {target_range}...")
         
-        # Update semua data dalam satu panggilan API
-        try:
-            execute_with_backoff(
-                target_worksheet.update,
-                values=data_to_write,
-                range_name=target_range
-            )
-            print(f"✅ Data berhasil ditulis dalam satu batch update: {len(output_df)} baris")
-        except Exception as e:
-            print(f"⚠️  Batch update gagal, mencoba metode per-baris dengan backoff: {e}")
+            # Update semua data dalam satu panggilan API
+            try:
+                execute_with_backoff(
+                    target_worksheet.update,
+                    values=data_to_write,
+                    range_name=target_range
+                )
+                print(f"✅ Data berhasil ditulis dalam satu batch update: {len(output_df)} baris")
+            except Exception as e:
+                print(f"⚠️  Batch update gagal, mencoba metode per-baris dengan backoff: {e}")
             
-            # Fallback: tulis per baris dengan backoff
-            for i in range(len(data_to_write)):
-                row_range = f'A{i+1}:{end_column}{i+1}'
-                row_data = [data_to_write[i]]
-                
-                for retry in range(5):
-                    try:
-                        target_worksheet.update(values=row_data, range_name=row_range)
-                        break
-                    except Exception as inner_e:
-                        if "429" in str(inner_e) and retry < 4:
-                            wait_time = (2 ** retry) + random.random()
-                            print(f"     ⚠️  Rate limit pada baris {i+1}, retry {retry+1} dalam {wait_time:.2f} detik...")
-                            time.sleep(wait_time)
-                        else:
-                            raise inner_e
-                
-                # Jeda kecil antar baris
-                if i % 20 == 0 and i > 0:
-                    time.sleep(1)
+                # Fallback: tulis per baris, laju diatur rate limiter
+                for i in range(len(data_to_write)):
+                    row_range = f'A{i+1}:{end_column}{i+1}'
+                    execute_with_backoff(
+                        target_worksheet.update,
+                        values=[data_to_write[i]],
+                        range_name=row_range
+                    )
             
-            print(f"✅ Data berhasil ditulis (metode fallback): {len(output_df)} baris")
+                print(f"✅ Data berhasil ditulis (metode fallback): {len(output_df)} baris")
         
-        # Format header (opsional, bisa dihapus jika ingin lebih cepat)
-        try:
-            header_format = {
-                "backgroundColor": {"red": 0.2, "green": 0.6, "blue": 0.8},
-                "textFormat": {"bold": True, "foregroundColor": {"red": 1.0, "green": 1.0, "blue": 1.0}}
-            }
-            execute_with_backoff(target_worksheet.format, 'A1:C1', header_format)
-        except:
-            pass
+            # Format header (opsional, bisa dihapus jika ingin lebih cepat)
+            try:
+                header_format = {
+                    "backgroundColor": {"red": 0.2, "green": 0.6, "blue": 0.8},
+                    "textFormat": {"bold": True, "foregroundColor": {"red": 1.0, "green": 1.0, "blue": 1.0}}
+                }
+                execute_with_backoff(target_worksheet.format, 'A1:C1', header_format)
+            except:
+                pass
+        
+        # Tulis hanya baris yang berubah (fallback: tulis ulang penuh)
+        sync_dataframe_to_worksheet(
+            target_worksheet, output_df, "sisa_kuota_wa", key_columns=['NIK'],
+            full_write=tulis_ulang_penuh, value_input_option='RAW'
+        )
         
         print(f"✅ Data berhasil ditulis: {len(output_df)} baris")
         
@@ -564,3 +486,4 @@ if __name__ == "__main__":
     pd.set_option('display.max_colwidth', 50)
     
     process_sisa_kuota_wa()
+    SHEETS_LIMITER.print_summary()
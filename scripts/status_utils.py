@@ -0,0 +1,112 @@
+"""
+status_utils.py
+Klasifikasi kolom STATUS per nilai unik, dengan cache hasil klasifikasi.
+
+Kolom STATUS hanya berisi beberapa puluh teks berbeda, tetapi dulu setiap
+baris diklasifikasikan sendiri lewat .apply (regex + pencarian substring).
+StatusClassifier membungkus fungsi klasifikasi yang sudah ada di setiap
+script (aturannya tetap milik script masing-masing):
+- kolom di-factorize, setiap teks unik diklasifikasikan sekali lalu hasilnya
+  disebar ke semua baris, jadi biayanya hampir tidak bergantung jumlah baris;
+- hasil klasifikasi disimpan di memori (antar file dalam satu run) dan di
+  disk (antar run). Naikkan `version` jika aturan klasifikasi berubah.
+
+Konfigurasi lewat environment variable:
+- STATUS_CACHE_DIR     : lokasi cache (default ~/.cache/verval-pupuk2/status)
+- STATUS_CACHE_ENABLED : "0" untuk tidak menyimpan cache ke disk
+
+Lokasi: verval-pupuk2/scripts/status_utils.py
+"""
+
+import os
+import json
+import numpy as np
+import pandas as pd
+
+# ============================
+# KONFIGURASI
+# ============================
+STATUS_CACHE_DIR = os.getenv(
+    "STATUS_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "verval-pupuk2", "status")
+)
+STATUS_CACHE_ENABLED = os.getenv("STATUS_CACHE_ENABLED", "1").strip().lower() not in ("0", "false", "no")
+
+# Kunci cache untuk nilai kosong (NaN/None)
+EMPTY_STATUS_KEY = "\x00KOSONG"
+
+# ============================
+# KELAS KLASIFIKASI
+# ============================
+class StatusClassifier:
+    """Jalankan fungsi klasifikasi sekali per teks STATUS unik"""
+
+    def __init__(self, classify_func, name, version=1, categories=None,
+                 cache_dir=STATUS_CACHE_DIR, persist=STATUS_CACHE_ENABLED):
+        self.classify_func = classify_func
+        self.name = name
+        self.version = str(version)
+        self.categories = list(categories) if categories is not None else None
+        self.persist = persist
+        self.cache_path = os.path.join(cache_dir, f"{name}.json")
+        self._mapping = self._load() if persist else {}
+        self._dirty = False
+
+    def _load(self):
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if cached.get("version") != self.version:
+            return {}
+        return cached.get("mapping", {})
+
+    def save(self):
+        """Simpan cache ke disk (hanya jika ada teks STATUS baru)"""
+        if not self.persist or not self._dirty:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = f"{self.cache_path}.tmp-{os.getpid()}"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": self.version, "mapping": self._mapping}, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.cache_path)
+            self._dirty = False
+        except OSError as e:
+            print(f"⚠️  Gagal menyimpan cache status {self.name}: {e}")
+
+    def classify_value(self, status_value):
+        """Klasifikasi satu nilai STATUS (dengan cache)"""
+        is_empty = status_value is None or (not isinstance(status_value, str) and pd.isna(status_value))
+        key = EMPTY_STATUS_KEY if is_empty else str(status_value)
+        if key not in self._mapping:
+            self._mapping[key] = self.classify_func(None if is_empty else status_value)
+            self._dirty = True
+        return self._mapping[key]
+
+    def _classify_codes(self, series):
+        """(codes, hasil per nilai unik + slot terakhir untuk nilai kosong)"""
+        codes, uniques = pd.factorize(series)
+        results = [self.classify_value(value) for value in uniques]
+        results.append(self.classify_value(None))
+        self.save()
+        return codes, results
+
+    def classify_series(self, series):
+        """Kolom hasil klasifikasi (categorical, kategori = klasifikasi yang muncul)"""
+        codes, results = self._classify_codes(series)
+        labels = np.array(results, dtype=object)[codes]
+
+        present = set(labels)
+        if self.categories is not None:
+            categories = [cat for cat in self.categories if cat in present]
+            categories += sorted(present - set(categories))
+        else:
+            categories = sorted(present)
+        return pd.Series(pd.Categorical(labels, categories=categories), index=series.index, name=series.name)
+
+    def mask(self, series):
+        """Mask boolean untuk fungsi klasifikasi yang mengembalikan True/False"""
+        codes, results = self._classify_codes(series)
+        return pd.Series(np.array(results, dtype=bool)[codes], index=series.index)
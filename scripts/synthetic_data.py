@@ -0,0 +1,556 @@
+"""
+synthetic_data.py
+Generator file ERDKK dan realisasi sintetis untuk benchmark seluruh tahap
+pipeline, dari 10 ribu sampai 5 juta baris (dan lebih).
+
+Struktur file mengikuti data asli:
+- ERDKK      : satu file per kecamatan ("ERDKK <KECAMATAN>.xlsx", sheet Sheet1),
+               kolom Nama Penyuluh, Kode Desa, Kode Kios Pengecer, Gapoktan,
+               Nama Poktan, Nama Petani, KTP, ..., Komoditas / Luas Lahan (Ha) /
+               Pupuk X (Kg) untuk MT1-MT3. Kolom Gapoktan berisi nama
+               kecamatan (tidak ada kolom Kecamatan), seperti file asli.
+- Realisasi  : satu file per bulan ("Realisasi <Bulan> <Tahun>.xlsx", sheet
+               Worksheet), kolom KECAMATAN, NO TRANSAKSI, KODE KIOS, NIK,
+               UREA ... ORGANIK CAIR, TGL TEBUS, TGL INPUT, STATUS, dst.
+
+Kekacauan data yang memang ditangani parser ikut dibuat:
+- NIK diberi tanda ' / ` / spasi, akhiran ".0", sel angka, atau kosong;
+- TGL TEBUS / Tanggal Lahir campuran dd-mm-yyyy, yyyy-mm-dd, dd/mm/yyyy,
+  dengan jam, sel tanggal Excel dan angka serial Excel;
+- angka pupuk / luas lahan sebagai sel angka atau teks, sel pupuk kosong;
+- kode kios huruf kecil, nama kecamatan dengan spasi / huruf campuran;
+- pasangan NIK + kios ganda: petani terdaftar di dua poktan, baris ERDKK
+  dobel, transaksi realisasi yang ter-export dua kali.
+
+Data petani (NIK, nama, desa, poktan, kios) dihitung dari nomor petani,
+sehingga NIK realisasi cocok dengan ERDKK (sebagian kecil sengaja tidak
+terdaftar) tanpa menyimpan populasi di memori. Hasil deterministik untuk
+seed yang sama; file ditulis paralel per proses. XML sheet di-stream
+langsung ke zip (openpyxl write-only tanpa lxml ~10x lebih lambat).
+
+Pemakaian:
+    python scripts/synthetic_data.py OUTPUT_DIR [--realisasi-rows 1M] [--erdkk-rows 500k]
+                                     [--months 12] [--seed 42] [--workers N]
+
+Hasil: OUTPUT_DIR/erdkk/*.xlsx dan OUTPUT_DIR/realisasi/*.xlsx. Untuk run
+offline, seed_fake_drive() mengunggah keduanya ke fake_google dengan folder
+ID produksi.
+
+Lokasi: verval-pupuk2/scripts/synthetic_data.py
+"""
+
+import os
+import sys
+import time
+import random
+import zipfile
+import argparse
+import itertools
+from xml.sax.saxutils import escape
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+
+# ============================
+# KONFIGURASI
+# ============================
+ERDKK_FOLDER_ID = "13N5dLdHzAKff6g8RDRiHa7LFyZbdJUCJ"  # Folder ERDKK
+REALISASI_FOLDER_ID = "1AXQdEUW1dXRcdT0m0QkzvT7ZJjN0Vt4E"  # Folder realisasi
+
+TAHUN = 2025
+MAX_SHEET_ROWS = 1_048_575  # batas baris xlsx tanpa header
+
+KECAMATAN = [
+    'AJUNG', 'AMBULU', 'ARJASA', 'BALUNG', 'BANGSALSARI', 'GUMUKMAS', 'JELBUK', 'JENGGAWAH',
+    'JOMBANG', 'KALISAT', 'KALIWATES', 'KENCONG', 'LEDOKOMBO', 'MAYANG', 'MUMBULSARI', 'PAKUSARI',
+    'PANTI', 'PATRANG', 'PUGER', 'RAMBIPUJI', 'SEMBORO', 'SILO', 'SUKORAMBI', 'SUKOWONO',
+    'SUMBERBARU', 'SUMBERJAMBE', 'SUMBERSARI', 'TANGGUL', 'TEMPUREJO', 'UMBULSARI', 'WULUHAN'
+]
+BULAN = [
+    "Januari", "Februari", "Maret", "April", "Mei", "Juni",
+    "Juli", "Agustus", "September", "Oktober", "November", "Desember"
+]
+DESA = ['SUMBEREJO', 'KARANGREJO', 'MULYOREJO', 'TANJUNGREJO', 'PURWOASRI', 'MAYANGAN',
+        'KEPANJEN', 'MENAMPU', 'BAGOREJO', 'WONOREJO', 'SIDOMULYO', 'TEGALREJO']
+POKTAN = ['TANI MAKMUR', 'SUMBER REJEKI', 'SRI REJEKI', 'TANI JAYA', 'SUBUR', 'MEKAR SARI',
+          'HARAPAN', 'SIDO MAKMUR', 'BAROKAH', 'TUNAS BARU']
+NAMA_LAKI = ['AHMAD', 'SUPARMAN', 'SLAMET', 'SUKARDI', 'MISNAN', 'HASAN', 'SUGENG', 'MOH',
+             'ABDUL', 'NURHADI', 'JUMARI', 'SUNARTO', 'RIYADI', 'KASIANTO', 'SAMSUL']
+NAMA_PEREMPUAN = ['SITI', 'SUMIATI', 'ROSIDAH', 'SUPIYATI', 'NUR', 'MUNAWAROH', 'SULASTRI',
+                  'KHOTIMAH', 'SRI', 'WATINI', 'JUMAIYAH', 'ASMIRAH']
+NAMA_BELAKANG = ['', 'HIDAYAT', 'SANTOSO', 'ROHMAN', 'FAUZI', 'WAHYUDI', 'AMINAH', 'SAFII',
+                 'MULYONO', 'UTOMO', 'HASANAH', 'ARIFIN', 'SUSANTO']
+KOMODITAS = [('PADI', 'TANAMAN PANGAN'), ('JAGUNG', 'TANAMAN PANGAN'), ('KEDELAI', 'TANAMAN PANGAN'),
+             ('CABAI', 'HORTIKULTURA'), ('BAWANG MERAH', 'HORTIKULTURA'), ('TEBU', 'PERKEBUNAN'),
+             ('TEMBAKAU', 'PERKEBUNAN'), ('KOPI', 'PERKEBUNAN')]
+
+DESA_PER_KECAMATAN = len(DESA)
+POKTAN_PER_DESA = 4
+KIOS_PER_KECAMATAN = 12
+
+ERDKK_PUPUK = ['Urea', 'NPK', 'NPK Formula', 'Organik', 'ZA']
+ERDKK_PUPUK_PER_HA = {'Urea': 250, 'NPK': 300, 'NPK Formula': 0, 'Organik': 500, 'ZA': 100}
+ERDKK_HEADER = [
+    'Nama Penyuluh', 'Kode Desa', 'Kode Kios Pengecer', 'Nama Kios Pengecer', 'Gapoktan',
+    'Nama Poktan', 'Nama Petani', 'KTP', 'Tempat Lahir', 'Tanggal Lahir', 'Nama Ibu Kandung',
+    'Alamat', 'Subsektor', 'Nama Desa'
+] + [col for mt in (1, 2, 3) for col in
+     [f'Komoditas MT{mt}', f'Luas Lahan (Ha) MT{mt}'] + [f'Pupuk {p} (Kg) MT{mt}' for p in ERDKK_PUPUK]]
+
+REALISASI_HEADER = [
+    'NO', 'KECAMATAN', 'NO TRANSAKSI', 'KODE KIOS', 'NAMA KIOS', 'NIK', 'NAMA PETANI',
+    'KODE DESA', 'DESA', 'POKTAN', 'UREA', 'NPK', 'SP36', 'ZA', 'NPK FORMULA',
+    'ORGANIK', 'ORGANIK CAIR', 'TGL TEBUS', 'TGL INPUT', 'STATUS', 'NO HP',
+    'ALAMAT', 'KETERANGAN', 'PETUGAS'
+]
+STATUS_VALUES = [
+    'Disetujui Pusat', 'Menunggu Persetujuan Pusat', 'Disetujui Pupuk Indonesia',
+    'Ditolak Kabupaten', 'Menunggu verifikasi tim verval kecamatan'
+]
+STATUS_WEIGHTS = [70, 12, 10, 3, 5]
+
+# Tingkat kekacauan data (proporsi baris)
+ERDKK_DUPLICATE_POKTAN_RATE = 0.03  # petani terdaftar lagi di poktan lain (NIK + kios sama)
+ERDKK_DUPLICATE_ROW_RATE = 0.005  # baris ERDKK dobel persis
+REALISASI_DUPLICATE_ROW_RATE = 0.01  # transaksi ter-export dua kali
+REALISASI_OTHER_KIOS_RATE = 0.02  # petani menebus di kios lain di kecamatannya
+REALISASI_UNREGISTERED_RATE = 0.02  # NIK realisasi yang tidak ada di ERDKK
+NIK_STYLES = [  # (gaya penulisan NIK, bobot)
+    ('plain', 80), ('quote', 7), ('backtick', 2), ('spaces', 2), ('float', 2), ('number', 6), ('empty', 1)
+]
+DATE_STYLES = [  # (gaya penulisan tanggal, bobot)
+    ('%d-%m-%Y', 50), ('%Y-%m-%d', 12), ('%d/%m/%Y', 10), ('%Y-%m-%d %H:%M:%S', 10),
+    ('%d-%m-%Y %H:%M:%S', 3), ('datetime', 10), ('serial', 5)
+]
+NUMBER_AS_TEXT_RATE = 0.1
+MESSY_TEXT_RATE = 0.03
+
+EXCEL_EPOCH = datetime(1899, 12, 30)
+
+# Bagian xlsx minimal (satu sheet, style 1 = tanggal dd-mm-yyyy hh:mm)
+_XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="{sheet_name}" sheetId="1" r:id="rId1"/></sheets></workbook>'),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '<Relationship Id="rId2" Target="styles.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles"/>'
+        '</Relationships>'),
+    "xl/styles.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<numFmts count="1"><numFmt numFmtId="164" formatCode="dd\\-mm\\-yyyy\\ hh:mm"/></numFmts>'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'),
+}
+_SHEET_START = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+
+# ============================
+# DATA PETANI (DETERMINISTIK DARI NOMOR PETANI)
+# ============================
+def petani(p):
+    """
+    Atribut petani nomor p: dict kecamatan, NIK (16 digit, unik untuk
+    p < ~50 juta), nama, tanggal lahir, desa, poktan dan kios.
+    """
+    k = p % len(KECAMATAN)
+    j = p // len(KECAMATAN)
+    mix = (p * 2654435761) & 0xFFFFFFFF
+
+    # NIK: 3509 + kode kecamatan + tanggal lahir (perempuan +40) + nomor urut
+    dob_index = (j * 7919) % 16800
+    day, month, year = dob_index % 28 + 1, (dob_index // 28) % 12 + 1, 1950 + dob_index // 336
+    female = (mix >> 7) & 1 == 1
+    nik = f"3509{k + 1:02d}{day + 40 if female else day:02d}{month:02d}{year % 100:02d}{j % 9999 + 1:04d}"
+
+    first_names = NAMA_PEREMPUAN if female else NAMA_LAKI
+    nama = f"{first_names[(mix >> 9) % len(first_names)]} {NAMA_BELAKANG[(mix >> 13) % len(NAMA_BELAKANG)]}".strip()
+
+    desa = (j // 3) % DESA_PER_KECAMATAN
+    kios = (desa * KIOS_PER_KECAMATAN // DESA_PER_KECAMATAN + (mix >> 17) % 2) % KIOS_PER_KECAMATAN
+    return {
+        'kecamatan': k,
+        'nik': nik,
+        'nama': nama,
+        'female': female,
+        'lahir': datetime(year, month, day),
+        'desa': desa,
+        'poktan': desa * POKTAN_PER_DESA + (mix >> 19) % POKTAN_PER_DESA,
+        'kios': kios,
+        'mix': mix,
+    }
+
+def kode_desa(k, desa):
+    return f"3509{k + 1:02d}20{desa + 1:02d}"
+
+def nama_desa(k, desa):
+    return DESA[(k + desa) % len(DESA)]
+
+def kode_kios(k, kios):
+    return f"PPTS3509{k + 1:02d}{kios + 1:04d}"
+
+def nama_kios(k, kios):
+    return f"UD {POKTAN[(k + kios) % len(POKTAN)]} {kios + 1}"
+
+def nama_poktan(k, poktan):
+    return f"{POKTAN[(k + poktan) % len(POKTAN)]} {poktan // len(POKTAN) + 1}"
+
+# ============================
+# FUNGSI KEKACAUAN DATA
+# ============================
+def messy_nik(nik, rng):
+    """NIK dengan gaya penulisan acak sesuai NIK_STYLES"""
+    style = rng.choices(_NIK_STYLE_NAMES, _NIK_STYLE_WEIGHTS)[0]
+    if style == 'quote':
+        return f"'{nik}"
+    if style == 'backtick':
+        return f"`{nik}"
+    if style == 'spaces':
+        return f" {nik} "
+    if style == 'float':
+        return f"{nik}.0"
+    if style == 'number':
+        return int(nik)
+    if style == 'empty':
+        return None
+    return nik
+
+def messy_date(value, rng):
+    """Tanggal sebagai teks dengan format acak, sel datetime, atau angka serial Excel"""
+    style = rng.choices(_DATE_STYLE_NAMES, _DATE_STYLE_WEIGHTS)[0]
+    if style == 'datetime':
+        return value
+    if style == 'serial':
+        return (value - EXCEL_EPOCH).days
+    return value.strftime(style)
+
+def messy_number(value, rng):
+    """Angka sebagai sel angka atau teks; nol kadang sel kosong"""
+    if value == 0 and rng.random() < 0.3:
+        return None
+    if rng.random() < NUMBER_AS_TEXT_RATE:
+        return str(value)
+    return value
+
+def messy_text(value, rng):
+    """Teks dengan spasi di tepi / huruf kecil sesekali"""
+    if rng.random() >= MESSY_TEXT_RATE:
+        return value
+    return rng.choice([f"{value} ", f" {value}", value.lower(), value.title()])
+
+_NIK_STYLE_NAMES, _NIK_STYLE_WEIGHTS = zip(*NIK_STYLES)
+_DATE_STYLE_NAMES, _DATE_STYLE_WEIGHTS = zip(*DATE_STYLES)
+
+# ============================
+# GENERATOR BARIS
+# ============================
+def erdkk_row(info, poktan, rng):
+    """Satu baris ERDKK untuk petani info di poktan tertentu"""
+    k = info['kecamatan']
+    mix = info['mix']
+    kecamatan = KECAMATAN[k]
+    komoditas_utama = KOMODITAS[(mix >> 21) % len(KOMODITAS)]
+
+    row = [
+        f"PENYULUH {kecamatan} {info['desa'] % 3 + 1}",
+        kode_desa(k, info['desa']),
+        messy_text(kode_kios(k, info['kios']), rng),
+        nama_kios(k, info['kios']),
+        messy_text(kecamatan, rng),  # Gapoktan berisi nama kecamatan
+        nama_poktan(k, poktan),
+        info['nama'],
+        messy_nik(info['nik'], rng),
+        'JEMBER' if mix % 10 else kecamatan,
+        messy_date(info['lahir'], rng),
+        NAMA_PEREMPUAN[(mix >> 23) % len(NAMA_PEREMPUAN)],
+        f"DUSUN {DESA[(mix >> 25) % len(DESA)]} RT {mix % 9 + 1:03d} RW {mix % 5 + 1:03d}",
+        komoditas_utama[1],
+        nama_desa(k, info['desa']),
+    ]
+    for mt, chance in ((1, 1.0), (2, 0.7), (3, 0.4)):
+        if rng.random() >= chance:
+            row += [None, None] + [None] * len(ERDKK_PUPUK)
+            continue
+        komoditas = komoditas_utama if mt == 1 else rng.choice(KOMODITAS)
+        luas = round(rng.uniform(0.1, 2.0), 2)
+        row += [komoditas[0], messy_number(luas, rng)]
+        for pupuk in ERDKK_PUPUK:
+            dipakai = pupuk in ('Urea', 'NPK') or rng.random() < 0.4
+            row.append(messy_number(round(luas * ERDKK_PUPUK_PER_HA[pupuk]) if dipakai else 0, rng))
+    return row
+
+def erdkk_rows(k, rows, seed):
+    """Baris ERDKK kecamatan k (generator, tepat `rows` baris)"""
+    rng = random.Random(f"{seed}-erdkk-{k}")
+    emitted = 0
+    j = 0
+    while emitted < rows:
+        info = petani(j * len(KECAMATAN) + k)
+        row = erdkk_row(info, info['poktan'], rng)
+        batch = [row]
+        if rng.random() < ERDKK_DUPLICATE_ROW_RATE:
+            batch.append(list(row))
+        if rng.random() < ERDKK_DUPLICATE_POKTAN_RATE:
+            other = (info['poktan'] + 1) % (DESA_PER_KECAMATAN * POKTAN_PER_DESA)
+            batch.append(erdkk_row(info, other, rng))
+        for item in batch[:rows - emitted]:
+            yield item
+        emitted += len(batch[:rows - emitted])
+        j += 1
+
+def realisasi_row(no, month, population, rng):
+    """Satu transaksi realisasi bulan month (1-12) dari petani acak"""
+    unregistered = rng.random() < REALISASI_UNREGISTERED_RATE
+    p = population + rng.randrange(max(1, population // 10)) if unregistered else rng.randrange(population)
+    info = petani(p)
+    k = info['kecamatan']
+    kios = info['kios']
+    if rng.random() < REALISASI_OTHER_KIOS_RATE:
+        kios = rng.randrange(KIOS_PER_KECAMATAN)
+
+    days = (datetime(TAHUN + month // 12, month % 12 + 1, 1) - datetime(TAHUN, month, 1)).days
+    tebus = datetime(TAHUN, month, rng.randint(1, days), rng.randint(7, 16), rng.randint(0, 59))
+    tgl_input = tebus + timedelta(hours=rng.randint(0, 48), minutes=rng.randint(0, 59))
+    if rng.random() < 0.1:
+        tgl_input = tgl_input.strftime('%Y-%m-%d %H:%M:%S')
+
+    return [
+        no,
+        messy_text(KECAMATAN[k], rng),
+        f"TRX{TAHUN}{month:02d}{no:08d}",
+        messy_text(kode_kios(k, kios), rng),
+        nama_kios(k, kios),
+        messy_nik(info['nik'], rng),
+        info['nama'],
+        kode_desa(k, info['desa']),
+        nama_desa(k, info['desa']),
+        nama_poktan(k, info['poktan']),
+        messy_number(rng.choice([0, 25, 50, 75, 100, 12.5]), rng),
+        messy_number(rng.choice([0, 25, 50, 100]), rng),
+        messy_number(rng.choice([0, 0, 25]), rng),
+        messy_number(rng.choice([0, 0, 25]), rng),
+        messy_number(rng.choice([0, 0, 50]), rng),
+        messy_number(rng.choice([0, 100, 200]), rng),
+        messy_number(rng.choice([0, 0, 1.5]), rng),
+        messy_date(tebus, rng),
+        tgl_input,
+        rng.choices(STATUS_VALUES, STATUS_WEIGHTS)[0],
+        f"08{(info['mix'] * 7) % 10**10:010d}",
+        f"DUSUN {nama_desa(k, info['desa'])} RT {info['mix'] % 9 + 1}",
+        rng.choice(['', '', '', 'Sudah tebus', 'Kios tutup']),
+        f"Petugas {kios + 1} {KECAMATAN[k]}",
+    ]
+
+def realisasi_rows(month, rows, population, seed):
+    """Baris realisasi satu bulan (generator, tepat `rows` baris)"""
+    rng = random.Random(f"{seed}-realisasi-{month}")
+    no = 0
+    while no < rows:
+        no += 1
+        row = realisasi_row(no, month, population, rng)
+        yield row
+        if no < rows and rng.random() < REALISASI_DUPLICATE_ROW_RATE:
+            no += 1
+            yield [no] + row[1:]
+
+# ============================
+# PENULISAN FILE
+# ============================
+def _column_letters(count):
+    letters = []
+    for index in range(1, count + 1):
+        name = ""
+        while index:
+            index, rem = divmod(index - 1, 26)
+            name = chr(65 + rem) + name
+        letters.append(name)
+    return letters
+
+def _cell_xml(ref, value):
+    """XML satu sel: angka, datetime (serial + style tanggal) atau inline string"""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c r="{ref}"><v>{value!r}</v></c>'
+    if isinstance(value, datetime):
+        serial = (value - EXCEL_EPOCH) / timedelta(days=1)
+        return f'<c r="{ref}" s="1"><v>{serial!r}</v></c>'
+    text = escape(str(value))
+    space = ' xml:space="preserve"' if text != text.strip() else ''
+    return f'<c r="{ref}" t="inlineStr"><is><t{space}>{text}</t></is></c>'
+
+def write_workbook(path, sheet_name, header, rows):
+    """
+    Tulis satu xlsx (satu sheet) dengan men-stream XML sheet langsung ke zip,
+    return jumlah baris data. openpyxl write-only hanya ~65 ribu sel/detik
+    tanpa lxml, terlalu lambat untuk jutaan baris.
+    """
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    letters = _column_letters(len(header))
+    count = 0
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+        for name, content in _XLSX_PARTS.items():
+            zf.writestr(name, content.format(sheet_name=escape(sheet_name, {'"': "&quot;"})))
+        with zf.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write(_SHEET_START.encode("utf-8"))
+            batch = []
+            for number, row in enumerate(itertools.chain([header], rows), start=1):
+                cells = "".join(_cell_xml(f"{letter}{number}", value) for letter, value in zip(letters, row))
+                batch.append(f'<row r="{number}">{cells}</row>')
+                if len(batch) >= 1000:
+                    sheet.write("".join(batch).encode("utf-8"))
+                    batch = []
+                count = number - 1
+            sheet.write(("".join(batch) + "</sheetData></worksheet>").encode("utf-8"))
+    return count
+
+def write_erdkk_file(path, k, rows, seed=42):
+    """File ERDKK kecamatan k"""
+    return write_workbook(path, "Sheet1", ERDKK_HEADER, erdkk_rows(k, rows, seed))
+
+def write_realisasi_file(path, month, rows, population=None, seed=42):
+    """File realisasi bulan month; population = jumlah petani terdaftar (default = rows)"""
+    return write_workbook(path, "Worksheet", REALISASI_HEADER,
+                          realisasi_rows(month, rows, population or rows, seed))
+
+def split_rows(total, parts):
+    """Bagi total baris ke beberapa file serata mungkin"""
+    return [total // parts + (1 if i < total % parts else 0) for i in range(parts)]
+
+def registered_population(erdkk_rows_total):
+    """Perkiraan jumlah petani unik dalam ERDKK dengan erdkk_rows_total baris"""
+    return max(1, int(erdkk_rows_total / (1 + ERDKK_DUPLICATE_POKTAN_RATE + ERDKK_DUPLICATE_ROW_RATE)))
+
+def _run_task(task):
+    kind, path, args = task
+    writer = write_erdkk_file if kind == "erdkk" else write_realisasi_file
+    start = time.perf_counter()
+    count = writer(path, *args)
+    return kind, path, count, time.perf_counter() - start
+
+def generate_dataset(output_dir, erdkk_rows_total, realisasi_rows_total, months=12, seed=42, workers=None):
+    """
+    Tulis ERDKK (per kecamatan) dan realisasi (per bulan) ke output_dir.
+    Return dict {'erdkk': [path...], 'realisasi': [path...]}
+    """
+    if not 1 <= months <= 12:
+        raise ValueError("months harus 1-12")
+    per_month = split_rows(realisasi_rows_total, months)
+    if per_month and per_month[0] > MAX_SHEET_ROWS:
+        raise ValueError(f"{per_month[0]:,} baris per file realisasi melebihi batas xlsx {MAX_SHEET_ROWS:,}")
+
+    population = registered_population(erdkk_rows_total)
+    tasks = []
+    for k, rows in enumerate(split_rows(erdkk_rows_total, len(KECAMATAN))):
+        if rows:
+            path = os.path.join(output_dir, "erdkk", f"ERDKK {KECAMATAN[k]}.xlsx")
+            tasks.append(("erdkk", path, (k, rows, seed)))
+    for month, rows in enumerate(per_month, start=1):
+        if rows:
+            path = os.path.join(output_dir, "realisasi", f"Realisasi {BULAN[month - 1]} {TAHUN}.xlsx")
+            tasks.append(("realisasi", path, (month, rows, population, seed)))
+
+    # File besar dulu supaya proses paralel selesai bersamaan
+    tasks.sort(key=lambda task: task[2][1] * (len(ERDKK_HEADER) if task[0] == "erdkk" else len(REALISASI_HEADER)),
+               reverse=True)
+    workers = max(1, workers or os.cpu_count() or 1)
+    if workers == 1:
+        results = [_run_task(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_run_task, tasks))
+
+    paths = {'erdkk': [], 'realisasi': []}
+    for kind, path, count, elapsed in sorted(results, key=lambda result: result[1]):
+        paths[kind].append(path)
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        print(f"   📄 {os.path.relpath(path, output_dir):42s} {count:>10,} baris {size_mb:8.1f} MB {elapsed:7.1f} detik")
+    return paths
+
+# ============================
+# FAKE DRIVE
+# ============================
+def seed_fake_drive(backend, paths):
+    """
+    Unggah hasil generate_dataset ke backend fake_google dengan folder ID
+    produksi (ERDKK_FOLDER_ID / REALISASI_FOLDER_ID). Return jumlah file.
+    """
+    count = 0
+    for kind, folder_id in (('erdkk', ERDKK_FOLDER_ID), ('realisasi', REALISASI_FOLDER_ID)):
+        if folder_id not in backend.files:
+            backend.add_folder(kind.upper(), folder_id=folder_id)
+        for path in paths.get(kind, []):
+            with open(path, "rb") as f:
+                backend.add_file(os.path.basename(path), f.read(), parents=[folder_id])
+            count += 1
+    return count
+
+# ============================
+# FUNGSI UTAMA
+# ============================
+def parse_count(text):
+    """'10k' / '1.5M' / '250000' -> int"""
+    text = str(text).strip().lower().replace("_", "")
+    multiplier = {'k': 1_000, 'm': 1_000_000}.get(text[-1:], 1)
+    return int(float(text[:-1] if multiplier > 1 else text) * multiplier)
+
+def main():
+    parser = argparse.ArgumentParser(description="Generator data ERDKK dan realisasi sintetis")
+    parser.add_argument("output_dir")
+    parser.add_argument("--realisasi-rows", type=parse_count, default=100_000, help="total baris realisasi (10k-5M)")
+    parser.add_argument("--erdkk-rows", type=parse_count, default=None, help="total baris ERDKK (default = realisasi / 2)")
+    parser.add_argument("--months", type=int, default=12, help="jumlah file realisasi bulanan (1-12)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=None, help="proses paralel (default: jumlah CPU)")
+    args = parser.parse_args()
+
+    erdkk_total = args.erdkk_rows if args.erdkk_rows is not None else max(1, args.realisasi_rows // 2)
+    print(f"🛠️  Membuat data sintetis di {args.output_dir}: ERDKK {erdkk_total:,} baris, "
+          f"realisasi {args.realisasi_rows:,} baris ({args.months} bulan), seed {args.seed}")
+    start = time.perf_counter()
+    try:
+        paths = generate_dataset(args.output_dir, erdkk_total, args.realisasi_rows,
+                                 months=args.months, seed=args.seed, workers=args.workers)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    print(f"✅ {len(paths['erdkk'])} file ERDKK + {len(paths['realisasi'])} file realisasi "
+          f"dalam {time.perf_counter() - start:.1f} detik")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,7 +6,6 @@ FINAL VERSION + DEBUG LOGGING + EMAIL NOTIFICATION
 """
 
 import os
-import io
 import json
 import pandas as pd
 from datetime import datetime
@@ -15,10 +14,11 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import traceback
 
-import gspread
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
+
+from drive_cache import get_drive_cache, DRIVE_FILE_FIELDS
+from google_clients import get_credentials, get_drive_service, get_gspread_client
+from excel_snapshot import read_excel_cached
+from nik_utils import clean_nik_series
 
 # =====================================================
 # KONFIGURASI
@@ -26,6 +26,9 @@ from googleapiclient.http import MediaIoBaseDownload
 ERDKK_FOLDER_ID = "13N5dLdHzAKff6g8RDRiHa7LFyZbdJUCJ"
 REALISASI_FOLDER_ID = "1AXQdEUW1dXRcdT0m0QkzvT7ZJjN0Vt4E"
 
+# Dari realisasi hanya NIK dan TGL INPUT yang dipakai
+REALISASI_USECOLS = ["KTP", "NIK", "TGL INPUT"]
+
 OUTPUT_SPREADSHEET_ID = "1BmaYGnBTAyW6JoI0NGweO0lDgNxiTwH-SiNXTrhRLnM"
 OUTPUT_SPREADSHEET_URL = (
     "https://docs.google.com/spreadsheets/d/"
@@ -46,9 +49,6 @@ def log(msg, level="INFO"):
     ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     print(f"[{ts}] [{level}] {msg}")
 
-def clean_nik(series):
-    return series.astype(str).str.replace(r"\D", "", regex=True).str.strip()
-
 def find_column(df, keywords):
     for col in df.columns:
         col_u = col.upper()
@@ -131,16 +131,10 @@ Email ini dikirim otomatis oleh sistem.
 # GOOGLE AUTH
 # =====================================================
 def init_drive():
-    creds = service_account.Credentials.from_service_account_info(
-        json.loads(SERVICE_ACCOUNT_JSON), scopes=SCOPES
-    )
-    return build("drive", "v3", credentials=creds)
+    return get_drive_service(get_credentials(SCOPES))
 
 def init_gspread():
-    creds = service_account.Credentials.from_service_account_info(
-        json.loads(SERVICE_ACCOUNT_JSON), scopes=SCOPES
-    )
-    return gspread.authorize(creds)
+    return get_gspread_client(get_credentials(SCOPES))
 
 # =====================================================
 # GOOGLE DRIVE
@@ -149,19 +143,13 @@ def list_excel_files(drive, folder_id):
     res = drive.files().list(
         q=f"'{folder_id}' in parents "
         f"and mimeType='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'",
-        fields="files(id,name)",
+        fields=DRIVE_FILE_FIELDS,
     ).execute()
     return res.get("files", [])
 
-def download_excel(drive, file_id):
-    request = drive.files().get_media(fileId=file_id)
-    fh = io.BytesIO()
-    downloader = MediaIoBaseDownload(fh, request)
-    done = False
-    while not done:
-        _, done = downloader.next_chunk()
-    fh.seek(0)
-    return fh
+def download_excel(drive, file_meta):
+    # file_meta dari list_excel_files (id + md5Checksum untuk cache)
+    return get_drive_cache().fetch_bytes(drive, file_meta)
 
 # =====================================================
 # LOAD DATA
@@ -169,14 +157,14 @@ def download_excel(drive, file_id):
 def load_erdkk(drive):
     frames = []
     for f in list_excel_files(drive, ERDKK_FOLDER_ID):
-        df = pd.read_excel(download_excel(drive, f["id"]), dtype=str)
+        df = read_excel_cached(download_excel(drive, f), dtype=str)
         frames.append(df)
 
     df = pd.concat(frames, ignore_index=True)
 
     nik_col = find_column(df, ["KTP", "NIK"])
     df.rename(columns={nik_col: "NIK"}, inplace=True)
-    df["NIK"] = clean_nik(df["NIK"])
+    df["NIK"] = clean_nik_series(df["NIK"])[0].fillna("")
 
     debug_df(df, "ERDKK")
     return df
@@ -185,7 +173,7 @@ def load_realisasi(drive):
     frames, tgl_inputs = [], []
 
     for f in list_excel_files(drive, REALISASI_FOLDER_ID):
-        df = pd.read_excel(download_excel(drive, f["id"]), dtype=str)
+        df = read_excel_cached(download_excel(drive, f), dtype=str, usecols_keywords=REALISASI_USECOLS)
 
         if "TGL INPUT" in df.columns:
             df["TGL INPUT"] = pd.to_datetime(df["TGL INPUT"], errors="coerce")
@@ -198,7 +186,7 @@ def load_realisasi(drive):
         frames.append(df)
 
     df = pd.concat(frames, ignore_index=True)
-    df["NIK"] = clean_nik(df["NIK"])
+    df["NIK"] = clean_nik_series(df["NIK"])[0].fillna("")
 
     debug_df(df, "REALISASI")
 
@@ -209,6 +197,8 @@ def load_realisasi(drive):
 # MAIN
 # =====================================================
 def main():
+    import gspread
+
     log("=== SISTEM PEMANTAUAN PENEBUSAN PUPUK ===", "INFO")
 
     try: